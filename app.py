@@ -17,6 +17,7 @@ from src.models import FeatureEngine
 from src.strategy import StrategyEngine
 from src.reporter import GeminiReporter
 from src.logger import logger
+from src.history_store import load_history
 
 # Page configuration
 st.set_page_config(
@@ -250,7 +251,7 @@ with st.sidebar:
     
     # 資料統計
     if os.path.exists("data/539_train.csv"):
-        df_info = pd.read_csv("data/539_train.csv")
+        df_info = load_history('539_train')
         st.markdown("### 📊 資料統計")
         st.metric("訓練集筆數", len(df_info))
         if len(df_info) > 0:
@@ -441,16 +442,7 @@ with col2:
         with col_verify2:
             if st.button("🗑️ 放棄此預測", use_container_width=True, type="secondary"):
                 # 將預測狀態改為 expired
-                history = prediction_history.load_all_predictions()
-                for record in history:
-                    if record.get('prediction_date') == pending_prediction.get('prediction_date'):
-                        record['status'] = 'expired'
-                        break
-                
-                # 儲存更新
-                import json
-                with open(prediction_history.history_file, 'w', encoding='utf-8') as f:
-                    json.dump(history, f, indent=2, ensure_ascii=False)
+                prediction_history.update_status(pending_prediction.get('prediction_date'), 'expired')
                 
                 # 清除 session state
                 if 'fetched_numbers_str' in st.session_state:
@@ -477,7 +469,7 @@ with col2:
                 else:
                     # Backtest
                     logger.step(1, "執行回測驗證")
-                    full_df = pd.read_csv("data/539_history.csv")
+                    full_df = load_history('539')
                     logger.info(f"載入完整資料: {len(full_df)} 筆")
                     
                     if len(full_df) > 100:
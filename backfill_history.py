@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+歷史開獎資料回補工具
+逐月抓取各遊戲的月份列表頁並寫入歷史 CSV (只新增本地沒有的日期)。
+進度記錄在 data/backfill/manifest.json, 中斷後重新執行會從未完成的月份繼續。
+
+用法:
+    python backfill_history.py --start 2015-01
+    python backfill_history.py --start 2020-01 --end 2023-12 --games 539 lotto --rate 1
+    LOTTO_CRAWLER_BASE_URL=http://127.0.0.1:8765 python backfill_history.py --start 2026-01  # 本機 fixture server
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from src.backfill import GAMES, Backfiller
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回補歷史開獎資料")
+    parser.add_argument('--start', required=True, help="起始月份 YYYY-MM")
+    parser.add_argument('--end', help="結束月份 YYYY-MM (預設本月)")
+    parser.add_argument('--games', nargs='+', choices=GAMES, help="遊戲 (預設全部)")
+    parser.add_argument('--workers', type=int, help="下載執行緒數")
+    parser.add_argument('--rate', type=float, help="每秒最多連線數")
+    parser.add_argument('--manifest', help="進度記錄檔")
+    parser.add_argument('--reset', action='store_true', help="忽略既有進度,全部重新抓取")
+    args = parser.parse_args()
+
+    backfiller = Backfiller.from_config(
+        args.start, args.end,
+        games=args.games,
+        workers=args.workers,
+        rate=args.rate,
+        manifest_path=Path(args.manifest) if args.manifest else None
+    )
+    if args.reset:
+        backfiller.manifest.data['completed'] = {}
+        backfiller.manifest.data['failed'] = {}
+
+    try:
+        summary = backfiller.run()
+    except KeyboardInterrupt:
+        print("\n[WARNING] Interrupted - progress saved, rerun to resume")
+        sys.exit(130)
+
+    print("=" * 60)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if summary['failed']:
+        print(f"[WARNING] {len(summary['failed'])} months failed - rerun to retry")
+        sys.exit(1)
+    print(f"[SUCCESS] Backfill complete in {summary['elapsed_seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
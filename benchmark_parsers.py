@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+開獎頁面解析後端效能比較
+- 以 data/fixtures/html 中保存的頁面 (auzo.tw 與 auzonet) 比較各後端的解析結果與每頁解析時間
+- 所有後端結果必須與 bs4 完全相同,否則以非零代碼結束
+- --full-history: 另外以整份歷史 CSV 產生大型頁面測試
+
+用法:
+    python benchmark_parsers.py
+    python benchmark_parsers.py --repeat 50 --full-history
+"""
+import argparse
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+import pandas as pd
+
+from src import result_parsers
+from src.fixture_server import (
+    AUZO_HOST, AUZO_PAGES, FIXTURE_ROOT, render_auzo_page, render_auzonet_page
+)
+from src.history_store import GAME_FILES
+from src.html_backends import available_backends
+from src.month_index import AUZONET_HOST, MONTH_PAGES, parse_month_page
+
+
+FIXTURE_MONTH = '2026-02'
+
+
+def _fixture_cases():
+    """(標籤, 解析函式, HTML) - 保存的 fixture 頁面"""
+    year, month = (int(x) for x in FIXTURE_MONTH.split('-'))
+    cases = []
+    for game, (template, _) in AUZO_PAGES.items():
+        path = FIXTURE_ROOT / AUZO_HOST / template.format(year=year, month=month)
+        if path.exists():
+            cases.append((f"auzo {game}", _auzo_parser(game, FIXTURE_MONTH), path.read_text(encoding='utf-8')))
+    for game, folder in MONTH_PAGES.items():
+        path = FIXTURE_ROOT / AUZONET_HOST / folder / f"list_{year}_{month}.html"
+        if path.exists():
+            cases.append((f"auzonet {game}", _auzonet_parser(game), path.read_text(encoding='utf-8')))
+    return cases
+
+
+def _history_cases():
+    """整份歷史 CSV 產生的大型頁面"""
+    cases = []
+    for game in AUZO_PAGES:
+        df = pd.read_csv(GAME_FILES[game], dtype=str)
+        cases.append((f"auzo {game} (all {len(df)})", _auzo_parser(game, ''), render_auzo_page(game, df)))
+        cases.append((f"auzonet {game} (all {len(df)})", _auzonet_parser(game), render_auzonet_page(game, df)))
+    return cases
+
+
+def _auzo_parser(game, current_ym):
+    return lambda html_text, backend: result_parsers._parse_job((game, html_text, current_ym, backend))
+
+
+def _auzonet_parser(game):
+    return lambda html_text, backend: parse_month_page(game, html_text, backend)
+
+
+def run_benchmark(repeat: int = 20, full_history: bool = False) -> bool:
+    """
+    執行比較
+
+    Returns:
+        bool: 所有後端結果是否與 bs4 相同
+    """
+    backends = ['bs4'] + [b for b in available_backends() if b != 'bs4']
+    cases = _fixture_cases() + (_history_cases() if full_history else [])
+    if not cases:
+        print(f"[ERROR] No fixtures found under {FIXTURE_ROOT} (run: python -m src.fixture_server --month {FIXTURE_MONTH})")
+        return False
+
+    print(f"Backends: {', '.join(backends)} | repeat: {repeat}")
+    header = f"{'page':<28}{'rows':>6}" + ''.join(f"{b + ' ms':>15}" for b in backends) + "  result"
+    print(header)
+    print('-' * len(header))
+
+    all_match = True
+    totals = {b: 0.0 for b in backends}
+    for label, parse, html_text in cases:
+        timings, results = {}, {}
+        for backend in backends:
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[backend] = parse(html_text, backend)
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    parse(html_text, backend)
+                timings[backend] = (time.perf_counter() - start) * 1000 / repeat
+            totals[backend] += timings[backend]
+
+        mismatched = [b for b in backends if results[b] != results['bs4']]
+        all_match = all_match and not mismatched
+        status = 'MISMATCH: ' + ', '.join(mismatched) if mismatched else 'identical'
+        print(f"{label:<28}{len(results['bs4']):>6}" + ''.join(f"{timings[b]:>15.2f}" for b in backends) + f"  {status}")
+
+    print('-' * len(header))
+    print(f"{'total':<34}" + ''.join(f"{totals[b]:>15.2f}" for b in backends))
+    for backend in backends[1:]:
+        print(f"{backend}: {totals['bs4'] / totals[backend]:.1f}x faster than bs4")
+    return all_match
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="比較開獎頁面解析後端的結果與速度")
+    parser.add_argument('--repeat', type=int, default=20, help="每頁重複解析次數")
+    parser.add_argument('--full-history', action='store_true', help="加入以整份歷史產生的大型頁面")
+    args = parser.parse_args()
+
+    if run_benchmark(args.repeat, args.full_history):
+        print("[SUCCESS] All backends produce identical results")
+    else:
+        print("[ERROR] Backend results differ")
+        sys.exit(1)
@@ -74,7 +74,8 @@ def main():
             }
             file_path = Path(file_map.get(game, ''))
             if file_path.exists():
-                return pd.read_csv(file_path)
+                from src.history_store import load_history as load_history_store
+                return load_history_store(str(file_path))
             return pd.DataFrame()
 
         # 自定義 CSS
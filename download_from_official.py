@@ -101,7 +101,8 @@ if __name__ == "__main__":
     print("2. 選擇遊戲類型")
     print("3. 選擇日期範圍 (建議: 2024-01-01 ~ 2026-01-31)")
     print("4. 下載 CSV 檔案")
-    print("5. 將檔案放到對應目錄:")
+    print("5. 將年度檔案放到 data/<年份>/ (例如 data/2025/今彩539_2025.csv)")
+    print("6. 執行 python import_official_csv.py 匯入到各遊戲歷史檔:")
     print("   - 539: data/539_history.csv")
     print("   - 大樂透: data/lotto/lotto_history.csv")
     print("   - 威力彩: data/power/power_history.csv")
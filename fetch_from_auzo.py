@@ -3,7 +3,7 @@
 從 lotto.auzo.tw 補齊所有遊戲的 2 月份資料
 新的資料來源,更新更即時
 """
-import requests
+from src.http_client import get_http_client
 from bs4 import BeautifulSoup
 import pandas as pd
 from pathlib import Path
@@ -27,7 +27,7 @@ def fetch_lotto_from_auzo():
     url = "https://lotto.auzo.tw/biglotto"
     
     try:
-        response = requests.get(url, timeout=10)
+        response = get_http_client().get(url, timeout=10)
         response.encoding = 'utf-8'
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -113,7 +113,7 @@ def fetch_power_from_auzo():
     url = "https://lotto.auzo.tw/power"
     
     try:
-        response = requests.get(url, timeout=10)
+        response = get_http_client().get(url, timeout=10)
         response.encoding = 'utf-8'
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -198,7 +198,7 @@ def fetch_star3_from_auzo():
     url = "https://lotto.auzo.tw/lotto_historylist_three-star.html"
     
     try:
-        response = requests.get(url, timeout=10)
+        response = get_http_client().get(url, timeout=10)
         response.encoding = 'utf-8'
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -272,7 +272,7 @@ def fetch_star4_from_auzo():
     url = "https://lotto.auzo.tw/lotto_historylist_four-star.html"
     
     try:
-        response = requests.get(url, timeout=10)
+        response = get_http_client().get(url, timeout=10)
         response.encoding = 'utf-8'
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -3,7 +3,7 @@
 從台灣彩券官網補齊最新資料
 爬取各遊戲的最新開獎號碼
 """
-import requests
+from src.http_client import get_http_client
 from bs4 import BeautifulSoup
 import pandas as pd
 from pathlib import Path
@@ -24,7 +24,7 @@ def fetch_latest_power():
     url = "https://www.taiwanlottery.com/lotto/result/super_lotto638"
     
     try:
-        response = requests.get(url, timeout=10, verify=False)
+        response = get_http_client().get(url, timeout=10, verify=False)
         response.encoding = 'utf-8'
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -117,7 +117,7 @@ def fetch_latest_lotto():
     url = "https://www.taiwanlottery.com/lotto/result/lotto649"
     
     try:
-        response = requests.get(url, timeout=10, verify=False)
+        response = get_http_client().get(url, timeout=10, verify=False)
         response.encoding = 'utf-8'
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -195,7 +195,7 @@ def fetch_latest_539():
     url = "https://www.taiwanlottery.com/lotto/result/daily539"
     
     try:
-        response = requests.get(url, timeout=10, verify=False)
+        response = get_http_client().get(url, timeout=10, verify=False)
         response.encoding = 'utf-8'
         
         soup = BeautifulSoup(response.text, 'html.parser')
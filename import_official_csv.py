@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+匯入台灣彩券官方年度 CSV
+將官網下載的年度檔案放在 data/<年份>/ (例如 data/2025/今彩539_2025.csv) 後執行,
+資料會轉為各遊戲歷史 CSV 格式並合併 (已匯入且未變動的檔案自動略過)。
+
+用法:
+    python import_official_csv.py
+    python import_official_csv.py --years 2024 2025 --dry-run
+    python import_official_csv.py --no-overwrite   # 只新增缺少的日期,不修正既有資料
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from src.official_importer import OfficialImporter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="匯入官方年度開獎 CSV")
+    parser.add_argument('--data-dir', default='data', help="年份目錄所在位置")
+    parser.add_argument('--years', nargs='+', help="只匯入這些年份")
+    parser.add_argument('--force', action='store_true', help="忽略匯入記錄,全部重新匯入")
+    parser.add_argument('--dry-run', action='store_true', help="只解析與檢查,不寫入")
+    parser.add_argument('--no-overwrite', action='store_true', help="同日期資料不同時保留本地資料")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    importer = OfficialImporter(Path(args.data_dir), overwrite=not args.no_overwrite)
+    summary = importer.run(years=args.years, force=args.force, dry_run=args.dry_run)
+
+    print("=" * 60)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    print(f"[SUCCESS] Import finished in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
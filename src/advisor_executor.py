@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+AI 顧問執行器 (Advisor Executor)
+- 各顧問 (命理、數學驗證、AI 分身、策略審查、Gemini 報告) 在共用執行緒池中同時執行,各自有截止時間
+- 超過截止時間即取消: 尚未開始的工作直接取消; 執行中的工作設定取消旗標,
+  在等待 LLM 配額 (src/llm_quota.py) 或呼叫 check_cancelled() 時結束,結果不再採用
+- 輸出不影響選號的顧問以背景工作執行 (background=True),主流程不等待,完成後記錄結果
+"""
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional
+
+from src.structured_logger import structured_logger
+
+
+class AdvisorCancelled(Exception):
+    """顧問工作已逾時或被取消"""
+
+
+_local = threading.local()
+
+
+def current_deadline() -> Optional[float]:
+    """目前執行緒上的顧問工作剩餘秒數 (不在顧問工作中時為 None)"""
+    handle = getattr(_local, 'handle', None)
+    return None if handle is None else handle.remaining
+
+
+def check_cancelled():
+    """目前的顧問工作已取消或逾時時拋出 AdvisorCancelled (送出報告前呼叫)"""
+    handle = getattr(_local, 'handle', None)
+    if handle is not None and (handle.cancelled or handle.remaining <= 0):
+        raise AdvisorCancelled(f"{handle.name} cancelled")
+
+
+class AdvisorHandle:
+    """單一顧問工作"""
+
+    def __init__(self, name: str, deadline_seconds: float, background: bool):
+        self.name = name
+        self.deadline_seconds = deadline_seconds
+        self.background = background
+        self.submitted = time.monotonic()
+        self.deadline = self.submitted + deadline_seconds
+        self.future = None
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+
+    @property
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """取消 (尚未開始則不會執行; 執行中則設定取消旗標)"""
+        self._cancel.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def outcome(self) -> Dict:
+        """
+        目前結果 (不等待)
+
+        Returns:
+            dict: {'status': 'running'/'ok'/'failed'/'timeout'/'cancelled', 'result', 'elapsed_seconds', 'error'}
+        """
+        end = self.finished_at or time.monotonic()
+        record = {'status': 'running', 'result': None,
+                  'elapsed_seconds': round(end - self.submitted, 2), 'error': None}
+        if not self.future.done():
+            if self.cancelled:
+                record.update(status='timeout' if self.remaining <= 0 else 'cancelled', error='deadline exceeded')
+            return record
+        try:
+            record['result'] = self.future.result()
+            record['status'] = 'ok'
+        except CancelledError:
+            record.update(status='timeout' if self.remaining <= 0 else 'cancelled', error='cancelled before start')
+        except AdvisorCancelled as e:
+            record.update(status='timeout' if self.remaining <= 0 else 'cancelled', error=str(e))
+        except Exception as e:
+            record.update(status='failed', error=f"{type(e).__name__}: {e}")
+        if record['status'] == 'ok' and self.cancelled:
+            # 逾時後才完成: 結果不採用
+            record.update(status='timeout', result=None, error='finished after deadline')
+        return record
+
+
+class AdvisorExecutor:
+    """AI 顧問執行器"""
+
+    def __init__(self, max_workers: int = 4, default_deadline: float = 120,
+                 deadlines: Optional[Dict[str, float]] = None):
+        """
+        初始化
+
+        Args:
+            max_workers: 同時執行的顧問數
+            default_deadline: 預設截止秒數
+            deadlines: {顧問名稱: 截止秒數}
+        """
+        self.default_deadline = default_deadline
+        self.deadlines = deadlines or {}
+        self.pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='advisor')
+        self.background: List[AdvisorHandle] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'AdvisorExecutor':
+        """依配置檔 ai_advisors 區段建立 (executor 與各顧問的 deadline_seconds)"""
+        advisors = config.get('ai_advisors', {})
+        executor = advisors.get('executor', {})
+        deadlines = {name: section['deadline_seconds'] for name, section in advisors.items()
+                     if isinstance(section, dict) and 'deadline_seconds' in section}
+        return cls(
+            max_workers=executor.get('max_workers', 4),
+            default_deadline=executor.get('default_deadline_seconds', 120),
+            deadlines=deadlines
+        )
+
+    def deadline_for(self, name: str) -> float:
+        return self.deadlines.get(name, self.default_deadline)
+
+    def _call(self, handle: AdvisorHandle, func: Callable, args: tuple, kwargs: dict):
+        """工作執行緒入口"""
+        if handle.cancelled or handle.remaining <= 0:
+            raise AdvisorCancelled(f"{handle.name} cancelled before start")
+        _local.handle = handle
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.handle = None
+            handle.finished_at = time.monotonic()
+
+    def submit(self, name: str, func: Callable, *args, deadline: Optional[float] = None,
+               background: bool = False, **kwargs) -> AdvisorHandle:
+        """
+        送出顧問工作 (立即返回)
+
+        Args:
+            name: 顧問名稱 (截止時間設定與記錄用)
+            func: 顧問函式
+            deadline: 截止秒數 (預設依設定)
+            background: 背景工作: 截止時自動取消,完成後記錄結果,不需等待
+
+        Returns:
+            AdvisorHandle
+        """
+        handle = AdvisorHandle(name, deadline if deadline is not None else self.deadline_for(name), background)
+        handle.future = self.pool.submit(self._call, handle, func, args, kwargs)
+        if background:
+            timer = threading.Timer(handle.deadline_seconds, self._expire, args=[handle])
+            timer.daemon = True
+            timer.start()
+            handle.future.add_done_callback(lambda _: (timer.cancel(), self._log(handle)))
+            with self._lock:
+                self.background = [h for h in self.background if not h.future.done()] + [handle]
+            print(f"[INFO] Advisor {name} running in background (deadline {handle.deadline_seconds:.0f}s)")
+        return handle
+
+    def _expire(self, handle: AdvisorHandle):
+        if not handle.future.done():
+            print(f"[WARNING] Advisor {handle.name} exceeded {handle.deadline_seconds:.0f}s deadline, cancelling")
+            handle.cancel()
+
+    def _log(self, handle: AdvisorHandle):
+        record = handle.outcome()
+        structured_logger.log_operation(
+            operation_type=f"advisor:{handle.name}",
+            status=record['status'],
+            details={'background': handle.background, 'error': record['error'],
+                     'deadline_seconds': handle.deadline_seconds},
+            duration_seconds=record['elapsed_seconds']
+        )
+        if record['status'] == 'ok':
+            print(f"[SUCCESS] Advisor {handle.name} finished in {record['elapsed_seconds']:.2f}s")
+        elif record['status'] != 'running':
+            print(f"[WARNING] Advisor {handle.name} {record['status']}: {record['error']}")
+
+    def wait(self, handles: List[AdvisorHandle]) -> Dict[str, Dict]:
+        """
+        等待各顧問到截止時間為止,逾時者取消
+
+        Returns:
+            dict: {顧問: {'status': 'ok'/'failed'/'timeout'/'cancelled', 'result', 'elapsed_seconds', 'error'}}
+        """
+        outcomes = {}
+        for handle in handles:
+            try:
+                handle.future.result(timeout=max(0.0, handle.remaining))
+            except FutureTimeoutError:
+                handle.cancel()
+            except BaseException:
+                pass
+            outcomes[handle.name] = handle.outcome()
+            if not handle.background:
+                self._log(handle)
+        return outcomes
+
+    def run(self, name: str, func: Callable, *args, deadline: Optional[float] = None, **kwargs) -> Dict:
+        """執行單一顧問並等待 (最多到截止時間)"""
+        return self.wait([self.submit(name, func, *args, deadline=deadline, **kwargs)])[name]
+
+    def run_all(self, jobs: Dict[str, Callable]) -> Dict[str, Dict]:
+        """同時執行多個顧問並等待 (各自套用截止時間)"""
+        return self.wait([self.submit(name, func) for name, func in jobs.items()])
+
+    def background_status(self) -> Dict[str, Dict]:
+        """背景工作目前狀態"""
+        with self._lock:
+            return {handle.name: handle.outcome() for handle in self.background}
+
+    def shutdown(self, wait: bool = False):
+        """取消尚未開始的工作"""
+        with self._lock:
+            for handle in self.background:
+                handle.cancel()
+        self.pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_default_executor = None
+_default_lock = threading.Lock()
+
+
+def get_advisor_executor(config_path: str = "config/auto_config.json") -> AdvisorExecutor:
+    """行程內共用的顧問執行器"""
+    global _default_executor
+    with _default_lock:
+        if _default_executor is None:
+            import json
+            try:
+                with open(config_path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                config = {}
+            _default_executor = AdvisorExecutor.from_config(config)
+        return _default_executor
+
+
+if __name__ == "__main__":
+    def advisor(seconds, fail=False):
+        def run():
+            end = time.monotonic() + seconds
+            while time.monotonic() < end:
+                check_cancelled()
+                time.sleep(0.05)
+            if fail:
+                raise RuntimeError('advisor error')
+            return f"done in {seconds}s"
+        return run
+
+    executor = AdvisorExecutor(max_workers=4, default_deadline=1.0)
+    start = time.perf_counter()
+    outcomes = executor.run_all({
+        'numerology_advice': advisor(0.3),
+        'math_validation': advisor(0.5),
+        'strategy_review': advisor(5.0),
+        'digital_twin': advisor(0.2, fail=True)
+    })
+    for advisor_name, record in outcomes.items():
+        print(f"  {advisor_name}: {record['status']} {record['elapsed_seconds']}s {record['error'] or ''}")
+    print(f"Elapsed: {time.perf_counter() - start:.2f}s (slowest advisor would take 5s)")
+
+    handle = executor.submit('gemini_report', advisor(0.3), background=True)
+    print(f"Background submitted, returned in {time.perf_counter() - start:.2f}s: {handle.outcome()['status']}")
+    time.sleep(0.6)
+    print(executor.background_status())
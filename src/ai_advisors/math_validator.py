@@ -4,11 +4,13 @@
 負責資料驗證、統計分析、模型驗證
 使用純計算,不依賴 LLM
 """
-import pandas as pd
+import json
 import numpy as np
 from pathlib import Path
+from typing import Dict
 from src.discord_notifier import DiscordNotifier
 from src.timezone_utils import get_taiwan_isoformat
+from src.history_store import GAME_FILES, load_history
 
 
 class MathValidator:
@@ -27,11 +29,11 @@ class MathValidator:
         """檢查歷史資料的完整性和正確性"""
         try:
             # 讀取歷史資料
-            history_file = f"data/{game}_history.csv"
+            history_file = GAME_FILES.get(game, f"data/{game}_history.csv")
             if not Path(history_file).exists():
                 return {'error': f'History file not found: {history_file}'}
             
-            df = pd.read_csv(history_file)
+            df = load_history(history_file)
             issues = []
             
             # 1. 檢查期數連續性 (僅 539)
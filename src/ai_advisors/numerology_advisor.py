@@ -7,8 +7,9 @@ import os
 from datetime import datetime
 from typing import Dict, List
 from google import genai
-from lunarcalendar import Converter, Solar, Lunar
 from src.discord_notifier import DiscordNotifier
+from src.llm_quota import estimate_tokens, get_llm_limiter
+from src.lunar_calendar import get_lunar_calendar, numerology_feature
 from src.timezone_utils import get_taiwan_isoformat
 
 
@@ -29,62 +30,53 @@ class NumerologyAdvisor:
         return genai.Client(api_key=api_key)
     
     def _get_lunar_info(self, target_date: str) -> Dict:
-        """取得準確的農曆資訊"""
+        """取得準確的農曆資訊 (查預先計算的曆法表)"""
         try:
-            dt = datetime.strptime(target_date, '%Y-%m-%d')
-            solar = Solar(dt.year, dt.month, dt.day)
-            lunar = Converter.Solar2Lunar(solar)
-            
-            # 農曆月份名稱
-            lunar_months = ['正月', '二月', '三月', '四月', '五月', '六月',
-                          '七月', '八月', '九月', '十月', '冬月', '臘月']
-            
-            # 農曆日期名稱 (1-30)
-            def get_lunar_day_name(day: int) -> str:
-                if day <= 10:
-                    return f"初{['一','二','三','四','五','六','七','八','九','十'][day-1]}"
-                elif day < 20:
-                    return f"十{['一','二','三','四','五','六','七','八','九'][day-11]}" if day > 10 else "初十"
-                elif day == 20:
-                    return "二十"
-                elif day < 30:
-                    return f"廿{['一','二','三','四','五','六','七','八','九'][day-21]}"
-                else:
-                    return "三十"
-            
-            lunar_date_str = f"農曆{lunar_months[lunar.month-1]}{get_lunar_day_name(lunar.day)}"
-            
-            # 天干地支
-            heavenly_stems = ['甲', '乙', '丙', '丁', '戊', '己', '庚', '辛', '壬', '癸']
-            earthly_branches = ['子', '丑', '寅', '卯', '辰', '巳', '午', '未', '申', '酉', '戌', '亥']
-            
-            # 簡化版:使用年份計算天干地支
-            year_offset = (dt.year - 4) % 60
-            stem = heavenly_stems[year_offset % 10]
-            branch = earthly_branches[year_offset % 12]
-            
-            return {
-                'lunar_date': lunar_date_str,
-                'lunar_year': lunar.year,
-                'lunar_month': lunar.month,
-                'lunar_day': lunar.day,
-                'heavenly_stem': stem,
-                'earthly_branch': branch,
-                'ganzhi': f"{stem}{branch}"
-            }
+            return get_lunar_calendar().info(target_date)
         except Exception as e:
             print(f"[WARNING] Lunar calculation failed: {e}")
             return {
                 'lunar_date': '未知',
                 'heavenly_stem': '未知',
                 'earthly_branch': '未知',
-                'ganzhi': '未知'
+                'ganzhi': '未知',
+                'day_ganzhi': '未知',
+                'solar_term': '未知'
             }
     
+    def get_rule_based_advice(self, target_date: str) -> Dict:
+        """
+        規則式命理建議 (不呼叫 LLM; 與 lunar_calendar.numerology_feature 相同規則,可回測)
+        
+        Returns:
+            dict: 與 LLM 建議相同欄位
+        """
+        try:
+            calendar = get_lunar_calendar()
+            scores = numerology_feature(calendar, [target_date])[0]
+            info = calendar.info(target_date)
+        except Exception as e:
+            print(f"[WARNING] Rule-based numerology failed: {e}")
+            return self._get_default_advice()
+        
+        order = sorted(range(len(scores)), key=lambda i: (-scores[i], i))
+        return {
+            "lunar_date": info['lunar_date'],
+            "solar_term": info['solar_term'],
+            "heavenly_stem": info['heavenly_stem'],
+            "earthly_branch": info['earthly_branch'],
+            "element": info['day_element'],
+            "lucky_numbers": [i + 1 for i in order[:5]],
+            "avoid_numbers": [i + 1 for i in range(len(scores)) if scores[i] < 0][:5],
+            "yin_yang_balance": "平衡為佳",
+            "confidence": 0.5,
+            "explanation": f"{info['day_ganzhi']}日,日干屬{info['day_element']},依河圖數與五行生剋選號"
+        }
+    
     def get_daily_numerology_advice(self, target_date: str) -> Dict:
         """取得當日的天文數理建議"""
         if not self.llm_client:
-            return self._get_default_advice()
+            return self.get_rule_based_advice(target_date)
         
         try:
             dt = datetime.strptime(target_date, '%Y-%m-%d')
@@ -98,14 +90,15 @@ class NumerologyAdvisor:
 
 日期: {target_date} ({weekday})
 農曆: {lunar_info['lunar_date']}
-天干地支: {lunar_info['ganzhi']}年
+天干地支: {lunar_info['ganzhi']}年 {lunar_info['day_ganzhi']}日
+節氣: {lunar_info['solar_term']}
 遊戲: 台灣539 (從1-39選5個號碼)
 
 請根據以下角度分析:
 
 1. **農曆與節氣**
    - 根據 {lunar_info['lunar_date']} 分析月相對數字能量的影響
-   - 判斷當前節氣
+   - 當前節氣: {lunar_info['solar_term']}
 
 2. **天干地支與五行**
    - 天干: {lunar_info['heavenly_stem']}
@@ -126,7 +119,7 @@ class NumerologyAdvisor:
 請以 JSON 格式回應:
 {{
   "lunar_date": "{lunar_info['lunar_date']}",
-  "solar_term": "立春",
+  "solar_term": "{lunar_info['solar_term']}",
   "heavenly_stem": "{lunar_info['heavenly_stem']}",
   "earthly_branch": "{lunar_info['earthly_branch']}",
   "element": "木",
@@ -140,10 +133,13 @@ class NumerologyAdvisor:
 注意: 這只是輔助參考,不保證中獎。
 """
             
-            response = self.llm_client.models.generate_content(
-                model='gemini-2.0-flash',
-                contents=prompt
-            )
+            # 命理報告不影響選號 (背景顧問工作): 與報告同為最低等級,不佔用選號相關配額
+            with get_llm_limiter().request('numerology_advisor', 'review',
+                                           tokens=estimate_tokens(prompt) + 500) as ticket:
+                response = ticket.record(self.llm_client.models.generate_content(
+                    model='gemini-2.0-flash',
+                    contents=prompt
+                ), prompt)
             
             # 解析 JSON
             import re
@@ -152,14 +148,14 @@ class NumerologyAdvisor:
                 advice = json.loads(json_match.group())
                 return advice
             else:
-                return self._get_default_advice()
+                return self.get_rule_based_advice(target_date)
                 
         except Exception as e:
             print(f"[ERROR] Numerology advice failed: {e}")
-            return self._get_default_advice()
+            return self.get_rule_based_advice(target_date)
     
     def _get_default_advice(self) -> Dict:
-        """預設建議 (當 LLM 不可用時)"""
+        """預設建議 (LLM 與曆法表皆不可用時)"""
         return {
             "lunar_date": "未知",
             "solar_term": "未知",
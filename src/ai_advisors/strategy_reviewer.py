@@ -8,6 +8,7 @@ from pathlib import Path
 from typing import Dict
 from google import genai
 from src.discord_notifier import DiscordNotifier
+from src.llm_quota import estimate_tokens, get_llm_limiter
 from src.timezone_utils import get_taiwan_isoformat
 
 
@@ -56,7 +57,9 @@ class StrategyReviewer:
 }}
 """
             
-            response = self.llm_client.generate_content(prompt)
+            with get_llm_limiter().request('strategy_reviewer', 'review',
+                                           tokens=estimate_tokens(prompt) + 500) as ticket:
+                response = ticket.record(self.llm_client.generate_content(prompt), prompt)
             
             # 解析 JSON
             import re
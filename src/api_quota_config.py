@@ -16,14 +16,24 @@ API_QUOTA_CONFIG = {
     # 模型選擇 (免費版使用 Flash)
     'model': 'gemini-2.0-flash-exp',  # 更快,更省配額
     
-    # 請求延遲 (秒)
-    'request_delay': 5,  # 每次請求間隔5秒,避免超過 RPM
+    # 請求速率 (令牌桶, 取代固定延遲)
+    'requests_per_minute': 12,  # 平均每 5 秒一次,避免超過 RPM
+    'burst': 1,  # 允許的瞬間突發請求數
+    'tokens_per_minute': 1000000,
     
     # 每日請求限制 (此專案僅用 40% 配額)
     'daily_limit': 40,  # 40% 配額,其他專案使用 60%
     
+    # 各優先等級可使用的每日配額比例 (prediction > advice > review, 保留名額給影響選號的請求)
+    'priority_daily_share': {
+        'prediction': 1.0,
+        'advice': 0.75,
+        'review': 0.5
+    },
+    
     # Token 優化
     'max_output_tokens': 300,  # 進一步限制輸出長度 (500→300)
+    'batch_max_output_tokens': 800,  # 四群合併為一次請求時的輸出上限
     'temperature': 0.2,  # 更低溫度,更精簡 (0.3→0.2)
     
     # 提示詞優化
@@ -31,7 +41,7 @@ API_QUOTA_CONFIG = {
     'strip_examples': True,  # 移除範例以節省 tokens
     
     # 快取策略
-    'cache_responses': True,  # 快取相同日期的回應
+    'cache_responses': True,  # 快取相同 prompt 的回應 (data/cache/llm/responses.db)
     'cache_duration_hours': 24,
     
     # 錯誤處理
@@ -39,9 +49,4 @@ API_QUOTA_CONFIG = {
     'fallback_to_default': True  # 配額用完時使用預設值
 }
 
-# 每日配額追蹤
-DAILY_USAGE = {
-    'date': None,
-    'requests': 0,
-    'tokens_used': 0
-}
+# 每日配額追蹤: 見 src/llm_quota.py (SQLite 帳本, 所有 LLM 呼叫端與行程共用)
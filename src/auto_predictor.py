@@ -14,6 +14,51 @@ from src.prediction_history import PredictionHistory
 from src.auzonet_crawler import fetch_auzonet_single_date
 from src.structured_logger import structured_logger
 from src.discord_notifier import DiscordNotifier
+from src.history_store import load_history
+from src.history_writer import get_history_writer
+from src.advisor_executor import check_cancelled, get_advisor_executor
+
+
+REPORT_PATH = Path('data/latest_report.txt')
+
+
+def generate_ai_report(numbers: List[int], scores, prediction_date: str = '',
+                       output_path: Path = REPORT_PATH) -> Optional[str]:
+    """
+    生成 Gemini AI 報告並存檔
+    
+    Args:
+        numbers: 報告的號碼組合
+        scores: 各號碼分數 (DataFrame)
+        prediction_date: 預測日期 (記錄用)
+        output_path: 報告存檔位置
+    
+    Returns:
+        str: 報告內容
+    """
+    # 配額用盡、API 錯誤或逾時時拋出例外 (背景工作記為 failed/timeout),不以錯誤訊息覆寫上一份報告
+    report = GeminiReporter().generate_report(numbers, scores, raise_errors=True)
+    check_cancelled()
+    if report:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(report, encoding='utf-8')
+        print(f"[SUCCESS] AI report for {prediction_date} saved to {output_path}")
+    return report
+
+
+def schedule_ai_report(request: Dict):
+    """
+    以背景顧問工作生成 AI 報告 (不等待; 截止時間為 ai_advisors.gemini_reporter.deadline_seconds)
+    
+    Args:
+        request: generate_new_prediction(report_mode='deferred') 回傳的 report_request
+    
+    Returns:
+        AdvisorHandle
+    """
+    return get_advisor_executor().submit(
+        'gemini_reporter', generate_ai_report, background=True, **request
+    )
 
 
 class AutoPredictor:
@@ -147,7 +192,7 @@ class AutoPredictor:
             return None
     
     def _update_training_data(self, date: str, numbers: List[int]):
-        """更新訓練集"""
+        """更新訓練集 (附加到 train 與 history 檔尾)"""
         try:
             train_file = Path('data/539_train.csv')
             
@@ -155,10 +200,11 @@ class AutoPredictor:
                 print("[WARNING] Training file not found")
                 return
             
-            df_train = pd.read_csv(train_file)
+            date = pd.to_datetime(date).strftime('%Y-%m-%d')
+            train_writer = get_history_writer(train_file)
             
-            # 檢查是否已存在
-            if date in df_train['date'].values:
+            # 檢查是否已存在 (日期索引, 不需讀取整個檔案)
+            if train_writer.has_date(date):
                 print(f"[INFO] Date {date} already in training data")
                 return
             
@@ -168,28 +214,29 @@ class AutoPredictor:
                 'numbers': ','.join([str(n) for n in sorted(numbers)])
             }
             
-            df_train = pd.concat([df_train, pd.DataFrame([new_row])], ignore_index=True)
-            
-            # 排序
-            df_train['date'] = pd.to_datetime(df_train['date'])
-            df_train = df_train.sort_values('date').reset_index(drop=True)
-            df_train['date'] = df_train['date'].dt.strftime('%Y-%m-%d')
-            
-            # 儲存
-            df_train.to_csv(train_file, index=False)
+            train_writer.write([new_row])
             
             # 同步到 history (如果存在)
             history_file = Path('data/539_history.csv')
             if history_file.exists():
-                df_train.to_csv(history_file, index=False)
+                get_history_writer(history_file).write([new_row])
             
-            print(f"[SUCCESS] Training data updated: {len(df_train)} records")
+            print(f"[SUCCESS] Training data updated: {len(train_writer.digests)} records")
             
         except Exception as e:
             print(f"[ERROR] Failed to update training data: {e}")
     
-    def generate_new_prediction(self) -> Optional[Dict]:
-        """生成新預測 (5 組號碼)"""
+    def generate_new_prediction(self, report_mode: str = 'background') -> Optional[Dict]:
+        """
+        生成新預測 (5 組號碼)
+        
+        Args:
+            report_mode: AI 報告產生方式 (預測推送一律不等待報告, inline 除外)
+                - 'background': 推送後以背景顧問工作產生
+                - 'deferred': 不產生,回傳 report_request 由呼叫端排程 (供子行程使用)
+                - 'inline': 推送後同步產生,結果放在 ai_report
+                - 'off': 不產生
+        """
         print("=" * 60)
         print("Auto Prediction Starting (5 Sets)...")
         print("=" * 60)
@@ -240,17 +287,7 @@ class AutoPredictor:
                 backtest_result=backtest_result
             )
             
-            # 5. 生成 AI 報告
-            print("\n[Step 4] Generating AI report...")
-            try:
-                reporter = GeminiReporter()
-                # 使用第一組號碼生成報告
-                report = reporter.generate_report(all_candidates[0], final_scores)
-            except Exception as e:
-                print(f"[WARNING] AI report generation failed: {e}")
-                report = None
-            
-            # 6. 記錄日誌
+            # 5. 記錄日誌
             structured_logger.log_operation(
                 operation_type='auto_prediction',
                 status='success',
@@ -261,8 +298,8 @@ class AutoPredictor:
                 }
             )
             
-            # 7. Discord 通知 (發送所有 5 組)
-            print("\n[Step 5] Sending Discord notification...")
+            # 6. Discord 通知 (發送所有 5 組; 不等待 AI 報告)
+            print("\n[Step 4] Sending Discord notification...")
             self.discord.send_prediction_result(
                 prediction_date=prediction_date,
                 predicted_numbers=all_candidates,  # 傳遞所有 5 組
@@ -274,8 +311,26 @@ class AutoPredictor:
                 'predicted_numbers': all_candidates,
                 'num_sets': len(all_candidates),
                 'backtest_result': backtest_result,
-                'ai_report': report
+                'ai_report': None
+            }
+            
+            # 7. AI 報告 (使用第一組號碼; 推送之後才產生)
+            report_request = {
+                'prediction_date': prediction_date,
+                'numbers': all_candidates[0],
+                'scores': final_scores
             }
+            if report_mode == 'inline':
+                print("\n[Step 5] Generating AI report...")
+                try:
+                    result['ai_report'] = generate_ai_report(**report_request)
+                except Exception as e:
+                    print(f"[WARNING] AI report generation failed: {e}")
+            elif report_mode == 'background':
+                print("\n[Step 5] AI report scheduled in background")
+                schedule_ai_report(report_request)
+            elif report_mode == 'deferred':
+                result['report_request'] = report_request
             
             print("\n" + "=" * 60)
             print(f"Prediction completed! Date: {prediction_date}")
@@ -385,7 +440,7 @@ class AutoPredictor:
     def _run_backtest(self) -> Optional[Dict]:
         """執行回測"""
         try:
-            full_df = pd.read_csv("data/539_history.csv")
+            full_df = load_history('539')
             
             if len(full_df) < 100:
                 print("[WARNING] Insufficient data for backtest")
@@ -3,19 +3,32 @@
 自動資料更新模組
 整合爬蟲與資料驗證,實現自動化資料更新流程 (支援所有遊戲: 539, Lotto, Power, Star3, Star4)
 """
-import pandas as pd
 from pathlib import Path
 from datetime import datetime, timedelta
 import shutil
 import os
-import requests
-from bs4 import BeautifulSoup
-import re
 import time
 from typing import Optional, List, Dict, Any
 from src.structured_logger import structured_logger
 from src.discord_notifier import DiscordNotifier
 from src.timezone_utils import get_taiwan_timestamp_str, get_taiwan_now
+from src.history_writer import get_history_writer
+from src.draw_repository import draw_repository
+from src.http_client import get_http_client, load_crawler_config
+from src.http_cache import get_http_cache
+from src import result_parsers
+
+
+def page_urls(year: int, month: int) -> Dict[str, str]:
+    """各遊戲的當月列表頁 (3星彩/4星彩為歷史列表頁)"""
+    return {
+        '539': f"https://lotto.auzo.tw/daily539/list_{year}_{month}.html",
+        'power': f"https://lotto.auzo.tw/power/list_{year}_{month}.html",
+        'lotto': f"https://lotto.auzo.tw/biglotto/list_{year}_{month}.html",
+        'star3': "https://lotto.auzo.tw/lotto_historylist_three-star.html",
+        'star4': "https://lotto.auzo.tw/lotto_historylist_four-star.html"
+    }
+
 
 class AutoUpdater:
     """自動資料更新協調器 (支援全遊戲)"""
@@ -39,10 +52,14 @@ class AutoUpdater:
         self.backup_dir.mkdir(parents=True, exist_ok=True)
         self.discord = DiscordNotifier()
 
-        # 爬蟲設定
-        self.headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
+        # 爬蟲設定 (共用連線池; crawler.parse_workers > 1 時以 spawn 行程池解析,預設依序解析)
+        self.http = get_http_client()
+        self.http_cache = get_http_cache()
+        self.headers = dict(self.http.session.headers)
+        self.parse_workers = load_crawler_config().get('parse_workers', 1)
+        
+        self.games = ['539', 'power', 'lotto', 'star3', 'star4']
+        self.game_labels = {'539': '539', 'power': 'Power', 'lotto': 'Lotto', 'star3': 'Star3', 'star4': 'Star4'}
 
     def _backup_file(self, file_path: Path) -> Optional[Path]:
         """備份檔案"""
@@ -83,231 +100,41 @@ class AutoUpdater:
             return None
 
     def _download_html(self, url: str) -> Optional[str]:
-        """下載 HTML 內容"""
-        try:
-            print(f"Downloading {url}...")
-            response = requests.get(url, headers=self.headers, timeout=15)
-            response.encoding = 'utf-8'
-            if response.status_code == 200:
-                return response.text
-            else:
-                print(f"[ERROR] HTTP {response.status_code} for {url}")
-                return None
-        except Exception as e:
-            print(f"[ERROR] Download failed: {e}")
-            return None
+        """下載 HTML 內容 (共用連線池, 含重試)"""
+        return self.http.get_text(url)
 
     def _parse_539(self, html_content: str, current_ym: str) -> List[Dict]:
         """解析 539"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        data = []
-        date_pattern = re.compile(r'\d{4}-\d{2}-\d{2}')
-        
-        tables = soup.find_all('table', class_='history_view_table')
-        for table in tables:
-            tds = table.find_all('td')
-            for td in tds:
-                text = td.get_text(separator=' ', strip=True)
-                date_match = date_pattern.search(text)
-                if date_match:
-                    date_str = date_match.group(0)
-                    if not date_str.startswith(current_ym): continue 
-                    
-                    parent_tr = td.find_parent('tr')
-                    if not parent_tr: continue
-                    
-                    ball_ul = parent_tr.find('ul', class_='history_ball')
-                    if not ball_ul: continue
-                    
-                    sorted_li = None
-                    for li in ball_ul.find_all('li'):
-                        if '大小順序' in li.get_text():
-                            sorted_li = li
-                            break
-                    
-                    nums = []
-                    if sorted_li:
-                        links = sorted_li.find_all('a', class_='history_ball_link')
-                        nums = [int(link.get_text(strip=True)) for link in links]
-                    else:
-                        links = ball_ul.find_all('a', class_='history_ball_link')
-                        nums = [int(link.get_text(strip=True)) for link in links[:5]]
-                    
-                    if len(nums) == 5:
-                        nums.sort()
-                        data.append({
-                            'date': date_str,
-                            'numbers': ','.join(map(str, nums))
-                        })
-                        print(f"Parsed 539 {date_str}: {nums}")
-        return data
+        return result_parsers.parse_539(html_content, current_ym)
 
     def _parse_power(self, html_content: str, current_ym: str) -> List[Dict]:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        data = []
-        date_pattern = re.compile(r'\d{4}-\d{2}-\d{2}')
-        tables = soup.find_all('table', class_='history_view_table')
-        
-        for table in tables:
-            tds = table.find_all('td')
-            for td in tds:
-                text = td.get_text(separator=' ', strip=True)
-                date_match = date_pattern.search(text)
-                if date_match:
-                    date_str = date_match.group(0)
-                    if not date_str.startswith(current_ym): continue
-                    
-                    parent_tr = td.find_parent('tr')
-                    if not parent_tr: continue
-                    
-                    ball_ul = parent_tr.find('ul', class_='history_ball')
-                    if not ball_ul: continue
-                    
-                    sorted_li = None
-                    for li in ball_ul.find_all('li'):
-                        if '大小順序' in li.get_text():
-                            sorted_li = li
-                            break
-                    
-                    if sorted_li:
-                        links = sorted_li.find_all('a', class_='history_ball_link')
-                        nums = [int(link.get_text(strip=True)) for link in links]
-                    else:
-                        links = ball_ul.find_all('a', class_='history_ball_link')
-                        if len(links) >= 12: nums = [int(t.get_text()) for t in links[6:12]]
-                        elif len(links) >= 6: nums = [int(t.get_text()) for t in links[:6]]
-                        else: nums = []
-
-                    special_td = parent_tr.find('td', style=lambda x: x and 'color:#005aff' in x and 'font-size:48px' in x)
-                    special = special_td.get_text(strip=True) if special_td else None
-                    if not special:
-                         cells = parent_tr.find_all('td', recursive=False)
-                         if len(cells) >= 3: special = cells[2].get_text(strip=True)
-
-                    if nums and special:
-                        data.append({
-                            'date': date_str,
-                            '1': nums[0], '2': nums[1], '3': nums[2],
-                            '4': nums[3], '5': nums[4], '6': nums[5],
-                            'zone2': special
-                        })
-                        print(f"Parsed Power {date_str}: {nums} + {special}")
-        return data
+        return result_parsers.parse_power(html_content, current_ym)
 
     def _parse_lotto(self, html_content: str, current_ym: str) -> List[Dict]:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        data = []
-        date_pattern = re.compile(r'\d{4}-\d{2}-\d{2}')
-        tables = soup.find_all('table', class_='history_view_table')
-        
-        for table in tables:
-            tds = table.find_all('td')
-            for td in tds:
-                text = td.get_text(separator=' ', strip=True)
-                date_match = date_pattern.search(text)
-                if date_match:
-                    date_str = date_match.group(0)
-                    if not date_str.startswith(current_ym): continue
-                    
-                    parent_tr = td.find_parent('tr')
-                    if not parent_tr: continue
-                    
-                    ball_ul = parent_tr.find('ul', class_='history_ball')
-                    if not ball_ul: continue
-                    
-                    sorted_li = None
-                    for li in ball_ul.find_all('li'):
-                        if '大小順序' in li.get_text():
-                            sorted_li = li
-                            break
-                    
-                    if sorted_li:
-                       links = sorted_li.find_all('a', class_='history_ball_link')
-                       nums = [int(link.get_text(strip=True)) for link in links]
-                    else:
-                       links = ball_ul.find_all('a', class_='history_ball_link')
-                       if len(links) >= 12: nums = [int(t.get_text()) for t in links[6:12]]
-                       else: nums = [int(t.get_text()) for t in links[:6]]
-                    
-                    special_td = parent_tr.find('td', style=lambda x: x and 'color:#005aff' in x)
-                    special = special_td.get_text(strip=True) if special_td else "0"
-                    
-                    if nums:
-                        data.append({
-                            'date': date_str,
-                            '1': nums[0], '2': nums[1], '3': nums[2],
-                            '4': nums[3], '5': nums[4], '6': nums[5],
-                            'special': special
-                        })
-                        print(f"Parsed Lotto {date_str}: {nums} + {special}")
-        return data
+        return result_parsers.parse_lotto(html_content, current_ym)
 
     def _parse_star(self, html_content: str, current_ym: str, star_type: int) -> List[Dict]:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        data = []
-        date_pattern = re.compile(r'(\d{4}-\d{2}-\d{2})')
-        rows = soup.find_all('tr', class_='history_view_star')
-        
-        for row in rows:
-            tds = row.find_all('td')
-            if len(tds) < 3: continue
-            
-            date_text = tds[2].get_text()
-            date_match = date_pattern.search(date_text)
-            if not date_match: continue
-            date_str = date_match.group(1)
-            
-            if not date_str.startswith(current_ym): continue
-            
-            ball_td = tds[1]
-            spans = ball_td.find_all('span')
-            nums = [s.get_text(strip=True) for s in spans]
-            
-            if len(nums) == star_type:
-                record = {'date': date_str}
-                for i, n in enumerate(nums):
-                    record[f'{i+1}'] = n
-                data.append(record)
-                print(f"Parsed Star{star_type} {date_str}: {nums}")
-        return data
+        return result_parsers.parse_star(html_content, current_ym, star_type)
+
+    def _page_urls(self, year: int, month: int) -> Dict[str, str]:
+        """各遊戲的月份列表頁"""
+        return page_urls(year, month)
 
     def _update_csv(self, file_path: Path, new_data: List[Dict]) -> int:
-        """更新 CSV, 返回新增筆數"""
+        """更新 CSV (新開獎直接附加, 補登/修正才排序合併), 返回新增筆數"""
         if not new_data:
             return 0
         
-        added_count = 0
         try:
-            new_df = pd.DataFrame(new_data)
+            outcome = get_history_writer(file_path).write(new_data)
             
-            if file_path.exists():
-                old_df = pd.read_csv(file_path)
-                original_len = len(old_df)
-                
-                # 合併
-                combined_df = pd.concat([old_df, new_df], ignore_index=True)
-                # 去重 (依賴 date)
-                combined_df.drop_duplicates(subset=['date'], keep='last', inplace=True)
-                combined_df.sort_values(by='date', ascending=True, inplace=True)
-                
-                final_len = len(combined_df)
-                added_count = final_len - original_len
-                # 注意: 如果是更新既有日期的資料(修正), len 可能不變, 但內容變了.
-                # 這裡簡化為數量變化. 若完全一樣則為 0.
+            if outcome['mode'] == 'noop':
+                print(f"[INFO] No new records for {file_path.name}")
             else:
-                combined_df = new_df
-                # Create parent dir if not exists
-                file_path.parent.mkdir(parents=True, exist_ok=True)
-                combined_df.sort_values(by='date', ascending=True, inplace=True)
-                added_count = len(combined_df)
+                print(f"[INFO] Updated {file_path.name} ({outcome['mode']}): "
+                      f"+{outcome['added']} records, {outcome['updated']} corrected")
             
-            if added_count > 0 or not file_path.exists(): # Always save if new file
-                combined_df.to_csv(file_path, index=False)
-                print(f"[INFO] Updated {file_path.name}: +{added_count} records")
-            else:
-                print(f"[INFO] No new records for {file_path.name}")
-                
-            return max(0, added_count) # Ensure non-negative
+            return outcome['added']
             
         except Exception as e:
             print(f"[ERROR] Update CSV {file_path} failed: {e}")
@@ -332,69 +159,32 @@ class AutoUpdater:
         current_month = now.month
         current_ym = now.strftime('%Y-%m')
         
-        # 1. Update 539
-        try:
-            self._backup_file(self.paths['539'])
-            url_539 = f"https://lotto.auzo.tw/daily539/list_{current_year}_{current_month}.html"
-            html_539 = self._download_html(url_539)
-            if html_539:
-                data_539 = self._parse_539(html_539, current_ym)
-                count = self._update_csv(self.paths['539'], data_539)
-                result['updated_stats']['539'] = count
+        # 1. 備份
+        for game in self.games:
+            self._backup_file(self.paths[game])
+        
+        # 2. 平行下載所有遊戲頁面 (共用連線池, 每主機並行上限; 以條件式請求避免重複下載未變動頁面)
+        pages = self.http_cache.fetch_many(self._page_urls(current_year, current_month), ttl=0)
+        
+        # 3. 以行程池平行解析
+        parsed = result_parsers.parse_pages(pages, current_ym, max_workers=self.parse_workers)
+        
+        # 4. 依序寫入 (539 同步到 train_csv)
+        for game in self.games:
+            data = parsed.get(game)
+            if data is None:
+                continue
+            label = self.game_labels[game]
+            try:
+                if isinstance(data, Exception):
+                    raise data
+                count = self._update_csv(self.paths[game], data)
+                result['updated_stats'][game] = count
                 
-                # 同步到 train_csv
-                if count > 0:
-                     self._update_csv(self.train_file_539, data_539)
-        except Exception as e:
-            result['errors'].append(f"539 Error: {e}")
-
-        # 2. Update Power
-        try:
-            self._backup_file(self.paths['power'])
-            url_power = f"https://lotto.auzo.tw/power/list_{current_year}_{current_month}.html"
-            html_power = self._download_html(url_power)
-            if html_power:
-                data_power = self._parse_power(html_power, current_ym)
-                count = self._update_csv(self.paths['power'], data_power)
-                result['updated_stats']['power'] = count
-        except Exception as e:
-            result['errors'].append(f"Power Error: {e}")
-
-        # 3. Update Lotto
-        try:
-            self._backup_file(self.paths['lotto'])
-            url_lotto = f"https://lotto.auzo.tw/biglotto/list_{current_year}_{current_month}.html"
-            html_lotto = self._download_html(url_lotto)
-            if html_lotto:
-                data_lotto = self._parse_lotto(html_lotto, current_ym)
-                count = self._update_csv(self.paths['lotto'], data_lotto)
-                result['updated_stats']['lotto'] = count
-        except Exception as e:
-             result['errors'].append(f"Lotto Error: {e}")
-
-        # 4. Update Star3
-        try:
-            self._backup_file(self.paths['star3'])
-            url_star3 = "https://lotto.auzo.tw/lotto_historylist_three-star.html"
-            html_star3 = self._download_html(url_star3)
-            if html_star3:
-                data_star3 = self._parse_star(html_star3, current_ym, 3)
-                count = self._update_csv(self.paths['star3'], data_star3)
-                result['updated_stats']['star3'] = count
-        except Exception as e:
-            result['errors'].append(f"Star3 Error: {e}")
-            
-        # 5. Update Star4
-        try:
-            self._backup_file(self.paths['star4'])
-            url_star4 = "https://lotto.auzo.tw/lotto_historylist_four-star.html"
-            html_star4 = self._download_html(url_star4)
-            if html_star4:
-                data_star4 = self._parse_star(html_star4, current_ym, 4)
-                count = self._update_csv(self.paths['star4'], data_star4)
-                result['updated_stats']['star4'] = count
-        except Exception as e:
-            result['errors'].append(f"Star4 Error: {e}")
+                if game == '539' and count > 0:
+                    self._update_csv(self.train_file_539, data)
+            except Exception as e:
+                result['errors'].append(f"{label} Error: {e}")
 
         # Summary
         result['new_records'] = sum(result['updated_stats'].values())
@@ -424,78 +214,25 @@ class AutoUpdater:
     
     def _get_today_results(self) -> Dict[str, Dict]:
         """提取當日開獎號碼"""
-        import pandas as pd
-        from src.timezone_utils import get_taiwan_now
-        
         today = get_taiwan_now().strftime('%Y-%m-%d')
         results = {}
         
-        # 539
-        try:
-            df_539 = pd.read_csv(self.paths['539'])
-            today_539 = df_539[df_539['date'] == today]
-            if not today_539.empty:
-                row = today_539.iloc[0]
-                results['539'] = {
-                    'date': row['date'],
-                    'numbers': [int(row[f'n{i}']) for i in range(1, 6)]
-                }
-        except:
-            pass
-        
-        # Power
-        try:
-            df_power = pd.read_csv(self.paths['power'])
-            today_power = df_power[df_power['date'] == today]
-            if not today_power.empty:
-                row = today_power.iloc[0]
-                results['power'] = {
-                    'date': row['date'],
-                    'numbers': [int(row[f'n{i}']) for i in range(1, 7)],
-                    'special': str(int(row['special'])).zfill(2)
-                }
-        except:
-            pass
-        
-        # Lotto
-        try:
-            df_lotto = pd.read_csv(self.paths['lotto'])
-            today_lotto = df_lotto[df_lotto['date'] == today]
-            if not today_lotto.empty:
-                row = today_lotto.iloc[0]
-                results['lotto'] = {
-                    'date': row['date'],
-                    'numbers': [int(row[f'n{i}']) for i in range(1, 7)],
-                    'special': str(int(row['special'])).zfill(2)
-                }
-        except:
-            pass
-        
-        # Star3
-        try:
-            df_star3 = pd.read_csv(self.paths['star3'])
-            today_star3 = df_star3[df_star3['date'] == today]
-            if not today_star3.empty:
-                row = today_star3.iloc[0]
-                results['star3'] = {
-                    'date': row['date'],
-                    'numbers': [row['n1'], row['n2'], row['n3']]
-                }
-        except:
-            pass
-        
-        # Star4
-        try:
-            df_star4 = pd.read_csv(self.paths['star4'])
-            today_star4 = df_star4[df_star4['date'] == today]
-            if not today_star4.empty:
-                row = today_star4.iloc[0]
-                results['star4'] = {
-                    'date': row['date'],
-                    'numbers': [row['n1'], row['n2'], row['n3'], row['n4']]
-                }
-        except:
-            pass
+        for game in ['539', 'power', 'lotto', 'star3', 'star4']:
+            try:
+                record = draw_repository.get_record(str(self.paths[game]), today)
+            except Exception as e:
+                print(f"[WARNING] Failed to read {game} results: {e}")
+                continue
+            if not record:
+                continue
+            
+            results[game] = {
+                'date': record['date'],
+                'numbers': record['numbers']
+            }
+            # 威力彩第二區 / 大樂透特別號
+            if game in ('power', 'lotto') and record['extra'] is not None:
+                results[game]['special'] = str(record['extra']).zfill(2)
         
         return results
 
@@ -4,8 +4,7 @@ Auzonet 539 爬蟲模組
 從 https://lotto.auzonet.com/daily539 抓取開獎資料
 """
 import requests
-from bs4 import BeautifulSoup
-import re
+from src.month_index import month_index
 from datetime import datetime
 
 def fetch_auzonet_single_date(target_date):
@@ -26,7 +25,7 @@ def fetch_auzonet_single_date(target_date):
     year = target_date.year
     month = target_date.month
     
-    # 構建 URL - 使用月份列表頁
+    # 月份列表頁 (經磁碟快取, 整頁只解析一次)
     url = f"https://lotto.auzonet.com/daily539/list_{year}_{month}.html"
     
     headers = {
@@ -37,45 +36,18 @@ def fetch_auzonet_single_date(target_date):
         print(f"[INFO] 查詢日期: {target_str}")
         print(f"[INFO] 目標網址: {url}")
         
-        r = requests.get(url, headers=headers, timeout=30)  # 增加超時到 30 秒
-        r.encoding = 'utf-8'
-        
-        soup = BeautifulSoup(r.text, 'html.parser')
-        
-        # 查找包含目標日期的文本
-        date_elements = soup.find_all(string=re.compile(target_str))
+        draws = month_index.month('539', year, month, headers=headers, timeout=30)  # 增加超時到 30 秒
+        if draws is None:
+            print("[ERROR] 無法取得開獎頁面")
+            return None
         
-        if not date_elements:
+        numbers = draws.get(target_str)
+        if not numbers:
             print(f"[WARNING] 找不到 {target_str} 的開獎記錄")
             return None
         
-        # 找到日期後,查找附近的號碼連結
-        for date_elem in date_elements:
-            # 向上查找包含號碼的父元素
-            parent = date_elem.parent
-            for _ in range(10):  # 最多向上查找 10 層
-                if parent:
-                    # 查找號碼連結
-                    ball_links = parent.find_all('a', href=re.compile(r'lotto_ballview_daily539_(\d+)'))
-                    
-                    if len(ball_links) >= 5:
-                        # 提取號碼
-                        numbers = []
-                        for link in ball_links[:5]:  # 只取前 5 個
-                            match = re.search(r'lotto_ballview_daily539_(\d+)', link.get('href'))
-                            if match:
-                                numbers.append(int(match.group(1)))
-                        
-                        if len(numbers) == 5:
-                            print(f"[SUCCESS] 找到 {target_str} 的開獎號碼: {numbers}")
-                            return numbers
-                    
-                    parent = parent.parent
-                else:
-                    break
-        
-        print(f"[WARNING] 找不到 {target_str} 的完整號碼")
-        return None
+        print(f"[SUCCESS] 找到 {target_str} 的開獎號碼: {numbers}")
+        return list(numbers)
         
     except requests.exceptions.Timeout:
         print("[ERROR] 請求超時 (30秒),請檢查網路連線")
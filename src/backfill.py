@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+歷史開獎資料回補 (Resumable Backfill)
+- 逐月走訪 list_YYYY_M 月份頁 (539/威力彩/大樂透: lotto.auzo.tw, 3星彩/4星彩: lotto.auzonet.com)
+- 執行緒池平行下載,令牌桶限制實際連線速率 (已在 HttpCache 中的頁面不佔額度)
+- 解析結果累積數個月後以 HistoryWriter 一次寫入,只新增本地沒有的日期
+- 寫入成功且有資料的已結束月份記錄到 manifest,中斷後重新執行會略過已完成月份
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src import result_parsers
+from src.history_store import GAME_FILES
+from src.history_writer import get_history_writer
+from src.http_cache import HttpCache, get_http_cache
+from src.http_client import load_crawler_config
+from src.month_index import month_url, parse_month_page
+from src.rate_limiter import TokenBucket
+from src.timezone_utils import get_taiwan_now
+
+
+BACKFILL_ROOT = Path('data/backfill')
+MANIFEST_VERSION = 1
+GAMES = ['539', 'power', 'lotto', 'star3', 'star4']
+
+# auzo.tw 月份頁目錄
+AUZO_FOLDERS = {'539': 'daily539', 'power': 'power', 'lotto': 'biglotto'}
+
+
+def month_range(start: str, end: str) -> List[Tuple[int, int]]:
+    """'YYYY-MM' ~ 'YYYY-MM' (含) 的 (年, 月) 列表"""
+    year, month = (int(x) for x in start.split('-'))
+    end_year, end_month = (int(x) for x in end.split('-'))
+    months = []
+    while (year, month) <= (end_year, end_month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def backfill_url(game: str, year: int, month: int) -> str:
+    """遊戲月份頁網址"""
+    if game in AUZO_FOLDERS:
+        return f"https://lotto.auzo.tw/{AUZO_FOLDERS[game]}/list_{year}_{month}.html"
+    return month_url(game, year, month)
+
+
+def parse_month(game: str, html_text: str, year: int, month: int, backend: Optional[str] = None) -> List[Dict]:
+    """
+    解析月份頁為歷史 CSV 資料列
+
+    Returns:
+        list: 與各遊戲歷史 CSV 欄位相同的資料列 (依日期排序)
+    """
+    ym = f"{year}-{month:02d}"
+    if game in ('star3', 'star4'):
+        draws = parse_month_page(game, html_text, backend)
+        return [
+            dict({'date': date}, **{str(i + 1): digit for i, digit in enumerate(draws[date]['number'])})
+            for date in sorted(draws) if date.startswith(ym)
+        ]
+    parser = result_parsers.PARSERS[game]
+    return sorted(parser(html_text, ym, backend, verbose=False), key=lambda r: r['date'])
+
+
+class BackfillManifest:
+    """回補進度記錄 (已完成/失敗月份)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.data = {'version': MANIFEST_VERSION, 'completed': {}, 'failed': {}}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.data = data
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def is_done(self, game: str, ym: str) -> bool:
+        return ym in self.data['completed'].get(game, {})
+
+    def mark_done(self, game: str, ym: str, rows: int):
+        self.data['completed'].setdefault(game, {})[ym] = rows
+        self.data['failed'].get(game, {}).pop(ym, None)
+
+    def mark_failed(self, game: str, ym: str, error: str):
+        self.data['failed'].setdefault(game, {})[ym] = error
+
+    def save(self):
+        """原子寫入 (暫存檔 + rename)"""
+        self.data['updated_at'] = get_taiwan_now().replace(tzinfo=None).isoformat(timespec='seconds')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+class Backfiller:
+    """歷史開獎資料回補"""
+
+    def __init__(
+        self,
+        start: str,
+        end: Optional[str] = None,
+        games: Optional[List[str]] = None,
+        workers: int = 4,
+        rate: float = 2.0,
+        burst: Optional[float] = None,
+        flush_months: int = 12,
+        manifest_path: Path = BACKFILL_ROOT / 'manifest.json',
+        files: Optional[Dict[str, Path]] = None,
+        index_dir: Optional[Path] = None,
+        http_cache: Optional[HttpCache] = None,
+        backend: Optional[str] = None
+    ):
+        """
+        初始化
+
+        Args:
+            start: 起始月份 'YYYY-MM'
+            end: 結束月份 'YYYY-MM' (預設為本月)
+            games: 遊戲列表 (預設全部)
+            workers: 下載執行緒數
+            rate: 每秒最多連線數 (令牌桶補充速率, <= 0 不限速)
+            burst: 令牌桶容量 (預設 = workers)
+            flush_months: 每個遊戲累積多少個月份後寫入一次
+            manifest_path: 進度記錄檔
+            files: {遊戲: 歷史 CSV} (預設 GAME_FILES, 539 同步寫入 539_train)
+            index_dir: HistoryWriter 日期索引目錄
+            http_cache: 頁面快取 (預設為共用實例)
+            backend: 解析後端名稱
+        """
+        now = get_taiwan_now()
+        self.current_ym = now.strftime('%Y-%m')
+        self.months = month_range(start, min(end or self.current_ym, self.current_ym))
+        self.games = games or list(GAMES)
+        self.workers = max(1, workers)
+        self.bucket = TokenBucket(rate, burst if burst is not None else self.workers)
+        self.flush_months = max(1, flush_months)
+        self.manifest = BackfillManifest(manifest_path)
+        self.files = {game: Path(p) for game, p in (files or GAME_FILES).items()}
+        self.index_dir = index_dir
+        self.http_cache = http_cache or get_http_cache()
+        self.backend = backend
+
+        self._buffers: Dict[str, List[Dict]] = {}
+        self._stopping = threading.Event()
+        self._pending: Dict[str, List[Tuple[str, int]]] = {}
+        self.summary = {}
+
+    @classmethod
+    def from_config(cls, start: str, end: Optional[str] = None, **overrides) -> 'Backfiller':
+        """依配置檔 crawler.backfill 區段建立 (overrides 優先)"""
+        config = load_crawler_config().get('backfill', {})
+        options = {
+            'workers': config.get('workers', 4),
+            'rate': config.get('requests_per_second', 2.0),
+            'burst': config.get('burst'),
+            'flush_months': config.get('flush_months', 12),
+            'manifest_path': Path(config.get('manifest', BACKFILL_ROOT / 'manifest.json'))
+        }
+        options.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(start, end, **options)
+
+    # ---- fetch ----
+    def _fetch(self, game: str, year: int, month: int) -> Optional[str]:
+        """下載月份頁 (工作執行緒); 需要連線時先取得令牌"""
+        url = backfill_url(game, year, month)
+        if not self.http_cache.is_fresh(url):
+            if self._stopping.is_set():
+                return None
+            self.bucket.acquire()
+        return self.http_cache.get_text(url)
+
+    # ---- write ----
+    def _flush(self, game: str):
+        """寫入累積的資料列,成功後才將已結束月份記為完成"""
+        rows, pending = self._buffers.pop(game, []), self._pending.pop(game, [])
+        if not pending:
+            return
+
+        writer = get_history_writer(self.files[game], self.index_dir)
+        new_rows = [r for r in rows if not writer.has_date(r['date'])]
+        if new_rows:
+            outcome = writer.write(new_rows)
+            if game == '539' and '539_train' in self.files:
+                get_history_writer(self.files['539_train'], self.index_dir).write(new_rows)
+            print(f"[INFO] {game}: +{outcome['added']} records ({outcome['mode']}) from {len(pending)} months")
+        stats = self.summary['games'][game]
+        stats['added'] += len(new_rows)
+        stats['duplicates'] += len(rows) - len(new_rows)
+
+        # 本月仍會新增開獎; 沒有資料的月份不記錄 (頁面已在 HttpCache, 重跑不需連線)
+        for ym, count in pending:
+            if ym < self.current_ym and count > 0:
+                self.manifest.mark_done(game, ym, count)
+        self.manifest.save()
+
+    def _collect(self, game: str, ym: str, rows: List[Dict]):
+        self._buffers.setdefault(game, []).extend(rows)
+        self._pending.setdefault(game, []).append((ym, len(rows)))
+        if len(self._pending[game]) >= self.flush_months:
+            self._flush(game)
+
+    # ---- run ----
+    def run(self) -> Dict:
+        """
+        執行回補
+
+        Returns:
+            dict: {'months', 'skipped', 'fetched', 'failed', 'games': {遊戲: {'added', 'duplicates', 'rows'}}, 'elapsed_seconds'}
+        """
+        start_time = time.perf_counter()
+        jobs = []
+        skipped = 0
+        for game in self.games:
+            for year, month in self.months:
+                if self.manifest.is_done(game, f"{year}-{month:02d}"):
+                    skipped += 1
+                else:
+                    jobs.append((game, year, month))
+
+        self.summary = {
+            'months': len(self.months) * len(self.games),
+            'skipped': skipped,
+            'fetched': 0,
+            'failed': [],
+            'games': {game: {'added': 0, 'duplicates': 0, 'rows': 0} for game in self.games}
+        }
+        print(f"[INFO] Backfill {self.months[0][0]}-{self.months[0][1]:02d} ~ "
+              f"{self.months[-1][0]}-{self.months[-1][1]:02d}: {len(jobs)} pages to fetch, {skipped} already done")
+
+        # 不用 with: 離開時的 shutdown(wait=True) 會等完所有排隊中的限速下載才寫入
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='backfill')
+        self._stopping.clear()
+        try:
+            futures = {pool.submit(self._fetch, *job): job for job in jobs}
+            for future in as_completed(futures):
+                game, year, month = futures[future]
+                ym = f"{year}-{month:02d}"
+                try:
+                    html_text = future.result()
+                    if html_text is None:
+                        raise RuntimeError('page unavailable')
+                    rows = parse_month(game, html_text, year, month, self.backend)
+                except Exception as e:
+                    print(f"[ERROR] {game} {ym}: {e}")
+                    self.manifest.mark_failed(game, ym, str(e))
+                    self.summary['failed'].append(f"{game} {ym}")
+                    continue
+                self.summary['fetched'] += 1
+                self.summary['games'][game]['rows'] += len(rows)
+                self._collect(game, ym, rows)
+        except BaseException:
+            # Ctrl+C 或錯誤: 取消排隊中的下載,執行中的下載不再取得令牌
+            print("[WARNING] Backfill interrupted, cancelling queued pages and saving progress")
+            self._stopping.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            pool.shutdown(wait=False)
+            # 中斷時也寫入已解析的月份,下次從未完成處繼續
+            for game in list(self._pending):
+                self._flush(game)
+            self.manifest.save()
+
+        self.summary['elapsed_seconds'] = round(time.perf_counter() - start_time, 2)
+        return self.summary
+
+
+if __name__ == "__main__":
+    backfiller = Backfiller.from_config('2026-01', '2026-02', games=['539'])
+    print(backfiller.run())
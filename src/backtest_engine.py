@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+平行化滾動回測引擎 (Walk-Forward Backtest)
+在凍結權重模式下,各期預測彼此獨立,可分散到多個行程同時計算。
+開獎資料以二進位矩陣 (期數 x 39) 存成 .npy,由各工作行程以 memory-map 共用。
+"""
+import io
+import math
+import os
+import time
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import deepcopy
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.history_store import load_history
+from src.profit_evaluator import ProfitEvaluator
+
+
+# 工作行程內的共用狀態 (由 _init_worker 設定)
+_WORKER_STATE = {}
+
+
+def wilson_interval(successes: int, total: int, z: float = 1.96):
+    """
+    Wilson 信賴區間
+
+    Returns:
+        tuple: (下界, 上界)
+    """
+    if total <= 0:
+        return 0.0, 1.0
+    p = successes / total
+    denom = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denom
+    half = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def build_draw_matrix(df: pd.DataFrame) -> np.ndarray:
+    """將 numbers 欄位 ("02,16,22,23,38") 轉為二進位矩陣 (期數 x 39, uint8)"""
+    matrix = np.zeros((len(df), 39), dtype=np.uint8)
+    for i, nums in enumerate(df['numbers'].astype(str)):
+        for n in nums.split(','):
+            matrix[i, int(n) - 1] = 1
+    return matrix
+
+
+def _matrix_to_frame(matrix: np.ndarray, dates: np.ndarray) -> pd.DataFrame:
+    """由二進位矩陣還原 FeatureEngine 所需的 DataFrame"""
+    numbers = [
+        ','.join(f"{n + 1:02d}" for n in np.flatnonzero(row))
+        for row in matrix
+    ]
+    return pd.DataFrame({'date': pd.to_datetime(dates), 'numbers': numbers})
+
+
+def _init_worker(matrix_path: str, dates_path: str, group_weights: Dict, use_enhanced: bool):
+    """工作行程初始化: 以 memory-map 開啟共用開獎矩陣"""
+    _WORKER_STATE['draws'] = np.load(matrix_path, mmap_mode='r')
+    _WORKER_STATE['dates'] = np.load(dates_path, mmap_mode='r')
+    _WORKER_STATE['group_weights'] = group_weights
+    _WORKER_STATE['use_enhanced'] = use_enhanced
+    _WORKER_STATE['strategy'] = None
+
+
+def _evaluate_period(period_index: int) -> Dict:
+    """以凍結權重預測第 period_index 期 (只使用之前的資料) 並計算命中"""
+    from src.models import FeatureEngine
+    from src.group_strategy import GroupBasedStrategy
+
+    start = time.perf_counter()
+    draws = _WORKER_STATE['draws']
+    dates = _WORKER_STATE['dates']
+    use_enhanced = _WORKER_STATE['use_enhanced']
+
+    # 模型計算會大量 print,工作行程內靜音
+    with contextlib.redirect_stdout(io.StringIO()):
+        strategy = _WORKER_STATE.get('strategy')
+        if strategy is None:
+            strategy = GroupBasedStrategy()
+            strategy.group_weights = deepcopy(_WORKER_STATE['group_weights'])
+            _WORKER_STATE['strategy'] = strategy
+
+        train_df = _matrix_to_frame(np.asarray(draws[:period_index]), np.asarray(dates[:period_index]))
+        feature_engine = FeatureEngine(data_df=train_df)
+        all_scores = feature_engine.get_all_scores(use_enhanced=use_enhanced)
+
+        group_results = {
+            group_id: strategy.analyze_group_scores(all_scores, group_id, use_enhanced=use_enhanced)
+            for group_id in strategy.GROUPS
+        }
+        final_result = strategy.cross_group_selection(group_results)
+
+    predicted = [int(n) for n in final_result['final_selection']]
+    actual = [int(n) + 1 for n in np.flatnonzero(draws[period_index])]
+    hits = len(set(predicted) & set(actual))
+
+    return {
+        'period': period_index + 1,
+        'date': str(np.datetime_as_string(dates[period_index], unit='D')),
+        'predicted': predicted,
+        'actual': actual,
+        'hits': hits,
+        'accuracy': hits / 5.0,
+        'elapsed_seconds': time.perf_counter() - start
+    }
+
+
+class WalkForwardBacktester:
+    """平行化滾動回測引擎 (凍結權重模式)"""
+
+    def __init__(
+        self,
+        data_file: str = "data/539_history.csv",
+        group_weights: Optional[Dict] = None,
+        use_enhanced: bool = False,
+        max_workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        ci_half_width: float = 0.03,
+        min_periods: int = 60,
+        cache_dir: str = "data/cache/backtest"
+    ):
+        """
+        初始化
+
+        Args:
+            data_file: 開獎歷史 CSV
+            group_weights: 凍結的四群模型權重 (None = GroupBasedStrategy 預設權重)
+            use_enhanced: 是否使用增強模型
+            max_workers: 工作行程數 (None = CPU 核心數, 1 = 單行程)
+            batch_size: 每批提交的期數 (每批結束後檢查是否提前停止)
+            ci_half_width: 2+/3+ 命中率 95% 信賴區間半寬度達此值即提前停止 (0 = 不提前停止)
+            min_periods: 提前停止前至少回測的期數
+            cache_dir: 共用開獎矩陣 (.npy) 的存放目錄
+        """
+        from src.group_strategy import GroupBasedStrategy
+
+        self.data_file = Path(data_file)
+        self.group_weights = deepcopy(group_weights) if group_weights else GroupBasedStrategy().group_weights
+        self.use_enhanced = use_enhanced
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size or self.max_workers * 4
+        self.ci_half_width = ci_half_width
+        self.min_periods = min_periods
+        self.cache_dir = Path(cache_dir)
+
+    def _prepare_shared_matrix(self):
+        """將開獎資料寫成 .npy,供工作行程 memory-map 共用"""
+        df = load_history(str(self.data_file), use_store=False)
+        df['date'] = pd.to_datetime(df['date'])
+        df = df.sort_values('date').reset_index(drop=True)
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        matrix_path = self.cache_dir / f"{self.data_file.stem}_draws.npy"
+        dates_path = self.cache_dir / f"{self.data_file.stem}_dates.npy"
+        np.save(matrix_path, build_draw_matrix(df))
+        np.save(dates_path, df['date'].values.astype('datetime64[D]'))
+        return matrix_path, dates_path, len(df)
+
+    def _should_stop(self, evaluator: ProfitEvaluator) -> bool:
+        """2+ 與 3+ 命中率的信賴區間都夠窄時停止"""
+        n = len(evaluator)
+        if self.ci_half_width <= 0 or n < self.min_periods:
+            return False
+        hits = evaluator.get_hits_array()
+        for threshold in (2, 3):
+            low, high = wilson_interval(int((hits >= threshold).sum()), n)
+            if (high - low) / 2 > self.ci_half_width:
+                return False
+        return True
+
+    def run(self, start_period: int = 30, end_period: Optional[int] = None, order: str = 'recent') -> Dict:
+        """
+        執行回測
+
+        Args:
+            start_period: 第一個被預測的期數索引 (之前的資料作為初始訓練)
+            end_period: 結束期數索引 (不含, None = 全部)
+            order: 'recent' 由最近一期往回, 'chronological' 由舊到新, 'random' 隨機抽樣
+
+        Returns:
+            dict: {
+                'results': DataFrame (每期結果),
+                'metrics': {...},
+                'stopped_early': bool
+            }
+        """
+        matrix_path, dates_path, total = self._prepare_shared_matrix()
+        end_period = total if end_period is None else min(end_period, total)
+        periods = list(range(start_period, end_period))
+
+        if order == 'recent':
+            periods.reverse()
+        elif order == 'random':
+            np.random.default_rng(0).shuffle(periods)
+
+        print(f"[INFO] Walk-forward backtest: {len(periods)} periods, {self.max_workers} workers")
+        wall_start = time.perf_counter()
+
+        evaluator = ProfitEvaluator()
+        rows: List[Dict] = []
+        stopped_early = False
+        init_args = (str(matrix_path), str(dates_path), self.group_weights, self.use_enhanced)
+
+        def collect(row):
+            rows.append(row)
+            evaluator.add_result(row['period'], row['predicted'], row['actual'], row['hits'])
+
+        if self.max_workers == 1:
+            _init_worker(*init_args)
+            for i in range(0, len(periods), self.batch_size):
+                for period_index in periods[i:i + self.batch_size]:
+                    collect(_evaluate_period(period_index))
+                if self._should_stop(evaluator):
+                    stopped_early = i + self.batch_size < len(periods)
+                    break
+        else:
+            with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=init_args
+            ) as pool:
+                for i in range(0, len(periods), self.batch_size):
+                    futures = [pool.submit(_evaluate_period, p) for p in periods[i:i + self.batch_size]]
+                    for future in as_completed(futures):
+                        collect(future.result())
+                    print(f"[INFO] Backtested {len(rows)}/{len(periods)} periods")
+                    if self._should_stop(evaluator):
+                        stopped_early = i + self.batch_size < len(periods)
+                        break
+
+        results = pd.DataFrame(rows)
+        if not results.empty:
+            results = results.sort_values('period').reset_index(drop=True)
+
+        metrics = self._aggregate_metrics(evaluator)
+        metrics['wall_seconds'] = time.perf_counter() - wall_start
+
+        if stopped_early:
+            print(f"[INFO] Confidence intervals converged, stopped early after {len(rows)} periods")
+        print(f"[SUCCESS] Backtest done: 2+ hits {metrics['hit2_rate']:.2%}, "
+              f"3+ hits {metrics['hit3_rate']:.2%} ({metrics['wall_seconds']:.1f}s)")
+
+        return {
+            'results': results,
+            'metrics': metrics,
+            'stopped_early': stopped_early
+        }
+
+    def _aggregate_metrics(self, evaluator: ProfitEvaluator) -> Dict:
+        """彙總指標 (含 2+/3+ 命中率信賴區間)"""
+        n = len(evaluator)
+        hits = evaluator.get_hits_array()
+        metrics = evaluator.get_summary()
+
+        for threshold in (2, 3):
+            successes = int((hits >= threshold).sum())
+            low, high = wilson_interval(successes, n)
+            metrics[f'hit{threshold}_rate'] = successes / n if n else 0.0
+            metrics[f'hit{threshold}_ci'] = (low, high)
+
+        return metrics
+
+
+if __name__ == "__main__":
+    # 測試 - 回測最近 40 期
+    backtester = WalkForwardBacktester(max_workers=2, ci_half_width=0)
+    history_len = len(pd.read_csv("data/539_history.csv"))
+    output = backtester.run(start_period=history_len - 40)
+    print(output['results'].tail())
+    print({k: v for k, v in output['metrics'].items() if k != 'hits_distribution'})
@@ -1,4 +1,5 @@
 import requests
+from src.http_client import get_http_client
 from bs4 import BeautifulSoup
 import pandas as pd
 import re
@@ -44,7 +45,7 @@ def fetch_data(url="https://www.pilio.idv.tw/lto539/list539APP.asp", split_by_ye
     
     try:
         logger.info("開始抓取資料...")
-        r = requests.get(url, headers=headers, timeout=10)
+        r = get_http_client().get(url, headers=headers, timeout=10)
         r.encoding = 'utf-8' 
         
         soup = BeautifulSoup(r.text, 'html.parser')
@@ -159,7 +160,7 @@ def fetch_single_date(target_date, url="https://www.pilio.idv.tw/lto539/list539A
     }
     
     try:
-        r = requests.get(url, headers=headers, timeout=10)
+        r = get_http_client().get(url, headers=headers, timeout=10)
         r.encoding = 'utf-8'
         
         soup = BeautifulSoup(r.text, 'html.parser')
@@ -3,8 +3,7 @@
 大樂透爬蟲
 從 Auzonet 爬取大樂透開獎資料
 """
-import requests
-from bs4 import BeautifulSoup
+from src.month_index import month_index
 from datetime import datetime
 from typing import List, Optional
 
@@ -31,49 +30,11 @@ def fetch_lotto_single_date(date_str: str) -> Optional[dict]:
         print(f"[INFO] 查詢日期: {date_str}")
         print(f"[INFO] 目標網址: {url}")
         
-        # 發送請求
-        response = requests.get(url, timeout=10)
-        response.encoding = 'utf-8'
-        
-        if response.status_code != 200:
-            print(f"[ERROR] HTTP {response.status_code}")
-            return None
-        
-        # 解析 HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 找到所有開獎記錄
-        rows = soup.find_all('tr')
-        
-        for row in rows:
-            cols = row.find_all('td')
-            if len(cols) < 2:
-                continue
-            
-            # 第一欄是日期
-            date_cell = cols[0].get_text(strip=True)
-            
-            # 檢查是否為目標日期
-            if date_str in date_cell or date_str.replace('-', '/') in date_cell:
-                # 找號碼球
-                balls = row.find_all('div', class_='ball_tx')
-                
-                if len(balls) >= 7:  # 6個號碼 + 1個特別號
-                    numbers = []
-                    for i in range(6):
-                        num = int(balls[i].get_text(strip=True))
-                        numbers.append(num)
-                    
-                    special = int(balls[6].get_text(strip=True))
-                    
-                    result = {
-                        'date': date_str,
-                        'numbers': sorted(numbers),
-                        'special': special
-                    }
-                    
-                    print(f"[SUCCESS] 大樂透 {date_str} 開獎: {numbers} + 特別號 {special}")
-                    return result
+        # 月份頁經磁碟快取取得,整頁只解析一次
+        result = month_index.lookup('lotto', date_str, timeout=10)
+        if result:
+            print(f"[SUCCESS] 大樂透 {date_str} 開獎: {result['numbers']} + 特別號 {result['special']}")
+            return result
         
         print(f"[WARNING] 未找到 {date_str} 的開獎資料")
         return None
@@ -3,8 +3,7 @@
 4星彩爬蟲
 從 Auzonet 爬取4星彩開獎資料
 """
-import requests
-from bs4 import BeautifulSoup
+from src.month_index import month_index
 from datetime import datetime
 from typing import List, Optional
 
@@ -31,48 +30,11 @@ def fetch_star4_single_date(date_str: str) -> Optional[dict]:
         print(f"[INFO] 查詢日期: {date_str}")
         print(f"[INFO] 目標網址: {url}")
         
-        # 發送請求
-        response = requests.get(url, timeout=10)
-        response.encoding = 'utf-8'
-        
-        if response.status_code != 200:
-            print(f"[ERROR] HTTP {response.status_code}")
-            return None
-        
-        # 解析 HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 找到所有開獎記錄
-        rows = soup.find_all('tr')
-        
-        for row in rows:
-            cols = row.find_all('td')
-            if len(cols) < 2:
-                continue
-            
-            # 第一欄是日期
-            date_cell = cols[0].get_text(strip=True)
-            
-            # 檢查是否為目標日期
-            if date_str in date_cell or date_str.replace('-', '/') in date_cell:
-                # 找號碼球 (4個數字)
-                balls = row.find_all('div', class_='ball_tx')
-                
-                if len(balls) >= 4:
-                    digits = []
-                    for i in range(4):
-                        digit = balls[i].get_text(strip=True)
-                        digits.append(digit)
-                    
-                    number = ''.join(digits)
-                    
-                    result = {
-                        'date': date_str,
-                        'number': number
-                    }
-                    
-                    print(f"[SUCCESS] 4星彩 {date_str} 開獎: {number}")
-                    return result
+        # 月份頁經磁碟快取取得,整頁只解析一次
+        result = month_index.lookup('star4', date_str, timeout=10)
+        if result:
+            print(f"[SUCCESS] 4星彩 {date_str} 開獎: {result['number']}")
+            return result
         
         print(f"[WARNING] 未找到 {date_str} 的開獎資料")
         return None
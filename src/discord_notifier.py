@@ -2,6 +2,7 @@
 """
 Discord 推送通知模組
 提供自動化系統的 Discord Webhook 推送功能
+預設經由背景推送佇列 (src/discord_queue.py) 送出,呼叫端不等待網路
 """
 import json
 import requests
@@ -9,6 +10,7 @@ from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional
 import traceback
+from src.discord_queue import get_discord_queue
 from src.timezone_utils import get_taiwan_isoformat
 
 
@@ -28,6 +30,10 @@ class DiscordNotifier:
         self.webhook_url = self.config.get("discord", {}).get("webhook_url", "")
         self.enabled = self.config.get("discord", {}).get("enable_notifications", True)
         self.notification_types = self.config.get("discord", {}).get("notification_types", {})
+        self.use_queue = self.config.get("discord", {}).get("queue", {}).get("enabled", True)
+        if self.use_queue and self.enabled and self.webhook_url:
+            # 啟動背景推送 (上次未送出的通知會在此時補送)
+            get_discord_queue(str(self.config_path)).start()
         
     def _load_config(self) -> dict:
         """載入配置檔"""
@@ -53,7 +59,7 @@ class DiscordNotifier:
         return " ".join(balls)
     
     def _send_webhook(self, payload: dict, retry: int = 3) -> bool:
-        """發送 Webhook 請求"""
+        """發送 Webhook 請求 (啟用佇列時寫入待送區後立即返回 True)"""
         if not self.enabled:
             print("[INFO] Discord notification disabled")
             return False
@@ -62,6 +68,18 @@ class DiscordNotifier:
             print("[WARNING] Discord Webhook URL not configured")
             return False
         
+        if self.use_queue:
+            try:
+                get_discord_queue(str(self.config_path)).enqueue(self.webhook_url, payload)
+                print("[INFO] Discord notification queued")
+                return True
+            except Exception as e:
+                print(f"[WARNING] Discord queue unavailable, sending directly: {e}")
+        
+        return self._post_webhook(payload, retry)
+    
+    def _post_webhook(self, payload: dict, retry: int = 3) -> bool:
+        """直接發送 Webhook 請求 (同步)"""
         for attempt in range(retry):
             try:
                 response = requests.post(
@@ -498,6 +516,9 @@ if __name__ == "__main__":
     print("\n[Test New] Sending update report...")
     notifier.send_update_report({'539': 5, 'lotto': 2, 'power': 0})
     
+    if notifier.use_queue:
+        print(f"\n[Flush] Delivered: {get_discord_queue().flush(timeout=30)}")
+    
     print("\n" + "=" * 60)
     print("Test completed! Please check your Discord channel")
     print("=" * 60)
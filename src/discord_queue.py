@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+"""
+Discord 背景推送佇列 (Delivery Queue)
+- 通知先寫入 SQLite 待送區 (data/store/discord_outbox.db) 後立即返回,由背景執行緒負責送出,呼叫端不會被網路阻塞
+- 短時間內的多則通知合併成一個 payload (Discord 上限: 每則 10 個 embed、embed 文字合計 6000 字)
+- 依回應標頭控制速率: 429 依 Retry-After 等待 (不計入失敗次數),X-RateLimit-Remaining 為 0 時等待 X-RateLimit-Reset-After
+- 連線失敗與 5xx 以指數退避重試,用盡次數或 4xx 時移到 dead letter (合併的批次被拒時先改為逐則重送)
+- 未送出的通知保留在待送區,程式重新啟動後繼續送出; 多個行程共用待送區時以 claim 欄位避免重複送出
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+from src.history_store import STORE_ROOT
+from src.sqlite_utils import connect, transaction
+
+
+OUTBOX_PATH = STORE_ROOT / 'discord_outbox.db'
+
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    webhook_url TEXT NOT NULL,
+    username TEXT,
+    embeds TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    solo INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    claimed_by TEXT,
+    claimed_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+def embed_chars(embed: Dict) -> int:
+    """embed 計入 Discord 6000 字上限的文字長度"""
+    total = len(embed.get('title') or '') + len(embed.get('description') or '')
+    total += len((embed.get('footer') or {}).get('text') or '')
+    total += len((embed.get('author') or {}).get('name') or '')
+    for field in embed.get('fields') or []:
+        total += len(str(field.get('name') or '')) + len(str(field.get('value') or ''))
+    return total
+
+
+def _header_float(headers, name: str) -> Optional[float]:
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class DiscordDeliveryQueue:
+    """Discord Webhook 背景推送佇列"""
+
+    def __init__(
+        self,
+        outbox_path: Path = OUTBOX_PATH,
+        username: str = '539 AI 預測大師',
+        batch_window: float = 2.0,
+        max_attempts: int = 5,
+        base_delay: float = 5.0,
+        max_delay: float = 300.0,
+        poll_interval: float = 5.0,
+        timeout: float = 10.0,
+        session: Optional[requests.Session] = None
+    ):
+        """
+        初始化
+
+        Args:
+            outbox_path: 待送區資料庫
+            username: 合併不同來源的通知時使用的名稱 (原名稱改放在各 embed 的 author)
+            batch_window: 收到新通知後等待合併的秒數
+            max_attempts: 每則通知最多嘗試次數
+            base_delay: 第一次重試前等待秒數 (之後每次加倍)
+            max_delay: 重試等待秒數上限
+            poll_interval: 沒有通知時檢查待送區的間隔 (其他行程寫入的通知)
+            timeout: HTTP 逾時秒數
+            session: requests.Session (測試時可替換)
+        """
+        self.outbox_path = Path(outbox_path)
+        self.username = username
+        self.batch_window = batch_window
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.claim_ttl = timeout * 3 + batch_window
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._blocked_until: Dict[str, float] = {}
+        self._pid = None
+        self.conn = None
+        self.stats = {'enqueued': 0, 'sent_messages': 0, 'sent_payloads': 0,
+                      'rate_limited': 0, 'errors': 0, 'dead': 0}
+
+    @classmethod
+    def from_config(cls, config_path: str = "config/auto_config.json", **overrides) -> 'DiscordDeliveryQueue':
+        """依配置檔 discord.queue 區段建立 (overrides 優先)"""
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f).get('discord', {}).get('queue', {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            config = {}
+        options = {
+            'username': config.get('username', '539 AI 預測大師'),
+            'batch_window': config.get('batch_window_seconds', 2.0),
+            'max_attempts': config.get('max_attempts', 5),
+            'base_delay': config.get('retry_delay_seconds', 5.0),
+            'max_delay': config.get('max_retry_delay_seconds', 300.0),
+            'poll_interval': config.get('poll_interval_seconds', 5.0)
+        }
+        options.update(overrides)
+        return cls(**options)
+
+    # ---- outbox ----
+    def _connection(self):
+        """待送區連線 (fork 出的子行程重新開啟)"""
+        if self.conn is None or self._pid != os.getpid():
+            self.conn = connect(self.outbox_path)
+            self.conn.executescript(_SCHEMA)
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._thread = None
+        return self.conn
+
+    @property
+    def _owner(self) -> str:
+        return f"{os.getpid()}:{id(self)}"
+
+    def enqueue(self, webhook_url: str, payload: Dict) -> int:
+        """
+        寫入待送區 (立即返回)
+
+        Args:
+            webhook_url: Discord Webhook URL
+            payload: {'username', 'embeds': [...]}
+
+        Returns:
+            int: 通知編號
+        """
+        conn = self._connection()
+        embeds = payload.get('embeds') or []
+        if payload.get('content'):
+            embeds = [{'description': payload['content']}] + list(embeds)
+        with transaction(conn, self._lock):
+            cursor = conn.execute(
+                "INSERT INTO outbox (webhook_url, username, embeds, created_at) VALUES (?, ?, ?, ?)",
+                (webhook_url, payload.get('username'), json.dumps(embeds, ensure_ascii=False), time.time())
+            )
+        self.stats['enqueued'] += 1
+        self._wake.set()
+        self.start()
+        return cursor.lastrowid
+
+    def pending_count(self) -> int:
+        """尚未送出的通知數"""
+        conn = self._connection()
+        return conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def dead_letters(self, limit: int = 50) -> List[Dict]:
+        """放棄送出的通知 (最新的在前)"""
+        conn = self._connection()
+        rows = conn.execute(
+            "SELECT id, username, attempts, created_at, last_error FROM outbox "
+            "WHERE status = 'dead' ORDER BY id DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _claim(self, now: float, limit: int = 100) -> List[Dict]:
+        """取得到期的通知並標記為本實例處理中"""
+        conn = self._connection()
+        with transaction(conn, self._lock):
+            rows = conn.execute(
+                "SELECT * FROM outbox WHERE status = 'pending' AND next_attempt_at <= ? "
+                "AND (claimed_by IS NULL OR claimed_at < ?) ORDER BY id LIMIT ?",
+                (now, now - self.claim_ttl, limit)
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE outbox SET claimed_by = ?, claimed_at = ? WHERE id = ?",
+                    [(self._owner, now, row['id']) for row in rows]
+                )
+        return [dict(row, embeds=json.loads(row['embeds'])) for row in rows]
+
+    def _release(self, ids: List[int], **changes):
+        """解除 claim 並更新欄位"""
+        if not ids:
+            return
+        conn = self._connection()
+        assignments = ', '.join(f"{column} = ?" for column in changes)
+        sql = "UPDATE outbox SET claimed_by = NULL, claimed_at = NULL" + (f", {assignments}" if changes else '')
+        with transaction(conn, self._lock):
+            conn.executemany(sql + " WHERE id = ?", [tuple(changes.values()) + (i,) for i in ids])
+
+    def _delete(self, ids: List[int]):
+        conn = self._connection()
+        with transaction(conn, self._lock):
+            conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+    # ---- batching ----
+    def batches(self, rows: List[Dict]) -> List[List[Dict]]:
+        """依 Webhook 分組,依序合併成不超過 10 個 embed / 6000 字的批次 (solo 的通知單獨一批)"""
+        batches, current = [], {}
+        for row in rows:
+            url = row['webhook_url']
+            size = len(row['embeds'])
+            chars = sum(embed_chars(e) for e in row['embeds'])
+            batch = current.get(url)
+            if (row['solo'] or batch is None or batch['solo']
+                    or batch['embeds'] + size > MAX_EMBEDS or batch['chars'] + chars > MAX_EMBED_CHARS):
+                batch = {'rows': [], 'embeds': 0, 'chars': 0, 'solo': bool(row['solo'])}
+                batches.append(batch['rows'])
+                current[url] = batch
+            batch['rows'].append(row)
+            batch['embeds'] += size
+            batch['chars'] += chars
+        return batches
+
+    def build_payload(self, batch: List[Dict]) -> Dict:
+        """合併批次為單一 payload (來源名稱不同時以 author 標示原名稱)"""
+        usernames = {row['username'] for row in batch}
+        if len(usernames) == 1:
+            return {'username': batch[0]['username'] or self.username,
+                    'embeds': [e for row in batch for e in row['embeds']]}
+
+        embeds = []
+        for row in batch:
+            for embed in row['embeds']:
+                if row['username'] and 'author' not in embed:
+                    embed = dict(embed, author={'name': row['username']})
+                embeds.append(embed)
+        return {'username': self.username, 'embeds': embeds}
+
+    # ---- delivery ----
+    def _retry_delay(self, attempts: int) -> float:
+        return min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+
+    def _fail(self, batch: List[Dict], error: str, now: float):
+        """連線失敗 / 5xx: 累計次數後退避重試,用盡時放棄"""
+        self.stats['errors'] += 1
+        for row in batch:
+            attempts = row['attempts'] + 1
+            if attempts >= self.max_attempts:
+                self._give_up([row], error)
+            else:
+                self._release([row['id']], attempts=attempts, last_error=error,
+                              next_attempt_at=now + self._retry_delay(attempts))
+
+    def _give_up(self, batch: List[Dict], error: str):
+        self.stats['dead'] += len(batch)
+        print(f"[ERROR] Discord notification dropped after {batch[0]['attempts'] + 1} attempts: {error}")
+        self._release([row['id'] for row in batch], status='dead', attempts=batch[0]['attempts'] + 1,
+                      last_error=error)
+
+    def _send(self, url: str, batch: List[Dict]) -> Optional[float]:
+        """
+        送出一個批次
+
+        Returns:
+            float: 需要暫停此 Webhook 的秒數 (None = 不需暫停)
+        """
+        ids = [row['id'] for row in batch]
+        payload = self.build_payload(batch)
+        now = time.time()
+        try:
+            response = self.session.post(url, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"[WARNING] Discord delivery error: {e}")
+            self._fail(batch, f"{type(e).__name__}: {e}", now)
+            return None
+
+        headers = response.headers
+        if response.status_code == 429:
+            retry_after = _header_float(headers, 'Retry-After')
+            if retry_after is None:
+                try:
+                    retry_after = float(response.json().get('retry_after', 1.0))
+                except ValueError:
+                    retry_after = 1.0
+            self.stats['rate_limited'] += 1
+            print(f"[WARNING] Discord rate limited, retry in {retry_after:.1f}s ({len(ids)} messages kept)")
+            self._release(ids, next_attempt_at=now + retry_after, last_error='429 rate limited')
+            return retry_after
+
+        if 200 <= response.status_code < 300:
+            self._delete(ids)
+            self.stats['sent_messages'] += len(ids)
+            self.stats['sent_payloads'] += 1
+            print(f"[SUCCESS] Discord notification sent ({len(ids)} messages, {len(payload['embeds'])} embeds)")
+            if _header_float(headers, 'X-RateLimit-Remaining') == 0:
+                return _header_float(headers, 'X-RateLimit-Reset-After') or 1.0
+            return None
+
+        error = f"HTTP {response.status_code}: {response.text[:200]}"
+        if response.status_code >= 500:
+            print(f"[WARNING] Discord delivery failed ({error})")
+            self._fail(batch, error, now)
+        elif len(batch) > 1:
+            # 合併後被拒 (例如其中一則格式錯誤): 改為逐則送出,只讓有問題的通知進 dead letter
+            print(f"[WARNING] Discord rejected batch of {len(ids)} ({error}), resending individually")
+            self._release(ids, solo=1, last_error=error)
+        else:
+            self._give_up(batch, error)
+        return None
+
+    def deliver_due(self) -> float:
+        """
+        送出所有到期的通知
+
+        Returns:
+            float: 距離下一則到期通知的秒數 (最多 poll_interval)
+        """
+        now = time.time()
+        rows = self._claim(now)
+        for batch in self.batches(rows):
+            url = batch[0]['webhook_url']
+            blocked = self._blocked_until.get(url, 0) - time.time()
+            if blocked > 0:
+                self._release([row['id'] for row in batch])
+                continue
+            pause = self._send(url, batch)
+            if pause:
+                self._blocked_until[url] = time.time() + pause
+
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending' AND claimed_by IS NULL"
+        ).fetchone()
+        if row[0] is None:
+            return self.poll_interval
+        # 到期的通知仍須等 Webhook 暫停結束
+        ready_at = max([row[0]] + list(self._blocked_until.values()))
+        return max(0.05, min(self.poll_interval, ready_at - time.time()))
+
+    # ---- worker ----
+    def _run(self):
+        while not self._stopping.is_set():
+            if self._wake.is_set():
+                self._wake.clear()
+                # 收到新通知: 稍等片刻讓同一波通知合併送出
+                self._stopping.wait(self.batch_window)
+            try:
+                wait = self.deliver_due()
+            except Exception as e:
+                print(f"[ERROR] Discord delivery worker error: {e}")
+                wait = self.poll_interval
+            self._wake.wait(wait)
+
+    def start(self) -> 'DiscordDeliveryQueue':
+        """啟動背景執行緒 (已啟動時不重複啟動)"""
+        self._connection()
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='discord-delivery', daemon=True)
+            self._thread.start()
+        return self
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """等待待送區清空 (True = 全部送出或放棄)"""
+        deadline = time.time() + timeout
+        while self.pending_count():
+            if time.time() >= deadline:
+                return False
+            self._wake.set()
+            time.sleep(0.05)
+        return True
+
+    def stop(self, timeout: float = 5.0) -> bool:
+        """送出剩餘通知後停止背景執行緒 (未送出的保留在待送區)"""
+        flushed = self.flush(timeout) if self._thread is not None and self._thread.is_alive() else False
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout + 1)
+        return flushed
+
+
+_default_queue = None
+_default_lock = threading.Lock()
+
+
+def get_discord_queue(config_path: str = "config/auto_config.json") -> DiscordDeliveryQueue:
+    """行程內共用的推送佇列 (結束時最多等待 shutdown_timeout_seconds 送出剩餘通知)"""
+    global _default_queue
+    with _default_lock:
+        if _default_queue is None:
+            _default_queue = DiscordDeliveryQueue.from_config(config_path)
+            try:
+                with open(config_path, 'r', encoding='utf-8') as f:
+                    shutdown_timeout = json.load(f).get('discord', {}).get('queue', {}).get(
+                        'shutdown_timeout_seconds', 5.0)
+            except (FileNotFoundError, json.JSONDecodeError):
+                shutdown_timeout = 5.0
+            atexit.register(_default_queue.stop, shutdown_timeout)
+        return _default_queue
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    from src.fixture_server import WebhookStub
+
+    with tempfile.TemporaryDirectory() as tmp, WebhookStub() as stub:
+        outbox = Path(tmp) / 'outbox.db'
+        stub.rate_limit(times=1, retry_after=0.5)
+        queue = DiscordDeliveryQueue(outbox, batch_window=0.2, base_delay=0.2, poll_interval=0.5)
+
+        start = time.perf_counter()
+        for i in range(23):
+            queue.enqueue(stub.url, {'username': f'source {i % 3}', 'embeds': [{'title': f'message {i}'}]})
+        enqueue_time = time.perf_counter() - start
+        print(f"Enqueued 23 messages in {enqueue_time * 1000:.1f} ms")
+
+        print(f"Flushed: {queue.flush(timeout=10)}")
+        queue.stop()
+        print(f"Stub received {len(stub.payloads)} payloads: {[len(p['embeds']) for p in stub.payloads]}")
+        print(f"Stats: {queue.stats}")
+
+        # 重新啟動: 待送區中的通知在下一個實例送出
+        stub.fail(times=10)
+        queue = DiscordDeliveryQueue(outbox, batch_window=0.1, max_attempts=10, base_delay=1)
+        queue.enqueue(stub.url, {'username': 'restart', 'embeds': [{'title': 'kept'}]})
+        time.sleep(0.5)
+        queue.stop(timeout=0.1)
+        print(f"Pending after failure: {queue.pending_count()}")
+        stub.fail(times=0)
+        queue = DiscordDeliveryQueue(outbox, batch_window=0.1).start()
+        print(f"Flushed after restart: {queue.flush(timeout=10)}, last payload: {stub.payloads[-1]}")
+        queue.stop()
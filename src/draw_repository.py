@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+開獎資料倉庫 (Process-wide Draw Repository)
+統一負責各遊戲歷史 CSV 的解析,並以 (路徑, mtime, 大小) 為鍵快取解析結果。
+同一排程週期內,檔案未變動時每個檔案只解析一次;對外只提供副本或唯讀陣列。
+"""
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.history_store import (
+    GAME_FILES, DrawHistory, HistoryStore, frame_to_draws, read_history, use_history_store
+)
+
+
+class _Entry:
+    """單一檔案的快取內容"""
+
+    def __init__(self, stat, frame: pd.DataFrame):
+        self.stat = stat
+        self.frame = frame
+        self.draws: Optional[DrawHistory] = None
+        self.date_index: Optional[Dict[str, int]] = None
+
+
+def _freeze(array):
+    """設為唯讀 (memmap 本身已唯讀)"""
+    if isinstance(array, np.ndarray) and not isinstance(array, np.memmap):
+        array.flags.writeable = False
+    return array
+
+
+class DrawRepository:
+    """開獎資料倉庫"""
+
+    def __init__(self):
+        self._entries: Dict[tuple, _Entry] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.parse_counts: Dict[str, int] = {}
+
+    @staticmethod
+    def resolve(source: str) -> Path:
+        """遊戲名稱或路徑 -> CSV 路徑"""
+        return Path(GAME_FILES.get(source, source))
+
+    def _entry(self, source: str, use_store: Optional[bool] = None) -> Optional[_Entry]:
+        """取得快取項目; 檔案變動 (mtime/大小) 時重新解析"""
+        path = self.resolve(source)
+        if use_store is None:
+            use_store = use_history_store()
+
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        stat = (st.st_mtime_ns, st.st_size)
+        key = (str(path.resolve()), bool(use_store))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stat == stat:
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            self.parse_counts[str(path)] = self.parse_counts.get(str(path), 0) + 1
+            entry = _Entry(stat, read_history(str(path), use_store=use_store))
+            self._entries[key] = entry
+            return entry
+
+    # ---- frames ----
+    def get_frame(self, source: str, use_store: Optional[bool] = None) -> pd.DataFrame:
+        """
+        取得歷史 DataFrame (與 pd.read_csv 相同欄位)
+
+        Returns:
+            DataFrame: 快取內容的副本 (呼叫端可自由修改); 檔案不存在時為空 DataFrame
+        """
+        entry = self._entry(source, use_store)
+        if entry is None:
+            return pd.DataFrame()
+        return entry.frame.copy()
+
+    # ---- arrays ----
+    def _draws(self, entry: _Entry, path: Path, use_store: bool) -> DrawHistory:
+        """由快取項目建立唯讀陣列 (每個檔案版本只建立一次)"""
+        with self._lock:
+            if entry.draws is None:
+                draws = None
+                if use_store:
+                    try:
+                        draws = HistoryStore(path).load(sync=False)
+                    except Exception:
+                        draws = None
+                if draws is None:
+                    draws = frame_to_draws(entry.frame)
+                for name in ('dates', 'numbers', 'extra'):
+                    _freeze(getattr(draws, name))
+                entry.draws = draws
+                entry.date_index = {d: i for i, d in enumerate(draws.date_strings().tolist())}
+            return entry.draws
+
+    def get_draws(self, source: str, use_store: Optional[bool] = None) -> Optional[DrawHistory]:
+        """
+        取得依日期排序的唯讀陣列 (日期 int32 天數, 號碼 uint8 矩陣)
+
+        Returns:
+            DrawHistory: 檔案不存在時為 None
+        """
+        if use_store is None:
+            use_store = use_history_store()
+        entry = self._entry(source, use_store)
+        if entry is None:
+            return None
+        return self._draws(entry, self.resolve(source), use_store)
+
+    def get_numbers(self, source: str, date: str) -> Optional[List[int]]:
+        """
+        查詢指定日期的開獎號碼 (不含特別號/第二區)
+
+        Args:
+            source: 遊戲名稱或 CSV 路徑
+            date: 'YYYY-MM-DD'
+
+        Returns:
+            list: 號碼列表; 查無資料時為 None
+        """
+        record = self.get_record(source, date)
+        return record['numbers'] if record else None
+
+    def get_record(self, source: str, date: str) -> Optional[Dict]:
+        """
+        查詢指定日期的開獎資料 (日期索引, O(1))
+
+        Returns:
+            dict: {'date', 'numbers', 'extra'}; 查無資料時為 None
+        """
+        use_store = use_history_store()
+        entry = self._entry(source, use_store)
+        if entry is None:
+            return None
+        draws = self._draws(entry, self.resolve(source), use_store)
+        position = entry.date_index.get(str(date)[:10])
+        if position is None:
+            return None
+        return {
+            'date': str(date)[:10],
+            'numbers': [int(n) for n in draws.numbers[position]],
+            'extra': int(draws.extra[position]) if draws.extra is not None else None
+        }
+
+    def latest_date(self, source: str) -> Optional[str]:
+        """最新一期日期 ('YYYY-MM-DD'); 無資料時為 None"""
+        draws = self.get_draws(source)
+        if draws is None or len(draws) == 0:
+            return None
+        return str(draws.date_strings()[-1])
+
+    # ---- maintenance ----
+    def invalidate(self, source: Optional[str] = None):
+        """清除快取 (None = 全部)"""
+        with self._lock:
+            if source is None:
+                self._entries.clear()
+                return
+            resolved = str(self.resolve(source).resolve())
+            for key in [k for k in self._entries if k[0] == resolved]:
+                del self._entries[key]
+
+    def stats(self) -> Dict:
+        """快取統計 (命中/未命中/各檔案解析次數)"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._entries),
+                'parse_counts': dict(self.parse_counts)
+            }
+
+
+# 全域實例
+draw_repository = DrawRepository()
+
+
+if __name__ == "__main__":
+    import time
+
+    for game in ['539', 'lotto', 'power', 'star3', 'star4']:
+        start = time.perf_counter()
+        draws_first = draw_repository.get_draws(game)
+        first = (time.perf_counter() - start) * 1e3
+        start = time.perf_counter()
+        df = draw_repository.get_frame(game)
+        second = (time.perf_counter() - start) * 1e3
+        latest = draw_repository.latest_date(game)
+        print(f"{game}: {len(draws_first)} draws, latest {latest} {draw_repository.get_numbers(game, latest)} "
+              f"(parse {first:.1f} ms, cached copy {second:.2f} ms)")
+    print(draw_repository.stats())
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+開獎偵測 (Draw Watcher)
+- 依各遊戲開獎日 (539/3星彩/4星彩: 週一~週六, 威力彩: 週一、週四, 大樂透: 週二、週五) 決定當天要等待的遊戲
+- 從預期公布時間 (約 20:30) 起以條件式請求輪詢結果頁 (未變動時伺服器回 304,不重新下載與解析)
+- 沒有新結果時輪詢間隔逐次拉長 (adaptive backoff),有遊戲公布時重設為最短間隔
+- 當天所有遊戲都已公布 (或超過截止時間且至少一個已公布) 時觸發一次回呼 (資料更新 → 驗證 → 訓練 → 預測)
+- 時間來源與等待函式可替換,搭配 src/fixture_server.py 即可在本機測試
+"""
+import hashlib
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from src import result_parsers
+from src.auto_updater import page_urls
+from src.http_cache import HttpCache, get_http_cache
+from src.http_client import load_crawler_config
+from src.timezone_utils import get_taiwan_now
+
+
+# 遊戲 -> 開獎星期 (0 = 週一)
+DRAW_WEEKDAYS = {
+    '539': {0, 1, 2, 3, 4, 5},
+    'power': {0, 3},
+    'lotto': {1, 4},
+    'star3': {0, 1, 2, 3, 4, 5},
+    'star4': {0, 1, 2, 3, 4, 5}
+}
+
+
+def is_draw_day(game: str, day: date) -> bool:
+    """該日是否為遊戲開獎日"""
+    return day.weekday() in DRAW_WEEKDAYS[game]
+
+
+def next_draw_date(game: str, now: Optional[datetime] = None, cutoff_hour: int = 20) -> str:
+    """下次開獎日期 (當天 cutoff_hour 點後視為已開獎)"""
+    now = now or get_taiwan_now()
+    for days_ahead in range(8):
+        day = (now + timedelta(days=days_ahead)).date()
+        if is_draw_day(game, day) and (days_ahead > 0 or now.hour < cutoff_hour):
+            return day.strftime('%Y-%m-%d')
+    return (now + timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+class DrawWatcher:
+    """開獎偵測服務"""
+
+    def __init__(
+        self,
+        games: Optional[List[str]] = None,
+        publish_time: str = '20:30',
+        initial_interval: float = 30,
+        max_interval: float = 300,
+        backoff: float = 1.5,
+        deadline_minutes: float = 120,
+        on_published: Optional[Callable[[str, List[str]], object]] = None,
+        http_cache: Optional[HttpCache] = None,
+        clock: Callable[[], datetime] = get_taiwan_now,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        初始化
+
+        Args:
+            games: 偵測的遊戲 (預設全部)
+            publish_time: 預期公布時間 HH:MM (台灣時間)
+            initial_interval: 最短輪詢間隔秒數
+            max_interval: 最長輪詢間隔秒數
+            backoff: 沒有新結果時間隔的放大倍數
+            deadline_minutes: 公布時間後多久停止等待
+            on_published: 觸發回呼 (日期, 已公布的遊戲)
+            http_cache: 頁面快取 (預設為共用實例; 替換 clock 時改用同一時間來源的快取)
+            clock: 時間來源 (回傳台灣時間 datetime, 測試時可替換)
+            sleep: 等待函式 (測試時可替換)
+        """
+        self.games = games or list(DRAW_WEEKDAYS)
+        hour, minute = (int(x) for x in publish_time.split(':'))
+        self.publish_hour, self.publish_minute = hour, minute
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.deadline = timedelta(minutes=deadline_minutes)
+        self.on_published = on_published
+        if http_cache is None and clock is not get_taiwan_now:
+            http_cache = HttpCache.from_config(clock=clock)
+        self.http_cache = http_cache
+        self.clock = clock
+        self.sleep = sleep
+
+        self.day: Optional[date] = None
+        self.pending: Set[str] = set()
+        self.published: Set[str] = set()
+        self.fired = False
+        self.interval = initial_interval
+        self.polls = 0
+        self._digests: Dict[str, Optional[str]] = {}
+        self.history: List[Dict] = []
+        self._poll_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config_path: str = "config/auto_config.json", **overrides) -> 'DrawWatcher':
+        """依配置檔 crawler.draw_watcher 區段建立 (overrides 優先)"""
+        config = load_crawler_config(config_path).get('draw_watcher', {})
+        options = {
+            'publish_time': config.get('publish_time', '20:30'),
+            'initial_interval': config.get('initial_interval_seconds', 30),
+            'max_interval': config.get('max_interval_seconds', 300),
+            'backoff': config.get('backoff', 1.5),
+            'deadline_minutes': config.get('deadline_minutes', 120),
+            'games': config.get('games')
+        }
+        options.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(**options)
+
+    # ---- calendar ----
+    def due_games(self, day: date) -> List[str]:
+        """當天開獎的遊戲"""
+        return [game for game in self.games if is_draw_day(game, day)]
+
+    def expected_publication(self, day: date) -> datetime:
+        """當天預期公布時間"""
+        now = self.clock()
+        return now.replace(year=day.year, month=day.month, day=day.day,
+                           hour=self.publish_hour, minute=self.publish_minute, second=0, microsecond=0)
+
+    def _reset(self, day: date):
+        self.day = day
+        self.pending = set(self.due_games(day))
+        self.published = set()
+        self.fired = False
+        self.interval = self.initial_interval
+        self.polls = 0
+
+    # ---- check ----
+    def check(self, game: str, day: date) -> bool:
+        """結果頁是否已有當天開獎 (條件式請求; 內容未變動時不重新解析)"""
+        url = page_urls(day.year, day.month)[game]
+        cache = self.http_cache or get_http_cache()
+        # 偵測中的月份尚未定案: 不套用永久快取規則,每次都以條件式請求驗證
+        html_text = cache.get_text(url, ttl=0, permanent=False)
+        if not html_text:
+            return False
+
+        digest = hashlib.sha1(html_text.encode('utf-8')).hexdigest()
+        if self._digests.get(game) == digest:
+            return False
+        day_str = day.strftime('%Y-%m-%d')
+        rows = result_parsers.parse_page(game, html_text, day.strftime('%Y-%m'), verbose=False)
+        found = any(row['date'] == day_str for row in rows)
+        # 只記住「尚未公布」的頁面內容,下次內容相同時直接略過解析
+        self._digests[game] = None if found else digest
+        return found
+
+    # ---- poll ----
+    def poll(self) -> Dict:
+        """
+        執行一次輪詢 (同時只允許一個輪詢; 已有輪詢進行中時直接略過)
+
+        Returns:
+            dict: {'date', 'published', 'pending', 'new', 'fired', 'done', 'next_poll_seconds'}
+                  next_poll_seconds 為 None 表示今天不需再輪詢;
+                  略過時為 {'skipped': True, 'done': False, 'next_poll_seconds': None}
+                  (由進行中的輪詢負責排入下一次)
+        """
+        if not self._poll_lock.acquire(blocking=False):
+            print("[INFO] Draw watcher poll already running, skipping")
+            return {'skipped': True, 'new': [], 'fired': False, 'done': False, 'next_poll_seconds': None}
+        try:
+            return self._poll()
+        finally:
+            self._poll_lock.release()
+
+    def _poll(self) -> Dict:
+        now = self.clock()
+        if self.day != now.date():
+            self._reset(now.date())
+
+        status = {'date': self.day.strftime('%Y-%m-%d'), 'new': [], 'fired': False}
+        expected = self.expected_publication(self.day)
+
+        if self.fired or not (self.pending or self.published):
+            next_poll = None
+        elif now < expected:
+            next_poll = (expected - now).total_seconds()
+        else:
+            self.polls += 1
+            for game in sorted(self.pending):
+                try:
+                    if self.check(game, self.day):
+                        status['new'].append(game)
+                except Exception as e:
+                    print(f"[WARNING] Draw check failed for {game}: {e}")
+            self.pending -= set(status['new'])
+            self.published |= set(status['new'])
+
+            if status['new']:
+                print(f"[INFO] Draw results published: {', '.join(status['new'])} "
+                      f"(pending: {', '.join(sorted(self.pending)) or 'none'})")
+                self.interval = self.initial_interval
+            else:
+                self.interval = min(self.max_interval, self.interval * self.backoff)
+
+            past_deadline = now >= expected + self.deadline
+            if not self.pending or (past_deadline and self.published):
+                self._fire(past_deadline and bool(self.pending))
+                status['fired'] = True
+                next_poll = None
+            elif past_deadline:
+                print(f"[WARNING] No draw results for {status['date']} by deadline "
+                      f"(waited for {', '.join(sorted(self.pending))})")
+                self.fired = True
+                next_poll = None
+            else:
+                next_poll = min(self.interval, (expected + self.deadline - now).total_seconds())
+
+        status.update(
+            published=sorted(self.published),
+            pending=sorted(self.pending),
+            done=next_poll is None,
+            next_poll_seconds=next_poll
+        )
+        self.history.append(dict(status, at=now.isoformat(timespec='seconds')))
+        return status
+
+    def _fire(self, partial: bool):
+        self.fired = True
+        games = sorted(self.published)
+        label = 'partial ' if partial else ''
+        print(f"[INFO] Triggering {label}pipeline for {self.day} after {self.polls} polls: {', '.join(games)}")
+        if self.on_published:
+            self.on_published(self.day.strftime('%Y-%m-%d'), games)
+
+    def run_day(self) -> Dict:
+        """輪詢直到今天觸發或截止 (阻塞)"""
+        while True:
+            status = self.poll()
+            if status.get('skipped'):
+                self.sleep(self.initial_interval)
+                continue
+            if status['done']:
+                return status
+            self.sleep(status['next_poll_seconds'])
+
+
+if __name__ == "__main__":
+    watcher = DrawWatcher.from_config(on_published=lambda day, games: print(f"published {day}: {games}"))
+    today = get_taiwan_now().date()
+    print(f"Due today: {watcher.due_games(today)}")
+    for game in DRAW_WEEKDAYS:
+        print(f"{game} next draw: {next_draw_date(game)}")
+    print(watcher.poll())
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+本機開獎頁面測試伺服器 (Fixture Server)
+- build_fixtures(): 由歷史 CSV 產生與 lotto.auzo.tw 相同結構的月份列表頁,存到 data/fixtures/html/<主機>/<路徑>
+- build_auzonet_fixtures(): 同上,產生 lotto.auzonet.com 的月份列表頁 (單日查詢/月份索引使用)
+- FixtureServer: 以 http.server 提供這些頁面,搭配 HttpClient 的 base_url 改寫
+  (環境變數 LOTTO_CRAWLER_BASE_URL) 即可在不連網的情況下測試爬蟲與解析流程
+- WebhookStub: 本機 Discord Webhook 替身,記錄收到的 payload,可模擬 429 (Retry-After) 與 5xx
+
+用法:
+    python -m src.fixture_server --month 2026-02 --port 8765
+    LOTTO_CRAWLER_BASE_URL=http://127.0.0.1:8765 python -m src.auto_updater
+"""
+import argparse
+import html
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from src.history_store import GAME_FILES
+from src.month_index import AUZONET_HOST, MONTH_PAGES
+
+
+FIXTURE_ROOT = Path('data/fixtures/html')
+AUZO_HOST = 'lotto.auzo.tw'
+
+# 遊戲 -> (月份頁路徑樣板, 是否為月份頁)
+AUZO_PAGES = {
+    '539': ('daily539/list_{year}_{month}.html', True),
+    'power': ('power/list_{year}_{month}.html', True),
+    'lotto': ('biglotto/list_{year}_{month}.html', True),
+    'star3': ('lotto_historylist_three-star.html', False),
+    'star4': ('lotto_historylist_four-star.html', False)
+}
+
+_WEEKDAYS = '一二三四五六日'
+
+
+def _ball_list(numbers: List[int]) -> str:
+    """開出順序與大小順序 (fixture 中兩者相同)"""
+    links = ''.join(f'<a class="history_ball_link" href="#">{n:02d}</a>' for n in numbers)
+    return (
+        '<ul class="history_ball">'
+        f'<li>開出順序 {links}</li>'
+        f'<li>大小順序 {links}</li>'
+        '</ul>'
+    )
+
+
+def _date_cell(date_str: str) -> str:
+    weekday = _WEEKDAYS[pd.Timestamp(date_str).weekday()]
+    return f'<td>{date_str} ({weekday})</td>'
+
+
+def render_auzo_rows(game: str, rows: pd.DataFrame) -> str:
+    """將開獎資料列轉為 auzo.tw 表格列 (rows 為 dtype=str 的 CSV 資料)"""
+    parts = []
+    for _, row in rows.iterrows():
+        date_str = row['date']
+        if game == '539':
+            numbers = sorted(int(n) for n in row['numbers'].split(','))
+            parts.append(f'<tr>{_date_cell(date_str)}<td>{_ball_list(numbers)}</td></tr>')
+        elif game in ('power', 'lotto'):
+            numbers = sorted(int(row[str(i)]) for i in range(1, 7))
+            extra = row['zone2'] if game == 'power' else row['special']
+            style = 'color:#005aff;font-size:48px' if game == 'power' else 'color:#005aff'
+            parts.append(
+                f'<tr>{_date_cell(date_str)}<td>{_ball_list(numbers)}</td>'
+                f'<td style="{style}">{html.escape(str(extra))}</td></tr>'
+            )
+        else:
+            width = int(game[-1])
+            digits = ''.join(f'<span>{row[str(i)]}</span>' for i in range(1, width + 1))
+            parts.append(
+                f'<tr class="history_view_star"><td>{date_str.replace("-", "")}</td>'
+                f'<td>{digits}</td><td>{date_str}</td></tr>'
+            )
+    return '\n'.join(parts)
+
+
+def render_auzo_page(game: str, rows: pd.DataFrame, title: str = '') -> str:
+    """產生完整頁面 (新到舊排列,與實際網站相同)"""
+    rows = rows.sort_values('date', ascending=False)
+    body = render_auzo_rows(game, rows)
+    if game in ('star3', 'star4'):
+        table = f'<table class="history_view_star_table">\n{body}\n</table>'
+    else:
+        table = f'<table class="history_view_table">\n{body}\n</table>'
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+        f'<title>{html.escape(title or game)}</title></head>\n'
+        f'<body>\n<div class="history_view">\n{table}\n</div>\n</body></html>\n'
+    )
+
+
+def build_fixtures(month: str, root: Path = FIXTURE_ROOT, games: Optional[List[str]] = None) -> Dict[str, Path]:
+    """
+    由歷史 CSV 產生指定月份的 auzo.tw 頁面
+
+    Args:
+        month: 'YYYY-MM'
+        root: 輸出根目錄
+        games: 遊戲列表 (預設全部)
+
+    Returns:
+        dict: {遊戲: 檔案路徑}
+    """
+    year, mon = (int(x) for x in month.split('-'))
+    previous = (pd.Timestamp(f"{month}-01") - pd.Timedelta(days=1)).strftime('%Y-%m')
+    written = {}
+
+    for game in games or list(AUZO_PAGES):
+        template, monthly = AUZO_PAGES[game]
+        df = pd.read_csv(GAME_FILES[game], dtype=str)
+        if monthly:
+            rows = df[df['date'].str.startswith(month)]
+        else:
+            # 星彩頁面不分月份: 包含上個月以驗證年月篩選
+            rows = df[df['date'].str.startswith(month) | df['date'].str.startswith(previous)]
+
+        path = Path(root) / AUZO_HOST / template.format(year=year, month=mon)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(render_auzo_page(game, rows, title=f"{game} {month}"), encoding='utf-8')
+        written[game] = path
+    return written
+
+
+def _ball_divs(values: List[str], link: bool = False) -> str:
+    """auzonet 號碼球 (539 附號碼連結)"""
+    if link:
+        return ''.join(
+            f'<a href="lotto_ballview_daily539_{int(v):02d}.html"><div class="ball_tx">{int(v):02d}</div></a>'
+            for v in values
+        )
+    return ''.join(f'<div class="ball_tx">{v}</div>' for v in values)
+
+
+def render_auzonet_rows(game: str, rows: pd.DataFrame) -> str:
+    """將開獎資料列轉為 auzonet 表格列 (星彩日期以 YYYY/MM/DD 呈現)"""
+    parts = []
+    for _, row in rows.iterrows():
+        date_str = row['date']
+        if game == '539':
+            balls = _ball_divs(row['numbers'].split(','), link=True)
+        elif game in ('power', 'lotto'):
+            values = [f"{int(row[str(i)]):02d}" for i in range(1, 7)]
+            values.append(f"{int(row['zone2' if game == 'power' else 'special']):02d}")
+            balls = _ball_divs(values)
+        else:
+            balls = _ball_divs([row[str(i)] for i in range(1, int(game[-1]) + 1)])
+            date_str = date_str.replace('-', '/')
+        parts.append(f'<tr>{_date_cell(date_str)}<td>{balls}</td></tr>')
+    return '\n'.join(parts)
+
+
+def render_auzonet_page(game: str, rows: pd.DataFrame, title: str = '') -> str:
+    """產生完整 auzonet 頁面 (新到舊排列)"""
+    rows = rows.sort_values('date', ascending=False)
+    table = f'<table class="list_table">\n{render_auzonet_rows(game, rows)}\n</table>'
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+        f'<title>{html.escape(title or game)}</title></head>\n'
+        f'<body>\n{table}\n</body></html>\n'
+    )
+
+
+def build_auzonet_fixtures(month: str, root: Path = FIXTURE_ROOT, games: Optional[List[str]] = None) -> Dict[str, Path]:
+    """
+    由歷史 CSV 產生指定月份的 auzonet 月份列表頁
+
+    Returns:
+        dict: {遊戲: 檔案路徑}
+    """
+    year, mon = (int(x) for x in month.split('-'))
+    written = {}
+    for game in games or list(MONTH_PAGES):
+        df = pd.read_csv(GAME_FILES[game], dtype=str)
+        rows = df[df['date'].str.startswith(month)]
+        path = Path(root) / AUZONET_HOST / MONTH_PAGES[game] / f"list_{year}_{mon}.html"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(render_auzonet_page(game, rows, title=f"{game} {month}"), encoding='utf-8')
+        written[game] = path
+    return written
+
+
+class _FixtureHandler(SimpleHTTPRequestHandler):
+    """提供 <root>/<主機>/<路徑> 的靜態檔案,可模擬暫時性錯誤"""
+
+    server_version = 'FixtureServer/1.0'
+
+    def do_GET(self):
+        failures = self.server.failures
+        with self.server.lock:
+            self.server.request_log.append(self.path)
+            remaining = failures.get(self.path, 0)
+            if remaining:
+                failures[self.path] = remaining - 1
+        if remaining:
+            self.send_error(503, 'Simulated failure')
+            return
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class FixtureServer:
+    """本機測試伺服器 (背景執行緒)"""
+
+    def __init__(self, root: Path = FIXTURE_ROOT, host: str = '127.0.0.1', port: int = 0, verbose: bool = False):
+        """
+        初始化
+
+        Args:
+            root: fixture 根目錄
+            host: 綁定位址
+            port: 連接埠 (0 = 自動選擇)
+            verbose: 是否輸出存取記錄
+        """
+        root = str(Path(root).resolve())
+        handler = lambda *args, **kwargs: _FixtureHandler(*args, directory=root, **kwargs)
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.failures = {}
+        self.httpd.request_log = []
+        self.httpd.lock = threading.Lock()
+        self.httpd.verbose = verbose
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_log(self) -> List[str]:
+        return list(self.httpd.request_log)
+
+    def fail(self, path: str, times: int = 1):
+        """讓指定路徑前 N 次請求回傳 503 (測試重試用)"""
+        self.httpd.failures[path] = times
+
+    def start(self) -> 'FixtureServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    """記錄 POST 的 JSON payload,可模擬 429 / 5xx 與速率限制標頭"""
+
+    server_version = 'WebhookStub/1.0'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        with server.lock:
+            if server.failures:
+                server.failures -= 1
+                status, headers, reply = 503, {}, b'{"message": "Simulated failure"}'
+            elif server.rate_limits:
+                server.rate_limits -= 1
+                status = 429
+                headers = {'Retry-After': f"{server.retry_after:g}", 'X-RateLimit-Remaining': '0',
+                           'X-RateLimit-Reset-After': f"{server.retry_after:g}"}
+                reply = json.dumps({'message': 'You are being rate limited.',
+                                    'retry_after': server.retry_after, 'global': False}).encode('utf-8')
+            else:
+                server.payloads.append(json.loads(body.decode('utf-8')))
+                status, headers, reply = 204, {'X-RateLimit-Limit': '5', 'X-RateLimit-Remaining': '4',
+                                               'X-RateLimit-Reset-After': '1'}, b''
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if reply:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class WebhookStub:
+    """本機 Discord Webhook 替身 (背景執行緒),測試推送佇列用"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, verbose: bool = False):
+        self.httpd = ThreadingHTTPServer((host, port), _WebhookHandler)
+        self.httpd.payloads = []
+        self.httpd.failures = 0
+        self.httpd.rate_limits = 0
+        self.httpd.retry_after = 1.0
+        self.httpd.lock = threading.Lock()
+        self.httpd.verbose = verbose
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api/webhooks/stub/token"
+
+    @property
+    def payloads(self) -> List[Dict]:
+        with self.httpd.lock:
+            return list(self.httpd.payloads)
+
+    def fail(self, times: int = 1):
+        """接下來 N 次請求回傳 503"""
+        self.httpd.failures = times
+
+    def rate_limit(self, times: int = 1, retry_after: float = 1.0):
+        """接下來 N 次請求回傳 429 與 Retry-After"""
+        self.httpd.rate_limits = times
+        self.httpd.retry_after = retry_after
+
+    def start(self) -> 'WebhookStub':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="產生並提供本機開獎頁面 fixtures")
+    parser.add_argument('--month', help="由歷史 CSV 產生此月份 (YYYY-MM) 的頁面")
+    parser.add_argument('--root', default=str(FIXTURE_ROOT))
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.month:
+        for build in (build_fixtures, build_auzonet_fixtures):
+            for game, path in build(args.month, Path(args.root)).items():
+                print(f"[SUCCESS] {game}: {path}")
+
+    server = FixtureServer(Path(args.root), port=args.port, verbose=True)
+    print(f"[INFO] Serving {args.root} at {server.base_url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
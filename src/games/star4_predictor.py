@@ -8,8 +8,8 @@ import random
 from typing import List
 from datetime import datetime, timedelta
 from collections import Counter
-from pathlib import Path
 from src.timezone_utils import get_taiwan_now
+from src.history_store import load_history
 
 
 class Star4Predictor:
@@ -21,9 +21,7 @@ class Star4Predictor:
     def _load_history(self) -> pd.DataFrame:
         """載入歷史資料"""
         try:
-            if Path(self.history_file).exists():
-                return pd.read_csv(self.history_file)
-            return pd.DataFrame()
+            return load_history(self.history_file)
         except:
             return pd.DataFrame()
     
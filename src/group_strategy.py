@@ -63,12 +63,27 @@ class GroupBasedStrategy:
                 'model_scores': {'freq': {...}, 'rsi': {...}, ...}
             }
         """
-        group_range = self.GROUPS[group_id]
-        group_numbers = list(range(group_range[0], group_range[1] + 1))
-        
         # 取得該群組的所有模型評分
         all_scores = feature_engine.get_all_scores(use_enhanced=use_enhanced)
         
+        return self.analyze_group_scores(all_scores, group_id, llm_advice, use_enhanced)
+    
+    def analyze_group_scores(self, all_scores, group_id, llm_advice=None, use_enhanced=False):
+        """
+        以已計算好的模型評分分析單一群組 (供回測/重播使用,避免重算模型)
+        
+        Args:
+            all_scores: FeatureEngine.get_all_scores() 的結果 (index 1-39)
+            group_id: 群組 ID (group1-4)
+            llm_advice: LLM 建議 (可選)
+            use_enhanced: 是否使用增強模型
+        
+        Returns:
+            dict: 與 analyze_group 相同
+        """
+        group_range = self.GROUPS[group_id]
+        group_numbers = list(range(group_range[0], group_range[1] + 1))
+        
         # 篩選出該群組的號碼
         group_scores = all_scores.loc[all_scores.index.isin(group_numbers)]
         
@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+"""
+開獎歷史二進位儲存 (Columnar Draw-History Store)
+每個遊戲一份: 日期存成 int32 (1970-01-01 起算天數),號碼存成固定寬度 uint8 矩陣,
+以 np.memmap 讀取 (微秒等級),並提供附加 API。
+CSV 仍是交換格式: CSV 被其他程式修改時 (mtime/大小改變) 會自動由 CSV 重建。
+"""
+import csv
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+
+STORE_VERSION = 1
+STORE_ROOT = Path('data/store')
+
+# 各遊戲的歷史 CSV
+GAME_FILES = {
+    '539': 'data/539_history.csv',
+    '539_train': 'data/539_train.csv',
+    'lotto': 'data/lotto/lotto_history.csv',
+    'power': 'data/power/power_history.csv',
+    'star3': 'data/star3/star3_history.csv',
+    'star4': 'data/star4/star4_history.csv'
+}
+
+_config_cache = {}
+
+
+def use_history_store(config_path: str = "config/auto_config.json") -> bool:
+    """讀取配置檔 data.use_history_store (預設 False)"""
+    if config_path not in _config_cache:
+        enabled = False
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                enabled = bool(json.load(f).get('data', {}).get('use_history_store', False))
+        except Exception:
+            pass
+        _config_cache[config_path] = enabled
+    return _config_cache[config_path]
+
+
+def days_to_date_strings(days: np.ndarray) -> np.ndarray:
+    """int32 天數 -> 'YYYY-MM-DD' 字串陣列"""
+    return np.datetime_as_string(np.asarray(days, dtype='int64').astype('datetime64[D]'), unit='D')
+
+
+def dates_to_days(dates) -> np.ndarray:
+    """日期 (字串/datetime) -> int32 天數"""
+    return pd.to_datetime(pd.Series(dates)).values.astype('datetime64[D]').astype(np.int32)
+
+
+class DrawHistory:
+    """單一遊戲的開獎歷史 (唯讀陣列)"""
+
+    def __init__(self, dates: np.ndarray, numbers: np.ndarray, extra: Optional[np.ndarray],
+                 layout: str, number_columns: Sequence[str], extra_column: Optional[str]):
+        self.dates = dates
+        self.numbers = numbers
+        self.extra = extra
+        self.layout = layout
+        self.number_columns = list(number_columns)
+        self.extra_column = extra_column
+
+    def __len__(self):
+        return len(self.dates)
+
+    def date_strings(self) -> np.ndarray:
+        return days_to_date_strings(self.dates)
+
+    def to_frame(self) -> pd.DataFrame:
+        """轉為與 CSV 相同欄位的 DataFrame"""
+        data = {'date': self.date_strings()}
+        numbers = np.asarray(self.numbers)
+        if self.layout == 'joined':
+            data['numbers'] = [','.join(f"{n:02d}" for n in row) for row in numbers.tolist()]
+        else:
+            for i, col in enumerate(self.number_columns):
+                data[col] = numbers[:, i].astype(np.int64)
+        if self.extra_column is not None and self.extra is not None:
+            data[self.extra_column] = np.asarray(self.extra).astype(np.int64)
+        return pd.DataFrame(data)
+
+
+def frame_to_draws(df: pd.DataFrame) -> DrawHistory:
+    """
+    將 CSV DataFrame 解析為依日期排序的 DrawHistory
+
+    Args:
+        df: pd.read_csv 的結果 (欄位: date + numbers 或 date + 1..N [+ special/zone2])
+    """
+    layout, number_columns, extra_column = HistoryStore._infer_layout(df.columns)
+
+    if df.empty:
+        numbers = np.zeros((0, 0), dtype=np.uint8)
+    elif layout == 'joined':
+        numbers = df['numbers'].astype(str).str.split(',', expand=True).astype(np.int64).values.astype(np.uint8)
+    else:
+        numbers = df[number_columns].astype(np.int64).values.astype(np.uint8)
+
+    dates = dates_to_days(df['date']) if len(df) else np.zeros(0, dtype=np.int32)
+    order = np.argsort(dates, kind='stable')
+    dates, numbers = dates[order], numbers[order]
+    extra = None
+    if extra_column is not None and len(df):
+        extra = df[extra_column].astype(np.int64).values.astype(np.uint8)[order]
+
+    if layout == 'joined':
+        number_columns = [str(i + 1) for i in range(numbers.shape[1] if numbers.ndim == 2 else 0)]
+    return DrawHistory(dates, numbers, extra, layout, number_columns, extra_column)
+
+
+class HistoryStore:
+    """開獎歷史二進位儲存"""
+
+    def __init__(self, csv_path: Union[str, Path], store_dir: Optional[Union[str, Path]] = None):
+        """
+        初始化
+
+        Args:
+            csv_path: 對應的 CSV 檔
+            store_dir: 二進位檔目錄 (預設 data/store/<CSV 檔名>)
+        """
+        self.csv_path = Path(csv_path)
+        self.store_dir = Path(store_dir) if store_dir else STORE_ROOT / self.csv_path.stem
+        self.meta_path = self.store_dir / 'meta.json'
+        self.dates_path = self.store_dir / 'dates.i4'
+        self.numbers_path = self.store_dir / 'numbers.u1'
+        self.extra_path = self.store_dir / 'extra.u1'
+        self._meta = None
+
+    @classmethod
+    def for_game(cls, game: str) -> 'HistoryStore':
+        """依遊戲名稱建立 (539, 539_train, lotto, power, star3, star4)"""
+        return cls(GAME_FILES[game])
+
+    # ---- meta ----
+    def _read_meta(self) -> Optional[Dict]:
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_meta(self, meta: Dict):
+        tmp = self.meta_path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, self.meta_path)
+        self._meta = meta
+
+    def _csv_stat(self):
+        st = self.csv_path.stat()
+        return st.st_mtime_ns, st.st_size
+
+    def is_stale(self) -> bool:
+        """二進位檔是否落後於 CSV"""
+        meta = self._read_meta()
+        if meta is None or meta.get('version') != STORE_VERSION:
+            return True
+        if not self.csv_path.exists():
+            return False
+        mtime_ns, size = self._csv_stat()
+        return meta.get('csv_mtime_ns') != mtime_ns or meta.get('csv_size') != size
+
+    # ---- build ----
+    @staticmethod
+    def _infer_layout(columns: Sequence[str]):
+        """由 CSV 欄位推斷格式: ('joined'|'columns', 號碼欄位, 額外欄位)"""
+        columns = [str(c) for c in columns]
+        if 'numbers' in columns:
+            return 'joined', ['numbers'], None
+        number_columns = [c for c in columns if c.isdigit()]
+        extra = [c for c in columns if c != 'date' and not c.isdigit()]
+        return 'columns', number_columns, (extra[0] if extra else None)
+
+    def rebuild(self) -> int:
+        """由 CSV 重建二進位檔,回傳筆數"""
+        history = frame_to_draws(pd.read_csv(self.csv_path, dtype=str))
+        dates, numbers, extra = history.dates, history.numbers, history.extra
+        layout, extra_column = history.layout, history.extra_column
+        number_columns = ['numbers'] if layout == 'joined' else history.number_columns
+
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        for path, array in ((self.dates_path, dates), (self.numbers_path, numbers), (self.extra_path, extra)):
+            tmp = path.with_suffix(path.suffix + '.tmp')
+            with open(tmp, 'wb') as f:
+                if array is not None:
+                    f.write(np.ascontiguousarray(array).tobytes())
+            os.replace(tmp, path)
+
+        mtime_ns, size = self._csv_stat()
+        self._write_meta({
+            'version': STORE_VERSION,
+            'rows': int(len(dates)),
+            'width': int(numbers.shape[1]) if numbers.ndim == 2 else 0,
+            'layout': layout,
+            'number_columns': number_columns,
+            'extra_column': extra_column,
+            'csv_mtime_ns': mtime_ns,
+            'csv_size': size
+        })
+        return len(dates)
+
+    def sync(self, force: bool = False) -> bool:
+        """若 CSV 有變動則重建,回傳是否重建"""
+        if not self.csv_path.exists():
+            return False
+        if force or self.is_stale():
+            self.rebuild()
+            return True
+        return False
+
+    # ---- read ----
+    def load(self, sync: bool = True) -> DrawHistory:
+        """
+        以 memory-map 載入 (唯讀)
+
+        Args:
+            sync: 載入前檢查 CSV 是否變動
+        """
+        if sync:
+            self.sync()
+        meta = self._read_meta()
+        if meta is None:
+            raise FileNotFoundError(f"History store not built: {self.store_dir}")
+
+        rows, width = meta['rows'], meta['width']
+        if rows == 0:
+            dates = np.zeros(0, dtype=np.int32)
+            numbers = np.zeros((0, width), dtype=np.uint8)
+            extra = np.zeros(0, dtype=np.uint8) if meta['extra_column'] else None
+        else:
+            dates = np.memmap(self.dates_path, dtype=np.int32, mode='r', shape=(rows,))
+            numbers = np.memmap(self.numbers_path, dtype=np.uint8, mode='r', shape=(rows, width))
+            extra = None
+            if meta['extra_column']:
+                extra = np.memmap(self.extra_path, dtype=np.uint8, mode='r', shape=(rows,))
+
+        number_columns = meta['number_columns']
+        if meta['layout'] == 'joined':
+            number_columns = [str(i + 1) for i in range(width)]
+        return DrawHistory(dates, numbers, extra, meta['layout'], number_columns, meta['extra_column'])
+
+    # ---- append ----
+    def append(self, dates, numbers, extra=None, write_csv: bool = True) -> int:
+        """
+        附加新開獎 (必須晚於目前最後一期)
+
+        Args:
+            dates: 日期列表
+            numbers: 號碼 (期數 x 寬度)
+            extra: 特別號/第二區 (可選)
+            write_csv: 同時附加到 CSV
+
+        Returns:
+            int: 附加筆數
+        """
+        self.sync()
+        return self._append(dates, numbers, extra, write_csv)
+
+    def sync_csv_append(self, records: Sequence[Dict], previous_csv_stat) -> bool:
+        """
+        CSV 已在尾端附加資料列 (由 HistoryWriter 寫入) 時,同步附加二進位檔以免整檔重建
+
+        Args:
+            records: 附加的資料列 (與 CSV 欄位相同的 dict)
+            previous_csv_stat: 附加前 CSV 的 (mtime_ns, size)
+
+        Returns:
+            bool: 是否已同步 (False 表示留待下次載入時由 CSV 重建)
+        """
+        meta = self._read_meta()
+        if meta is None or meta.get('version') != STORE_VERSION:
+            return False
+        if (meta.get('csv_mtime_ns'), meta.get('csv_size')) != tuple(previous_csv_stat):
+            return False
+
+        try:
+            if meta['layout'] == 'joined':
+                numbers = [[int(n) for n in str(r['numbers']).split(',')] for r in records]
+            else:
+                numbers = [[int(r[c]) for c in meta['number_columns']] for r in records]
+            extra = [int(r[meta['extra_column']]) for r in records] if meta['extra_column'] else None
+            self._append([r['date'] for r in records], numbers, extra, write_csv=False)
+            return True
+        except (KeyError, ValueError, TypeError) as e:
+            print(f"[WARNING] History store append skipped ({e}), will rebuild from CSV")
+            return False
+
+    def _append(self, dates, numbers, extra, write_csv: bool) -> int:
+        """附加資料 (呼叫端負責先同步)"""
+        meta = self._read_meta()
+        if meta is None:
+            raise FileNotFoundError(f"History store not built: {self.store_dir}")
+
+        new_days = dates_to_days(dates)
+        new_numbers = np.asarray(numbers, dtype=np.int64).astype(np.uint8).reshape(len(new_days), -1)
+        if len(new_days) == 0:
+            return 0
+        if meta['rows'] and meta['width'] != new_numbers.shape[1]:
+            raise ValueError(f"Width mismatch: store {meta['width']}, new {new_numbers.shape[1]}")
+        if meta['extra_column'] and extra is None:
+            raise ValueError(f"Column '{meta['extra_column']}' is required")
+
+        rows = meta['rows']
+        if rows:
+            last_day = np.memmap(self.dates_path, dtype=np.int32, mode='r', shape=(rows,))[-1]
+            if new_days.min() <= last_day or np.any(np.diff(new_days) <= 0):
+                raise ValueError("Appended draws must be newer than the last stored draw and strictly increasing")
+
+        if write_csv:
+            self._append_csv(new_days, new_numbers, extra, meta)
+
+        # 截斷未完成的寫入,再附加
+        width = new_numbers.shape[1]
+        new_extra = np.asarray(extra, dtype=np.int64).astype(np.uint8) if meta['extra_column'] else None
+        for path, itemsize, array in ((self.dates_path, 4, new_days),
+                                      (self.numbers_path, width, new_numbers),
+                                      (self.extra_path, 1, new_extra)):
+            if array is None:
+                continue
+            with open(path, 'ab') as f:
+                f.truncate(rows * itemsize)
+                f.write(np.ascontiguousarray(array).tobytes())
+
+        meta = dict(meta, rows=rows + len(new_days), width=width)
+        if self.csv_path.exists():
+            meta['csv_mtime_ns'], meta['csv_size'] = self._csv_stat()
+        self._write_meta(meta)
+        return len(new_days)
+
+    def _append_csv(self, days, numbers, extra, meta):
+        """依 CSV 原格式附加資料列"""
+        date_strings = days_to_date_strings(days)
+        with open(self.csv_path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            for i, date_str in enumerate(date_strings):
+                if meta['layout'] == 'joined':
+                    row = [date_str, ','.join(f"{n:02d}" for n in numbers[i])]
+                else:
+                    row = [date_str] + [int(n) for n in numbers[i]]
+                    if meta['extra_column']:
+                        row.append(int(extra[i]))
+                writer.writerow(row)
+
+
+def read_history(source: str, use_store: Optional[bool] = None) -> pd.DataFrame:
+    """
+    讀取開獎歷史 DataFrame (不經快取,供 DrawRepository 使用)
+
+    Args:
+        source: 遊戲名稱 (539, lotto, ...) 或 CSV 路徑
+        use_store: 是否使用二進位儲存 (None = 依配置檔)
+
+    Returns:
+        DataFrame: 檔案不存在時為空 DataFrame
+    """
+    csv_path = Path(GAME_FILES.get(source, source))
+    if not csv_path.exists():
+        return pd.DataFrame()
+    if use_store is None:
+        use_store = use_history_store()
+    if use_store:
+        try:
+            return HistoryStore(csv_path).load().to_frame()
+        except Exception as e:
+            print(f"[WARNING] History store unavailable for {csv_path}, falling back to CSV: {e}")
+    return pd.read_csv(csv_path)
+
+
+def load_history(source: str, use_store: Optional[bool] = None) -> pd.DataFrame:
+    """
+    載入開獎歷史 DataFrame (與 pd.read_csv 相同欄位)
+    經由全域 DrawRepository 快取,檔案未變動時不重新解析;回傳的是副本,可自由修改。
+
+    Args:
+        source: 遊戲名稱 (539, lotto, ...) 或 CSV 路徑
+        use_store: 是否使用二進位儲存 (None = 依配置檔)
+
+    Returns:
+        DataFrame: 檔案不存在時為空 DataFrame
+    """
+    from src.draw_repository import draw_repository
+    return draw_repository.get_frame(source, use_store=use_store)
+
+
+if __name__ == "__main__":
+    import time
+
+    for game in ['539', 'lotto', 'power', 'star3', 'star4']:
+        store = HistoryStore.for_game(game)
+        store.sync(force=True)
+        start = time.perf_counter()
+        history = store.load()
+        elapsed = (time.perf_counter() - start) * 1e6
+        print(f"{game}: {len(history)} draws, width {history.numbers.shape[1]}, "
+              f"last {history.date_strings()[-1]} {history.numbers[-1].tolist()} ({elapsed:.0f} µs)")
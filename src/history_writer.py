@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+開獎歷史 CSV 寫入器 (Append-Only, Crash-Safe)
+- 新開獎晚於最後一期時直接附加到檔尾 (成本只與新增筆數有關)
+- 只有補登舊日期或修正既有資料時才排序合併整檔,並以暫存檔 + rename 原子替換
+- 日期索引 sidecar (日期 -> 資料列雜湊) 讓重複檢查為 O(1),不需讀取 CSV
+- 索引只在首次寫入時載入並常駐記憶體,之後每次寫入只附加新項目到 sidecar
+"""
+import csv
+import io
+import json
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+
+from src.history_store import STORE_ROOT, HistoryStore, use_history_store
+
+
+INDEX_VERSION = 1
+INDEX_ROOT = STORE_ROOT / 'index'
+
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+_writers: Dict[tuple, 'HistoryWriter'] = {}
+_writers_lock = threading.Lock()
+
+
+def _lock_for(path: Path) -> threading.Lock:
+    """同一行程內,同一 CSV 的寫入互斥"""
+    key = str(path.resolve())
+    with _file_locks_guard:
+        return _file_locks.setdefault(key, threading.Lock())
+
+
+def _normalize_value(value) -> str:
+    """比對用的正規化: '04,28' 與 '4,28'、'03' 與 3 視為相同"""
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    parts = []
+    for part in str(value).split(','):
+        part = part.strip()
+        try:
+            parts.append(str(int(float(part))))
+        except ValueError:
+            parts.append(part)
+    return ','.join(parts)
+
+
+def row_digest(row: Dict, columns: Sequence[str]) -> str:
+    """資料列內容雜湊 (不含日期)"""
+    key = '|'.join(_normalize_value(row.get(col)) for col in columns if col != 'date')
+    return f"{zlib.crc32(key.encode('utf-8')):08x}"
+
+
+class HistoryWriter:
+    """開獎歷史 CSV 寫入器"""
+
+    def __init__(self, csv_path: Union[str, Path], index_dir: Optional[Union[str, Path]] = None):
+        """
+        初始化
+
+        Args:
+            csv_path: 歷史 CSV 檔
+            index_dir: 日期索引目錄 (預設 data/store/index)
+        """
+        self.csv_path = Path(csv_path)
+        index_dir = Path(index_dir) if index_dir else INDEX_ROOT
+        self.index_path = index_dir / f"{self.csv_path.stem}.dates"
+        self.meta_path = index_dir / f"{self.csv_path.stem}.json"
+
+        self.columns: List[str] = []
+        self.digests: Dict[str, str] = {}
+        self.last_date = ''
+        self._meta: Optional[Dict] = None
+
+    # ---- index ----
+    def _csv_stat(self):
+        st = self.csv_path.stat()
+        return st.st_mtime_ns, st.st_size
+
+    def _read_meta(self) -> Optional[Dict]:
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            return meta if meta.get('version') == INDEX_VERSION else None
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_meta(self, meta: Dict):
+        self.meta_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.meta_path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, self.meta_path)
+        self._meta = meta
+
+    def _commit_meta(self, pending: Optional[Dict] = None):
+        """記錄目前 CSV/索引狀態 (pending 為附加前的位置,用於中斷後回復)"""
+        mtime_ns, size = self._csv_stat()
+        self._write_meta({
+            'version': INDEX_VERSION,
+            'columns': self.columns,
+            'last_date': self.last_date,
+            'rows': len(self.digests),
+            'csv_mtime_ns': mtime_ns,
+            'csv_size': size,
+            'index_size': self.index_path.stat().st_size if self.index_path.exists() else 0,
+            'pending': pending
+        })
+
+    def _recover(self, meta: Dict):
+        """上次附加中斷: 將 CSV 與索引截回附加前的位置"""
+        pending = meta['pending']
+        print(f"[WARNING] Incomplete append detected for {self.csv_path.name}, rolling back")
+        for path, size in ((self.csv_path, pending['csv_size']), (self.index_path, pending['index_size'])):
+            if path.exists() and path.stat().st_size > size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+                    os.fsync(f.fileno())
+        meta['pending'] = None
+
+    def _index_is_current(self) -> bool:
+        """記憶體中的索引仍對應目前的 CSV (只需 stat,不讀檔)"""
+        if self._meta is None or self._meta.get('pending') or not self.csv_path.exists():
+            return False
+        mtime_ns, size = self._csv_stat()
+        return self._meta['csv_mtime_ns'] == mtime_ns and self._meta['csv_size'] == size
+
+    def _load_index(self):
+        """載入日期索引; 記憶體中已是最新時直接沿用, CSV 被外部修改時由 CSV 重建"""
+        if self._index_is_current():
+            return
+
+        meta = self._read_meta()
+        if meta is not None and meta.get('pending'):
+            self._recover(meta)
+            self._rebuild_index()
+            return
+
+        if meta is not None and self.csv_path.exists() and self.index_path.exists():
+            mtime_ns, size = self._csv_stat()
+            if meta['csv_mtime_ns'] == mtime_ns and meta['csv_size'] == size:
+                self.columns = meta['columns']
+                self.last_date = meta['last_date']
+                self.digests = {}
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        date, digest = line.rstrip('\n').split('\t')
+                        self.digests[date] = digest
+                self._meta = meta
+                return
+
+        self._rebuild_index()
+
+    def _rebuild_index(self):
+        """掃描 CSV 建立索引 (只有首次或 CSV 被外部修改時執行)"""
+        self.columns, self.digests, self.last_date = [], {}, ''
+        if self.csv_path.exists():
+            with open(self.csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+                reader = csv.DictReader(f)
+                self.columns = list(reader.fieldnames or [])
+                for row in reader:
+                    self._index_row(row)
+        self._write_index_file()
+        if self.csv_path.exists():
+            self._commit_meta()
+
+    def _index_row(self, row: Dict):
+        date = str(row['date']).strip()
+        self.digests[date] = row_digest(row, self.columns)
+        if date > self.last_date:
+            self.last_date = date
+
+    def _write_index_file(self):
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.writelines(f"{date}\t{digest}\n" for date, digest in self.digests.items())
+        os.replace(tmp, self.index_path)
+
+    def has_date(self, date: str) -> bool:
+        """O(1) 檢查日期是否已存在"""
+        with _lock_for(self.csv_path):
+            self._load_index()
+        return str(date) in self.digests
+
+    # ---- write ----
+    def write(self, records: List[Dict]) -> Dict:
+        """
+        寫入開獎資料 (同日期以新資料為準)
+
+        Args:
+            records: [{'date': 'YYYY-MM-DD', <與 CSV 相同的欄位>...}, ...]
+
+        Returns:
+            dict: {'mode': 'noop'|'append'|'merge', 'added': 新增筆數, 'updated': 修正筆數}
+        """
+        with _lock_for(self.csv_path):
+            self._load_index()
+
+            # 同日期取最後一筆,依日期排序
+            incoming = {}
+            for record in records:
+                record = dict(record)
+                record['date'] = str(record['date']).strip()
+                incoming[record['date']] = record
+            incoming = [incoming[d] for d in sorted(incoming)]
+
+            if not incoming:
+                return {'mode': 'noop', 'added': 0, 'updated': 0}
+
+            columns = self.columns or list(incoming[0].keys())
+            new_rows, changed_rows = [], []
+            for record in incoming:
+                digest = self.digests.get(record['date'])
+                if digest is None:
+                    new_rows.append(record)
+                elif digest != row_digest(record, columns):
+                    changed_rows.append(record)
+
+            if not new_rows and not changed_rows:
+                return {'mode': 'noop', 'added': 0, 'updated': 0}
+
+            extra_columns = [c for r in incoming for c in r if c not in columns]
+            tail_only = (
+                self.csv_path.exists() and self.columns
+                and not changed_rows and not extra_columns
+                and new_rows[0]['date'] > self.last_date
+            )
+
+            if tail_only:
+                self._append_rows(new_rows)
+                mode = 'append'
+            else:
+                self._merge_rows(incoming)
+                mode = 'merge'
+
+            return {'mode': mode, 'added': len(new_rows), 'updated': len(changed_rows)}
+
+    def _line_terminator(self) -> str:
+        with open(self.csv_path, 'rb') as f:
+            head = f.readline()
+        return '\r\n' if head.endswith(b'\r\n') else '\n'
+
+    def _append_rows(self, rows: List[Dict]):
+        """附加到檔尾: 先記錄附加前位置,寫入並 fsync 後才提交索引"""
+        previous_stat = self._csv_stat()
+        pending = {'csv_size': previous_stat[1], 'index_size': self._meta['index_size']}
+        self._write_meta(dict(self._meta, pending=pending))
+
+        terminator = self._line_terminator()
+        buffer = io.StringIO()
+        with open(self.csv_path, 'rb') as f:
+            f.seek(max(0, previous_stat[1] - 1))
+            if previous_stat[1] and f.read(1) not in (b'\n', b'\r'):
+                buffer.write(terminator)
+        writer = csv.writer(buffer, lineterminator=terminator)
+        for row in rows:
+            writer.writerow(['' if row.get(col) is None else row.get(col) for col in self.columns])
+
+        with open(self.csv_path, 'a', encoding='utf-8', newline='') as f:
+            f.write(buffer.getvalue())
+            f.flush()
+            os.fsync(f.fileno())
+
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                self._index_row(row)
+                f.write(f"{row['date']}\t{self.digests[row['date']]}\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._commit_meta()
+        self._sync_history_store(rows, previous_stat)
+
+    def _merge_rows(self, records: List[Dict]):
+        """排序合併 (補登或修正時), 以暫存檔 + rename 原子替換"""
+        new_df = pd.DataFrame(records).fillna('').astype(str)
+        if self.csv_path.exists():
+            old_df = pd.read_csv(self.csv_path, dtype=str, keep_default_na=False)
+            combined = pd.concat([old_df, new_df], ignore_index=True)
+        else:
+            self.csv_path.parent.mkdir(parents=True, exist_ok=True)
+            combined = new_df
+
+        combined['date'] = combined['date'].str.strip()
+        combined = combined.drop_duplicates(subset=['date'], keep='last')
+        combined = combined.sort_values('date', kind='stable').reset_index(drop=True)
+        combined = combined.fillna('')
+
+        tmp = self.csv_path.with_name(self.csv_path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            combined.to_csv(f, index=False, lineterminator='\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.csv_path)
+
+        self.columns = list(combined.columns)
+        self.digests, self.last_date = {}, ''
+        for row in combined.to_dict('records'):
+            self._index_row(row)
+        self._write_index_file()
+        self._commit_meta()
+
+    def _sync_history_store(self, rows: List[Dict], previous_stat):
+        """二進位儲存已啟用時一併附加 (否則下次載入時自動重建)"""
+        if not use_history_store():
+            return
+        HistoryStore(self.csv_path).sync_csv_append(rows, previous_stat)
+
+
+def get_history_writer(csv_path: Union[str, Path],
+                       index_dir: Optional[Union[str, Path]] = None) -> HistoryWriter:
+    """
+    取得 CSV 對應的共用寫入器 (索引常駐記憶體,不必每次寫入重新載入)
+
+    Args:
+        csv_path: 歷史 CSV 檔
+        index_dir: 日期索引目錄 (預設 data/store/index)
+
+    Returns:
+        HistoryWriter: 同一 CSV 與索引目錄回傳同一個實例
+    """
+    key = (str(Path(csv_path).resolve()), str(Path(index_dir).resolve()) if index_dir else '')
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = HistoryWriter(csv_path, index_dir)
+        return writer
+
+
+def write_history(csv_path: Union[str, Path], records: List[Dict]) -> Dict:
+    """便利函式: 以共用的 HistoryWriter 寫入一批開獎資料"""
+    return get_history_writer(csv_path).write(records)
+
+
+if __name__ == "__main__":
+    # 測試 - 在暫存目錄操作 539 歷史的副本
+    import shutil
+    import tempfile
+
+    tmp_dir = Path(tempfile.mkdtemp())
+    csv_copy = tmp_dir / '539_history.csv'
+    shutil.copy('data/539_history.csv', csv_copy)
+
+    writer = HistoryWriter(csv_copy, index_dir=tmp_dir / 'index')
+    last = writer.has_date('2026-02-13')
+    print(f"2026-02-13 indexed: {last}")
+    print(writer.write([{'date': '2026-02-13', 'numbers': '4,28,31,33,34'}]))
+    print(writer.write([{'date': '2026-02-14', 'numbers': '1,2,3,4,5'}]))
+    print(writer.write([{'date': '2026-02-14', 'numbers': '1,2,3,4,6'}]))
+
+    # 索引常駐記憶體: 連續附加不再重新讀取 sidecar
+    reads = []
+    original_read_meta = writer._read_meta
+    writer._read_meta = lambda: reads.append(1) or original_read_meta()
+    print(writer.write([{'date': '2026-02-15', 'numbers': '5,6,7,8,9'}]))
+    print(writer.write([{'date': '2026-02-16', 'numbers': '6,7,8,9,10'}]))
+    print(f"sidecar reloads during appends: {len(reads)}")
+    writer._read_meta = original_read_meta
+    print(pd.read_csv(csv_copy).tail(3))
+    shutil.rmtree(tmp_dir)
@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+開獎頁面 HTML 解析後端
+- selectolax (lexbor) / lxml: C 實作的解析器,以 CSS/XPath 直接定位需要的節點
+- bs4: BeautifulSoup html.parser (未安裝上述套件時的備援, 也是行為基準)
+
+各後端只負責「取出節點文字」,轉換為開獎資料的規則統一寫在
+src/result_parsers.py 與 src/month_index.py, 因此所有後端的結果相同。
+可用 benchmark_parsers.py 以 data/fixtures/html 的頁面比對結果並量測解析時間。
+
+選擇順序: 參數 > 配置檔 crawler.parser_backend > 自動 (selectolax > lxml > bs4)
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+from src.http_client import load_crawler_config
+
+# 嘗試載入 C 實作的解析器 (列於 requirements.txt; 未安裝時退回 bs4)
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    HAS_SELECTOLAX = False
+
+try:
+    from lxml import html as lxml_html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+BALL_HREF = re.compile(r'lotto_ballview_daily539_(\d+)')
+SORTED_LABEL = '大小順序'
+
+
+class Bs4Backend:
+    """BeautifulSoup (html.parser) 後端"""
+
+    name = 'bs4'
+
+    def auzo_table_rows(self, html_text: str) -> List[Dict]:
+        """
+        auzo.tw 539/威力彩/大樂透列表: history_view_table 中含日期的 td 所在的資料列
+
+        Returns:
+            list: [{'date', 'has_ul', 'sorted', 'links', 'styled', 'cells'}, ...]
+                sorted: 「大小順序」li 中的號碼文字 (無此 li 時為 None)
+                links: ul.history_ball 中全部號碼文字
+                styled: [(style, 文字), ...] 有 style 屬性的 td
+                cells: 資料列直接子 td 的文字
+        """
+        soup = BeautifulSoup(html_text, 'html.parser')
+        rows = []
+        for table in soup.find_all('table', class_='history_view_table'):
+            for td in table.find_all('td'):
+                match = DATE_PATTERN.search(td.get_text(separator=' ', strip=True))
+                if not match:
+                    continue
+                tr = td.find_parent('tr')
+                if not tr:
+                    continue
+                row = {'date': match.group(0), 'has_ul': False}
+                ul = tr.find('ul', class_='history_ball')
+                if ul:
+                    sorted_li = None
+                    for li in ul.find_all('li'):
+                        if SORTED_LABEL in li.get_text():
+                            sorted_li = li
+                            break
+                    row.update(
+                        has_ul=True,
+                        sorted=[a.get_text(strip=True) for a in sorted_li.find_all('a', class_='history_ball_link')]
+                        if sorted_li else None,
+                        links=[a.get_text(strip=True) for a in ul.find_all('a', class_='history_ball_link')],
+                        styled=[(c['style'], c.get_text(strip=True)) for c in tr.find_all('td') if c.get('style')],
+                        cells=[c.get_text(strip=True) for c in tr.find_all('td', recursive=False)]
+                    )
+                rows.append(row)
+        return rows
+
+    def auzo_star_rows(self, html_text: str) -> List[List[Tuple[str, List[str]]]]:
+        """auzo.tw 星彩列表: 每列 [(td 文字, [span 文字...]), ...]"""
+        soup = BeautifulSoup(html_text, 'html.parser')
+        return [
+            [(td.get_text(), [s.get_text(strip=True) for s in td.find_all('span')]) for td in row.find_all('td')]
+            for row in soup.find_all('tr', class_='history_view_star')
+        ]
+
+    def auzonet_rows(self, html_text: str) -> List[Tuple[int, str, List[str]]]:
+        """auzonet 列表: 每列 (td 數, 第一個 td 文字, [div.ball_tx 文字...])"""
+        soup = BeautifulSoup(html_text, 'html.parser')
+        rows = []
+        for tr in soup.find_all('tr'):
+            tds = tr.find_all('td')
+            first = tds[0].get_text(strip=True) if tds else ''
+            rows.append((len(tds), first, [b.get_text(strip=True) for b in tr.find_all('div', class_='ball_tx')]))
+        return rows
+
+    def auzonet_539(self, html_text: str) -> Dict[str, List[int]]:
+        """auzonet 539: 由日期文字向上 (最多 10 層) 找含 5 個號碼連結的父元素"""
+        soup = BeautifulSoup(html_text, 'html.parser')
+        draws = {}
+        for date_elem in soup.find_all(string=DATE_PATTERN):
+            for date_str in DATE_PATTERN.findall(str(date_elem)):
+                if date_str in draws:
+                    continue
+                parent = date_elem.parent
+                for _ in range(10):
+                    if not parent:
+                        break
+                    hrefs = [a.get('href') for a in parent.find_all('a', href=BALL_HREF)]
+                    if len(hrefs) >= 5:
+                        draws[date_str] = _ball_numbers(hrefs)
+                        break
+                    parent = parent.parent
+        return draws
+
+
+def _ball_numbers(hrefs: List[str]) -> List[int]:
+    return [int(BALL_HREF.search(href).group(1)) for href in hrefs[:5]]
+
+
+def _has_class(name: str) -> str:
+    """XPath: class 屬性包含指定名稱 (與 CSS .name 相同)"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _lxml_text(element, separator: str = '', strip: bool = True) -> str:
+    """對應 bs4 get_text(separator, strip)"""
+    if not strip:
+        return ''.join(element.itertext())
+    return separator.join(s.strip() for s in element.itertext() if s.strip())
+
+
+class LxmlBackend:
+    """lxml (libxml2) 後端"""
+
+    name = 'lxml'
+
+    def auzo_table_rows(self, html_text: str) -> List[Dict]:
+        doc = lxml_html.document_fromstring(html_text)
+        rows = []
+        for td in doc.xpath(f"//table[{_has_class('history_view_table')}]//td"):
+            match = DATE_PATTERN.search(_lxml_text(td, ' '))
+            if not match:
+                continue
+            tr = next(td.iterancestors('tr'), None)
+            if tr is None:
+                continue
+            row = {'date': match.group(0), 'has_ul': False}
+            uls = tr.xpath(f".//ul[{_has_class('history_ball')}]")
+            if uls:
+                ul = uls[0]
+                link_path = f".//a[{_has_class('history_ball_link')}]"
+                sorted_li = next((li for li in ul.iterdescendants('li') if SORTED_LABEL in _lxml_text(li, strip=False)), None)
+                row.update(
+                    has_ul=True,
+                    sorted=[_lxml_text(a) for a in sorted_li.xpath(link_path)] if sorted_li is not None else None,
+                    links=[_lxml_text(a) for a in ul.xpath(link_path)],
+                    styled=[(c.get('style'), _lxml_text(c)) for c in tr.iterdescendants('td') if c.get('style')],
+                    cells=[_lxml_text(c) for c in tr if c.tag == 'td']
+                )
+            rows.append(row)
+        return rows
+
+    def auzo_star_rows(self, html_text: str) -> List[List[Tuple[str, List[str]]]]:
+        doc = lxml_html.document_fromstring(html_text)
+        return [
+            [(_lxml_text(td, strip=False), [_lxml_text(s) for s in td.iterdescendants('span')])
+             for td in row.iterdescendants('td')]
+            for row in doc.xpath(f"//tr[{_has_class('history_view_star')}]")
+        ]
+
+    def auzonet_rows(self, html_text: str) -> List[Tuple[int, str, List[str]]]:
+        doc = lxml_html.document_fromstring(html_text)
+        rows = []
+        for tr in doc.iter('tr'):
+            tds = list(tr.iterdescendants('td'))
+            first = _lxml_text(tds[0]) if tds else ''
+            balls = tr.xpath(f".//div[{_has_class('ball_tx')}]")
+            rows.append((len(tds), first, [_lxml_text(b) for b in balls]))
+        return rows
+
+    def auzonet_539(self, html_text: str) -> Dict[str, List[int]]:
+        doc = lxml_html.document_fromstring(html_text)
+        draws = {}
+
+        def visit(text: Optional[str], parent):
+            for date_str in DATE_PATTERN.findall(text or ''):
+                if date_str in draws:
+                    continue
+                node = parent
+                for _ in range(10):
+                    if node is None:
+                        break
+                    hrefs = [a.get('href') for a in node.iterdescendants('a') if BALL_HREF.search(a.get('href') or '')]
+                    if len(hrefs) >= 5:
+                        draws[date_str] = _ball_numbers(hrefs)
+                        break
+                    node = node.getparent()
+
+        # 依文件順序走訪文字節點: 元素開頭的 text 與各子節點 (含註解) 後的 tail
+        def walk(element):
+            visit(element.text, element)
+            for child in element:
+                if isinstance(child.tag, str):
+                    walk(child)
+                visit(child.tail, element)
+
+        walk(doc)
+        return draws
+
+
+class SelectolaxBackend:
+    """selectolax (lexbor) 後端"""
+
+    name = 'selectolax'
+
+    def auzo_table_rows(self, html_text: str) -> List[Dict]:
+        tree = LexborHTMLParser(html_text)
+        rows = []
+        for td in tree.css('table.history_view_table td'):
+            match = DATE_PATTERN.search(td.text(separator=' ', strip=True))
+            if not match:
+                continue
+            tr = td.parent
+            while tr is not None and tr.tag != 'tr':
+                tr = tr.parent
+            if tr is None:
+                continue
+            row = {'date': match.group(0), 'has_ul': False}
+            ul = tr.css_first('ul.history_ball')
+            if ul is not None:
+                sorted_li = next((li for li in ul.css('li') if SORTED_LABEL in li.text()), None)
+                row.update(
+                    has_ul=True,
+                    sorted=[a.text(strip=True) for a in sorted_li.css('a.history_ball_link')]
+                    if sorted_li is not None else None,
+                    links=[a.text(strip=True) for a in ul.css('a.history_ball_link')],
+                    styled=[(c.attributes['style'], c.text(strip=True))
+                            for c in tr.css('td') if c.attributes.get('style')],
+                    cells=[c.text(strip=True) for c in tr.iter() if c.tag == 'td']
+                )
+            rows.append(row)
+        return rows
+
+    def auzo_star_rows(self, html_text: str) -> List[List[Tuple[str, List[str]]]]:
+        tree = LexborHTMLParser(html_text)
+        return [
+            [(td.text(), [s.text(strip=True) for s in td.css('span')]) for td in row.css('td')]
+            for row in tree.css('tr.history_view_star')
+        ]
+
+    def auzonet_rows(self, html_text: str) -> List[Tuple[int, str, List[str]]]:
+        tree = LexborHTMLParser(html_text)
+        rows = []
+        for tr in tree.css('tr'):
+            tds = [td for td in tr.css('td')]
+            first = tds[0].text(strip=True) if tds else ''
+            rows.append((len(tds), first, [b.text(strip=True) for b in tr.css('div.ball_tx')]))
+        return rows
+
+    def auzonet_539(self, html_text: str) -> Dict[str, List[int]]:
+        tree = LexborHTMLParser(html_text)
+        draws = {}
+        root = tree.root
+        if root is None:
+            return draws
+        for node in root.traverse(include_text=True):
+            if node.tag != '-text':
+                continue
+            for date_str in DATE_PATTERN.findall(node.text_content or ''):
+                if date_str in draws:
+                    continue
+                parent = node.parent
+                for _ in range(10):
+                    if parent is None:
+                        break
+                    hrefs = [
+                        a.attributes.get('href') for a in parent.css('a[href]')
+                        if a.mem_id != parent.mem_id and BALL_HREF.search(a.attributes.get('href') or '')
+                    ]
+                    if len(hrefs) >= 5:
+                        draws[date_str] = _ball_numbers(hrefs)
+                        break
+                    parent = parent.parent
+        return draws
+
+
+BACKENDS = {'bs4': Bs4Backend()}
+if HAS_LXML:
+    BACKENDS['lxml'] = LxmlBackend()
+if HAS_SELECTOLAX:
+    BACKENDS['selectolax'] = SelectolaxBackend()
+
+_PREFERENCE = ('selectolax', 'lxml', 'bs4')
+_configured = None
+
+
+def available_backends() -> List[str]:
+    """已安裝的後端 (依偏好順序)"""
+    return [name for name in _PREFERENCE if name in BACKENDS]
+
+
+def get_backend(name: Optional[str] = None):
+    """
+    取得解析後端
+
+    Args:
+        name: 'selectolax', 'lxml', 'bs4' 或 'auto' (None = 依配置檔 crawler.parser_backend)
+
+    Returns:
+        後端實例; 指定的後端未安裝時退回 bs4
+    """
+    global _configured
+    if name is None:
+        if _configured is None:
+            _configured = load_crawler_config().get('parser_backend') or 'auto'
+        name = _configured
+    if name == 'auto':
+        return BACKENDS[available_backends()[0]]
+    if name not in BACKENDS:
+        print(f"[WARNING] Parser backend '{name}' not installed, using bs4")
+        return BACKENDS['bs4']
+    return BACKENDS[name]
+
+
+if __name__ == "__main__":
+    print(f"Available backends: {available_backends()}")
+    print(f"Selected: {get_backend().name}")
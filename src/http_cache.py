@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+爬蟲頁面磁碟快取 (Conditional GET)
+- 回應內容與 ETag / Last-Modified 存在 data/cache/http
+- 已結束月份的列表頁 (list_YYYY_M.html) 在月份結束後抓取過一次即視為永久有效,不再連線
+- 當月頁面在 TTL 內直接使用快取,過期後送出 If-None-Match / If-Modified-Since,304 時沿用快取
+- 連線失敗時若有舊快取則回傳舊內容
+- stats() 提供命中統計
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import requests
+
+from src.http_client import HttpClient, get_http_client, load_crawler_config
+from src.timezone_utils import get_taiwan_now
+
+
+CACHE_ROOT = Path('data/cache/http')
+MONTH_PAGE_PATTERN = re.compile(r'list_(\d{4})_(\d{1,2})\.html')
+
+
+def page_month(url: str) -> Optional[tuple]:
+    """月份列表頁的 (年, 月); 非月份頁回傳 None"""
+    match = MONTH_PAGE_PATTERN.search(url)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+class HttpCache:
+    """爬蟲頁面磁碟快取"""
+
+    def __init__(
+        self,
+        cache_dir: Path = CACHE_ROOT,
+        current_month_ttl: float = 120,
+        settle_days: int = 1,
+        client: Optional[HttpClient] = None,
+        clock: Callable[[], datetime] = get_taiwan_now
+    ):
+        """
+        初始化
+
+        Args:
+            cache_dir: 快取目錄
+            current_month_ttl: 當月 (及非月份) 頁面的快取秒數,過期後以條件式請求重新驗證
+            settle_days: 月份結束後多少天抓取的內容才視為定案 (永久有效)
+            client: HttpClient (預設為共用實例)
+            clock: 時間來源 (回傳台灣時間 datetime; TTL 與定案判斷皆以此為準,測試時可替換)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.current_month_ttl = current_month_ttl
+        self.settle_days = settle_days
+        self.client = client
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stale': 0, 'errors': 0}
+
+    @classmethod
+    def from_config(cls, config_path: str = "config/auto_config.json", **overrides) -> 'HttpCache':
+        """依配置檔 crawler.cache 區段建立 (overrides 優先, 例如 clock)"""
+        config = load_crawler_config(config_path).get('cache', {})
+        options = {
+            'cache_dir': Path(config.get('dir', CACHE_ROOT)),
+            'current_month_ttl': config.get('current_month_ttl_seconds', 120),
+            'settle_days': config.get('settle_days', 1)
+        }
+        options.update(overrides)
+        return cls(**options)
+
+    def _timestamp(self) -> float:
+        """目前時間 (epoch 秒, 依 clock)"""
+        return self.clock().timestamp()
+
+    # ---- storage ----
+    def _paths(self, url: str):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{key}.json", self.cache_dir / f"{key}.html"
+
+    def _load(self, url: str) -> Optional[Dict]:
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            meta['body'] = body_path.read_text(encoding='utf-8')
+            return meta
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _store(self, url: str, response: requests.Response) -> Dict:
+        meta_path, body_path = self._paths(url)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        tmp = body_path.with_suffix('.html.tmp')
+        tmp.write_text(response.text, encoding='utf-8')
+        os.replace(tmp, body_path)
+
+        meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': self.clock().replace(tzinfo=None).isoformat(timespec='seconds'),
+            'checked_at': self._timestamp()
+        }
+        self._write_meta(meta_path, meta)
+        meta['body'] = response.text
+        return meta
+
+    @staticmethod
+    def _write_meta(meta_path: Path, meta: Dict):
+        tmp = meta_path.with_suffix('.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({k: v for k, v in meta.items() if k != 'body'}, f, ensure_ascii=False)
+        os.replace(tmp, meta_path)
+
+    # ---- policy ----
+    def is_permanent(self, url: str, meta: Dict) -> bool:
+        """已結束月份且在月份結束 settle_days 天後抓取的內容不會再變動"""
+        month = page_month(url)
+        if month is None:
+            return False
+        year, mon = month
+        month_end = datetime(year + mon // 12, mon % 12 + 1, 1)
+        fetched_at = datetime.fromisoformat(meta['fetched_at'])
+        return fetched_at >= month_end + timedelta(days=self.settle_days)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    # ---- public ----
+    def is_fresh(self, url: str, ttl: Optional[float] = None) -> bool:
+        """get_text 是否可直接由快取回應 (不需連線)"""
+        ttl = self.current_month_ttl if ttl is None else ttl
+        cached = self._load(url)
+        if cached is None:
+            return False
+        return self.is_permanent(url, cached) or self._timestamp() - cached.get('checked_at', 0) < ttl
+
+    def get_text(self, url: str, ttl: Optional[float] = None, permanent: bool = True,
+                 **kwargs) -> Optional[str]:
+        """
+        取得頁面文字 (經快取)
+
+        Args:
+            url: 原始網址 (快取鍵)
+            ttl: 覆寫當月頁面的快取秒數 (0 = 每次都以條件式請求驗證)
+            permanent: 是否套用已結束月份的永久快取規則 (False = 一律依 ttl 驗證)
+            **kwargs: 傳給 HttpClient.get (headers, timeout 等)
+
+        Returns:
+            str: 頁面內容; 失敗且無快取時為 None
+        """
+        ttl = self.current_month_ttl if ttl is None else ttl
+        cached = self._load(url)
+
+        if cached is not None:
+            if ((permanent and self.is_permanent(url, cached))
+                    or self._timestamp() - cached.get('checked_at', 0) < ttl):
+                self._count('hits')
+                return cached['body']
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if cached is not None:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        client = self.client or get_http_client()
+        try:
+            response = client.get(url, headers=headers, **kwargs)
+        except requests.RequestException as e:
+            if cached is not None:
+                print(f"[WARNING] Fetch failed ({e}), using cached copy of {url}")
+                self._count('stale')
+                return cached['body']
+            print(f"[ERROR] Download failed: {e}")
+            self._count('errors')
+            return None
+
+        if response.status_code == 304 and cached is not None:
+            cached['checked_at'] = self._timestamp()
+            self._write_meta(self._paths(url)[0], cached)
+            self._count('revalidated')
+            return cached['body']
+
+        if response.status_code == 200:
+            self._count('misses')
+            return self._store(url, response)['body']
+
+        print(f"[ERROR] HTTP {response.status_code} for {url}")
+        if cached is not None:
+            self._count('stale')
+            return cached['body']
+        self._count('errors')
+        return None
+
+    def fetch_many(self, urls: Dict[str, str], ttl: Optional[float] = None,
+                   max_workers: Optional[int] = None) -> Dict[str, Optional[str]]:
+        """
+        平行取得多個頁面 (經快取)
+
+        Args:
+            urls: {鍵: 網址}
+            ttl: 覆寫當月頁面的快取秒數
+            max_workers: 執行緒數 (預設 = 頁面數)
+
+        Returns:
+            dict: {鍵: 頁面文字或 None}
+        """
+        if not urls:
+            return {}
+        with ThreadPoolExecutor(max_workers=max_workers or len(urls), thread_name_prefix='fetch') as pool:
+            futures = {key: pool.submit(self.get_text, url, ttl) for key, url in urls.items()}
+            return {key: future.result() for key, future in futures.items()}
+
+    def stats(self) -> Dict:
+        """快取統計 (hits: 未連線直接命中, revalidated: 304, misses: 下載新內容)"""
+        with self._lock:
+            stats = dict(self._stats)
+        requests_total = sum(stats.values())
+        served = stats['hits'] + stats['revalidated'] + stats['stale']
+        stats['hit_rate'] = served / requests_total if requests_total else 0.0
+        return stats
+
+    def clear(self):
+        """清除所有快取檔案"""
+        if self.cache_dir.exists():
+            for path in self.cache_dir.iterdir():
+                path.unlink()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_http_cache() -> HttpCache:
+    """行程內共用的 HttpCache (依配置檔建立)"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = HttpCache.from_config()
+        return _default_cache
+
+
+if __name__ == "__main__":
+    cache = get_http_cache()
+    for url in ["https://lotto.auzonet.com/daily539/list_2026_1.html",
+                "https://lotto.auzonet.com/daily539/list_2026_1.html"]:
+        start = time.perf_counter()
+        text = cache.get_text(url)
+        print(f"{url}: {len(text) if text else 'failed'} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    print(cache.stats())
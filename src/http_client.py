@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+共用 HTTP 抓取層
+- requests.Session 連線池 (keep-alive)
+- urllib3 Retry: 連線錯誤與 429/5xx 以指數退避重試,遵守 Retry-After
+- 每個主機的並行上限 (Semaphore),避免同時對同一站台發出過多請求
+- fetch_many() 以執行緒池平行下載多個頁面
+- base_url 可改寫到本機測試伺服器 (src/fixture_server.py)
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# 環境變數優先於配置檔 (測試時指向本機 fixture server)
+BASE_URL_ENV = "LOTTO_CRAWLER_BASE_URL"
+
+
+def load_crawler_config(config_path: str = "config/auto_config.json") -> Dict:
+    """讀取配置檔 crawler 區段"""
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('crawler', {})
+    except Exception:
+        return {}
+
+
+class HttpClient:
+    """連線池化的 HTTP 用戶端 (執行緒安全)"""
+
+    def __init__(
+        self,
+        timeout: float = 15,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        per_host_concurrency: int = 2,
+        pool_size: int = 10,
+        base_url: Optional[str] = None,
+        headers: Optional[Dict] = None
+    ):
+        """
+        初始化
+
+        Args:
+            timeout: 單次請求逾時秒數
+            retries: 重試次數 (連線錯誤、429、5xx)
+            backoff_factor: 退避係數 (第 n 次重試等待 backoff_factor * 2^(n-1) 秒)
+            per_host_concurrency: 同一主機同時進行的請求上限
+            pool_size: 每個主機的連線池大小
+            base_url: 改寫所有請求到此位址 (例如 http://127.0.0.1:8765), 路徑變為 /<原主機>/<原路徑>
+            headers: 預設 headers
+        """
+        self.timeout = timeout
+        self.per_host_concurrency = per_host_concurrency
+        self.base_url = (base_url or '').rstrip('/') or None
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config_path: str = "config/auto_config.json") -> 'HttpClient':
+        """依配置檔 crawler 區段建立"""
+        config = load_crawler_config(config_path)
+        return cls(
+            timeout=config.get('timeout', 15),
+            retries=config.get('retries', 3),
+            backoff_factor=config.get('backoff_factor', 0.5),
+            per_host_concurrency=config.get('per_host_concurrency', 2),
+            base_url=os.environ.get(BASE_URL_ENV) or config.get('base_url')
+        )
+
+    def resolve(self, url: str) -> str:
+        """套用 base_url 改寫"""
+        if not self.base_url:
+            return url
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else '')
+        return f"{self.base_url}/{parts.netloc}{path}"
+
+    def _limit_for(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._host_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host_concurrency)
+            return self._host_limits[host]
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        GET (含重試與每主機並行限制)
+
+        Raises:
+            requests.RequestException: 重試後仍失敗
+        """
+        url = self.resolve(url)
+        kwargs.setdefault('timeout', self.timeout)
+        with self._limit_for(url):
+            response = self.session.get(url, **kwargs)
+        response.encoding = 'utf-8'
+        return response
+
+    def get_text(self, url: str, **kwargs) -> Optional[str]:
+        """下載頁面文字, 失敗或非 200 回傳 None"""
+        try:
+            print(f"Downloading {url}...")
+            response = self.get(url, **kwargs)
+            if response.status_code == 200:
+                return response.text
+            print(f"[ERROR] HTTP {response.status_code} for {url}")
+            return None
+        except requests.RequestException as e:
+            print(f"[ERROR] Download failed: {e}")
+            return None
+
+    def fetch_many(self, urls: Dict[str, str], max_workers: Optional[int] = None) -> Dict[str, Optional[str]]:
+        """
+        平行下載多個頁面
+
+        Args:
+            urls: {鍵: 網址}
+            max_workers: 執行緒數 (預設 = 頁面數)
+
+        Returns:
+            dict: {鍵: 頁面文字或 None}
+        """
+        if not urls:
+            return {}
+        workers = max_workers or len(urls)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fetch') as pool:
+            futures = {key: pool.submit(self.get_text, url) for key, url in urls.items()}
+            return {key: future.result() for key, future in futures.items()}
+
+    def close(self):
+        self.session.close()
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """行程內共用的 HttpClient (依配置檔建立)"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HttpClient.from_config()
+        return _default_client
+
+
+if __name__ == "__main__":
+    import time
+
+    client = get_http_client()
+    start = time.perf_counter()
+    pages = client.fetch_many({
+        '539': "https://lotto.auzo.tw/daily539",
+        'power': "https://lotto.auzo.tw/power",
+        'lotto': "https://lotto.auzo.tw/biglotto"
+    })
+    for key, text in pages.items():
+        print(f"{key}: {len(text) if text else 'failed'}")
+    print(f"Elapsed: {time.perf_counter() - start:.2f}s")
@@ -11,6 +11,8 @@ from src.group_strategy import GroupBasedStrategy
 from src.llm_advisor import LLMAdvisor
 from src.weight_optimizer import WeightOptimizer
 from src.iteration_logger import IterationLogger
+from src.weight_search import ScoreCache
+from src.history_store import load_history
 from src.logger import logger
 
 class IncrementalTrainer:
@@ -33,6 +35,8 @@ class IncrementalTrainer:
         self.strategy = GroupBasedStrategy()
         # 🔥 強化修補 4: 縮短觀察窗口 (5→3) 並提升學習率 (0.3→0.4),提高反應速度
         self.optimizer = WeightOptimizer(learning_rate=0.4, observation_window=3)
+        # 逐期模型評分快取,供權重優化器重播驗證
+        self.score_cache = None
         self.iteration_logger = IterationLogger()
         
         if use_llm:
@@ -61,7 +65,7 @@ class IncrementalTrainer:
             data_file: 訓練資料檔案
         """
         # 載入完整資料
-        df = pd.read_csv(data_file)
+        df = load_history(data_file, use_store=False)
         logger.info(f"載入訓練資料: {len(df)} 期")
         
         # 從第 initial_periods+1 期開始訓練
@@ -102,25 +106,25 @@ class IncrementalTrainer:
         # 3. 各群組分析
         group_results = {}
         
+        # LLM 建議 (如果啟用): 四群合併為一次請求
+        all_advice = {}
+        if self.llm_advisor and self.llm_advisor.model:
+            groups_data = {
+                group_id: {
+                    'range': group_range,
+                    'stats': self._get_group_stats(train_df, group_range),
+                    'scores': self._get_group_model_scores(all_scores, group_range)
+                }
+                for group_id, group_range in self.strategy.GROUPS.items()
+            }
+            all_advice = self.llm_advisor.get_all_groups_advice(groups_data)
+        
         for group_id in self.strategy.GROUPS.keys():
-            # LLM 建議 (如果啟用)
-            llm_advice = None
-            if self.llm_advisor and self.llm_advisor.model:
-                # 準備 LLM 所需資料
-                group_range = self.strategy.GROUPS[group_id]
-                historical_stats = self._get_group_stats(train_df, group_range)
-                model_scores = self._get_group_model_scores(all_scores, group_range)
-                
-                llm_advice = self.llm_advisor.get_group_advice(
-                    group_id,
-                    group_range,
-                    historical_stats,
-                    model_scores
-                )
+            llm_advice = all_advice.get(group_id)
             
-            # 群組分析
-            result = self.strategy.analyze_group(
-                feature_engine, 
+            # 群組分析 (重用已計算的評分)
+            result = self.strategy.analyze_group_scores(
+                all_scores,
                 group_id, 
                 llm_advice,
                 use_enhanced=self.use_enhanced_models
@@ -174,6 +178,7 @@ class IncrementalTrainer:
         )
         
         # 6. 權重調整
+        self._record_scores(period_index, all_scores, actual_numbers, target_row['date'], all_advice)
         weight_decisions = {}
         
         for group_id in self.strategy.GROUPS.keys():
@@ -192,7 +197,8 @@ class IncrementalTrainer:
                 group_id,
                 group_accuracy,
                 self.group_history[group_id],
-                self.strategy.group_weights[group_id]
+                self.strategy.group_weights[group_id],
+                self.strategy.group_weights
             )
             
             weight_decisions[group_id] = decision
@@ -208,6 +214,13 @@ class IncrementalTrainer:
         # 7. 儲存當期記錄
         self.iteration_logger.save_period()
     
+    def _record_scores(self, period_index, all_scores, actual_numbers, date, llm_advice=None):
+        """將本期評分、各群 LLM 建議與開獎結果加入快取 (供權重調整重播驗證)"""
+        if self.score_cache is None:
+            self.score_cache = ScoreCache.empty(list(all_scores.columns))
+            self.optimizer.score_cache = self.score_cache
+        self.score_cache.append(period_index + 1, all_scores, actual_numbers, date, llm_advice)
+    
     def _get_group_stats(self, df, group_range):
         """取得群組的歷史統計"""
         # 簡化版統計
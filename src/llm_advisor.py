@@ -1,30 +1,66 @@
 """
 LLM 顧問模組
 使用 Gemini 作為第八個模型維度,提供選號建議
+- 每期四個群組合併為一次請求,回傳結構化 JSON
+- 回應依 prompt 雜湊持久化快取 (cache_duration_hours 內不重複呼叫)
+- 速率與每日配額由所有 LLM 呼叫端共用的限速器控制 (src/llm_quota.py),取代每次請求前的固定延遲
+- client / cache / limiter 皆可注入,測試時可用假客戶端
 """
 import json
-import time
-import google.generativeai as genai
+import re
 from src.api_key_manager import api_key_manager
 from src.logger import logger
-from src.api_quota_config import API_QUOTA_CONFIG, DAILY_USAGE
-from src.timezone_utils import get_taiwan_now
+from src.api_quota_config import API_QUOTA_CONFIG
+from src.llm_cache import LLMResponseCache
+from src.llm_quota import QuotaExceeded, estimate_tokens, get_llm_limiter
 import os
 
+try:
+    import google.generativeai as genai
+except ImportError:
+    genai = None
+
+
+def _default_advice(reason):
+    """配額用完或失敗時的預設建議"""
+    return {
+        'numbers': [],
+        'confidence': 0.5,
+        'reason': reason
+    }
+
+
 class LLMAdvisor:
     """LLM 顧問 - 使用 Gemini 提供選號建議"""
     
-    def __init__(self):
-        """初始化 LLM"""
+    def __init__(self, client=None, cache=None, limiter=None):
+        """
+        初始化 LLM
+        
+        Args:
+            client: 具 generate_content(prompt, generation_config=...) 的客戶端 (預設建立 Gemini 模型)
+            cache: LLMResponseCache (預設依 cache_responses / cache_duration_hours 建立)
+            limiter: LLMRateLimiter (預設為共用限速器)
+        """
+        self.model_name = API_QUOTA_CONFIG['model']
+        if cache is None and API_QUOTA_CONFIG.get('cache_responses'):
+            cache = LLMResponseCache(ttl_hours=API_QUOTA_CONFIG.get('cache_duration_hours', 24))
+        self.cache = cache
+        self.limiter = limiter or get_llm_limiter()
+        
+        if client is not None:
+            self.model = client
+            return
+        
         # 使用新的 API Key
         api_key = API_QUOTA_CONFIG['api_key']
         
         if not api_key:
             api_key = os.getenv("GOOGLE_API_KEY")
         
-        if not api_key:
+        if not api_key or genai is None:
             self.model = None
-            logger.warning("LLM 顧問未啟用 (缺少 API Key)")
+            logger.warning("LLM 顧問未啟用 (缺少 API Key 或 google-generativeai)")
             return
         
         try:
@@ -42,23 +78,6 @@ class LLMAdvisor:
             self.model = None
             logger.error(f"LLM 初始化失敗: {e}")
     
-    def _check_quota(self):
-        """檢查每日配額"""
-        today = get_taiwan_now().strftime('%Y-%m-%d')
-        
-        # 重置每日計數
-        if DAILY_USAGE['date'] != today:
-            DAILY_USAGE['date'] = today
-            DAILY_USAGE['requests'] = 0
-            DAILY_USAGE['tokens_used'] = 0
-        
-        # 檢查是否超過每日限制
-        if DAILY_USAGE['requests'] >= API_QUOTA_CONFIG['daily_limit']:
-            logger.warning(f"已達每日配額限制 ({API_QUOTA_CONFIG['daily_limit']})")
-            return False
-        
-        return True
-    
     def get_group_advice(self, group_id, group_range, historical_stats, model_scores):
         """
         取得單一群組的 LLM 建議
@@ -79,50 +98,69 @@ class LLMAdvisor:
         if not self.model:
             return None
         
-        # 檢查配額
-        if not self._check_quota():
-            if API_QUOTA_CONFIG['fallback_to_default']:
-                return {
-                    'numbers': [],
-                    'confidence': 0.5,
-                    'reason': '配額已用完'
-                }
-            return None
-        
+        prompt = self._build_prompt(group_id, group_range, historical_stats, model_scores)
         try:
-            # 加入延遲以避免超過 RPM
-            time.sleep(API_QUOTA_CONFIG['request_delay'])
-            
-            prompt = self._build_prompt(group_id, group_range, historical_stats, model_scores)
-            
-            response = self.model.generate_content(prompt)
-            result = self._parse_response(response.text)
-            
-            # 更新配額使用
-            DAILY_USAGE['requests'] += 1
+            response_text = self._generate(prompt)
+            if response_text is None:
+                return _default_advice('配額已用完') if API_QUOTA_CONFIG['fallback_to_default'] else None
             
+            result = self._parse_response(response_text)
             logger.debug(f"LLM 建議 ({group_id}): {result}")
             return result
             
         except Exception as e:
             logger.error(f"LLM 建議失敗 ({group_id}): {e}")
             if API_QUOTA_CONFIG['fallback_to_default']:
-                return {
-                    'numbers': [],
-                    'confidence': 0.5,
-                    'reason': f'錯誤: {str(e)[:50]}'
-                }
+                return _default_advice(f'錯誤: {str(e)[:50]}')
             return None
     
-    def _build_prompt(self, group_id, group_range, historical_stats, model_scores):
-        """建立精簡 LLM prompt"""
+    def _generate(self, prompt, max_output_tokens=None, json_mode=False):
+        """
+        送出 prompt (先查快取,未命中時向共用限速器取得名額)
         
-        # 只取前 3 名以節省 tokens
+        Returns:
+            str: 回應文字; 配額已用完時為 None
+        """
+        if self.cache is not None:
+            cached = self.cache.get(prompt, self.model_name)
+            if cached is not None:
+                logger.debug("LLM 回應快取命中")
+                return cached
+        
+        generation_config = {
+            'max_output_tokens': max_output_tokens or API_QUOTA_CONFIG['max_output_tokens'],
+            'temperature': API_QUOTA_CONFIG['temperature']
+        }
+        if json_mode:
+            generation_config['response_mime_type'] = 'application/json'
+        
+        try:
+            with self.limiter.request('llm_advisor', 'advice',
+                                      tokens=estimate_tokens(prompt) + generation_config['max_output_tokens']) as ticket:
+                response = ticket.record(self.model.generate_content(prompt, generation_config=generation_config), prompt)
+        except QuotaExceeded as e:
+            logger.warning(f"LLM 配額不足: {e}")
+            return None
+        
+        text = response.text
+        if self.cache is not None and text:
+            self.cache.set(prompt, text, self.model_name)
+        return text
+    
+    def _top_scores(self, model_scores):
+        """各模型前 3 名評分 (節省 tokens)"""
         top_scores = {}
         for model_name, scores in model_scores.items():
             if isinstance(scores, dict):
                 sorted_scores = sorted(scores.items(), key=lambda x: float(x[1]) if isinstance(x[1], (int, float, str)) else 0, reverse=True)[:3]
                 top_scores[model_name] = {num: f"{float(score):.2f}" for num, score in sorted_scores}
+        return top_scores
+    
+    def _build_prompt(self, group_id, group_range, historical_stats, model_scores):
+        """建立精簡 LLM prompt"""
+        
+        # 只取前 3 名以節省 tokens
+        top_scores = self._top_scores(model_scores)
         
         # 精簡提示詞
         prompt = f"""分析 539 彩券 {group_id} ({group_range[0]}-{group_range[1]})。
@@ -141,7 +179,6 @@ JSON格式回答:
         """解析 LLM 回應"""
         try:
             # 嘗試提取 JSON
-            import re
             json_match = re.search(r'\{[^}]+\}', response_text, re.DOTALL)
             
             if json_match:
@@ -171,9 +208,66 @@ JSON格式回答:
                 'reason': f'解析錯誤: {e}'
             }
     
+    def _build_batch_prompt(self, groups_data):
+        """建立四群合併的精簡 prompt"""
+        lines = []
+        for group_id, data in groups_data.items():
+            group_range = data['range']
+            top_scores = self._top_scores(data.get('scores', {}))
+            lines.append(f"{group_id} ({group_range[0]}-{group_range[1]}): {json.dumps(top_scores, ensure_ascii=False)}")
+        example = ', '.join(f'"{group_id}": {{"numbers": [], "confidence": 0.5, "reason": "簡短理由"}}'
+                            for group_id in groups_data)
+        
+        prompt = f"""分析 539 彩券各群組,每群建議0-3個號碼 (須在群組範圍內),優先選多模型看好的。
+
+模型評分(前3):
+{chr(10).join(lines)}
+
+只回答 JSON:
+{{{example}}}
+"""
+        return prompt
+    
+    def _parse_batch_response(self, response_text, groups_data):
+        """解析四群合併回應 (缺少或格式錯誤的群組以預設值補上)"""
+        text = re.sub(r'^```(?:json)?|```$', '', response_text.strip(), flags=re.MULTILINE).strip()
+        start, end = text.find('{'), text.rfind('}')
+        try:
+            parsed = json.loads(text[start:end + 1]) if start >= 0 and end > start else {}
+        except json.JSONDecodeError:
+            parsed = {}
+        if not parsed:
+            logger.warning(f"LLM 回應解析失敗: {response_text[:100]}")
+        
+        advice = {}
+        for group_id, data in groups_data.items():
+            item = parsed.get(group_id) if isinstance(parsed, dict) else None
+            if not isinstance(item, dict) or 'numbers' not in item:
+                advice[group_id] = _default_advice('LLM 回應缺少此群組')
+                continue
+            low, high = data['range']
+            numbers = []
+            for num in item.get('numbers') or []:
+                try:
+                    num = int(num)
+                except (TypeError, ValueError):
+                    continue
+                if low <= num <= high and num not in numbers:
+                    numbers.append(num)
+            try:
+                confidence = float(item.get('confidence', 0.5))
+            except (TypeError, ValueError):
+                confidence = 0.5
+            advice[group_id] = {
+                'numbers': numbers[:3],
+                'confidence': confidence,
+                'reason': str(item.get('reason', ''))
+            }
+        return advice
+    
     def get_all_groups_advice(self, groups_data):
         """
-        取得所有群組的 LLM 建議
+        取得所有群組的 LLM 建議 (單次請求)
         
         Args:
             groups_data: {
@@ -184,47 +278,83 @@ JSON格式回答:
         Returns:
             dict: {'group1': {...}, 'group2': {...}, ...}
         """
-        if not self.model:
+        if not self.model or not groups_data:
             return {}
         
-        all_advice = {}
-        
-        for group_id, data in groups_data.items():
-            advice = self.get_group_advice(
-                group_id,
-                data['range'],
-                data.get('stats', {}),
-                data.get('scores', {})
+        prompt = self._build_batch_prompt(groups_data)
+        try:
+            response_text = self._generate(
+                prompt,
+                max_output_tokens=API_QUOTA_CONFIG.get('batch_max_output_tokens', 800),
+                json_mode=True
             )
+            if response_text is None:
+                if API_QUOTA_CONFIG['fallback_to_default']:
+                    return {group_id: _default_advice('配額已用完') for group_id in groups_data}
+                return {}
             
-            if advice:
-                all_advice[group_id] = advice
-        
-        return all_advice
+            advice = self._parse_batch_response(response_text, groups_data)
+            logger.debug(f"LLM 建議 (四群): {advice}")
+            return advice
+            
+        except Exception as e:
+            logger.error(f"LLM 建議失敗 (四群): {e}")
+            if API_QUOTA_CONFIG['fallback_to_default']:
+                return {group_id: _default_advice(f'錯誤: {str(e)[:50]}') for group_id in groups_data}
+            return {}
 
 if __name__ == "__main__":
-    # 測試
-    advisor = LLMAdvisor()
+    import tempfile
+    import time
+    from pathlib import Path
+    from src.llm_quota import LLMRateLimiter, QuotaLedger
     
-    if advisor.model:
-        # 模擬資料
-        test_stats = {
-            "avg_frequency": {"5": 0.15, "8": 0.12},
-            "recent_trend": "上升"
-        }
+    class _FakeResponse:
+        def __init__(self, text):
+            self.text = text
+    
+    class _FakeClient:
+        """假客戶端: 回傳各群評分最高的號碼"""
+        calls = 0
         
-        test_scores = {
-            "freq": {5: 0.85, 8: 0.72, 3: 0.65},
-            "rsi": {5: 0.90, 8: 0.75, 2: 0.65}
+        def generate_content(self, prompt, generation_config=None):
+            _FakeClient.calls += 1
+            advice = {}
+            for line in prompt.splitlines():
+                match = re.match(r'(group\d) \((\d+)-(\d+)\): (\{.*\})', line)
+                if match:
+                    scores = json.loads(match.group(4))
+                    best = sorted({int(n) for s in scores.values() for n in s})[:2]
+                    advice[match.group(1)] = {'numbers': best, 'confidence': 0.7, 'reason': 'fake'}
+            return _FakeResponse(json.dumps(advice))
+    
+    test_scores = {
+        "freq": {5: 0.85, 8: 0.72, 3: 0.65, 12: 0.8, 25: 0.7, 33: 0.6},
+        "rsi": {5: 0.90, 8: 0.75, 2: 0.65, 18: 0.5, 29: 0.4, 39: 0.3}
+    }
+    groups = {
+        f"group{i + 1}": {
+            'range': rng,
+            'scores': {m: {n: v for n, v in s.items() if rng[0] <= n <= rng[1]} for m, s in test_scores.items()}
         }
-        
-        advice = advisor.get_group_advice(
-            "group1",
-            (1, 10),
-            test_stats,
-            test_scores
-        )
-        
+        for i, rng in enumerate([(1, 10), (11, 20), (21, 30), (31, 39)])
+    }
+    
+    fake = LLMAdvisor(
+        client=_FakeClient(),
+        cache=LLMResponseCache(':memory:', ttl_hours=24),
+        limiter=LLMRateLimiter(QuotaLedger(Path(tempfile.mkdtemp()) / 'quota.db'), rpm=120, burst=1)
+    )
+    start = time.perf_counter()
+    for period in range(3):
+        advice = fake.get_all_groups_advice(groups)
+    logger.info(f"四群建議: {advice}")
+    logger.info(f"3 期 -> {_FakeClient.calls} 次請求, 快取 {fake.cache.stats()}, {time.perf_counter() - start:.2f}s")
+    logger.info(f"配額統計: {fake.limiter.metrics()}")
+    
+    advisor = LLMAdvisor()
+    if advisor.model:
+        advice = advisor.get_all_groups_advice(groups)
         logger.info(f"LLM 建議: {advice}")
     else:
         logger.warning("LLM 測試跳過 (未設定 API Key)")
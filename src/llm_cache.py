@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+LLM 回應快取 (Prompt Cache)
+- 以 (模型, prompt) 的 SHA-256 為鍵,把回應文字存在 SQLite (data/cache/llm/responses.db)
+- 超過 TTL 的回應視為失效; 重新執行同一段訓練時不再重複呼叫 API
+- stats() 提供命中統計
+"""
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from src.sqlite_utils import connect, transaction
+
+
+CACHE_PATH = Path('data/cache/llm/responses.db')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def prompt_key(prompt: str, model: str = '') -> str:
+    """快取鍵: SHA-256(模型 + prompt)"""
+    return hashlib.sha256(f"{model}\n{prompt}".encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """LLM 回應快取"""
+
+    def __init__(self, path: Path = CACHE_PATH, ttl_hours: float = 24, clock: Callable[[], float] = time.time):
+        """
+        初始化
+
+        Args:
+            path: 快取資料庫 (':memory:' 可用於測試)
+            ttl_hours: 回應有效時數 (<= 0 表示不快取)
+            clock: 時間來源 (測試時可替換)
+        """
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.clock = clock
+        self.conn = connect(path) if str(path) != ':memory:' else self._memory()
+        self.conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0}
+
+    @staticmethod
+    def _memory():
+        import sqlite3
+        conn = sqlite3.connect(':memory:', isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, prompt: str, model: str = '') -> Optional[str]:
+        """取得未過期的回應 (沒有時回傳 None)"""
+        if not self.enabled:
+            return None
+        row = self.conn.execute(
+            "SELECT response, created_at FROM responses WHERE key = ?", (prompt_key(prompt, model),)
+        ).fetchone()
+        with self._lock:
+            if row is None or self.clock() - row['created_at'] > self.ttl:
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+        return row['response']
+
+    def set(self, prompt: str, response: str, model: str = ''):
+        """儲存回應"""
+        if not self.enabled:
+            return
+        with transaction(self.conn, self._lock):
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at) VALUES (?, ?, ?, ?)",
+                (prompt_key(prompt, model), model, response, self.clock())
+            )
+        self._stats['stores'] += 1
+
+    def purge(self) -> int:
+        """刪除過期回應,回傳刪除筆數"""
+        with transaction(self.conn, self._lock):
+            cursor = self.conn.execute("DELETE FROM responses WHERE created_at < ?", (self.clock() - self.ttl,))
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """命中統計"""
+        with self._lock:
+            return dict(self._stats)
+
+
+if __name__ == "__main__":
+    now = {'t': 0.0}
+    cache = LLMResponseCache(':memory:', ttl_hours=1, clock=lambda: now['t'])
+    cache.set('prompt', '{"numbers": [5]}', model='demo')
+    print(cache.get('prompt', model='demo'), cache.get('prompt', model='other'))
+    now['t'] = 7200
+    print(cache.get('prompt', model='demo'), cache.purge(), cache.stats())
@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""
+LLM 配額帳本與共用限速器 (Quota Ledger)
+- 每次 Gemini 請求都記錄在 SQLite 帳本 (data/store/llm_quota.db),多個行程共用,重新啟動不會歸零
+- RPM / TPM 以帳本中最近 60 秒的請求與 token 計算,RPD 以台灣日期計算; 保留名額在同一個寫入交易中完成,不會超賣
+- 優先等級: prediction (輸出直接用於選號) > advice (訓練建議) > review (報告、審查與命理等不影響選號的輸出)
+  較低等級只能使用每日配額的一部分 (priority_daily_share),行程內等待時高等級先取得名額
+- 行程內以令牌桶平滑請求 (requests_per_minute / burst),避免一分鐘的額度在開頭一次用完
+- metrics() 回傳當日各呼叫端的請求數、token、被拒次數與平均等待秒數
+- 在顧問執行器 (src/advisor_executor.py) 中呼叫時,等待時間不超過該顧問的截止時間,取消後立即結束等待
+"""
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from src.advisor_executor import check_cancelled, current_deadline
+from src.api_quota_config import API_QUOTA_CONFIG
+from src.history_store import STORE_ROOT
+from src.rate_limiter import TokenBucket
+from src.sqlite_utils import connect, transaction
+from src.timezone_utils import get_taiwan_now
+
+
+LEDGER_PATH = STORE_ROOT / 'llm_quota.db'
+
+PRIORITIES = {'prediction': 0, 'advice': 1, 'review': 2}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    consumer TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 1,
+    tokens INTEGER NOT NULL DEFAULT 0,
+    outcome TEXT NOT NULL DEFAULT 'reserved',
+    wait_seconds REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_usage_ts ON usage (ts);
+CREATE INDEX IF NOT EXISTS idx_usage_day ON usage (day);
+"""
+
+
+class QuotaExceeded(Exception):
+    """今日配額已用完或等待逾時 (呼叫端應改用預設值)"""
+
+
+def estimate_tokens(text: str) -> int:
+    """粗估 token 數 (中英混合約 2 字元 1 token)"""
+    return max(1, len(text or '') // 2)
+
+
+def response_tokens(response, prompt: str = '') -> int:
+    """回應實際使用的 token 數 (SDK 未提供 usage_metadata 時以字數估算)"""
+    usage = getattr(response, 'usage_metadata', None)
+    total = getattr(usage, 'total_token_count', None) if usage is not None else None
+    if total:
+        return int(total)
+    return estimate_tokens(prompt) + estimate_tokens(getattr(response, 'text', '') or '')
+
+
+class QuotaLedger:
+    """LLM 請求帳本 (SQLite, 多行程共用)"""
+
+    def __init__(self, path: Path = LEDGER_PATH, clock: Callable[[], float] = time.time,
+                 today: Callable[[], str] = lambda: get_taiwan_now().strftime('%Y-%m-%d')):
+        """
+        初始化
+
+        Args:
+            path: 帳本資料庫
+            clock: 時間來源 (epoch 秒, 測試時可替換)
+            today: 目前日期 (配額以此日期計算)
+        """
+        self.path = Path(path)
+        self.clock = clock
+        self.today = today
+        self.conn = connect(self.path)
+        self.conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def reserve(self, consumer: str, priority: str, tokens: int, rpm: int, tpm: int,
+                rpd: int, daily_share: float = 1.0, wait_seconds: float = 0.0) -> Tuple[Optional[int], float, str]:
+        """
+        在單一寫入交易中檢查 RPM / TPM / RPD 並保留一次請求
+
+        Returns:
+            (ticket_id, wait, reason): 成功時 ticket_id 為帳本編號;
+            失敗時 wait 為建議等待秒數, reason 為 'rpm' / 'tpm' / 'rpd'
+        """
+        now = self.clock()
+        day = self.today()
+        with transaction(self.conn, self._lock):
+            window = self.conn.execute(
+                "SELECT COALESCE(SUM(requests), 0), COALESCE(SUM(tokens), 0), MIN(ts) "
+                "FROM usage WHERE ts > ? AND requests > 0", (now - 60,)
+            ).fetchone()
+            day_requests = self.conn.execute(
+                "SELECT COALESCE(SUM(requests), 0) FROM usage WHERE day = ?", (day,)
+            ).fetchone()[0]
+
+            if rpd and day_requests >= int(rpd * daily_share):
+                return None, 0.0, 'rpd'
+            window_wait = max(0.05, (window[2] or now) + 60 - now)
+            if rpm and window[0] >= rpm:
+                return None, window_wait, 'rpm'
+            if tpm and window[0] and window[1] + tokens > tpm:
+                return None, window_wait, 'tpm'
+
+            cursor = self.conn.execute(
+                "INSERT INTO usage (ts, day, consumer, priority, tokens, wait_seconds) VALUES (?, ?, ?, ?, ?, ?)",
+                (now, day, consumer, priority, int(tokens), round(wait_seconds, 3))
+            )
+        return cursor.lastrowid, 0.0, ''
+
+    def settle(self, ticket_id: int, tokens: int, outcome: str):
+        """以實際 token 數與結果更新保留的請求"""
+        with transaction(self.conn, self._lock):
+            self.conn.execute("UPDATE usage SET tokens = ?, outcome = ? WHERE id = ?",
+                              (int(tokens), outcome, ticket_id))
+
+    def record_denied(self, consumer: str, priority: str, reason: str, wait_seconds: float = 0.0):
+        """記錄被拒的請求 (不計入配額)"""
+        with transaction(self.conn, self._lock):
+            self.conn.execute(
+                "INSERT INTO usage (ts, day, consumer, priority, requests, outcome, wait_seconds) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?)",
+                (self.clock(), self.today(), consumer, priority, f"denied:{reason}", round(wait_seconds, 3))
+            )
+
+    def usage(self, day: Optional[str] = None) -> Dict[str, int]:
+        """當日請求數與 token 數"""
+        row = self.conn.execute(
+            "SELECT COALESCE(SUM(requests), 0), COALESCE(SUM(tokens), 0) FROM usage WHERE day = ?",
+            (day or self.today(),)
+        ).fetchone()
+        return {'requests': row[0], 'tokens': row[1]}
+
+    def metrics(self, day: Optional[str] = None) -> Dict:
+        """
+        當日統計
+
+        Returns:
+            dict: {'day', 'requests', 'tokens', 'denied',
+                   'consumers': {呼叫端: {'priority', 'requests', 'tokens', 'errors', 'denied', 'avg_wait_seconds'}}}
+        """
+        day = day or self.today()
+        rows = self.conn.execute(
+            "SELECT consumer, priority, SUM(requests) AS requests, SUM(tokens) AS tokens, "
+            "SUM(outcome = 'error') AS errors, SUM(outcome LIKE 'denied:%') AS denied, "
+            "AVG(CASE WHEN requests > 0 THEN wait_seconds END) AS avg_wait "
+            "FROM usage WHERE day = ? GROUP BY consumer, priority ORDER BY consumer", (day,)
+        ).fetchall()
+        consumers = {
+            row['consumer']: {
+                'priority': row['priority'],
+                'requests': row['requests'],
+                'tokens': row['tokens'],
+                'errors': row['errors'],
+                'denied': row['denied'],
+                'avg_wait_seconds': round(row['avg_wait'] or 0.0, 3)
+            }
+            for row in rows
+        }
+        return {
+            'day': day,
+            'requests': sum(c['requests'] for c in consumers.values()),
+            'tokens': sum(c['tokens'] for c in consumers.values()),
+            'denied': sum(c['denied'] for c in consumers.values()),
+            'consumers': consumers
+        }
+
+
+class LLMTicket:
+    """一次已保留的請求 (record() 記下實際 token 數)"""
+
+    def __init__(self, ticket_id: int, consumer: str, priority: str, tokens: int, wait_seconds: float):
+        self.id = ticket_id
+        self.consumer = consumer
+        self.priority = priority
+        self.tokens = tokens
+        self.wait_seconds = wait_seconds
+
+    def record(self, response, prompt: str = ''):
+        """由 SDK 回應記錄實際 token 數"""
+        self.tokens = response_tokens(response, prompt)
+        return response
+
+
+class LLMRateLimiter:
+    """所有 LLM 呼叫端共用的 RPM / TPM / RPD 限速器"""
+
+    def __init__(
+        self,
+        ledger: Optional[QuotaLedger] = None,
+        rpm: int = 12,
+        tpm: int = 1000000,
+        rpd: int = 40,
+        burst: float = 1,
+        daily_share: Optional[Dict[str, float]] = None,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        初始化
+
+        Args:
+            ledger: 配額帳本 (預設 data/store/llm_quota.db)
+            rpm: 每分鐘請求上限
+            tpm: 每分鐘 token 上限
+            rpd: 每日請求上限
+            burst: 行程內允許的瞬間突發請求數
+            daily_share: {優先等級: 可使用的每日配額比例} (未列出的等級為 1.0)
+            sleep: 等待函式 (測試時可替換)
+        """
+        self.ledger = ledger or QuotaLedger()
+        self.rpm = rpm
+        self.tpm = tpm
+        self.rpd = rpd
+        self.daily_share = daily_share or {}
+        self.bucket = TokenBucket(rate=rpm / 60.0 if rpm else 0, capacity=burst)
+        self.sleep = sleep
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    @classmethod
+    def from_config(cls, config: Dict = API_QUOTA_CONFIG, **overrides) -> 'LLMRateLimiter':
+        """依 API_QUOTA_CONFIG 建立"""
+        options = {
+            'rpm': config.get('requests_per_minute', 12),
+            'tpm': config.get('tokens_per_minute', 1000000),
+            'rpd': config.get('daily_limit', 40),
+            'burst': config.get('burst', 1),
+            'daily_share': config.get('priority_daily_share')
+        }
+        options.update(overrides)
+        return cls(**options)
+
+    def acquire(self, consumer: str, priority: str = 'review', tokens: int = 500,
+                timeout: Optional[float] = None) -> LLMTicket:
+        """
+        取得一次請求的名額 (必要時等待)
+
+        Args:
+            consumer: 呼叫端名稱 (統計用)
+            priority: 'prediction' / 'advice' / 'review'
+            tokens: 預估 token 數 (prompt + 輸出)
+            timeout: 最長等待秒數 (None = 一直等待; 在顧問工作中不超過其剩餘時間)
+
+        Returns:
+            LLMTicket
+
+        Raises:
+            QuotaExceeded: 今日配額 (此優先等級的份額) 已用完,或等待逾時
+            AdvisorCancelled: 所屬的顧問工作已取消
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        remaining_deadline = current_deadline()
+        if remaining_deadline is not None:
+            timeout = remaining_deadline if timeout is None else min(timeout, remaining_deadline)
+        start = time.monotonic()
+        entry = (PRIORITIES[priority], next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+        try:
+            while True:
+                # 行程內依優先等級排隊: 只有排在最前面的請求可以嘗試
+                with self._cond:
+                    while self._waiters[0] != entry:
+                        remaining = None if timeout is None else timeout - (time.monotonic() - start)
+                        if remaining is not None and remaining <= 0:
+                            raise self._denied(consumer, priority, 'timeout', start)
+                        self._cond.wait(remaining if remaining is not None else 1.0)
+                        check_cancelled()
+
+                wait = self.bucket.try_acquire()
+                reason = 'rate'
+                if wait <= 0:
+                    ticket_id, wait, reason = self.ledger.reserve(
+                        consumer, priority, tokens, self.rpm, self.tpm, self.rpd,
+                        self.daily_share.get(priority, 1.0), time.monotonic() - start
+                    )
+                    if ticket_id is not None:
+                        return LLMTicket(ticket_id, consumer, priority, tokens, time.monotonic() - start)
+                    if reason == 'rpd':
+                        raise self._denied(consumer, priority, 'rpd', start)
+
+                if timeout is not None:
+                    remaining = timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        raise self._denied(consumer, priority, 'timeout', start)
+                    wait = min(wait, remaining)
+                check_cancelled()
+                self.sleep(wait)
+        finally:
+            with self._cond:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def _denied(self, consumer: str, priority: str, reason: str, start: float) -> QuotaExceeded:
+        waited = time.monotonic() - start
+        self.ledger.record_denied(consumer, priority, reason, waited)
+        if reason == 'rpd':
+            message = f"{consumer}: daily LLM quota for '{priority}' exhausted"
+        else:
+            message = f"{consumer}: no LLM quota within {waited:.1f}s"
+        print(f"[WARNING] {message}")
+        return QuotaExceeded(message)
+
+    def release(self, ticket: LLMTicket, outcome: str = 'success'):
+        """以實際 token 數結算"""
+        self.ledger.settle(ticket.id, ticket.tokens, outcome)
+
+    @contextmanager
+    def request(self, consumer: str, priority: str = 'review', tokens: int = 500,
+                timeout: Optional[float] = None):
+        """
+        取得名額、執行請求並結算
+
+        用法:
+            with limiter.request('reporter', 'review', estimate_tokens(prompt) + 800) as ticket:
+                response = ticket.record(model.generate_content(prompt), prompt)
+        """
+        ticket = self.acquire(consumer, priority, tokens, timeout)
+        try:
+            yield ticket
+        except BaseException:
+            self.release(ticket, 'error')
+            raise
+        self.release(ticket, 'success')
+
+    def metrics(self) -> Dict:
+        """當日統計與剩餘配額"""
+        metrics = self.ledger.metrics()
+        metrics['limits'] = {'rpm': self.rpm, 'tpm': self.tpm, 'rpd': self.rpd}
+        metrics['remaining'] = {
+            priority: max(0, int(self.rpd * self.daily_share.get(priority, 1.0)) - metrics['requests'])
+            for priority in PRIORITIES
+        }
+        return metrics
+
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def get_llm_limiter() -> LLMRateLimiter:
+    """行程內共用的 LLM 限速器 (帳本跨行程共用)"""
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = LLMRateLimiter.from_config()
+        return _default_limiter
+
+
+if __name__ == "__main__":
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = QuotaLedger(Path(tmp) / 'quota.db')
+        limiter = LLMRateLimiter(ledger, rpm=120, tpm=5000, rpd=12, burst=2,
+                                 daily_share={'advice': 0.75, 'review': 0.5})
+        order = []
+
+        def call(consumer, priority):
+            try:
+                with limiter.request(consumer, priority, tokens=300, timeout=5) as ticket:
+                    order.append(priority)
+                    ticket.tokens = 280
+                return 'ok'
+            except QuotaExceeded:
+                return 'denied'
+
+        jobs = [('strategy_reviewer', 'review')] * 6 + [('auto_predictor', 'prediction')] * 4 \
+            + [('llm_advisor', 'advice')] * 4
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            outcomes = list(pool.map(lambda job: call(*job), jobs))
+        print(f"Outcomes: {outcomes}")
+        print(f"Grant order: {order} ({time.perf_counter() - start:.2f}s)")
+        print(limiter.metrics())
@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+"""
+預先計算的農曆 / 干支 / 節氣表 (Lunar Calendar Table)
+- 以天文演算 (Meeus 太陽視黃經與朔日公式, 東八區) 一次算出設定年份範圍內每一天的
+  農曆年月日 (含閏月)、年/月/日干支與當日節氣
+- 以 .npz 壓縮存放於 data/cache/calendar/ (檔名含版本與年份範圍),第一次使用時才建立 / 載入
+- lookup() 以整數天數索引,整個日期陣列一次查表; 名稱表只建立一次
+- numerology_feature() 由日干五行推出確定性的 39 號碼分數,不需 LLM 即可回測
+"""
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from src.history_store import dates_to_days
+
+
+TABLE_VERSION = 1
+CALENDAR_ROOT = Path('data/cache/calendar')
+
+HEAVENLY_STEMS = np.array(['甲', '乙', '丙', '丁', '戊', '己', '庚', '辛', '壬', '癸'])
+EARTHLY_BRANCHES = np.array(['子', '丑', '寅', '卯', '辰', '巳', '午', '未', '申', '酉', '戌', '亥'])
+# 六十甲子 (索引 i: 天干 i % 10, 地支 i % 12)
+GANZHI = np.array([HEAVENLY_STEMS[i % 10] + EARTHLY_BRANCHES[i % 12] for i in range(60)])
+LUNAR_MONTH_NAMES = np.array(['', '正月', '二月', '三月', '四月', '五月', '六月',
+                              '七月', '八月', '九月', '十月', '冬月', '臘月'])
+_DIGITS = ['一', '二', '三', '四', '五', '六', '七', '八', '九', '十']
+LUNAR_DAY_NAMES = np.array(
+    [''] + [f"初{_DIGITS[d - 1]}" for d in range(1, 11)] + [f"十{_DIGITS[d - 11]}" for d in range(11, 20)]
+    + ['二十'] + [f"廿{_DIGITS[d - 21]}" for d in range(21, 30)] + ['三十']
+)
+# 節氣索引 k: 太陽視黃經 15k 度 (0 = 春分); 偶數為中氣
+SOLAR_TERMS = np.array(['春分', '清明', '穀雨', '立夏', '小滿', '芒種', '夏至', '小暑', '大暑', '立秋',
+                        '處暑', '白露', '秋分', '寒露', '霜降', '立冬', '小雪', '大雪', '冬至', '小寒',
+                        '大寒', '立春', '雨水', '驚蟄'])
+WINTER_SOLSTICE = 18
+SPRING_BEGINS = 21
+
+# 五行 (木火土金水) 與河圖數 (個位數)
+ELEMENTS = np.array(['木', '火', '土', '金', '水'])
+STEM_ELEMENT = np.array([0, 0, 1, 1, 2, 2, 3, 3, 4, 4])
+ELEMENT_DIGITS = {0: (3, 8), 1: (2, 7), 2: (5, 0), 3: (4, 9), 4: (1, 6)}
+
+_UTC8 = 8 / 24
+_UNIX_EPOCH_JD = 2440587.5
+_NEW_MOON_EPOCH_JD = 2451550.09766
+
+
+def _delta_t_days(jd: np.ndarray) -> np.ndarray:
+    """地球自轉時差 ΔT (日), 1900-2100 的簡化多項式"""
+    y = (jd - 2451545.0) / 365.25
+    return (62.92 + 0.32217 * y + 0.005589 * y * y) / 86400
+
+
+def solar_longitude(jd: np.ndarray) -> np.ndarray:
+    """太陽視黃經 (度, 0-360), Meeus 低精度公式 (誤差約 0.01 度)"""
+    t = (jd + _delta_t_days(jd) - 2451545.0) / 36525
+    l0 = 280.46646 + 36000.76983 * t + 0.0003032 * t * t
+    m = np.radians(357.52911 + 35999.05029 * t - 0.0001537 * t * t)
+    c = ((1.914602 - 0.004817 * t - 0.000014 * t * t) * np.sin(m)
+         + (0.019993 - 0.000101 * t) * np.sin(2 * m) + 0.000289 * np.sin(3 * m))
+    omega = np.radians(125.04 - 1934.136 * t)
+    return np.mod(l0 + c - 0.00569 - 0.00478 * np.sin(omega), 360.0)
+
+
+def new_moons(k: np.ndarray) -> np.ndarray:
+    """第 k 個朔 (k = 0 為 2000-01-06) 的儒略日 (UT), Meeus 第 49 章"""
+    k = np.asarray(k, dtype=np.float64)
+    t = k / 1236.85
+    jde = (_NEW_MOON_EPOCH_JD + 29.530588861 * k + 0.00015437 * t ** 2
+           - 0.000000150 * t ** 3 + 0.00000000073 * t ** 4)
+    e = 1 - 0.002516 * t - 0.0000074 * t ** 2
+    m = np.radians(2.5534 + 29.10535670 * k - 0.0000014 * t ** 2 - 0.00000011 * t ** 3)
+    mp = np.radians(201.5643 + 385.81693528 * k + 0.0107582 * t ** 2 + 0.00001238 * t ** 3
+                    - 0.000000058 * t ** 4)
+    f = np.radians(160.7108 + 390.67050284 * k - 0.0016118 * t ** 2 - 0.00000227 * t ** 3
+                   + 0.000000011 * t ** 4)
+    omega = np.radians(124.7746 - 1.56375588 * k + 0.0020672 * t ** 2 + 0.00000215 * t ** 3)
+    sin = np.sin
+    jde += (-0.40720 * sin(mp) + 0.17241 * e * sin(m) + 0.01608 * sin(2 * mp) + 0.01039 * sin(2 * f)
+            + 0.00739 * e * sin(mp - m) - 0.00514 * e * sin(mp + m) + 0.00208 * e * e * sin(2 * m)
+            - 0.00111 * sin(mp - 2 * f) - 0.00057 * sin(mp + 2 * f) + 0.00056 * e * sin(2 * mp + m)
+            - 0.00042 * sin(3 * mp) + 0.00042 * e * sin(m + 2 * f) + 0.00038 * e * sin(m - 2 * f)
+            - 0.00024 * e * sin(2 * mp - m) - 0.00017 * sin(omega) - 0.00007 * sin(mp + 2 * m)
+            + 0.00004 * sin(2 * mp - 2 * f) + 0.00004 * sin(3 * m) + 0.00003 * sin(mp + m - 2 * f)
+            + 0.00003 * sin(2 * mp + 2 * f) - 0.00003 * sin(mp + m + 2 * f) + 0.00003 * sin(mp - m + 2 * f)
+            - 0.00002 * sin(mp - m - 2 * f) - 0.00002 * sin(3 * mp + m) + 0.00002 * sin(4 * mp))
+    # 行星攝動
+    planetary = [
+        (0.000325, 299.77, 0.107408), (0.000165, 251.88, 0.016321), (0.000164, 251.83, 26.651886),
+        (0.000126, 349.42, 36.412478), (0.000110, 84.66, 18.206239), (0.000062, 141.74, 53.303771),
+        (0.000060, 207.14, 2.453732), (0.000056, 154.84, 7.306860), (0.000047, 34.52, 27.261239),
+        (0.000042, 207.19, 0.121824), (0.000040, 291.34, 1.844379), (0.000037, 161.72, 24.198154),
+        (0.000035, 239.56, 25.513099), (0.000023, 331.55, 3.592518)
+    ]
+    for i, (coef, base, rate) in enumerate(planetary):
+        angle = base + rate * k - (0.009173 * t ** 2 if i == 0 else 0)
+        jde += coef * sin(np.radians(angle))
+    return jde - _delta_t_days(jde)
+
+
+def _local_day(jd: np.ndarray) -> np.ndarray:
+    """儒略日 (UT) -> 東八區日期的整數天數 (1970-01-01 = 0)"""
+    return np.floor(jd - _UNIX_EPOCH_JD + _UTC8).astype(np.int64)
+
+
+def build_calendar_table(start_year: int, end_year: int) -> Dict[str, np.ndarray]:
+    """
+    計算 start_year-01-01 至 end_year-12-31 每一天的曆法資料
+
+    Args:
+        start_year: 起始西元年
+        end_year: 結束西元年 (含)
+
+    Returns:
+        dict: 各欄位陣列 (lunar_year, lunar_month, lunar_day, leap, year_gz, month_gz, day_gz,
+              solar_term, term_day) 與 start_day / version
+    """
+    first = int(np.datetime64(f'{start_year}-01-01', 'D').astype(np.int64))
+    last = int(np.datetime64(f'{end_year}-12-31', 'D').astype(np.int64))
+    # 前後多算一年,涵蓋跨年的農曆月與冬至
+    lo, hi = first - 400, last + 400
+    days = np.arange(lo, hi + 1)
+
+    # 節氣: 以當日結束 (東八區 24:00) 時的太陽黃經判定當日生效的節氣
+    day_end_jd = days + 1 + _UNIX_EPOCH_JD - _UTC8
+    term = (np.floor(solar_longitude(day_end_jd) / 15).astype(np.int64)) % 24
+    term_day = np.r_[False, term[1:] != term[:-1]]
+    zhongqi_days = days[term_day & (term % 2 == 0)]
+    solstice_days = days[term_day & (term == WINTER_SOLSTICE)]
+
+    # 朔日: 每個農曆月從朔日 (東八區) 開始
+    k0 = int(np.floor((lo + _UNIX_EPOCH_JD - _NEW_MOON_EPOCH_JD) / 29.530588861)) - 1
+    k1 = int(np.ceil((hi + _UNIX_EPOCH_JD - _NEW_MOON_EPOCH_JD) / 29.530588861)) + 1
+    month_starts = _local_day(new_moons(np.arange(k0, k1 + 1)))
+    n_months = len(month_starts) - 1
+    has_zhongqi = (np.searchsorted(zhongqi_days, month_starts[1:]) -
+                   np.searchsorted(zhongqi_days, month_starts[:-1])) > 0
+
+    # 以冬至所在月為十一月,兩冬至間有 13 個月時,第一個沒有中氣的月為閏月
+    month_number = np.zeros(n_months, dtype=np.int64)
+    month_year = np.zeros(n_months, dtype=np.int64)
+    month_leap = np.zeros(n_months, dtype=bool)
+    solstice_month = np.searchsorted(month_starts, solstice_days, side='right') - 1
+    for i in range(len(solstice_month) - 1):
+        begin, end = solstice_month[i], solstice_month[i + 1]
+        solstice_year = int(np.datetime64(int(solstice_days[i]), 'D').astype('datetime64[Y]').astype(int) + 1970)
+        leap_found = end - begin != 13
+        number, year = 10, solstice_year
+        for j in range(begin, end):
+            if not leap_found and j > begin and not has_zhongqi[j]:
+                leap_found = True
+                month_leap[j] = True
+            else:
+                number = number % 12 + 1
+                if number == 1:
+                    year = solstice_year + 1
+            month_number[j] = number
+            month_year[j] = year
+
+    month_index = np.searchsorted(month_starts, days, side='right') - 1
+    lunar_day = days - month_starts[month_index] + 1
+
+    # 干支: 日柱 (JDN + 49) % 60; 年柱以立春為界; 月柱以節 (奇數節氣) 定月支,五虎遁定月干
+    day_gz = (days + 2440588 + 49) % 60
+    calendar_year = days.astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+    month_of_year = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) % 12 + 1
+    # 1-2 月尚未過立春 (冬至、小寒、大寒) 時屬前一年
+    before_spring = (month_of_year <= 2) & np.isin(term, [WINTER_SOLSTICE, 19, 20])
+    ganzhi_year = calendar_year - before_spring
+    year_gz = (ganzhi_year - 4) % 60
+    branch = ((term - SPRING_BEGINS) % 24 // 2 + 2) % 12
+    stem = ((year_gz % 10) * 2 + 2 + (branch - 2) % 12) % 10
+    month_gz = (6 * stem - 5 * branch) % 60
+
+    keep = slice(first - lo, last - lo + 1)
+    return {
+        'version': np.int32(TABLE_VERSION),
+        'start_day': np.int32(first),
+        'lunar_year': month_year[month_index][keep].astype(np.int16),
+        'lunar_month': month_number[month_index][keep].astype(np.int8),
+        'lunar_day': lunar_day[keep].astype(np.int8),
+        'leap': month_leap[month_index][keep],
+        'year_gz': year_gz[keep].astype(np.int8),
+        'month_gz': month_gz[keep].astype(np.int8),
+        'day_gz': day_gz[keep].astype(np.int8),
+        'solar_term': term[keep].astype(np.int8),
+        'term_day': term_day[keep]
+    }
+
+
+class LunarCalendar:
+    """預先計算的曆法表 (延遲載入)"""
+
+    FIELDS = ('lunar_year', 'lunar_month', 'lunar_day', 'leap', 'year_gz', 'month_gz', 'day_gz',
+              'solar_term', 'term_day')
+
+    def __init__(self, start_year: int = 2000, end_year: int = 2050, cache_dir: Optional[Path] = CALENDAR_ROOT):
+        """
+        初始化
+
+        Args:
+            start_year: 起始西元年
+            end_year: 結束西元年 (含)
+            cache_dir: .npz 存放目錄 (None 表示不存檔,每次重新計算)
+        """
+        self.start_year = start_year
+        self.end_year = end_year
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self._table: Optional[Dict[str, np.ndarray]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'LunarCalendar':
+        """依配置檔 ai_advisors.numerology_advisor.calendar 建立"""
+        section = config.get('ai_advisors', {}).get('numerology_advisor', {}).get('calendar', {})
+        return cls(start_year=section.get('start_year', 2000), end_year=section.get('end_year', 2050))
+
+    @property
+    def path(self) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"lunar_v{TABLE_VERSION}_{self.start_year}_{self.end_year}.npz"
+
+    @property
+    def table(self) -> Dict[str, np.ndarray]:
+        """曆法表 (第一次使用時載入; 檔案不存在或版本不符時重新計算並存檔)"""
+        if self._table is None:
+            with self._lock:
+                if self._table is None:
+                    self._table = self._load() or self._build()
+        return self._table
+
+    def _load(self) -> Optional[Dict[str, np.ndarray]]:
+        if self.path is None or not self.path.exists():
+            return None
+        try:
+            with np.load(self.path) as data:
+                if int(data['version']) != TABLE_VERSION:
+                    return None
+                return {name: data[name] for name in data.files}
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARNING] Lunar calendar table unreadable, rebuilding: {e}")
+            return None
+
+    def _build(self) -> Dict[str, np.ndarray]:
+        table = build_calendar_table(self.start_year, self.end_year)
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez_compressed(self.path, **table)
+            print(f"[INFO] Lunar calendar table built: {self.start_year}-{self.end_year} -> {self.path}")
+        return table
+
+    def _index(self, days) -> np.ndarray:
+        index = np.asarray(days, dtype=np.int64) - int(self.table['start_day'])
+        size = len(self.table['lunar_day'])
+        if index.size and (index.min() < 0 or index.max() >= size):
+            raise ValueError(f"date outside lunar calendar range {self.start_year}-{self.end_year}")
+        return index
+
+    def lookup(self, dates) -> Dict[str, np.ndarray]:
+        """
+        查詢整個日期陣列
+
+        Args:
+            dates: 日期字串 / datetime 序列,或 int 天數陣列 (1970-01-01 = 0)
+
+        Returns:
+            dict: 各欄位陣列 (見 FIELDS)
+        """
+        days = dates if np.asarray(dates).dtype.kind in 'iu' else dates_to_days(dates)
+        index = self._index(days)
+        return {name: self.table[name][index] for name in self.FIELDS}
+
+    def names(self, fields: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """lookup() 結果 -> 名稱陣列 (農曆日期、年/月/日干支、節氣)"""
+        leap = np.where(fields['leap'], '閏', '')
+        return {
+            'lunar_date': np.char.add(np.char.add(np.char.add('農曆', leap),
+                                                  LUNAR_MONTH_NAMES[fields['lunar_month']]),
+                                      LUNAR_DAY_NAMES[fields['lunar_day']]),
+            'year_ganzhi': GANZHI[fields['year_gz']],
+            'month_ganzhi': GANZHI[fields['month_gz']],
+            'day_ganzhi': GANZHI[fields['day_gz']],
+            'solar_term': SOLAR_TERMS[fields['solar_term']]
+        }
+
+    def info(self, target_date: str) -> Dict:
+        """單一日期的曆法資訊 (NumerologyAdvisor 使用的格式)"""
+        looked_up = self.lookup([target_date])
+        fields = {name: values[0] for name, values in looked_up.items()}
+        names = {name: values[0] for name, values in self.names(looked_up).items()}
+        year_gz = int(fields['year_gz'])
+        return {
+            'lunar_date': str(names['lunar_date']),
+            'lunar_year': int(fields['lunar_year']),
+            'lunar_month': int(fields['lunar_month']),
+            'lunar_day': int(fields['lunar_day']),
+            'is_leap_month': bool(fields['leap']),
+            'heavenly_stem': str(HEAVENLY_STEMS[year_gz % 10]),
+            'earthly_branch': str(EARTHLY_BRANCHES[year_gz % 12]),
+            'ganzhi': str(names['year_ganzhi']),
+            'month_ganzhi': str(names['month_ganzhi']),
+            'day_ganzhi': str(names['day_ganzhi']),
+            'day_element': str(ELEMENTS[STEM_ELEMENT[int(fields['day_gz']) % 10]]),
+            'solar_term': str(names['solar_term']),
+            'is_term_day': bool(fields['term_day'])
+        }
+
+
+def numerology_feature(calendar: LunarCalendar, dates, max_number: int = 39) -> np.ndarray:
+    """
+    確定性的命理號碼分數 (不需 LLM, 可直接回測)
+
+    規則: 日干五行的河圖數 (個位數) +1; 生日干五行者 +0.5; 剋日干五行者 -1; 農曆日數 +0.5
+
+    Args:
+        calendar: 曆法表
+        dates: 日期陣列
+        max_number: 號碼上限 (539 為 39)
+
+    Returns:
+        np.ndarray: (日期數 x max_number) 分數矩陣, 欄 j 為號碼 j+1
+    """
+    fields = calendar.lookup(dates)
+    element = STEM_ELEMENT[fields['day_gz'].astype(np.int64) % 10]
+    # 五行相生: 木->火->土->金->水->木; 相剋: 木剋土, 土剋水, 水剋火, 火剋金, 金剋木
+    generating = (element - 1) % 5
+    overcoming = (element - 2) % 5
+
+    digit_element = np.empty(10, dtype=np.int64)
+    for elem, pair in ELEMENT_DIGITS.items():
+        digit_element[list(pair)] = elem
+    number_element = digit_element[np.arange(1, max_number + 1) % 10]
+
+    scores = ((number_element[None, :] == element[:, None]) * 1.0
+              + (number_element[None, :] == generating[:, None]) * 0.5
+              - (number_element[None, :] == overcoming[:, None]) * 1.0)
+    lunar_day = fields['lunar_day'].astype(np.int64)
+    rows = np.nonzero(lunar_day <= max_number)[0]
+    scores[rows, lunar_day[rows] - 1] += 0.5
+    return scores.astype(np.float32)
+
+
+def evaluate_numerology_feature(calendar: LunarCalendar, dates, numbers: np.ndarray,
+                                top_k: int = 5, max_number: int = 39) -> Dict[str, float]:
+    """
+    回測命理分數: 每期取分數最高的 top_k 個號碼,統計平均命中數
+
+    Args:
+        calendar: 曆法表
+        dates: 開獎日期陣列
+        numbers: 開獎號碼 (期數 x 每期號碼數)
+        top_k: 每期選號數
+
+    Returns:
+        dict: {'draws', 'avg_hits', 'random_baseline', 'lift'}
+    """
+    scores = numerology_feature(calendar, dates, max_number)
+    # 同分時以號碼小者優先,結果可重現
+    order = np.argsort(-scores, axis=1, kind='stable')[:, :top_k]
+    actual = np.zeros_like(scores, dtype=bool)
+    numbers = np.asarray(numbers, dtype=np.int64)
+    actual[np.arange(len(numbers))[:, None], numbers - 1] = True
+    hits = np.take_along_axis(actual, order, axis=1).sum(axis=1)
+    baseline = top_k * numbers.shape[1] / max_number
+    avg_hits = float(hits.mean()) if len(hits) else 0.0
+    return {
+        'draws': int(len(hits)),
+        'avg_hits': round(avg_hits, 4),
+        'random_baseline': round(baseline, 4),
+        'lift': round(avg_hits / baseline, 4) if baseline else 0.0
+    }
+
+
+_default_calendar = None
+_default_lock = threading.Lock()
+
+
+def get_lunar_calendar(config_path: str = "config/auto_config.json") -> LunarCalendar:
+    """行程內共用的曆法表 (年份範圍依配置檔)"""
+    global _default_calendar
+    with _default_lock:
+        if _default_calendar is None:
+            try:
+                with open(config_path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                config = {}
+            _default_calendar = LunarCalendar.from_config(config)
+        return _default_calendar
+
+
+if __name__ == "__main__":
+    import time
+
+    from src.history_store import HistoryStore
+
+    calendar = LunarCalendar(cache_dir=None)
+    start = time.perf_counter()
+    calendar.table
+    print(f"Built {len(calendar.table['lunar_day'])} days in {time.perf_counter() - start:.3f}s")
+    for day in ['2023-01-22', '2023-03-22', '2024-02-10', '2025-07-25', '2026-02-17']:
+        print(day, calendar.info(day))
+
+    history = HistoryStore.for_game('539').load()
+    start = time.perf_counter()
+    print(evaluate_numerology_feature(calendar, history.dates, history.numbers))
+    print(f"Backtest over {len(history)} draws in {(time.perf_counter() - start) * 1000:.1f}ms")
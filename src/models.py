@@ -10,15 +10,17 @@ import warnings
 warnings.filterwarnings('ignore')
 
 class FeatureEngine:
-    def __init__(self, data_df=None, data_path='data/539_train.csv'):
+    def __init__(self, data_df=None, data_path='data/539_train.csv', use_store=None):
         """
         初始化特徵引擎
         
         Args:
             data_df: 直接傳入 DataFrame (優先使用,用於漸進式訓練)
             data_path: 資料檔案路徑 (當 data_df 為 None 時使用)
+            use_store: 是否從二進位歷史儲存載入 (None = 依配置檔)
         """
         self.data_path = data_path
+        self.numbers_series = None
         
         # 優先使用傳入的 DataFrame
         if data_df is not None:
@@ -30,12 +32,13 @@ class FeatureEngine:
             print(f"[OK] 使用傳入資料: {len(self.df)} 筆")
         else:
             # 從檔案載入
-            self.df = self.load_data()
+            self.df = self.load_data(use_store)
         
-        self.numbers_series = self.df['numbers'].apply(lambda x: [int(n) for n in x.split(',')]).tolist()
+        if self.numbers_series is None:
+            self.numbers_series = self.df['numbers'].apply(lambda x: [int(n) for n in x.split(',')]).tolist()
         self.total_numbers = 39
 
-    def load_data(self):
+    def load_data(self, use_store=None):
         """載入資料,若訓練集不存在則降級使用完整資料"""
         # 嘗試載入指定路徑
         if pd.io.common.file_exists(self.data_path):
@@ -52,19 +55,44 @@ class FeatureEngine:
                     f"請先執行爬蟲程式: python -m src.crawler"
                 )
         
-        df = pd.read_csv(self.data_path)
+        if use_store is None:
+            from src.history_store import use_history_store
+            use_store = use_history_store()
+        
+        if use_store:
+            try:
+                return self._load_from_store()
+            except Exception as e:
+                print(f"[WARNING] 二進位歷史儲存載入失敗,改用 CSV: {e}")
+        
+        from src.history_store import load_history
+        df = load_history(self.data_path, use_store=False)
         # Sort ascending (oldest to newest)
         df['date'] = pd.to_datetime(df['date'])
         df = df.sort_values(by='date').reset_index(drop=True)
         print(f"[INFO] 資料筆數: {len(df)} 筆 (日期範圍: {df['date'].min()} ~ {df['date'].max()})")
         return df
 
+    def _load_from_store(self):
+        """從二進位歷史儲存載入 (號碼直接取自 uint8 矩陣,不需逐列 split)"""
+        from src.draw_repository import draw_repository
+        
+        history = draw_repository.get_draws(self.data_path, use_store=True)
+        numbers = np.asarray(history.numbers)
+        df = pd.DataFrame({
+            'date': pd.to_datetime(history.date_strings()),
+            'numbers': [','.join(f"{n:02d}" for n in row) for row in numbers.tolist()]
+        })
+        self.numbers_series = numbers.astype(int).tolist()
+        print("[INFO] 使用二進位歷史儲存")
+        print(f"[INFO] 資料筆數: {len(df)} 筆 (日期範圍: {df['date'].min()} ~ {df['date'].max()})")
+        return df
+
     def get_binary_matrix(self):
         """Convert list of numbers to binary matrix (rows=draws, cols=1-39)"""
         matrix = np.zeros((len(self.df), 39), dtype=int)
         for i, nums in enumerate(self.numbers_series):
-            for n in nums:
-                matrix[i, n-1] = 1
+            matrix[i, np.asarray(nums, dtype=int) - 1] = 1
         return pd.DataFrame(matrix, columns=range(1, 40))
 
     def calc_freq(self, window=100):
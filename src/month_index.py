@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+月份開獎頁索引 (Parse-Once Month Index)
+- auzonet 月份列表頁只解析一次,轉為 {日期: 開獎資料} 對照表
+- 索引同時保存在記憶體與 data/cache/month_index,以頁面內容雜湊判斷是否需要重新解析
+- 單日查詢 (fetch_auzonet_single_date 等) 與批次驗證直接查表,同一月份不重複解析
+"""
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from src.html_backends import get_backend
+from src.http_cache import HttpCache, get_http_cache
+
+
+INDEX_VERSION = 1
+INDEX_ROOT = Path('data/cache/month_index')
+AUZONET_HOST = 'lotto.auzonet.com'
+
+# 遊戲 -> auzonet 月份頁目錄
+MONTH_PAGES = {
+    '539': 'daily539',
+    'lotto': 'lotto649',
+    'power': 'pwr',
+    'star3': '3star',
+    'star4': '4star'
+}
+
+_DATE_PATTERN = re.compile(r'(\d{4})[-/](\d{2})[-/](\d{2})')
+
+
+def month_url(game: str, year: int, month: int) -> str:
+    """auzonet 月份列表頁網址"""
+    return f"https://{AUZONET_HOST}/{MONTH_PAGES[game]}/list_{year}_{month}.html"
+
+
+# ---- parsers ----
+def _index_rows(rows, width: int) -> Dict[str, List[str]]:
+    """表格列: 第一欄為日期 (YYYY-MM-DD 或 YYYY/MM/DD), 號碼為 div.ball_tx"""
+    draws = {}
+    for n_cells, first_cell, balls in rows:
+        if n_cells < 2:
+            continue
+        dates = ['-'.join(m) for m in _DATE_PATTERN.findall(first_cell)]
+        dates = [d for d in dates if d not in draws]
+        if not dates or len(balls) < width:
+            continue
+        for date_str in dates:
+            draws[date_str] = balls[:width]
+    return draws
+
+
+def parse_month_page(game: str, html_text: str, backend: Optional[str] = None) -> Dict[str, object]:
+    """
+    解析整個月份頁
+
+    Args:
+        game: '539', 'lotto', 'power', 'star3', 'star4'
+        html_text: 頁面內容
+        backend: 解析後端名稱 (None = 依配置檔, 見 src/html_backends.py)
+
+    Returns:
+        dict: {日期: 開獎資料}, 格式與各單日爬蟲的回傳值相同
+            539: [n1..n5]; lotto: {'date', 'numbers', 'special'};
+            power: {'date', 'zone1', 'zone2'}; star3/star4: {'date', 'number'}
+    """
+    parser = get_backend(backend)
+    if game == '539':
+        return parser.auzonet_539(html_text)
+
+    if game in ('lotto', 'power'):
+        draws = {}
+        for date_str, values in _index_rows(parser.auzonet_rows(html_text), 7).items():
+            main = sorted(int(v) for v in values[:6])
+            if game == 'lotto':
+                draws[date_str] = {'date': date_str, 'numbers': main, 'special': int(values[6])}
+            else:
+                draws[date_str] = {'date': date_str, 'zone1': main, 'zone2': int(values[6])}
+        return draws
+
+    width = int(game[-1])
+    return {
+        date_str: {'date': date_str, 'number': ''.join(values)}
+        for date_str, values in _index_rows(parser.auzonet_rows(html_text), width).items()
+    }
+
+
+def draw_numbers(game: str, record) -> Optional[List[int]]:
+    """開獎資料 -> 驗證用號碼列表 (不含特別號/第二區, 星彩為各位數字)"""
+    if record is None:
+        return None
+    if game == '539':
+        return list(record)
+    if game == 'lotto':
+        return list(record['numbers'])
+    if game == 'power':
+        return list(record['zone1'])
+    return [int(d) for d in record['number']]
+
+
+class MonthIndex:
+    """月份開獎頁索引 (執行緒安全)"""
+
+    def __init__(self, cache_dir: Path = INDEX_ROOT, http_cache: Optional[HttpCache] = None):
+        """
+        初始化
+
+        Args:
+            cache_dir: 索引檔目錄
+            http_cache: 頁面快取 (預設為共用實例)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.http_cache = http_cache
+        self._memory: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'parses': 0, 'fetch_failures': 0}
+
+    def _path(self, url: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json"
+
+    def _load(self, url: str, digest: str) -> Optional[Dict]:
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if data.get('version') != INDEX_VERSION or data.get('digest') != digest:
+            return None
+        return data['draws']
+
+    def _save(self, url: str, game: str, digest: str, draws: Dict):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(url)
+        tmp = path.with_suffix('.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'url': url, 'game': game,
+                       'digest': digest, 'draws': draws}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def month(self, game: str, year: int, month: int, **kwargs) -> Optional[Dict[str, object]]:
+        """
+        取得整月索引 (頁面經 HttpCache 取得, 內容未變時不重新解析)
+
+        Args:
+            game: 遊戲名稱
+            year, month: 年、月
+            **kwargs: 傳給 HttpCache.get_text (headers, timeout 等)
+
+        Returns:
+            dict: {日期: 開獎資料} (共用物件,請勿修改); 頁面無法取得時為 None
+        """
+        url = month_url(game, year, month)
+        html_text = (self.http_cache or get_http_cache()).get_text(url, **kwargs)
+        if html_text is None:
+            self._count('fetch_failures')
+            return None
+
+        digest = hashlib.sha1(html_text.encode('utf-8')).hexdigest()
+        with self._lock:
+            cached = self._memory.get(url)
+        if cached is not None and cached[0] == digest:
+            self._count('memory_hits')
+            return cached[1]
+
+        draws = self._load(url, digest)
+        if draws is not None:
+            self._count('disk_hits')
+        else:
+            draws = parse_month_page(game, html_text)
+            self._count('parses')
+            self._save(url, game, digest, draws)
+
+        with self._lock:
+            self._memory[url] = (digest, draws)
+        return draws
+
+    def lookup(self, game: str, date: str, **kwargs):
+        """
+        查詢單日開獎資料
+
+        Args:
+            game: 遊戲名稱
+            date: 'YYYY-MM-DD'
+
+        Returns:
+            開獎資料 (副本, 格式見 parse_month_page); 查無資料時為 None
+        """
+        date = str(date)[:10]
+        draws = self.month(game, int(date[:4]), int(date[5:7]), **kwargs)
+        if not draws or date not in draws:
+            return None
+        return copy.deepcopy(draws[date])
+
+    def lookup_many(self, game: str, dates: Iterable[str], **kwargs) -> Dict[str, object]:
+        """
+        批次查詢 (每個月份只取得、解析一次)
+
+        Returns:
+            dict: {日期: 開獎資料}, 只包含查得的日期
+        """
+        by_month = defaultdict(list)
+        for date in dates:
+            date = str(date)[:10]
+            by_month[(int(date[:4]), int(date[5:7]))].append(date)
+
+        found = {}
+        for (year, mon), month_dates in sorted(by_month.items()):
+            draws = self.month(game, year, mon, **kwargs) or {}
+            for date in month_dates:
+                if date in draws:
+                    found[date] = copy.deepcopy(draws[date])
+        return found
+
+    def invalidate(self):
+        """清除記憶體索引 (磁碟索引以內容雜湊自動失效)"""
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> Dict:
+        """索引統計 (memory_hits/disk_hits: 免解析, parses: 實際解析次數)"""
+        with self._lock:
+            return dict(self._stats, months=len(self._memory))
+
+
+# 全域實例
+month_index = MonthIndex()
+
+
+if __name__ == "__main__":
+    import time
+
+    for _ in range(2):
+        start = time.perf_counter()
+        draws = month_index.month('539', 2026, 1)
+        print(f"539 2026-01: {len(draws) if draws else 'failed'} draws "
+              f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+    print(month_index.lookup('539', '2026-01-05'))
+    print(month_index.stats())
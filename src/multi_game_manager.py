@@ -2,19 +2,83 @@
 """
 多遊戲預測管理器
 統一管理所有遊戲的預測
+- 各遊戲互相獨立: 預測時 539 (ML 評分, CPU 密集) 在子行程執行,其他遊戲以執行緒執行;驗證以執行緒執行
+- 每個遊戲有逾時上限,單一遊戲失敗或逾時不影響其他遊戲,總耗時約等於最慢的遊戲
 """
-from src.auto_predictor import AutoPredictor
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from pathlib import Path
+from typing import Dict, Optional
+from src.auto_predictor import AutoPredictor, schedule_ai_report
 from src.games.lotto_predictor import LottoPredictor
 from src.games.power_predictor import PowerPredictor
 from src.games.star3_predictor import Star3Predictor
 from src.games.star4_predictor import Star4Predictor
 from src.discord_notifier import DiscordNotifier
-from src.prediction_manager import prediction_manager
+from src.draw_repository import draw_repository
+from src.month_index import month_index, draw_numbers
+from src.verification_engine import get_verification_engine
 import pandas as pd
 from datetime import datetime, timedelta
 from src.timezone_utils import get_taiwan_now
 
 
+GAMES = ['539', 'lotto', 'power', 'star3', 'star4']
+GAME_LABELS = {'539': '今彩539', 'lotto': '大樂透', 'power': '威力彩', 'star3': '3星彩', 'star4': '4星彩'}
+PREDICTOR_CLASSES = {
+    '539': AutoPredictor,
+    'lotto': LottoPredictor,
+    'power': PowerPredictor,
+    'star3': Star3Predictor,
+    'star4': Star4Predictor
+}
+
+
+def load_prediction_config(config_path: str = "config/auto_config.json") -> Dict:
+    """讀取配置檔 prediction 區段"""
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('prediction', {})
+    except Exception:
+        return {}
+
+
+def _build_prediction(game: str, predictor) -> Optional[Dict]:
+    """產生單一遊戲預測 ({'date', 'predictions', ...}; 539 有待驗證預測時為 None)"""
+    if game == '539':
+        # 539 AutoPredictor 自行存檔並推送; 舊格式以 numbers 表示預測號碼
+        # AI 報告延後由主行程以背景工作產生 (子行程結束後背景執行緒不會存活)
+        result = predictor.generate_new_prediction(report_mode='deferred')
+        if result and 'predictions' not in result and 'numbers' in result:
+            result['predictions'] = result['numbers']
+        return result
+    return {
+        'date': predictor.get_next_draw_date(),
+        'predictions': predictor.generate_predictions(5)
+    }
+
+
+def _predict_job(game: str):
+    """工作行程入口: 在子行程建立預測器並產生預測, 回傳 (結果, 耗時秒數)"""
+    start = time.perf_counter()
+    result = _build_prediction(game, PREDICTOR_CLASSES[game]())
+    return result, time.perf_counter() - start
+
+
+def _terminate_workers(pool: ProcessPoolExecutor):
+    """強制結束行程池的工作行程 (Python 3.14 起有 terminate_workers)"""
+    terminate = getattr(pool, 'terminate_workers', None)
+    if terminate is not None:
+        terminate()
+        return
+    for process in list((getattr(pool, '_processes', None) or {}).values()):
+        if process.is_alive():
+            process.terminate()
+
+
 class MultiGameManager:
     """多遊戲預測管理器"""
     
@@ -22,19 +86,16 @@ class MultiGameManager:
         self.discord = DiscordNotifier()
         
         # 初始化各遊戲預測器
-        self.predictors = {
-            '539': AutoPredictor(),
-            'lotto': LottoPredictor(),
-            'power': PowerPredictor(),
-            'star3': Star3Predictor(),
-            'star4': Star4Predictor()
-        }
+        self.predictors = {game: cls() for game, cls in PREDICTOR_CLASSES.items()}
+        
+        # 平行執行設定 (prediction 區段) 與最近一次執行的各遊戲耗時
+        self.config = load_prediction_config()
+        self.last_timing = {}
     
     def _save_prediction_to_csv(self, game_name, data):
         """將預測結果儲存為 CSV (供 Dashboard 讀取)"""
         try:
             import pandas as pd
-            from pathlib import Path
             
             # 確保目錄存在
             save_dir = Path("predictions")
@@ -88,94 +149,134 @@ class MultiGameManager:
         except Exception as e:
             print(f"[ERROR] {game_name} 存檔失敗: {e}")
 
-    def generate_all_predictions(self):
-        """生成所有遊戲的預測"""
-        results = {}
+    def _predict_local(self, game: str):
+        """在目前行程產生預測, 回傳 (結果, 耗時秒數)"""
+        start = time.perf_counter()
+        result = _build_prediction(game, self.predictors[game])
+        return result, time.perf_counter() - start
+    
+    def _run_games(self, label: str, jobs: Dict[str, tuple], timeout: Optional[float]) -> Dict[str, Dict]:
+        """
+        平行執行各遊戲工作並套用逾時
         
-        print("=" * 80)
-        print("多遊戲預測系統 - 生成所有預測")
-        print("=" * 80)
+        Args:
+            label: 日誌標籤
+            jobs: {遊戲: (執行器, 函式, 參數...)}
+            timeout: 每個遊戲的逾時秒數 (自同時開始起算, None = 不限)
         
-        # 1. 539
-        print("\n[1/5] 今彩539...")
-        try:
-            # 539 AutoPredictor 通常已經自己存檔了，但為了保險起見我們也存一份到 predictions/
-            # AutoPredictor saving path might be different
-            result_539 = self.predictors['539'].generate_new_prediction()
-            if result_539:
-                results['539'] = result_539
-                # 539 result format might need adjustment for _save_prediction_to_csv
-                # result_539 structure: {'date': ..., 'num_sets': ..., 'predictions': ...} ?
-                # AutoPredictor returns differently? Let's check AutoPredictor if needed.
-                # Assuming result_539 has 'predictions' key with list of lists
-                
-                # Check structure compatibility
-                if 'predictions' not in result_539 and 'numbers' in result_539:
-                     result_539['predictions'] = result_539['numbers']
-                
-                self._save_prediction_to_csv('539', result_539)
-                print(f"[OK] 539 完成: {result_539.get('num_sets', len(result_539.get('predictions', [])))} 組")
-        except Exception as e:
-            print(f"[ERROR] 539 失敗: {e}")
+        Returns:
+            dict: {遊戲: {'status': 'ok'/'failed'/'timeout', 'result', 'elapsed_seconds', 'error'}}
+        """
+        start = time.perf_counter()
+        futures = {game: job[0].submit(*job[1:]) for game, job in jobs.items()}
+        finished_at = {}
+        for game, future in futures.items():
+            future.add_done_callback(lambda _, game=game: finished_at.setdefault(game, time.perf_counter()))
+        outcomes = {}
+        for game, future in futures.items():
+            remaining = None if timeout is None else max(0.0, timeout - (time.perf_counter() - start))
+            try:
+                result, elapsed = future.result(timeout=remaining)
+                outcomes[game] = {'status': 'ok', 'result': result, 'elapsed_seconds': round(elapsed, 2), 'error': None}
+            except FutureTimeoutError:
+                future.cancel()
+                print(f"[ERROR] {label} {game} timed out after {timeout:.0f}s")
+                outcomes[game] = {'status': 'timeout', 'result': None,
+                                  'elapsed_seconds': round(time.perf_counter() - start, 2), 'error': 'timeout'}
+            except Exception as e:
+                print(f"[ERROR] {label} {game} failed: {e}")
+                outcomes[game] = {'status': 'failed', 'result': None,
+                                  'elapsed_seconds': round(finished_at.get(game, time.perf_counter()) - start, 2),
+                                  'error': str(e)}
+        return outcomes
+    
+    def _predict_parallel(self, timeout: Optional[float]) -> Dict[str, Dict]:
+        """539 等 CPU 密集遊戲以行程池,其他遊戲以執行緒同時執行"""
+        process_games = [g for g in self.config.get('process_games', ['539']) if g in GAMES]
+        thread_games = [g for g in GAMES if g not in process_games]
         
-        # 2. 大樂透
-        print("\n[2/5] 大樂透...")
-        try:
-            lotto_preds = self.predictors['lotto'].generate_predictions(5)
-            lotto_date = self.predictors['lotto'].get_next_draw_date()
-            results['lotto'] = {
-                'date': lotto_date,
-                'predictions': lotto_preds
-            }
-            self._save_prediction_to_csv('lotto', results['lotto'])
-            print(f"[OK] 大樂透完成: 5 組")
-        except Exception as e:
-            print(f"[ERROR] 大樂透失敗: {e}")
+        process_pool = None
+        if process_games:
+            try:
+                # spawn: 排程器行程已有多個執行緒 (APScheduler、TaskDAG、Discord 佇列、顧問池),
+                # fork 可能複製到被持有的鎖而使子行程死結
+                process_pool = ProcessPoolExecutor(max_workers=len(process_games),
+                                                   mp_context=multiprocessing.get_context('spawn'))
+            except (OSError, RuntimeError) as e:
+                # 無法建立行程池 (例如受限環境) 時改以執行緒執行
+                print(f"[WARNING] Process pool unavailable ({e}), using threads for {process_games}")
+                thread_games = list(GAMES)
+                process_games = []
+        thread_pool = ThreadPoolExecutor(max_workers=max(1, len(thread_games)), thread_name_prefix='predict')
         
-        # 3. 威力彩
-        print("\n[3/5] 威力彩...")
+        jobs = {game: (process_pool, _predict_job, game) for game in process_games}
+        jobs.update({game: (thread_pool, self._predict_local, game) for game in thread_games})
+        outcomes = {}
         try:
-            power_preds = self.predictors['power'].generate_predictions(5)
-            power_date = self.predictors['power'].get_next_draw_date()
-            results['power'] = {
-                'date': power_date,
-                'predictions': power_preds
-            }
-            self._save_prediction_to_csv('power', results['power'])
-            print(f"[OK] 威力彩完成: 5 組")
-        except Exception as e:
-            print(f"[ERROR] 威力彩失敗: {e}")
+            outcomes = self._run_games('Prediction', {game: jobs[game] for game in GAMES}, timeout)
+            return outcomes
+        finally:
+            # 逾時的執行緒工作不再等待 (執行緒無法中斷,會在背景結束後丟棄結果)
+            thread_pool.shutdown(wait=False, cancel_futures=True)
+            if process_pool is not None:
+                unfinished = [g for g in process_games if outcomes.get(g, {}).get('status') != 'ok']
+                if unfinished:
+                    # 終止逾時 (或中斷) 的子行程,避免之後仍存檔並推送已回報為 timeout 的預測
+                    # (逾時前已完成的推送無法撤回)
+                    _terminate_workers(process_pool)
+                process_pool.shutdown(wait=False, cancel_futures=True)
+    
+    def generate_all_predictions(self, parallel: Optional[bool] = None, timeout: Optional[float] = None):
+        """
+        生成所有遊戲的預測
         
-        # 4. 3星彩
-        print("\n[4/5] 3星彩...")
-        try:
-            star3_preds = self.predictors['star3'].generate_predictions(5)
-            star3_date = self.predictors['star3'].get_next_draw_date()
-            results['star3'] = {
-                'date': star3_date,
-                'predictions': star3_preds
-            }
-            self._save_prediction_to_csv('star3', results['star3'])
-            print(f"[OK] 3星彩完成: 5 組")
-        except Exception as e:
-            print(f"[ERROR] 3星彩失敗: {e}")
+        Args:
+            parallel: 是否平行執行 (預設依配置 prediction.parallel)
+            timeout: 每個遊戲的逾時秒數 (預設依配置 prediction.game_timeout_seconds)
         
-        # 5. 4星彩
-        print("\n[5/5] 4星彩...")
-        try:
-            star4_preds = self.predictors['star4'].generate_predictions(5)
-            star4_date = self.predictors['star4'].get_next_draw_date()
-            results['star4'] = {
-                'date': star4_date,
-                'predictions': star4_preds
-            }
-            self._save_prediction_to_csv('star4', results['star4'])
-            print(f"[OK] 4星彩完成: 5 組")
-        except Exception as e:
-            print(f"[ERROR] 4星彩失敗: {e}")
+        Returns:
+            dict: {遊戲: {'date', 'predictions', 'elapsed_seconds', ...}} (失敗或逾時的遊戲不在結果中,
+                  各遊戲狀態見 self.last_timing)
+        """
+        parallel = self.config.get('parallel', True) if parallel is None else parallel
+        timeout = self.config.get('game_timeout_seconds') if timeout is None else timeout
+        results = {}
+        
+        print("=" * 80)
+        print(f"多遊戲預測系統 - 生成所有預測 ({'parallel' if parallel else 'sequential'})")
+        print("=" * 80)
+        
+        start = time.perf_counter()
+        if parallel:
+            outcomes = self._predict_parallel(timeout)
+        else:
+            outcomes = {}
+            for i, game in enumerate(GAMES, 1):
+                print(f"\n[{i}/{len(GAMES)}] {GAME_LABELS[game]}...")
+                try:
+                    result, elapsed = self._predict_local(game)
+                    outcomes[game] = {'status': 'ok', 'result': result, 'elapsed_seconds': round(elapsed, 2), 'error': None}
+                except Exception as e:
+                    print(f"[ERROR] {GAME_LABELS[game]} 失敗: {e}")
+                    outcomes[game] = {'status': 'failed', 'result': None, 'elapsed_seconds': None, 'error': str(e)}
+        
+        for game in GAMES:
+            outcome = outcomes[game]
+            data = outcome.pop('result')
+            if outcome['status'] == 'ok' and not data:
+                outcome['status'] = 'empty'
+            if data and data.get('report_request'):
+                schedule_ai_report(data.pop('report_request'))
+            if data:
+                data['elapsed_seconds'] = outcome['elapsed_seconds']
+                results[game] = data
+                self._save_prediction_to_csv(game, data)
+                count = data.get('num_sets', len(data.get('predictions', [])))
+                print(f"[OK] {GAME_LABELS[game]} 完成: {count} 組 ({outcome['elapsed_seconds']:.2f}s)")
+        self.last_timing = outcomes
         
         print("\n" + "=" * 80)
-        print(f"預測完成! 共 {len(results)} 個遊戲")
+        print(f"預測完成! 共 {len(results)} 個遊戲 ({time.perf_counter() - start:.2f}s)")
         print("=" * 80)
         
         return results
@@ -239,17 +340,15 @@ class MultiGameManager:
     def check_data_sync(self, game: str) -> dict:
         """檢查資料是否已同步"""
         try:
-            history_file = f"data/{game}_history.csv"
-            from pathlib import Path
-            if not Path(history_file).exists():
+            if not draw_repository.resolve(game).exists():
                 return {'synced': False, 'reason': 'file_not_found'}
             
-            df = pd.read_csv(history_file)
-            if df.empty:
+            latest = draw_repository.latest_date(game)
+            if latest is None:
                 return {'synced': False, 'reason': 'empty_file'}
             
             # 取得最新日期
-            latest_date = pd.to_datetime(df.iloc[-1]['date'])
+            latest_date = pd.to_datetime(latest)
             
             # 計算預期的最新日期 (昨日)
             expected_date = get_taiwan_now() - timedelta(days=1)
@@ -265,78 +364,82 @@ class MultiGameManager:
         except Exception as e:
             return {'synced': False, 'error': str(e)}
     
-    def verify_all_predictions(self) -> dict:
-        """驗證所有遊戲的待驗證預測"""
-        print("\n[Verification] Starting prediction verification...")
-        results = {}
+    def _verify_game(self, game: str, rows: list):
+        """驗證單一遊戲的待驗證預測 (向量化比對, 單一交易寫入), 回傳 (結果, 耗時秒數)"""
+        start = time.perf_counter()
+        result = get_verification_engine().verify_game(game, rows, fetch_missing=self._fetch_actual_numbers)
+        result.pop('results', None)
         
-        for game in ['539', 'lotto', 'power', 'star3', 'star4']:
-            # 1. 檢查資料同步狀態
+        if result['status'] == 'no_actuals':
             sync_status = self.check_data_sync(game)
             if not sync_status.get('synced', False):
                 print(f"[WARNING] {game} data not synced, skipping verification")
-                results[game] = {
+                result = {
                     'status': 'skipped',
                     'reason': 'data_not_synced',
                     'sync_info': sync_status
                 }
-                continue
-            
-            # 2. 取得待驗證預測
-            pending = prediction_manager.get_pending_predictions(game, days=7)
-            if pending.empty:
-                results[game] = {'status': 'no_pending', 'verified': 0}
-                continue
-            
-            # 3. 讀取實際開獎號碼並驗證
-            verified_count = 0
-            for _, pred_row in pending.iterrows():
-                pred_date = str(pred_row['prediction_date'].date())
-                
-                # 從歷史資料中找到對應日期的開獎號碼
-                actual_numbers = self._get_actual_numbers(game, pred_date)
-                if actual_numbers:
-                    prediction_manager.update_verification(game, pred_date, actual_numbers)
-                    verified_count += 1
-            
-            results[game] = {
-                'status': 'verified',
-                'verified': verified_count,
-                'pending': len(pending)
-            }
+            else:
+                result['status'] = 'verified'
+        
+        return result, time.perf_counter() - start
+    
+    def verify_all_predictions(self, parallel: Optional[bool] = None, timeout: Optional[float] = None) -> dict:
+        """
+        驗證所有遊戲的待驗證預測 (各遊戲以執行緒同時執行)
         
+        Args:
+            parallel: 是否平行執行 (預設依配置 prediction.parallel)
+            timeout: 每個遊戲的逾時秒數 (預設依配置 prediction.game_timeout_seconds)
+        
+        Returns:
+            dict: {遊戲: {'status', 'verified', ..., 'elapsed_seconds'}}
+        """
+        print("\n[Verification] Starting prediction verification...")
+        parallel = self.config.get('parallel', True) if parallel is None else parallel
+        timeout = self.config.get('game_timeout_seconds') if timeout is None else timeout
+        
+        # 所有遊戲的待驗證預測以單一查詢取得; 實際號碼由各遊戲日期索引批次對應
+        pending = get_verification_engine().pending(days=7, games=GAMES)
+        
+        if parallel:
+            pool = ThreadPoolExecutor(max_workers=len(GAMES), thread_name_prefix='verify')
+            try:
+                jobs = {game: (pool, self._verify_game, game, pending.get(game, [])) for game in GAMES}
+                outcomes = self._run_games('Verification', jobs, timeout)
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
+        else:
+            outcomes = {}
+            for game in GAMES:
+                try:
+                    result, elapsed = self._verify_game(game, pending.get(game, []))
+                    outcomes[game] = {'status': 'ok', 'result': result, 'elapsed_seconds': round(elapsed, 2), 'error': None}
+                except Exception as e:
+                    print(f"[ERROR] Verification {game} failed: {e}")
+                    outcomes[game] = {'status': 'failed', 'result': None, 'elapsed_seconds': None, 'error': str(e)}
+        
+        results = {}
+        for game in GAMES:
+            outcome = outcomes[game]
+            result = outcome['result'] or {'status': outcome['status'], 'verified': 0, 'error': outcome['error']}
+            result['elapsed_seconds'] = outcome['elapsed_seconds']
+            results[game] = result
         return results
     
+    def _fetch_actual_numbers(self, game: str, dates: list) -> dict:
+        """由月份頁索引批次取得實際開獎號碼 ({日期: 號碼列表})"""
+        try:
+            records = month_index.lookup_many(game, dates)
+            return {date: draw_numbers(game, record) for date, record in records.items()}
+        except Exception as e:
+            print(f"[ERROR] Failed to fetch actual numbers for {game}: {e}")
+            return {}
+    
     def _get_actual_numbers(self, game: str, date: str) -> list:
-        """從歷史資料中取得實際開獎號碼"""
+        """從歷史資料中取得實際開獎號碼 (不含特別號/第二區)"""
         try:
-            history_file = f"data/{game}_history.csv"
-            df = pd.read_csv(history_file)
-            
-            # 找到對應日期
-            row = df[df['date'] == date]
-            if row.empty:
-                return None
-            
-            # 提取號碼
-            row = row.iloc[0]
-            numbers = []
-            
-            # 根據不同遊戲提取號碼
-            if game in ['539', 'lotto']:
-                for col in ['1', '2', '3', '4', '5', '6']:
-                    if col in row:
-                        numbers.append(int(row[col]))
-            elif game == 'power':
-                for col in ['1', '2', '3', '4', '5', '6']:
-                    if col in row:
-                        numbers.append(int(row[col]))
-            elif game in ['star3', 'star4']:
-                if 'number' in row:
-                    numbers = [int(d) for d in str(row['number'])]
-            
-            return numbers if numbers else None
-            
+            return draw_repository.get_numbers(game, date)
         except Exception as e:
             print(f"[ERROR] Failed to get actual numbers for {game} on {date}: {e}")
             return None
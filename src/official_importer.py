@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+台灣彩券官方年度 CSV 匯入 (data/<年份>/<遊戲>_<年份>.csv)
+- 分塊讀取 (chunksize),向量化轉為各遊戲歷史 CSV 的欄位格式並檢查號碼範圍
+- 同一遊戲所有年份合併後以 HistoryWriter 一次寫入 (暫存檔 + rename 原子替換)
+- 以檔案內容 SHA-256 記錄已匯入的檔案,重新執行時略過未變動的年份
+- 官方資料為準: 同日期資料不同時以官方資料修正 (overwrite=False 則只新增缺少的日期)
+"""
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.history_store import GAME_FILES, STORE_ROOT
+from src.history_writer import get_history_writer
+from src.timezone_utils import get_taiwan_now
+
+
+MANIFEST_PATH = STORE_ROOT / 'official_import.json'
+MANIFEST_VERSION = 1
+
+# 檔名 (去掉 _年份) -> 遊戲; 其他檔案 (樂合彩、加開獎項) 不是獨立開獎,略過
+OFFICIAL_FILES = {
+    '今彩539': '539',
+    '大樂透': 'lotto',
+    '威力彩': 'power',
+    '3星彩': 'star3',
+    '4星彩': 'star4'
+}
+
+# 遊戲 -> (遊戲名稱欄位可接受的值, 主號數, 號碼範圍, 是否排序, 特別號欄位, 特別號範圍)
+GAME_SPECS = {
+    '539': (('今彩539',), 5, (1, 39), True, None, None),
+    'lotto': (('大樂透',), 6, (1, 49), True, '特別號', (1, 49)),
+    'power': (('威力彩',), 6, (1, 38), True, '第二區', (1, 8)),
+    'star3': (('三星彩', '3星彩'), 3, (0, 9), False, None, None),
+    'star4': (('四星彩', '4星彩'), 4, (0, 9), False, None, None)
+}
+
+_YEAR_DIR = re.compile(r'^\d{4}$')
+
+
+def file_digest(path: Path) -> str:
+    """檔案內容 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def discover_files(data_dir: Path = Path('data'), years: Optional[List[str]] = None) -> List[Path]:
+    """data/<年份>/*.csv (依年份、檔名排序)"""
+    files = []
+    for year_dir in sorted(Path(data_dir).iterdir()):
+        if year_dir.is_dir() and _YEAR_DIR.match(year_dir.name) and (not years or year_dir.name in years):
+            files.extend(sorted(year_dir.glob('*.csv')))
+    return files
+
+
+def official_game(path: Path) -> Optional[str]:
+    """由檔名判斷遊戲 (今彩539_2025.csv -> '539')"""
+    return OFFICIAL_FILES.get(Path(path).stem.rsplit('_', 1)[0])
+
+
+def normalize_chunk(game: str, chunk: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    將官方資料塊轉為歷史 CSV 欄位並檢查範圍
+
+    Returns:
+        (DataFrame, dict): 有效資料列, 各原因的剔除筆數
+    """
+    names, count, (low, high), sort_numbers, extra_col, extra_range = GAME_SPECS[game]
+    rejected = {}
+
+    def reject(mask, reason):
+        n = int(mask.sum())
+        if n:
+            rejected[reason] = rejected.get(reason, 0) + n
+        return ~mask
+
+    keep = reject(~chunk['遊戲名稱'].str.strip().isin(names), 'other_game')
+
+    dates = pd.to_datetime(chunk['開獎日期'].str.strip(), format='%Y/%m/%d', errors='coerce')
+    keep &= reject(dates.isna() & keep, 'bad_date')
+
+    number_cols = [f'獎號{i}' for i in range(1, count + 1)]
+    numbers = chunk[number_cols].apply(pd.to_numeric, errors='coerce')
+    keep &= reject(numbers.isna().any(axis=1) & keep, 'missing_number')
+    values = numbers.fillna(-1).to_numpy(dtype=np.int64)
+    keep &= reject(pd.Series(((values < low) | (values > high)).any(axis=1), index=chunk.index) & keep, 'out_of_range')
+    if sort_numbers:
+        values = np.sort(values, axis=1)
+        duplicated = (values[:, 1:] == values[:, :-1]).any(axis=1)
+        keep &= reject(pd.Series(duplicated, index=chunk.index) & keep, 'duplicate_number')
+
+    extra = None
+    if extra_col:
+        extra = pd.to_numeric(chunk[extra_col], errors='coerce')
+        bad = extra.isna() | (extra < extra_range[0]) | (extra > extra_range[1])
+        keep &= reject(bad & keep, 'bad_extra')
+        extra = extra.fillna(-1).astype(np.int64).to_numpy()
+
+    mask = keep.to_numpy()
+    date_strs = dates.dt.strftime('%Y-%m-%d').to_numpy()[mask]
+    values = values[mask]
+
+    if game == '539':
+        out = pd.DataFrame({
+            'date': date_strs,
+            'numbers': [','.join(f'{n:02d}' for n in row) for row in values]
+        })
+    else:
+        out = pd.DataFrame(values.astype(str), columns=[str(i) for i in range(1, count + 1)])
+        out.insert(0, 'date', date_strs)
+        if game == 'lotto':
+            out['special'] = extra[mask].astype(str)
+        elif game == 'power':
+            out['zone2'] = extra[mask].astype(str)
+    return out, rejected
+
+
+def read_official_csv(path: Path, game: str, chunksize: int = 5000) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """分塊讀取單一官方檔案"""
+    _, count, _, _, extra_col, _ = GAME_SPECS[game]
+    usecols = ['遊戲名稱', '開獎日期'] + [f'獎號{i}' for i in range(1, count + 1)] + ([extra_col] if extra_col else [])
+    frames, rejected = [], {}
+    for chunk in pd.read_csv(path, encoding='utf-8-sig', dtype=str, usecols=usecols, chunksize=chunksize):
+        frame, chunk_rejected = normalize_chunk(game, chunk)
+        frames.append(frame)
+        for reason, n in chunk_rejected.items():
+            rejected[reason] = rejected.get(reason, 0) + n
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if not df.empty:
+        df = df.drop_duplicates(subset=['date'], keep='last').sort_values('date').reset_index(drop=True)
+    return df, rejected
+
+
+class OfficialImporter:
+    """官方年度 CSV 匯入器"""
+
+    def __init__(
+        self,
+        data_dir: Path = Path('data'),
+        manifest_path: Path = MANIFEST_PATH,
+        files: Optional[Dict[str, Path]] = None,
+        index_dir: Optional[Path] = None,
+        overwrite: bool = True,
+        chunksize: int = 5000
+    ):
+        """
+        初始化
+
+        Args:
+            data_dir: 年份目錄所在位置
+            manifest_path: 已匯入檔案記錄
+            files: {遊戲: 歷史 CSV} (預設 GAME_FILES, 539 同步寫入 539_train)
+            index_dir: HistoryWriter 日期索引目錄
+            overwrite: 同日期資料不同時是否以官方資料修正
+            chunksize: 每次讀取的列數
+        """
+        self.data_dir = Path(data_dir)
+        self.manifest_path = Path(manifest_path)
+        self.files = {game: Path(p) for game, p in (files or GAME_FILES).items()}
+        self.index_dir = index_dir
+        self.overwrite = overwrite
+        self.chunksize = chunksize
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                return manifest
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        return {'version': MANIFEST_VERSION, 'files': {}}
+
+    def _save_manifest(self):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def _write(self, game: str, df: pd.DataFrame) -> Dict:
+        """單一遊戲一次寫入 (539 同步 539_train)"""
+        records = df.to_dict('records')
+        targets = [self.files[game]]
+        if game == '539' and '539_train' in self.files:
+            targets.append(self.files['539_train'])
+
+        outcome = None
+        for target in targets:
+            writer = get_history_writer(target, self.index_dir)
+            rows = records if self.overwrite else [r for r in records if not writer.has_date(r['date'])]
+            result = writer.write(rows)
+            outcome = outcome or result
+        return outcome
+
+    def run(self, years: Optional[List[str]] = None, force: bool = False, dry_run: bool = False) -> Dict:
+        """
+        匯入
+
+        Args:
+            years: 只匯入這些年份 (預設全部)
+            force: 忽略記錄,全部重新匯入
+            dry_run: 只解析與檢查,不寫入
+
+        Returns:
+            dict: {'files': {檔名: 狀態}, 'games': {遊戲: {'rows', 'added', 'updated', 'mode'}}, 'rejected': {...}}
+        """
+        summary = {'files': {}, 'games': {}, 'rejected': {}}
+        pending = {}
+
+        for path in discover_files(self.data_dir, years):
+            key = path.relative_to(self.data_dir).as_posix()
+            game = official_game(path)
+            if game is None:
+                summary['files'][key] = 'skipped (not a main draw file)'
+                continue
+
+            digest = file_digest(path)
+            if not force and self.manifest['files'].get(key, {}).get('sha256') == digest:
+                summary['files'][key] = 'unchanged'
+                continue
+
+            df, rejected = read_official_csv(path, game, self.chunksize)
+            if rejected:
+                summary['rejected'][key] = rejected
+                print(f"[WARNING] {key}: rejected rows {rejected}")
+            pending.setdefault(game, []).append((key, digest, df))
+            summary['files'][key] = f"parsed {len(df)} rows"
+
+        for game, items in pending.items():
+            df = pd.concat([item[2] for item in items], ignore_index=True)
+            df = df.drop_duplicates(subset=['date'], keep='last').sort_values('date').reset_index(drop=True)
+            stats = {'rows': len(df), 'added': 0, 'updated': 0, 'mode': 'dry_run'}
+
+            if not dry_run and not df.empty:
+                outcome = self._write(game, df)
+                stats.update(added=outcome['added'], updated=outcome['updated'], mode=outcome['mode'])
+                print(f"[SUCCESS] {game}: {len(df)} official rows -> +{outcome['added']} new, "
+                      f"{outcome['updated']} corrected ({outcome['mode']})")
+            summary['games'][game] = stats
+
+            if not dry_run:
+                imported_at = get_taiwan_now().replace(tzinfo=None).isoformat(timespec='seconds')
+                for key, digest, frame in items:
+                    self.manifest['files'][key] = {
+                        'sha256': digest, 'game': game, 'rows': len(frame), 'imported_at': imported_at
+                    }
+                self._save_manifest()
+
+        return summary
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    print(OfficialImporter().run(dry_run=True))
+    print(f"Elapsed: {time.perf_counter() - start:.2f}s")
@@ -1,21 +1,99 @@
 """
 預測歷史記錄管理模組
 提供預測結果的儲存、載入與查詢功能
+記錄存放於 SQLite (WAL 模式),以 prediction_date 為主鍵索引;
+prediction_history.json 僅作為舊資料遷移來源與相容匯出格式。
 """
 import json
 import os
+import threading
 from datetime import datetime
 from pathlib import Path
 from src.logger import logger
-from src.timezone_utils import get_taiwan_datetime_str, get_taiwan_now
+from src.timezone_utils import get_taiwan_datetime_str
+from src.sqlite_utils import connect, transaction, data_version
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    prediction_date TEXT NOT NULL UNIQUE,
+    created_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_created ON predictions (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_predictions_status ON predictions (status);
+"""
+
 
 class PredictionHistory:
     """預測歷史記錄管理器"""
     
-    def __init__(self):
-        self.history_dir = Path("data/predictions")
+    def __init__(self, history_dir="data/predictions"):
+        self.history_dir = Path(history_dir)
         self.history_dir.mkdir(parents=True, exist_ok=True)
         self.history_file = self.history_dir / "prediction_history.json"
+        self.db_file = self.history_dir / "prediction_history.db"
+        
+        self._lock = threading.RLock()
+        self._conn = connect(self.db_file)
+        self._conn.executescript(_SCHEMA)
+        
+        # 最新一筆記錄的快取 (資料版本不變時直接回傳)
+        self._latest_cache = None
+        self._latest_version = None
+        
+        self._migrate_json()
+    
+    def _migrate_json(self):
+        """首次啟用時將舊版 JSON 記錄匯入資料庫"""
+        if not self.history_file.exists():
+            return
+        
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM predictions LIMIT 1").fetchone():
+                return
+            
+            try:
+                with open(self.history_file, 'r', encoding='utf-8') as f:
+                    history = json.load(f)
+            except Exception as e:
+                logger.error(f"讀取舊版預測記錄失敗: {e}")
+                return
+            
+            with transaction(self._conn):
+                for record in history:
+                    self._upsert(record)
+        
+        logger.info(f"已匯入 {len(history)} 筆舊版預測記錄 -> {self.db_file}")
+    
+    def _upsert(self, record):
+        """寫入單筆記錄 (同日期則覆蓋, 保留原排序位置); 須在交易內呼叫"""
+        self._conn.execute(
+            """
+            INSERT INTO predictions (prediction_date, created_at, status, record)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(prediction_date) DO UPDATE SET
+                created_at = excluded.created_at,
+                status = excluded.status,
+                record = excluded.record
+            """,
+            (
+                record.get("prediction_date"),
+                record.get("created_at", ""),
+                record.get("status", "pending"),
+                json.dumps(record, ensure_ascii=False)
+            )
+        )
+    
+    def _fetch_record(self, prediction_date):
+        """以主鍵索引查詢單筆記錄"""
+        row = self._conn.execute(
+            "SELECT record FROM predictions WHERE prediction_date = ?",
+            (prediction_date,)
+        ).fetchone()
+        return json.loads(row["record"]) if row else None
         
     def save_prediction(self, prediction_date, numbers, scores=None, backtest_result=None):
         """
@@ -31,9 +109,6 @@ class PredictionHistory:
             bool: 是否儲存成功
         """
         try:
-            # 載入現有歷史
-            history = self.load_all_predictions()
-            
             # 建立新記錄
             record = {
                 "prediction_date": prediction_date,
@@ -51,27 +126,19 @@ class PredictionHistory:
             if backtest_result is not None:
                 record["backtest"] = backtest_result
             
-            # 檢查是否已有相同日期的預測
-            existing_index = None
-            for i, h in enumerate(history):
-                if h.get("prediction_date") == prediction_date:
-                    existing_index = i
-                    break
+            # 同日期已有預測則覆蓋 (單一交易內完成)
+            with transaction(self._conn, self._lock):
+                exists = self._conn.execute(
+                    "SELECT 1 FROM predictions WHERE prediction_date = ?",
+                    (prediction_date,)
+                ).fetchone()
+                self._upsert(record)
             
-            if existing_index is not None:
-                # 更新現有記錄
-                # 保留原有狀態如果已驗證? 不，覆蓋
-                history[existing_index] = record
+            if exists:
                 logger.info(f"更新預測記錄: {prediction_date}")
             else:
-                # 新增記錄
-                history.append(record)
                 logger.info(f"新增預測記錄: {prediction_date}")
             
-            # 儲存到檔案
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(history, f, indent=2, ensure_ascii=False)
-            
             logger.success(f"預測結果已儲存: {prediction_date} - {numbers}")
             return True
             
@@ -80,34 +147,33 @@ class PredictionHistory:
             return False
     
     def load_all_predictions(self):
-        """載入所有預測記錄"""
-        if not self.history_file.exists():
-            return []
-        
+        """載入所有預測記錄 (依新增順序)"""
         try:
-            with open(self.history_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with self._lock:
+                rows = self._conn.execute("SELECT record FROM predictions ORDER BY id").fetchall()
+            return [json.loads(row["record"]) for row in rows]
         except Exception as e:
             logger.error(f"載入預測記錄失敗: {e}")
             return []
     
     def get_latest_prediction(self):
-        """取得最新的預測記錄"""
-        history = self.load_all_predictions()
-        if not history:
-            return None
-        
-        # 按建立時間排序,取最新的
-        history.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-        return history[0]
+        """取得最新的預測記錄 (資料未變動時直接回傳快取)"""
+        with self._lock:
+            version = data_version(self._conn)
+            if version != self._latest_version:
+                row = self._conn.execute(
+                    "SELECT record FROM predictions ORDER BY created_at DESC, id LIMIT 1"
+                ).fetchone()
+                self._latest_cache = json.loads(row["record"]) if row else None
+                self._latest_version = version
+            
+            # 回傳副本,避免呼叫端修改快取內容
+            return json.loads(json.dumps(self._latest_cache)) if self._latest_cache else None
     
     def get_prediction_by_date(self, prediction_date):
         """根據預測日期查詢記錄"""
-        history = self.load_all_predictions()
-        for record in history:
-            if record.get("prediction_date") == prediction_date:
-                return record
-        return None
+        with self._lock:
+            return self._fetch_record(prediction_date)
     
     def update_actual_result(self, prediction_date, actual_numbers):
         """
@@ -118,60 +184,77 @@ class PredictionHistory:
             actual_numbers: 實際開獎號碼
         """
         try:
-            history = self.load_all_predictions()
-            updated = False
-            
-            for record in history:
-                if record.get("prediction_date") == prediction_date:
-                    predicted = record.get("predicted_numbers", [])
-                    
-                    # 處理多組號碼
-                    best_accuracy = 0.0
-                    best_hits = []
-                    
-                    prediction_sets = []
-                    if len(predicted) > 0 and isinstance(predicted[0], list):
-                        prediction_sets = predicted
-                    else:
-                        prediction_sets = [predicted]
-                    
-                    actual_set = set(actual_numbers)
-                    
-                    for p_set in prediction_sets:
-                         p_set_clean = [int(x) for x in p_set]
-                         hits = list(set(p_set_clean) & actual_set)
-                         acc = len(hits) / 5.0
-                         
-                         if acc > best_accuracy or (acc == best_accuracy and len(hits) > len(best_hits)):
-                             best_accuracy = acc
-                             best_hits = hits
-                    
-                    record["actual_numbers"] = actual_numbers
-                    record["hits"] = best_hits
-                    record["accuracy"] = best_accuracy
-                    record["status"] = "verified"
-                    record["verified_at"] = get_taiwan_datetime_str()
+            with transaction(self._conn, self._lock):
+                record = self._fetch_record(prediction_date)
+                if record is None:
+                    logger.warning(f"找不到預測記錄: {prediction_date}")
+                    return False
+                
+                predicted = record.get("predicted_numbers", [])
+                
+                # 處理多組號碼
+                best_accuracy = 0.0
+                best_hits = []
+                
+                prediction_sets = []
+                if len(predicted) > 0 and isinstance(predicted[0], list):
+                    prediction_sets = predicted
+                else:
+                    prediction_sets = [predicted]
+                
+                actual_set = set(actual_numbers)
+                
+                for p_set in prediction_sets:
+                    p_set_clean = [int(x) for x in p_set]
+                    hits = list(set(p_set_clean) & actual_set)
+                    acc = len(hits) / 5.0
                     
-                    updated = True
-                    logger.info(f"更新記錄 {prediction_date} -> Verified (Best Accuracy: {best_accuracy:.0%})")
-                    break
-            
-            if updated:
-                # 儲存更新 (Atomic write to avoid corruption)
-                start_write = get_taiwan_now()
-                with open(self.history_file, 'w', encoding='utf-8') as f:
-                    json.dump(history, f, indent=2, ensure_ascii=False)
+                    if acc > best_accuracy or (acc == best_accuracy and len(hits) > len(best_hits)):
+                        best_accuracy = acc
+                        best_hits = hits
                 
-                logger.success("實際結果已更新到檔案")
-                return True
-            else:
-                logger.warning(f"找不到預測記錄: {prediction_date}")
-                return False
+                record["actual_numbers"] = actual_numbers
+                record["hits"] = best_hits
+                record["accuracy"] = best_accuracy
+                record["status"] = "verified"
+                record["verified_at"] = get_taiwan_datetime_str()
+                
+                self._upsert(record)
+            
+            logger.info(f"更新記錄 {prediction_date} -> Verified (Best Accuracy: {best_accuracy:.0%})")
+            logger.success("實際結果已更新到資料庫")
+            return True
             
         except Exception as e:
             logger.error(f"更新實際結果失敗: {e}")
             return False
     
+    def update_status(self, prediction_date, status):
+        """
+        更新預測狀態 (例如放棄預測時設為 expired)
+        
+        Args:
+            prediction_date: 預測日期
+            status: pending / verified / expired
+        
+        Returns:
+            bool: 是否找到並更新記錄
+        """
+        try:
+            with transaction(self._conn, self._lock):
+                record = self._fetch_record(prediction_date)
+                if record is None:
+                    logger.warning(f"找不到預測記錄: {prediction_date}")
+                    return False
+                record["status"] = status
+                self._upsert(record)
+            
+            logger.info(f"更新記錄 {prediction_date} -> {status}")
+            return True
+        except Exception as e:
+            logger.error(f"更新預測狀態失敗: {e}")
+            return False
+    
     def has_pending_prediction(self):
         """檢查是否有待驗證的預測"""
         latest = self.get_latest_prediction()
@@ -189,6 +272,26 @@ class PredictionHistory:
     def get_all_predictions(self):
         """取得所有預測記錄 (別名方法,與 load_all_predictions 相同)"""
         return self.load_all_predictions()
+    
+    def export_json(self, output_file=None):
+        """
+        匯出為舊版 JSON 格式 (供相容用途)
+        
+        Args:
+            output_file: 輸出路徑 (預設為 prediction_history.json)
+        
+        Returns:
+            Path: 輸出檔案路徑
+        """
+        output_file = Path(output_file) if output_file else self.history_file
+        tmp_file = output_file.with_suffix(output_file.suffix + ".tmp")
+        
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.load_all_predictions(), f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, output_file)
+        
+        logger.info(f"預測記錄已匯出: {output_file}")
+        return output_file
 
 # 建立全域實例
 prediction_history = PredictionHistory()
@@ -4,20 +4,134 @@
 """
 import pandas as pd
 import json
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Iterable, Tuple
 from src.timezone_utils import get_taiwan_now, get_taiwan_isoformat
+from src.sqlite_utils import connect, transaction
+from src.verification_engine import match_hits
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    game TEXT NOT NULL,
+    prediction_date TEXT NOT NULL,
+    predicted_numbers TEXT NOT NULL,
+    actual_numbers TEXT NOT NULL DEFAULT '',
+    hits INTEGER,
+    accuracy REAL,
+    verified INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    verified_at TEXT,
+    metadata TEXT,
+    UNIQUE (game, prediction_date)
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_verified
+    ON predictions (game, verified, prediction_date);
+CREATE TABLE IF NOT EXISTS prediction_counts (
+    game TEXT PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_COLUMNS = [
+    'prediction_date', 'predicted_numbers', 'actual_numbers', 'hits',
+    'accuracy', 'verified', 'created_at', 'verified_at'
+]
+
+_EMPTY_STATS = {'total': 0, 'verified': 0, 'avg_accuracy': 0}
 
 
 class PredictionManager:
-    """預測管理器 - 管理所有遊戲的預測記錄"""
+    """預測管理器 - 管理所有遊戲的預測記錄 (SQLite, 各遊戲共用一個資料庫)"""
     
-    def __init__(self):
-        self.predictions_dir = Path('data/predictions')
+    def __init__(self, predictions_dir: str = 'data/predictions'):
+        self.predictions_dir = Path(predictions_dir)
         self.predictions_dir.mkdir(parents=True, exist_ok=True)
+        self.db_file = self.predictions_dir / 'predictions.db'
         
         self.games = ['539', 'lotto', 'power', 'star3', 'star4']
+        
+        self._lock = threading.RLock()
+        self._conn = connect(self.db_file)
+        self._conn.executescript(_SCHEMA)
+        
+        for game in self.games:
+            self._migrate_csv(game)
+    
+    def _migrate_csv(self, game: str):
+        """首次啟用時匯入舊版 {game}_predictions.csv"""
+        csv_file = self.predictions_dir / f"{game}_predictions.csv"
+        if not csv_file.exists():
+            return
+        
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM predictions WHERE game = ? LIMIT 1", (game,)).fetchone():
+                return
+            
+            try:
+                df = pd.read_csv(csv_file, dtype={'predicted_numbers': str, 'actual_numbers': str})
+            except Exception as e:
+                print(f"[ERROR] Failed to read {csv_file}: {e}")
+                return
+            
+            with transaction(self._conn):
+                for row in df.to_dict('records'):
+                    row = {k: (None if pd.isna(v) else v) for k, v in row.items()}
+                    metadata = {k: v for k, v in row.items() if k not in _COLUMNS}
+                    verified = str(row.get('verified')).lower() in ('true', '1', '1.0')
+                    self._insert(game, {
+                        'prediction_date': str(row['prediction_date']),
+                        'predicted_numbers': row.get('predicted_numbers') or '',
+                        'actual_numbers': row.get('actual_numbers') or '',
+                        'hits': int(row['hits']) if row.get('hits') is not None else None,
+                        'accuracy': row.get('accuracy'),
+                        'verified': int(verified),
+                        'created_at': row.get('created_at') or get_taiwan_isoformat(),
+                        'verified_at': row.get('verified_at'),
+                        'metadata': json.dumps(metadata, ensure_ascii=False) if metadata else None
+                    })
+        
+        print(f"[INFO] Migrated {len(df)} {game} predictions from {csv_file.name}")
+    
+    def _insert(self, game: str, record: Dict) -> bool:
+        """新增一筆記錄並更新計數 (須在交易內呼叫); 已存在則回傳 False"""
+        cursor = self._conn.execute(
+            """
+            INSERT OR IGNORE INTO predictions
+                (game, prediction_date, predicted_numbers, actual_numbers, hits, accuracy,
+                 verified, created_at, verified_at, metadata)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                game, record['prediction_date'], record['predicted_numbers'], record['actual_numbers'],
+                record['hits'], record['accuracy'], record['verified'], record['created_at'],
+                record['verified_at'], record['metadata']
+            )
+        )
+        if cursor.rowcount == 0:
+            return False
+        
+        self._conn.execute(
+            """
+            INSERT INTO prediction_counts (game, total) VALUES (?, 1)
+            ON CONFLICT(game) DO UPDATE SET total = total + 1
+            """,
+            (game,)
+        )
+        return True
+    
+    @staticmethod
+    def _cutoff(days: int) -> str:
+        """
+        最近 N 天的起始時間 (字串)
+        prediction_date (YYYY-MM-DD) 與 'YYYY-MM-DD HH:MM:SS' 以字串比較,
+        等同於以日期 00:00 與截止時間比較
+        """
+        cutoff = (get_taiwan_now() - timedelta(days=days)).replace(tzinfo=None)
+        return cutoff.strftime('%Y-%m-%d %H:%M:%S')
     
     def save_prediction(self, game: str, prediction_date: str, numbers: List[int], 
                        metadata: Optional[Dict] = None) -> bool:
@@ -31,8 +145,6 @@ class PredictionManager:
             metadata: 額外資訊 (策略、信心度等)
         """
         try:
-            csv_file = self.predictions_dir / f"{game}_predictions.csv"
-            
             # 準備資料
             record = {
                 'prediction_date': prediction_date,
@@ -40,33 +152,20 @@ class PredictionManager:
                 'actual_numbers': '',
                 'hits': None,
                 'accuracy': None,
-                'verified': False,
-                'created_at': get_taiwan_isoformat()
+                'verified': 0,
+                'created_at': get_taiwan_isoformat(),
+                'verified_at': None,
+                'metadata': json.dumps(metadata, ensure_ascii=False) if metadata else None
             }
             
-            # 添加 metadata
-            if metadata:
-                record.update(metadata)
+            with transaction(self._conn, self._lock):
+                inserted = self._insert(game, record)
             
-            # 讀取現有資料
-            if csv_file.exists():
-                df = pd.read_csv(csv_file)
-            else:
-                df = pd.DataFrame()
-            
-            # 檢查是否已存在
-            if not df.empty and prediction_date in df['prediction_date'].values:
+            if not inserted:
                 print(f"[WARNING] Prediction for {game} on {prediction_date} already exists")
                 return False
             
-            # 新增記錄
-            new_df = pd.DataFrame([record])
-            df = pd.concat([df, new_df], ignore_index=True)
-            
-            # 儲存
-            df.to_csv(csv_file, index=False, encoding='utf-8-sig')
             print(f"[SUCCESS] Saved prediction for {game} on {prediction_date}")
-            
             return True
             
         except Exception as e:
@@ -81,22 +180,29 @@ class PredictionManager:
             game: 遊戲名稱
             days: 查詢最近幾天的預測
         """
-        csv_file = self.predictions_dir / f"{game}_predictions.csv"
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT * FROM predictions
+                WHERE game = ? AND verified = 0 AND prediction_date >= ?
+                ORDER BY prediction_date
+                """,
+                (game, self._cutoff(days))
+            ).fetchall()
         
-        if not csv_file.exists():
+        if not rows:
             return pd.DataFrame()
         
-        df = pd.read_csv(csv_file)
-        
-        # 篩選未驗證的預測
-        pending = df[df['verified'] == False].copy()
-        
-        # 篩選最近 N 天
-        if not pending.empty:
-            pending['prediction_date'] = pd.to_datetime(pending['prediction_date']).dt.tz_localize(None)
-            cutoff_date = (get_taiwan_now() - timedelta(days=days)).replace(tzinfo=None)
-            pending = pending[pending['prediction_date'] >= cutoff_date]
+        records = []
+        for row in rows:
+            record = {col: row[col] for col in _COLUMNS}
+            record['verified'] = bool(record['verified'])
+            if row['metadata']:
+                record.update(json.loads(row['metadata']))
+            records.append(record)
         
+        pending = pd.DataFrame(records)
+        pending['prediction_date'] = pd.to_datetime(pending['prediction_date'])
         return pending
     
     def update_verification(self, game: str, prediction_date: str, 
@@ -112,103 +218,188 @@ class PredictionManager:
         Returns:
             驗證結果 (命中數、準確率等)
         """
+        return self.update_verifications(game, [(prediction_date, actual_numbers)])[0]
+    
+    def get_pending_rows(self, days: int = 7, games: Optional[Iterable[str]] = None) -> Dict[str, List[Tuple[str, List[int]]]]:
+        """
+        所有遊戲的待驗證預測 (單一查詢, 供批次驗證使用)
+        
+        Args:
+            days: 查詢最近幾天的預測
+            games: 遊戲列表 (預設全部)
+        
+        Returns:
+            dict: {遊戲: [(預測日期, 預測號碼), ...]} (依日期排序)
+        """
+        games = list(games or self.games)
+        placeholders = ','.join('?' * len(games))
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT game, prediction_date, predicted_numbers FROM predictions
+                WHERE verified = 0 AND prediction_date >= ? AND game IN ({placeholders})
+                ORDER BY game, prediction_date
+                """,
+                [self._cutoff(days)] + games
+            ).fetchall()
+        
+        pending = {}
+        for row in rows:
+            numbers = [int(n) for n in row['predicted_numbers'].split(',') if n.strip()]
+            pending.setdefault(row['game'], []).append((row['prediction_date'][:10], numbers))
+        return pending
+    
+    def record_verifications(self, game: str, results: List[Dict]) -> int:
+        """
+        寫入已計算的驗證結果 (單一交易, executemany)
+        
+        Args:
+            game: 遊戲名稱
+            results: [{'date', 'actual', 'hits', 'accuracy'}, ...]
+        
+        Returns:
+            int: 寫入筆數 (失敗時為 0, 整批回滾)
+        """
+        if not results:
+            return 0
+        verified_at = get_taiwan_isoformat()
+        params = [
+            (','.join(map(str, r['actual'])), r['hits'], r['accuracy'], verified_at, game, r['date'])
+            for r in results
+        ]
         try:
-            csv_file = self.predictions_dir / f"{game}_predictions.csv"
-            
-            if not csv_file.exists():
-                return {'error': 'No predictions file found'}
-            
-            df = pd.read_csv(csv_file)
-            
-            # 找到對應的預測
-            mask = df['prediction_date'] == prediction_date
-            if not mask.any():
-                return {'error': f'No prediction found for {prediction_date}'}
-            
-            # 取得預測號碼
-            predicted_str = df.loc[mask, 'predicted_numbers'].iloc[0]
-            predicted_numbers = [int(n) for n in predicted_str.split(',')]
-            
-            # 計算命中數
-            hits = len(set(predicted_numbers) & set(actual_numbers))
-            accuracy = hits / len(predicted_numbers)
-            
-            # 更新記錄
-            df.loc[mask, 'actual_numbers'] = ','.join(map(str, actual_numbers))
-            df.loc[mask, 'hits'] = hits
-            df.loc[mask, 'accuracy'] = accuracy
-            df.loc[mask, 'verified'] = True
-            df.loc[mask, 'verified_at'] = get_taiwan_isoformat()
-            
-            # 儲存
-            df.to_csv(csv_file, index=False, encoding='utf-8-sig')
+            with transaction(self._conn, self._lock):
+                self._conn.executemany(
+                    """
+                    UPDATE predictions
+                    SET actual_numbers = ?, hits = ?, accuracy = ?, verified = 1, verified_at = ?
+                    WHERE game = ? AND prediction_date = ?
+                    """,
+                    params
+                )
+        except Exception as e:
+            print(f"[ERROR] Failed to update verification: {e}")
+            return 0
+        
+        for r in results:
+            print(f"[SUCCESS] Verified {game} prediction: {r['hits']} hits ({r['accuracy']:.1%})")
+        return len(results)
+    
+    def update_verifications(self, game: str, items: Iterable[Tuple[str, List[int]]]) -> List[Dict]:
+        """
+        批次更新驗證結果 (單一交易)
+        
+        Args:
+            game: 遊戲名稱
+            items: [(預測日期, 實際開獎號碼), ...]
+        
+        Returns:
+            list: 每筆的驗證結果 (找不到記錄時為 {'error': ...})
+        """
+        items = list(items)
+        if not items:
+            return []
+        try:
+            dates = [prediction_date for prediction_date, _ in items]
+            placeholders = ','.join('?' * len(dates))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT prediction_date, predicted_numbers FROM predictions "
+                    f"WHERE game = ? AND prediction_date IN ({placeholders})",
+                    [game] + dates
+                ).fetchall()
+            predicted = {row['prediction_date']: [int(n) for n in row['predicted_numbers'].split(',')] for row in rows}
             
-            result = {
-                'game': game,
-                'date': prediction_date,
-                'predicted': predicted_numbers,
-                'actual': actual_numbers,
-                'hits': hits,
-                'accuracy': accuracy
+            # 計算命中數 (向量化集合交集)
+            found = [(d, predicted[d], list(actual)) for d, actual in items if d in predicted]
+            hits = match_hits([f[1] for f in found], [f[2] for f in found])
+            computed = {
+                d: {
+                    'game': game,
+                    'date': d,
+                    'predicted': p,
+                    'actual': a,
+                    'hits': int(h),
+                    'accuracy': int(h) / len(p)
+                }
+                for (d, p, a), h in zip(found, hits)
             }
             
-            print(f"[SUCCESS] Verified {game} prediction: {hits} hits ({accuracy:.1%})")
-            
-            return result
+            if computed and not self.record_verifications(game, list(computed.values())):
+                return [{'error': 'write failed'} for _ in items]
+            return [computed.get(d, {'error': f'No prediction found for {d}'}) for d in dates]
             
         except Exception as e:
             print(f"[ERROR] Failed to update verification: {e}")
-            return {'error': str(e)}
+            return [{'error': str(e)} for _ in items]
+    
+    def _stats_from_row(self, row, total: int) -> Dict:
+        """由彙總查詢結果組成統計字典"""
+        if row is None or not row['verified']:
+            return dict(_EMPTY_STATS)
+        
+        return {
+            'total': total,
+            'verified': row['verified'],
+            'avg_accuracy': row['avg_accuracy'],
+            'avg_hits': row['avg_hits'],
+            'max_hits': int(row['max_hits']),
+            'min_hits': int(row['min_hits']),
+            'date_range': f"{row['first_date'][:10]} ~ {row['last_date'][:10]}"
+        }
+    
+    _STATS_SELECT = """
+        SELECT game,
+               COUNT(*) AS verified,
+               AVG(accuracy) AS avg_accuracy,
+               AVG(hits) AS avg_hits,
+               MAX(hits) AS max_hits,
+               MIN(hits) AS min_hits,
+               MIN(prediction_date) AS first_date,
+               MAX(prediction_date) AS last_date
+        FROM predictions
+    """
     
     def get_accuracy_stats(self, game: str, days: int = 30) -> Dict:
         """
-        取得準確率統計
+        取得準確率統計 (SQL 彙總, 只掃描統計區間內的索引範圍)
         
         Args:
             game: 遊戲名稱
             days: 統計最近幾天
         """
-        csv_file = self.predictions_dir / f"{game}_predictions.csv"
-        
-        if not csv_file.exists():
-            return {'total': 0, 'verified': 0, 'avg_accuracy': 0}
-        
-        df = pd.read_csv(csv_file)
+        with self._lock:
+            row = self._conn.execute(
+                self._STATS_SELECT + " WHERE game = ? AND verified = 1 AND prediction_date >= ?",
+                (game, self._cutoff(days))
+            ).fetchone()
+            total = self._conn.execute(
+                "SELECT total FROM prediction_counts WHERE game = ?", (game,)
+            ).fetchone()
         
-        # 篩選已驗證的預測
-        verified = df[df['verified'] == True].copy()
-        
-        if verified.empty:
-            return {'total': 0, 'verified': 0, 'avg_accuracy': 0}
-        
-        # 篩選最近 N 天
-        verified['prediction_date'] = pd.to_datetime(verified['prediction_date']).dt.tz_localize(None)
-        cutoff_date = (get_taiwan_now() - timedelta(days=days)).replace(tzinfo=None)
-        recent = verified[verified['prediction_date'] >= cutoff_date]
-        
-        if recent.empty:
-            return {'total': 0, 'verified': 0, 'avg_accuracy': 0}
-        
-        stats = {
-            'total': len(df),
-            'verified': len(recent),
-            'avg_accuracy': recent['accuracy'].mean(),
-            'avg_hits': recent['hits'].mean(),
-            'max_hits': int(recent['hits'].max()),
-            'min_hits': int(recent['hits'].min()),
-            'date_range': f"{recent['prediction_date'].min().date()} ~ {recent['prediction_date'].max().date()}"
-        }
-        
-        return stats
+        return self._stats_from_row(row, total['total'] if total else 0)
     
     def get_all_stats(self, days: int = 30) -> Dict:
-        """取得所有遊戲的統計"""
-        all_stats = {}
+        """取得所有遊戲的統計 (各遊戲一次索引範圍彙總)"""
+        cutoff = self._cutoff(days)
         
-        for game in self.games:
-            all_stats[game] = self.get_accuracy_stats(game, days)
+        with self._lock:
+            rows = {
+                game: self._conn.execute(
+                    self._STATS_SELECT + " WHERE game = ? AND verified = 1 AND prediction_date >= ?",
+                    (game, cutoff)
+                ).fetchone()
+                for game in self.games
+            }
+            totals = {
+                row['game']: row['total']
+                for row in self._conn.execute("SELECT game, total FROM prediction_counts").fetchall()
+            }
         
-        return all_stats
+        return {
+            game: self._stats_from_row(rows.get(game), totals.get(game, 0))
+            for game in self.games
+        }
 
 
 # 全域實例
@@ -9,6 +9,9 @@ Scoring System:
 - 3 hits: Profit (score = 1)
 - 4 hits: Profit (score = 2)
 - 5 hits: Profit (score = 3)
+
+Results are stored column-wise in NumPy arrays with running and rolling-window
+(30/100/300 periods) counters, so summaries stay O(1) during long walk-forward runs.
 """
 import pandas as pd
 import numpy as np
@@ -16,99 +19,246 @@ import json
 from datetime import datetime
 
 
-class ProfitEvaluator:
-    """Money-Making Rate Evaluator"""
+# Profit status codes stored in the columnar arrays
+STATUS_LOSS = 0
+STATUS_BREAK_EVEN = 1
+STATUS_PROFIT = 2
+STATUS_NAMES = ('loss', 'break_even', 'profit')
+
+# Hit-count histogram size (0..MAX_HITS, larger values are clipped)
+MAX_HITS = 7
+
+
+def _is_int_period(period):
+    """Plain integer period IDs can use the compact int64 column"""
+    return isinstance(period, (int, np.integer)) and not isinstance(period, (bool, np.bool_))
+
+
+class _RunningStats:
+    """Running counters over a contiguous slice of results"""
     
     def __init__(self):
-        self.results = []
+        self.count = 0
+        self.status_counts = np.zeros(len(STATUS_NAMES), dtype=np.int64)
+        self.hits_counts = np.zeros(MAX_HITS + 1, dtype=np.int64)
+        self.total_score = 0
+        self.total_hits = 0
+    
+    def add(self, hits, status, score):
+        self.count += 1
+        self.status_counts[status] += 1
+        self.hits_counts[min(hits, MAX_HITS)] += 1
+        self.total_score += score
+        self.total_hits += hits
+    
+    def remove(self, hits, status, score):
+        self.count -= 1
+        self.status_counts[status] -= 1
+        self.hits_counts[min(hits, MAX_HITS)] -= 1
+        self.total_score -= score
+        self.total_hits -= hits
+    
+    def rate(self, status):
+        return self.status_counts[status] / self.count if self.count else 0.0
+    
+    def summary(self):
+        total = self.count
+        hits_distribution = {}
+        for i in range(6):
+            count = int(self.hits_counts[i])
+            hits_distribution[i] = {
+                'count': count,
+                'percentage': count / total if total > 0 else 0
+            }
+        
+        return {
+            'total_periods': total,
+            'profit_rate': float(self.rate(STATUS_PROFIT)),
+            'loss_rate': float(self.rate(STATUS_LOSS)),
+            'break_even_rate': float(self.rate(STATUS_BREAK_EVEN)),
+            'total_score': int(self.total_score),
+            'avg_score_per_period': self.total_score / total if total > 0 else 0,
+            'avg_hits': self.total_hits / total if total > 0 else 0.0,
+            'hits_distribution': hits_distribution
+        }
+
+
+class ProfitEvaluator:
+    """
+    Money-Making Rate Evaluator
+    
+    Results are kept in preallocated NumPy columns (grown by doubling) with
+    running counters for the full history and for each rolling window, so
+    add_result and every getter are O(1) regardless of the number of periods.
+    """
+    
+    ROLLING_WINDOWS = (30, 100, 300)
+    
+    def __init__(self, capacity=256, rolling_windows=ROLLING_WINDOWS):
+        """
+        Args:
+            capacity: Initial number of preallocated rows
+            rolling_windows: Window sizes (periods) for rolling aggregates
+        """
+        self.rolling_windows = tuple(rolling_windows)
+        self._allocate(max(int(capacity), 1), number_width=7)
+        self._size = 0
+        self._totals = _RunningStats()
+        self._rolling = {w: _RunningStats() for w in self.rolling_windows}
+    
+    def _allocate(self, capacity, number_width, period_dtype=np.int64):
+        """
+        Allocate empty columns
+        
+        Periods use int64 until a non-integer ID (e.g. '2025001A', '007') is
+        added; the column then switches to object dtype and keeps IDs as given.
+        """
+        self._capacity = capacity
+        self._periods = np.zeros(capacity, dtype=period_dtype) if period_dtype != object \
+            else np.full(capacity, None, dtype=object)
+        self._hits = np.zeros(capacity, dtype=np.int16)
+        self._status = np.zeros(capacity, dtype=np.int8)
+        self._scores = np.zeros(capacity, dtype=np.int16)
+        # Predicted / actual numbers, padded with -1
+        self._predicted = np.full((capacity, number_width), -1, dtype=np.int16)
+        self._actual = np.full((capacity, number_width), -1, dtype=np.int16)
+    
+    def _grow(self, min_capacity, number_width):
+        """Double capacity (and widen number columns) keeping existing rows"""
+        new_capacity = self._capacity
+        while new_capacity < min_capacity:
+            new_capacity *= 2
+        new_width = max(number_width, self._predicted.shape[1])
+        
+        if new_capacity == self._capacity and new_width == self._predicted.shape[1]:
+            return
+        
+        old = (self._periods, self._hits, self._status, self._scores,
+               self._predicted, self._actual)
+        n = self._size
+        self._allocate(new_capacity, new_width, old[0].dtype)
+        self._periods[:n] = old[0][:n]
+        self._hits[:n] = old[1][:n]
+        self._status[:n] = old[2][:n]
+        self._scores[:n] = old[3][:n]
+        self._predicted[:n, :old[4].shape[1]] = old[4][:n]
+        self._actual[:n, :old[5].shape[1]] = old[5][:n]
+    
+    @staticmethod
+    def _classify(hits):
+        """Determine economic benefit: (status code, score)"""
+        if hits >= 3:
+            return STATUS_PROFIT, hits - 2  # 3 hits=1, 4 hits=2, 5 hits=3
+        elif hits == 2:
+            return STATUS_BREAK_EVEN, 0
+        else:  # 0-1 hits
+            return STATUS_LOSS, -1
+    
+    def __len__(self):
+        return self._size
     
     def add_result(self, period, predicted, actual, hits):
         """
         Record single period result
         
         Args:
-            period: Period number
+            period: Period ID (int, or any other ID such as a prefixed string)
             predicted: Predicted numbers (list)
             actual: Actual winning numbers (list)
             hits: Number of hits
         """
-        # Determine economic benefit
-        if hits >= 3:
-            profit_status = 'profit'  # Profitable
-            score = hits - 2  # 3 hits=1, 4 hits=2, 5 hits=3
-        elif hits == 2:
-            profit_status = 'break_even'  # Break even
-            score = 0
-        else:  # 0-1 hits
-            profit_status = 'loss'  # Loss
-            score = -1
-        
-        self.results.append({
-            'period': period,
-            'predicted': predicted,
-            'actual': actual,
-            'hits': hits,
-            'profit_status': profit_status,
-            'score': score
-        })
+        hits = int(hits)
+        predicted = list(predicted) if predicted is not None else []
+        actual = list(actual) if actual is not None else []
+        
+        i = self._size
+        width = max(len(predicted), len(actual))
+        if i >= self._capacity or width > self._predicted.shape[1]:
+            self._grow(i + 1, width)
+        
+        status, score = self._classify(hits)
+        
+        if self._periods.dtype != object and not _is_int_period(period):
+            self._periods = self._periods.astype(object)
+        self._periods[i] = period
+        self._hits[i] = hits
+        self._status[i] = status
+        self._scores[i] = score
+        self._predicted[i, :len(predicted)] = predicted
+        self._actual[i, :len(actual)] = actual
+        self._size = i + 1
+        
+        # Running counters
+        self._totals.add(hits, status, score)
+        for window, stats in self._rolling.items():
+            stats.add(hits, status, score)
+            if i >= window:
+                j = i - window
+                stats.remove(int(self._hits[j]), int(self._status[j]), int(self._scores[j]))
+    
+    @property
+    def results(self):
+        """Results as a list of dicts (compatibility view, O(n))"""
+        return [self._row(i) for i in range(self._size)]
+    
+    def _row(self, i):
+        predicted = self._predicted[i]
+        actual = self._actual[i]
+        return {
+            'period': int(self._periods[i]) if self._periods.dtype != object else self._periods[i],
+            'predicted': [int(n) for n in predicted[predicted >= 0]],
+            'actual': [int(n) for n in actual[actual >= 0]],
+            'hits': int(self._hits[i]),
+            'profit_status': STATUS_NAMES[self._status[i]],
+            'score': int(self._scores[i])
+        }
+    
+    def get_hits_array(self):
+        """Read-only view of the hits column"""
+        view = self._hits[:self._size]
+        view.flags.writeable = False
+        return view
     
     def get_profit_rate(self):
         """Calculate profit rate (3+ hits period ratio)"""
-        if not self.results:
-            return 0.0
-        
-        profit_periods = sum(1 for r in self.results if r['profit_status'] == 'profit')
-        return profit_periods / len(self.results)
+        return float(self._totals.rate(STATUS_PROFIT))
     
     def get_loss_rate(self):
         """Calculate loss rate (0-1 hits period ratio)"""
-        if not self.results:
-            return 0.0
-        
-        loss_periods = sum(1 for r in self.results if r['profit_status'] == 'loss')
-        return loss_periods / len(self.results)
+        return float(self._totals.rate(STATUS_LOSS))
     
     def get_break_even_rate(self):
         """Calculate break-even rate (2 hits period ratio)"""
-        if not self.results:
-            return 0.0
-        
-        break_even_periods = sum(1 for r in self.results if r['profit_status'] == 'break_even')
-        return break_even_periods / len(self.results)
+        return float(self._totals.rate(STATUS_BREAK_EVEN))
     
     def get_total_score(self):
         """Calculate total score"""
-        return sum(r['score'] for r in self.results)
+        return int(self._totals.total_score)
     
     def get_avg_hits(self):
         """Calculate average hits per period"""
-        if not self.results:
+        if not self._size:
             return 0.0
-        return sum(r['hits'] for r in self.results) / len(self.results)
+        return self._totals.total_hits / self._size
     
     def get_summary(self):
         """Get summary statistics"""
-        total = len(self.results)
-        
-        # Group by hits count
-        hits_distribution = {}
-        for i in range(6):
-            count = sum(1 for r in self.results if r['hits'] == i)
-            hits_distribution[i] = {
-                'count': count,
-                'percentage': count / total if total > 0 else 0
-            }
+        return self._totals.summary()
+    
+    def get_rolling_summary(self, window):
+        """
+        Get summary statistics of the last `window` periods
         
-        return {
-            'total_periods': total,
-            'profit_rate': self.get_profit_rate(),
-            'loss_rate': self.get_loss_rate(),
-            'break_even_rate': self.get_break_even_rate(),
-            'total_score': self.get_total_score(),
-            'avg_score_per_period': self.get_total_score() / total if total > 0 else 0,
-            'avg_hits': self.get_avg_hits(),
-            'hits_distribution': hits_distribution
-        }
+        Args:
+            window: One of rolling_windows (e.g. 30, 100, 300)
+        """
+        if window not in self._rolling:
+            raise ValueError(f"Unknown rolling window {window}, available: {self.rolling_windows}")
+        return self._rolling[window].summary()
+    
+    def get_all_rolling_summaries(self):
+        """Get summaries for every rolling window"""
+        return {window: stats.summary() for window, stats in self._rolling.items()}
     
     def print_summary(self):
         """Display summary report"""
@@ -212,9 +362,59 @@ class ProfitEvaluator:
         with open(filepath, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
-        self.results = data['results']
+        self._reset()
+        for r in data['results']:
+            self.add_result(r['period'], r['predicted'], r['actual'], r['hits'])
+        print(f"[OK] Results loaded from: {filepath}")
+        print(f"     Total periods: {self._size}")
+    
+    def save_binary(self, filepath):
+        """Save results to a compressed NumPy (.npz) file"""
+        n = self._size
+        periods = self._periods[:n]
+        if periods.dtype == object:
+            # Non-integer period IDs are stored as a JSON list (no pickling needed)
+            periods = np.asarray(json.dumps([p.item() if isinstance(p, np.generic) else p for p in periods],
+                                            ensure_ascii=False, default=str))
+        np.savez_compressed(
+            filepath,
+            periods=periods,
+            hits=self._hits[:n],
+            predicted=self._predicted[:n],
+            actual=self._actual[:n],
+            rolling_windows=np.asarray(self.rolling_windows, dtype=np.int64)
+        )
+        print(f"[OK] Results saved to: {filepath}")
+    
+    def load_binary(self, filepath):
+        """Load results from a .npz file written by save_binary"""
+        with np.load(filepath) as data:
+            periods = data['periods']
+            if periods.ndim == 0:
+                periods = json.loads(str(periods))
+            hits = data['hits']
+            predicted = data['predicted']
+            actual = data['actual']
+            windows = tuple(int(w) for w in data['rolling_windows'])
+        
+        self.rolling_windows = windows
+        self._reset(capacity=max(len(periods), 1), number_width=max(predicted.shape[1], actual.shape[1], 1))
+        for i in range(len(periods)):
+            self.add_result(
+                periods[i],
+                predicted[i][predicted[i] >= 0],
+                actual[i][actual[i] >= 0],
+                int(hits[i])
+            )
         print(f"[OK] Results loaded from: {filepath}")
-        print(f"     Total periods: {len(self.results)}")
+        print(f"     Total periods: {self._size}")
+    
+    def _reset(self, capacity=256, number_width=7):
+        """Clear all results and counters"""
+        self._allocate(capacity, number_width)
+        self._size = 0
+        self._totals = _RunningStats()
+        self._rolling = {w: _RunningStats() for w in self.rolling_windows}
 
 
 if __name__ == "__main__":
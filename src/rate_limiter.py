@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+令牌桶限速器 (Token Bucket)
+每秒補充 rate 個令牌,最多累積 capacity 個;取不到令牌時等待補充。
+執行緒安全,可讓多個工作執行緒共用同一個速率上限。
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+
+class TokenBucket:
+    """令牌桶限速器"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        初始化
+
+        Args:
+            rate: 每秒補充的令牌數 (<= 0 表示不限速)
+            capacity: 桶容量 (允許的瞬間突發量, 預設 = max(1, rate))
+            clock: 時間來源 (測試時可替換)
+            sleep: 等待函式 (測試時可替換)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        嘗試取得令牌 (不等待)
+
+        Returns:
+            float: 0 = 已取得; > 0 = 需再等待的秒數
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        取得令牌,不足時等待
+
+        Args:
+            tokens: 令牌數
+            timeout: 最長等待秒數 (None = 一直等待)
+
+        Returns:
+            bool: 是否取得
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            self._sleep(wait)
+
+    @property
+    def available(self) -> float:
+        """目前可用的令牌數"""
+        with self._lock:
+            self._refill(self._clock())
+            return self._tokens
+
+
+if __name__ == "__main__":
+    bucket = TokenBucket(rate=5, capacity=2)
+    start = time.monotonic()
+    for i in range(10):
+        bucket.acquire()
+        print(f"request {i}: {time.monotonic() - start:.2f}s")
@@ -2,6 +2,7 @@ import google.generativeai as genai
 import os
 import pandas as pd
 from src.api_key_manager import api_key_manager
+from src.llm_quota import estimate_tokens, get_llm_limiter
 
 class GeminiReporter:
     def __init__(self):
@@ -27,8 +28,18 @@ class GeminiReporter:
             self.model = None
             print(f"Error initializing Gemini: {e}")
 
-    def generate_report(self, candidates, scores_df):
+    def generate_report(self, candidates, scores_df, raise_errors=False):
+        """
+        生成 AI 分析報告
+
+        Args:
+            candidates: 推薦號碼
+            scores_df: 各號碼模型分數
+            raise_errors: 失敗時拋出例外 (預設回傳錯誤訊息文字,供直接顯示的呼叫端使用)
+        """
         if not self.model:
+            if raise_errors:
+                raise RuntimeError("AI Report unavailable (Missing API Key)")
             return "AI Report unavailable (Missing API Key)."
 
         # Prepare data for prompt
@@ -68,9 +79,13 @@ class GeminiReporter:
 """
         print("Sending request to Gemini...")
         try:
-            response = self.model.generate_content(prompt)
+            with get_llm_limiter().request('gemini_reporter', 'review',
+                                           tokens=estimate_tokens(prompt) + 1500) as ticket:
+                response = ticket.record(self.model.generate_content(prompt), prompt)
             return response.text
         except Exception as e:
+            if raise_errors:
+                raise
             return f"Error generating report: {e}"
 
 if __name__ == "__main__":
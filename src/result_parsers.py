@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+開獎結果頁面解析器 (lotto.auzo.tw 月份列表頁)
+模組層級的純函式,預設在目前行程依序解析; 需要時可交給 spawn 行程池平行執行。
+節點擷取交給 src/html_backends.py 的解析後端 (selectolax/lxml/bs4),此處只保留轉換規則。
+"""
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from src.html_backends import get_backend
+
+
+def parse_539(html_content: str, current_ym: str, backend: Optional[str] = None,
+              verbose: bool = True) -> List[Dict]:
+    """解析 539"""
+    data = []
+    for row in get_backend(backend).auzo_table_rows(html_content):
+        date_str = row['date']
+        if not date_str.startswith(current_ym) or not row['has_ul']:
+            continue
+        
+        if row['sorted'] is not None:
+            nums = [int(n) for n in row['sorted']]
+        else:
+            nums = [int(n) for n in row['links'][:5]]
+        
+        if len(nums) == 5:
+            nums.sort()
+            data.append({
+                'date': date_str,
+                'numbers': ','.join(map(str, nums))
+            })
+            if verbose:
+                print(f"Parsed 539 {date_str}: {nums}")
+    return data
+
+def parse_power(html_content: str, current_ym: str, backend: Optional[str] = None,
+                verbose: bool = True) -> List[Dict]:
+    data = []
+    for row in get_backend(backend).auzo_table_rows(html_content):
+        date_str = row['date']
+        if not date_str.startswith(current_ym) or not row['has_ul']:
+            continue
+        
+        links = row['links']
+        if row['sorted'] is not None:
+            nums = [int(n) for n in row['sorted']]
+        elif len(links) >= 12: nums = [int(n) for n in links[6:12]]
+        elif len(links) >= 6: nums = [int(n) for n in links[:6]]
+        else: nums = []
+
+        special = next((text for style, text in row['styled']
+                        if 'color:#005aff' in style and 'font-size:48px' in style), None)
+        if not special:
+             if len(row['cells']) >= 3: special = row['cells'][2]
+
+        if nums and special:
+            data.append({
+                'date': date_str,
+                '1': nums[0], '2': nums[1], '3': nums[2],
+                '4': nums[3], '5': nums[4], '6': nums[5],
+                'zone2': special
+            })
+            if verbose:
+                print(f"Parsed Power {date_str}: {nums} + {special}")
+    return data
+
+def parse_lotto(html_content: str, current_ym: str, backend: Optional[str] = None,
+                verbose: bool = True) -> List[Dict]:
+    data = []
+    for row in get_backend(backend).auzo_table_rows(html_content):
+        date_str = row['date']
+        if not date_str.startswith(current_ym) or not row['has_ul']:
+            continue
+        
+        links = row['links']
+        if row['sorted'] is not None:
+           nums = [int(n) for n in row['sorted']]
+        elif len(links) >= 12: nums = [int(n) for n in links[6:12]]
+        else: nums = [int(n) for n in links[:6]]
+        
+        special = next((text for style, text in row['styled'] if 'color:#005aff' in style), "0")
+        
+        if nums:
+            data.append({
+                'date': date_str,
+                '1': nums[0], '2': nums[1], '3': nums[2],
+                '4': nums[3], '5': nums[4], '6': nums[5],
+                'special': special
+            })
+            if verbose:
+                print(f"Parsed Lotto {date_str}: {nums} + {special}")
+    return data
+
+def parse_star(html_content: str, current_ym: str, star_type: int, backend: Optional[str] = None,
+               verbose: bool = True) -> List[Dict]:
+    data = []
+    date_pattern = re.compile(r'(\d{4}-\d{2}-\d{2})')
+    
+    for tds in get_backend(backend).auzo_star_rows(html_content):
+        if len(tds) < 3: continue
+        
+        date_match = date_pattern.search(tds[2][0])
+        if not date_match: continue
+        date_str = date_match.group(1)
+        
+        if not date_str.startswith(current_ym): continue
+        
+        nums = tds[1][1]
+        
+        if len(nums) == star_type:
+            record = {'date': date_str}
+            for i, n in enumerate(nums):
+                record[f'{i+1}'] = n
+            data.append(record)
+            if verbose:
+                print(f"Parsed Star{star_type} {date_str}: {nums}")
+    return data
+
+
+PARSERS = {
+    '539': parse_539,
+    'power': parse_power,
+    'lotto': parse_lotto
+}
+
+
+def parse_page(game: str, html_content: str, current_ym: str, backend: Optional[str] = None,
+               verbose: bool = True) -> List[Dict]:
+    """依遊戲解析 lotto.auzo.tw 頁面 (3星彩/4星彩為歷史列表頁)"""
+    if game in ('star3', 'star4'):
+        return parse_star(html_content, current_ym, int(game[-1]), backend, verbose)
+    return PARSERS[game](html_content, current_ym, backend, verbose)
+
+
+def _parse_job(job: Tuple[str, str, str, Optional[str]]) -> List[Dict]:
+    """工作行程入口: (遊戲, HTML, 年月, 解析後端)"""
+    game, html_content, current_ym, backend = job
+    return parse_page(game, html_content, current_ym, backend)
+
+
+def parse_pages(pages: Dict[str, str], current_ym: str, max_workers: Optional[int] = None,
+                backend: Optional[str] = None) -> Dict[str, object]:
+    """
+    解析多個遊戲頁面 (預設在目前行程依序解析)
+
+    呼叫端 (AutoUpdater) 執行於多執行緒的排程行程中,fork 出的子行程可能繼承
+    其他執行緒持有的鎖而卡死,因此只在明確指定 max_workers > 1 時才使用
+    spawn 行程池。
+
+    Args:
+        pages: {遊戲: HTML}
+        current_ym: 只保留此年月 (YYYY-MM) 的開獎
+        max_workers: 工作行程數 (None 或 <= 1 = 在目前行程依序解析)
+        backend: 解析後端名稱 (None = 依配置檔, 見 src/html_backends.py)
+
+    Returns:
+        dict: {遊戲: 解析結果列表 或 Exception}
+    """
+    jobs = {game: (game, html, current_ym, backend) for game, html in pages.items() if html}
+    if not jobs:
+        return {}
+
+    workers = min(max_workers or 1, len(jobs))
+    results = {}
+
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = {game: pool.submit(_parse_job, job) for game, job in jobs.items()}
+                for game, future in futures.items():
+                    try:
+                        results[game] = future.result()
+                    except Exception as e:
+                        results[game] = e
+            return results
+        except (OSError, RuntimeError) as e:
+            # 無法建立行程池 (例如受限環境) 時改為依序解析
+            print(f"[WARNING] Process pool unavailable ({e}), parsing sequentially")
+            results = {}
+
+    for game, job in jobs.items():
+        try:
+            results[game] = _parse_job(job)
+        except Exception as e:
+            results[game] = e
+    return results
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+非阻塞重試 (Retry Runner)
+- 每次嘗試都是排程器上的一次性工作 (DateTrigger),失敗後以指數退避 + 隨機抖動排入下一次,不佔住工作執行緒等待
+- 每個任務名稱有並行上限,同名任務仍在執行時延後再試 (不計入嘗試次數)
+- 每次嘗試的開始時間、耗時與結果都會記錄,最終結果以 Future 回傳
+- 排程器尚未啟動時 (手動執行) 改用 threading.Timer 排程
+"""
+import random
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+from datetime import timedelta
+from typing import Callable, Deque, Dict, List, Optional
+
+from src.task_dag import TaskSkipped
+from src.timezone_utils import get_taiwan_isoformat, get_taiwan_now
+
+
+class RetryPolicy:
+    """指數退避策略"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 300, factor: float = 2.0,
+                 max_delay: float = 1800, jitter: float = 0.2):
+        """
+        初始化
+
+        Args:
+            max_attempts: 最多嘗試次數
+            base_delay: 第一次重試前等待秒數
+            factor: 每次重試的等待倍數
+            max_delay: 等待秒數上限
+            jitter: 隨機抖動比例 (0.2 = ±20%)
+        """
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    @classmethod
+    def from_config(cls, retry_config: Dict) -> 'RetryPolicy':
+        """依配置檔 retry 區段建立"""
+        return cls(
+            max_attempts=retry_config.get('max_attempts', 3),
+            base_delay=retry_config.get('interval_minutes', 5) * 60,
+            factor=retry_config.get('backoff_factor', 2.0),
+            max_delay=retry_config.get('max_interval_minutes', 30) * 60,
+            jitter=retry_config.get('jitter', 0.2)
+        )
+
+    def delay(self, attempt: int, rng: random.Random = random) -> float:
+        """第 attempt 次失敗後的等待秒數 (attempt 從 1 開始)"""
+        delay = min(self.max_delay, self.base_delay * self.factor ** (attempt - 1))
+        if self.jitter:
+            delay *= 1 + rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, delay)
+
+
+class _RetryState:
+    """單一任務的重試進度"""
+
+    def __init__(self, func: Callable, name: str, policy: RetryPolicy):
+        self.func = func
+        self.name = name
+        self.policy = policy
+        self.attempt = 0
+        self.future: Future = Future()
+
+
+class RetryRunner:
+    """以一次性排程工作執行重試"""
+
+    def __init__(
+        self,
+        scheduler=None,
+        policy: Optional[RetryPolicy] = None,
+        per_task_limit: int = 1,
+        busy_delay: float = 5.0,
+        on_attempt: Optional[Callable[[Dict], None]] = None,
+        on_give_up: Optional[Callable[[str, BaseException, str], None]] = None,
+        history_size: int = 500,
+        rng: Optional[random.Random] = None
+    ):
+        """
+        初始化
+
+        Args:
+            scheduler: APScheduler 排程器 (未啟動時改用 threading.Timer)
+            policy: 預設重試策略
+            per_task_limit: 同名任務最多同時執行數
+            busy_delay: 同名任務已達上限時延後的秒數
+            on_attempt: 每次嘗試結束後的回呼 (傳入嘗試記錄)
+            on_give_up: 最後一次嘗試仍失敗時的回呼 (任務名稱, 例外, stack trace)
+            history_size: 保留的嘗試記錄數
+            rng: 抖動用亂數產生器 (測試時可固定種子)
+        """
+        self.scheduler = scheduler
+        self.policy = policy or RetryPolicy()
+        self.per_task_limit = max(1, per_task_limit)
+        self.busy_delay = busy_delay
+        self.on_attempt = on_attempt
+        self.on_give_up = on_give_up
+        self.rng = rng or random.Random()
+        self.attempts: Deque[Dict] = deque(maxlen=history_size)
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    # ---- scheduling ----
+    def _slot(self, name: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if name not in self._slots:
+                self._slots[name] = threading.BoundedSemaphore(self.per_task_limit)
+            return self._slots[name]
+
+    def _schedule(self, state: _RetryState, delay: float):
+        """排入一次性工作 (delay 秒後)"""
+        if self.scheduler is not None and self.scheduler.running:
+            self.scheduler.add_job(
+                self._run_attempt,
+                'date',
+                run_date=get_taiwan_now() + timedelta(seconds=delay),
+                args=[state],
+                name=f"{state.name}#retry{state.attempt + 1}",
+                misfire_grace_time=None
+            )
+        else:
+            timer = threading.Timer(delay, self._run_attempt, args=[state])
+            timer.daemon = True
+            timer.start()
+
+    def submit(self, func: Callable, name: str, policy: Optional[RetryPolicy] = None) -> Future:
+        """
+        送出任務 (立即返回)
+
+        Args:
+            func: 任務函式
+            name: 任務名稱 (並行上限與記錄用)
+            policy: 覆寫預設重試策略
+
+        Returns:
+            Future: 成功時為 True,用盡重試次數為 False; 任務拋出 TaskSkipped 時以該例外結束
+        """
+        state = _RetryState(func, name, policy or self.policy)
+        self._schedule(state, 0)
+        return state.future
+
+    # ---- attempt ----
+    def _record(self, record: Dict):
+        with self._lock:
+            self.attempts.append(record)
+        if self.on_attempt:
+            try:
+                self.on_attempt(record)
+            except Exception as e:
+                print(f"[WARNING] Retry attempt callback failed: {e}")
+
+    def _run_attempt(self, state: _RetryState):
+        """執行一次嘗試 (排程器工作執行緒)"""
+        slot = self._slot(state.name)
+        if not slot.acquire(blocking=False):
+            print(f"[INFO] {state.name} already running, retry in {self.busy_delay:.0f}s")
+            self._schedule(state, self.busy_delay)
+            return
+
+        state.attempt += 1
+        max_attempts = state.policy.max_attempts
+        record = {
+            'task': state.name,
+            'attempt': state.attempt,
+            'max_attempts': max_attempts,
+            'started_at': get_taiwan_isoformat(),
+            'outcome': 'success',
+            'error': None,
+            'next_retry_seconds': None
+        }
+        print(f"[INFO] Executing {state.name} (attempt {state.attempt}/{max_attempts})...")
+        start = time.perf_counter()
+        error, stack_trace = None, None
+        try:
+            state.func()
+        except TaskSkipped as e:
+            record.update(outcome='skipped', error=str(e))
+            error = e
+        except Exception as e:
+            error, stack_trace = e, traceback.format_exc()
+            record.update(outcome='error', error=f"{type(e).__name__}: {e}", stack_trace=stack_trace)
+        finally:
+            slot.release()
+        record['duration_seconds'] = round(time.perf_counter() - start, 3)
+
+        if record['outcome'] == 'error' and state.attempt < max_attempts:
+            record['next_retry_seconds'] = round(state.policy.delay(state.attempt, self.rng), 1)
+        self._record(record)
+
+        if record['outcome'] == 'success':
+            state.future.set_result(True)
+        elif record['outcome'] == 'skipped':
+            state.future.set_exception(error)
+        elif record['next_retry_seconds'] is not None:
+            print(f"[WARNING] {state.name} failed ({record['error']}), "
+                  f"retry in {record['next_retry_seconds']:.1f}s")
+            self._schedule(state, record['next_retry_seconds'])
+        else:
+            if self.on_give_up:
+                try:
+                    self.on_give_up(state.name, error, stack_trace)
+                except Exception as e:
+                    print(f"[WARNING] Retry give-up callback failed: {e}")
+            state.future.set_result(False)
+
+    # ---- report ----
+    def history(self, name: Optional[str] = None) -> List[Dict]:
+        """嘗試記錄 (可依任務名稱篩選)"""
+        with self._lock:
+            return [dict(r) for r in self.attempts if name is None or r['task'] == name]
+
+
+if __name__ == "__main__":
+    calls = {'n': 0}
+
+    def flaky():
+        calls['n'] += 1
+        if calls['n'] < 3:
+            raise RuntimeError(f"transient failure {calls['n']}")
+
+    runner = RetryRunner(policy=RetryPolicy(max_attempts=4, base_delay=0.2, max_delay=1, jitter=0.2))
+    future = runner.submit(flaky, 'flaky')
+    print(f"Result: {future.result(timeout=10)}")
+    for attempt in runner.history():
+        print({k: v for k, v in attempt.items() if k != 'stack_trace'})
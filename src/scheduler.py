@@ -1,17 +1,22 @@
 # -*- coding: utf-8 -*-
 """
 自動化排程系統
-使用 APScheduler 管理所有定時任務
+使用 APScheduler 管理所有定時任務;每日流程由開獎偵測 (DrawWatcher) 觸發,以任務相依圖 (TaskDAG) 執行
 """
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 from pathlib import Path
-from typing import Callable, Optional
-import traceback
+from typing import Callable, Dict, Optional
 from src.structured_logger import structured_logger
+from src.advisor_executor import check_cancelled, get_advisor_executor
 from src.discord_notifier import DiscordNotifier
+from src.draw_watcher import DrawWatcher
+from src.llm_quota import get_llm_limiter
+from src.retry_runner import RetryPolicy, RetryRunner
+from src.task_dag import TaskDAG, TaskSkipped
 from src.timezone_utils import get_taiwan_now
 
 
@@ -23,17 +28,34 @@ class AutoScheduler:
         from src.timezone_utils import TAIWAN_TZ
         self.config_path = Path(config_path)
         self.config = self._load_config()
-        # 明確設定台灣時區
-        self.scheduler = BlockingScheduler(timezone=TAIWAN_TZ)
+        retry_config = self.config.get('retry', {})
+        # 明確設定台灣時區; 任務與重試都在執行緒池上執行,重試不佔住工作執行緒等待
+        self.scheduler = BlockingScheduler(
+            timezone=TAIWAN_TZ,
+            executors={'default': ThreadPoolExecutor(retry_config.get('max_workers', 8))}
+        )
         self.discord = DiscordNotifier(config_path)
+        self.advisors = get_advisor_executor(str(self.config_path))
+        self.retry_runner = RetryRunner(
+            self.scheduler,
+            RetryPolicy.from_config(retry_config),
+            per_task_limit=retry_config.get('per_task_concurrency', 1),
+            on_attempt=self._record_attempt,
+            on_give_up=self._alert_failure
+        )
         
         # 任務執行統計
         self.task_stats = {
             'data_update': {'success': 0, 'failed': 0},
             'verification': {'success': 0, 'failed': 0},
             'prediction': {'success': 0, 'failed': 0},
-            'training': {'success': 0, 'failed': 0}
+            'training': {'success': 0, 'failed': 0},
+            'math_validation': {'success': 0, 'failed': 0},
+            'numerology_advice': {'success': 0, 'failed': 0},
+            'digital_twin_review': {'success': 0, 'failed': 0}
         }
+        self.last_pipeline_run = None
+        self.draw_watcher = None
     
     def _load_config(self) -> dict:
         """載入配置檔"""
@@ -48,6 +70,67 @@ class AutoScheduler:
             print(f"[ERROR] Failed to load config: {e}")
             return {}
     
+    def _record_attempt(self, record: Dict):
+        """記錄單次嘗試的耗時與結果"""
+        task_name = record['task']
+        structured_logger.log_operation(
+            operation_type=task_name,
+            status=record['outcome'],
+            details={k: v for k, v in record.items() if k != 'stack_trace'},
+            duration_seconds=record['duration_seconds']
+        )
+        
+        if record['outcome'] == 'success':
+            if task_name in self.task_stats:
+                self.task_stats[task_name]['success'] += 1
+            print(f"[SUCCESS] {task_name} completed in {record['duration_seconds']:.2f}s")
+        elif record['outcome'] == 'skipped':
+            print(f"[INFO] {task_name} skipped: {record['error']}")
+        else:
+            print(f"[ERROR] {task_name} failed: {record['error']}")
+            structured_logger.log_execution_error(
+                error_type=record['error'].split(':', 1)[0],
+                error_message=record['error'],
+                stack_trace=record.get('stack_trace'),
+                context={'task_name': task_name, 'attempt': record['attempt']}
+            )
+    
+    def _alert_failure(self, task_name: str, error: BaseException, stack_trace: str):
+        """用盡重試次數: 發送 Discord 警報"""
+        self.discord.send_error_alert(
+            error_type=f"{task_name} Failed",
+            error_message=f"{task_name} failed: {error}",
+            stack_trace=stack_trace
+        )
+        if task_name in self.task_stats:
+            self.task_stats[task_name]['failed'] += 1
+    
+    def _retry_policy(self, max_attempts: Optional[int], interval_minutes: Optional[int]) -> Optional[RetryPolicy]:
+        """依參數覆寫預設重試策略 (皆為 None 時使用預設)"""
+        if max_attempts is None and interval_minutes is None:
+            return None
+        retry_config = dict(self.config.get('retry', {}))
+        if max_attempts is not None:
+            retry_config['max_attempts'] = max_attempts
+        if interval_minutes is not None:
+            retry_config['interval_minutes'] = interval_minutes
+        return RetryPolicy.from_config(retry_config)
+    
+    def submit_with_retry(
+        self,
+        task_func: Callable,
+        task_name: str,
+        max_attempts: Optional[int] = None,
+        interval_minutes: Optional[int] = None
+    ):
+        """
+        送出任務 (立即返回); 失敗時以一次性排程工作指數退避重試
+        
+        Returns:
+            Future: 成功為 True, 用盡重試次數為 False, 略過時以 TaskSkipped 結束
+        """
+        return self.retry_runner.submit(task_func, task_name, self._retry_policy(max_attempts, interval_minutes))
+    
     def _execute_with_retry(
         self, 
         task_func: Callable, 
@@ -55,71 +138,13 @@ class AutoScheduler:
         max_attempts: Optional[int] = None,
         interval_minutes: Optional[int] = None
     ) -> bool:
-        """執行任務並支援重試機制"""
-        if max_attempts is None:
-            max_attempts = self.config.get('retry', {}).get('max_attempts', 3)
-        if interval_minutes is None:
-            interval_minutes = self.config.get('retry', {}).get('interval_minutes', 5)
-        
-        start_time = get_taiwan_now()
+        """
+        執行任務並等待重試結果 (供 TaskDAG 等需要結果的呼叫端使用)
         
-        for attempt in range(max_attempts):
-            try:
-                print(f"[INFO] Executing {task_name} (attempt {attempt + 1}/{max_attempts})...")
-                
-                # 執行任務
-                task_func()
-                
-                # 計算執行時間
-                duration = (get_taiwan_now() - start_time).total_seconds()
-                
-                # 記錄成功
-                structured_logger.log_operation(
-                    operation_type=task_name,
-                    status='success',
-                    duration_seconds=duration
-                )
-                
-                # 更新統計
-                if task_name in self.task_stats:
-                    self.task_stats[task_name]['success'] += 1
-                
-                print(f"[SUCCESS] {task_name} completed in {duration:.2f}s")
-                return True
-                
-            except Exception as e:
-                error_msg = f"{task_name} failed: {e}"
-                stack_trace = traceback.format_exc()
-                
-                print(f"[ERROR] {error_msg}")
-                
-                # 記錄異常
-                structured_logger.log_execution_error(
-                    error_type=type(e).__name__,
-                    error_message=str(e),
-                    stack_trace=stack_trace,
-                    context={'task_name': task_name, 'attempt': attempt + 1}
-                )
-                
-                # 如果是最後一次嘗試,發送 Discord 警報
-                if attempt == max_attempts - 1:
-                    self.discord.send_error_alert(
-                        error_type=f"{task_name} Failed",
-                        error_message=error_msg,
-                        stack_trace=stack_trace
-                    )
-                    
-                    # 更新統計
-                    if task_name in self.task_stats:
-                        self.task_stats[task_name]['failed'] += 1
-                    
-                    return False
-                
-                # 等待後重試
-                import time
-                time.sleep(interval_minutes * 60)
-        
-        return False
+        等待期間不佔用排程器的工作執行緒: 每次嘗試與重試都是獨立的一次性工作。
+        任務拋出 TaskSkipped 時直接拋出,不重試。
+        """
+        return self.submit_with_retry(task_func, task_name, max_attempts, interval_minutes).result()
     
     def add_daily_task(
         self, 
@@ -130,7 +155,7 @@ class AutoScheduler:
     ):
         """新增每日定時任務"""
         self.scheduler.add_job(
-            lambda: self._execute_with_retry(task_func, task_name),
+            lambda: self.submit_with_retry(task_func, task_name),
             CronTrigger(hour=hour, minute=minute),
             id=task_name,
             name=task_name,
@@ -149,7 +174,7 @@ class AutoScheduler:
         """新增每週定時任務"""
         # day_of_week: 'monday', 'tuesday', ..., 'sunday'
         self.scheduler.add_job(
-            lambda: self._execute_with_retry(task_func, task_name),
+            lambda: self.submit_with_retry(task_func, task_name),
             CronTrigger(day_of_week=day_of_week, hour=hour, minute=minute),
             id=task_name,
             name=task_name,
@@ -159,11 +184,20 @@ class AutoScheduler:
     
     # 真實任務函數
     def _run_data_update(self):
-        """執行每日資料更新"""
+        """執行每日資料更新 (失敗時拋出例外以重試; 沒有新開獎時略過下游)"""
         from src.auto_updater import AutoUpdater
         print("\n[Scheduler] Starting Data Update...")
         updater = AutoUpdater()
-        updater.update_and_validate()
+        result = updater.update_and_validate()
+        
+        if not result.get('success'):
+            raise RuntimeError(f"Data update failed: {result.get('errors')}")
+        
+        pipeline_config = self.config.get('schedule', {}).get('pipeline', {})
+        if result.get('new_records', 0) == 0 and pipeline_config.get('skip_when_no_new_data', True):
+            raise TaskSkipped('no new draw data')
+        
+        return result
     
     def _run_verification(self):
         """執行預測驗證 (所有遊戲)"""
@@ -189,7 +223,7 @@ class AutoScheduler:
         
         # 傳遞驗證結果給訓練流程
         verification_results = getattr(self, 'last_verification_results', None)
-        trainer.run_full_training(verification_results=verification_results)
+        return trainer.run_full_training(verification_results=verification_results)
 
     def _run_math_validation(self):
         """執行數學專家驗證"""
@@ -197,6 +231,11 @@ class AutoScheduler:
         print("\n[Scheduler] Starting Math Validation...")
         validator = MathValidator()
         results = validator.run_daily_validation()
+        
+        # stop_on_error: 資料有嚴重問題時視為失敗,相依的驗證/預測一併略過
+        stop_on_error = self.config.get('ai_advisors', {}).get('math_validator', {}).get('stop_on_error', False)
+        if stop_on_error and results.get('summary', {}).get('has_critical_issues'):
+            raise RuntimeError('Math validation found critical data issues')
         return results
     
     def _run_numerology_advice(self):
@@ -207,6 +246,7 @@ class AutoScheduler:
         advisor = NumerologyAdvisor()
         today = date.today().strftime('%Y-%m-%d')
         advice = advisor.get_daily_numerology_advice(today)
+        check_cancelled()
         advisor.send_daily_numerology_report(today, advice)
         return advice
     
@@ -229,6 +269,96 @@ class AutoScheduler:
         manager = MultiGameManager()
         results = manager.generate_all_predictions()
         manager.send_all_predictions(results)
+        return results
+
+    def _run_advisor(self, advisor: str, task_func: Callable):
+        """以顧問執行器執行並等待 (最多到截止時間); 失敗或逾時時拋出例外"""
+        record = self.advisors.run(advisor, task_func)
+        if record['status'] != 'ok':
+            raise RuntimeError(f"{advisor} {record['status']}: {record['error']}")
+        return record['result']
+
+    def build_daily_pipeline(self) -> TaskDAG:
+        """
+        建立每日流程相依圖
+        
+        data_update       -> math_validation, verification, training, prediction
+        verification      -> training (只等待結束; 驗證失敗時仍以既有資料訓練)
+        training, math_validation -> prediction (只等待結束)
+        prediction        -> digital_twin_review
+        
+        - 沒有新開獎 (data_update 略過) 時,驗證/訓練/預測/分身審查一併略過
+        - AI 顧問經由顧問執行器執行,各有截止時間 (ai_advisors.<顧問>.deadline_seconds),逾時即取消
+        - 命理建議與分身審查的輸出不影響選號: 送出背景工作後立即完成,預測推送不等待
+        - math_validator.stop_on_error 時,數據驗證必須成功才會驗證與預測
+        - 未啟用的 AI 顧問記為 skipped,不影響主流程
+        """
+        pipeline_config = self.config.get('schedule', {}).get('pipeline', {})
+        advisors = self.config.get('ai_advisors', {})
+        
+        def enabled(advisor: str) -> bool:
+            return advisors.get(advisor, {}).get('enabled', True)
+        
+        def step(task_func: Callable, task_name: str) -> Callable:
+            return lambda: self._execute_with_retry(task_func, task_name)
+        
+        def advisor_step(task_func: Callable, advisor: str, task_name: str) -> Callable:
+            # 每次嘗試各自套用顧問截止時間,逾時算一次失敗並照常重試
+            return step(lambda: self._run_advisor(advisor, task_func), task_name)
+        
+        def background_step(task_func: Callable, advisor: str) -> Callable:
+            return lambda: self.advisors.submit(advisor, task_func, background=True).name
+        
+        math_required = enabled('math_validator') and advisors.get('math_validator', {}).get('stop_on_error', False)
+        
+        dag = TaskDAG('daily_pipeline', max_workers=pipeline_config.get('max_workers', 4))
+        dag.add('data_update', step(self._run_data_update, 'data_update'))
+        dag.add('numerology_advice', background_step(self._run_numerology_advice, 'numerology_advisor'),
+                enabled=enabled('numerology_advisor'))
+        dag.add('math_validation', advisor_step(self._run_math_validation, 'math_validator', 'math_validation'),
+                depends_on=['data_update'], enabled=enabled('math_validator'))
+        dag.add('verification', step(self._run_verification, 'verification'),
+                depends_on=['data_update'] + (['math_validation'] if math_required else []))
+        dag.add('training', step(self._run_training, 'training'),
+                depends_on=['data_update'], after=['verification'])
+        dag.add('prediction', step(self._run_prediction, 'prediction'),
+                depends_on=['data_update'] + (['math_validation'] if math_required else []),
+                after=['training', 'math_validation'])
+        dag.add('digital_twin_review', background_step(self._run_digital_twin_review, 'digital_twin'),
+                depends_on=['prediction'], enabled=enabled('digital_twin'))
+        return dag
+
+    def run_daily_pipeline(self) -> dict:
+        """執行每日流程相依圖並記錄各任務狀態"""
+        dag = self.build_daily_pipeline()
+        outcome = dag.run()
+        self.last_pipeline_run = outcome
+        
+        summary = {
+            name: {'status': record['status'], 'duration_seconds': record['duration_seconds'], 'reason': record['reason']}
+            for name, record in outcome['tasks'].items()
+        }
+        structured_logger.log_operation(
+            operation_type='daily_pipeline',
+            status='success' if outcome['success'] else 'partial_failure',
+            details={'tasks': summary},
+            duration_seconds=outcome['elapsed_seconds']
+        )
+        print(f"[INFO] Daily pipeline finished in {outcome['elapsed_seconds']:.2f}s: "
+              + ", ".join(f"{name}={record['status']}" for name, record in summary.items()))
+        self._log_llm_quota()
+        return outcome
+
+    def _log_llm_quota(self):
+        """記錄當日 LLM 配額使用 (所有呼叫端共用的帳本)"""
+        try:
+            metrics = get_llm_limiter().metrics()
+        except Exception as e:
+            print(f"[WARNING] LLM quota metrics unavailable: {e}")
+            return
+        structured_logger.log_operation(operation_type='llm_quota', status='ok', details=metrics)
+        print(f"[INFO] LLM quota today: {metrics['requests']}/{metrics['limits']['rpd']} requests, "
+              f"{metrics['tokens']} tokens, {metrics['denied']} denied")
 
     def setup_default_schedule(self):
         """設定預設排程 (從配置檔讀取)"""
@@ -240,35 +370,64 @@ class AutoScheduler:
             parts = time_str.split(':')
             return int(parts[0]), int(parts[1])
         
-        # 每日資料更新 (20:35 - 配合台彩開獎約 20:30)
+        # 每日流程 (不再使用固定時間間隔,後續任務依相依關係接續執行)
+        # trigger = draw_watcher: 公布時間起偵測結果頁,有新開獎即啟動; cron: 固定於 data_update_time 啟動
+        if schedule_config.get('trigger', 'cron') == 'draw_watcher':
+            self.draw_watcher = DrawWatcher.from_config(str(self.config_path), on_published=self._on_draws_published)
+            self.scheduler.add_job(
+                self._watch_draws,
+                CronTrigger(hour=self.draw_watcher.publish_hour, minute=self.draw_watcher.publish_minute),
+                id='draw_watcher',
+                name='draw_watcher',
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True
+            )
+            # 啟動時先輪詢一次 (於公布時間後重啟時不會錯過當天開獎)
+            self.scheduler.add_job(self._watch_draws, 'date', run_date=get_taiwan_now(),
+                                   id='draw_watcher_poll', replace_existing=True, misfire_grace_time=None)
+            print(f"[INFO] Draw watcher from {self.draw_watcher.publish_hour:02d}:{self.draw_watcher.publish_minute:02d} "
+                  f"(data_update -> verification/advisors -> training -> prediction)")
+            return
+        
         update_time = schedule_config.get('data_update_time', '20:35')
         hour, minute = parse_time(update_time)
-        self.add_daily_task(
-            self._run_data_update,
-            'data_update',
-            hour,
-            minute
-        )
-        
-        # 每日訓練 (20:40)
-        training_time = schedule_config.get('training_time', '20:40')
-        hour, minute = parse_time(training_time)
-        self.add_daily_task(
-            self._run_training,
-            'training',
-            hour,
-            minute
+        self.scheduler.add_job(
+            self.run_daily_pipeline,
+            CronTrigger(hour=hour, minute=minute),
+            id='daily_pipeline',
+            name='daily_pipeline',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
         )
-        
-        # 每日新預測與推送 (20:45)
-        predict_time = schedule_config.get('prediction_time', '20:45')
-        hour, minute = parse_time(predict_time)
-        self.add_daily_task(
-            self._run_prediction,
-            'prediction',
-            hour,
-            minute
+        print(f"[INFO] Scheduled daily pipeline at {hour:02d}:{minute:02d} "
+              f"(data_update -> verification/advisors -> training -> prediction)")
+    
+    def _watch_draws(self):
+        """輪詢一次結果頁,尚未結束時以一次性工作排入下一次輪詢 (輪詢進行中時略過,由該輪詢排程)"""
+        status = self.draw_watcher.poll()
+        if status.get('skipped'):
+            return
+        if status['next_poll_seconds'] is not None:
+            self.scheduler.add_job(
+                self._watch_draws,
+                'date',
+                run_date=get_taiwan_now() + timedelta(seconds=status['next_poll_seconds']),
+                id='draw_watcher_poll',
+                name='draw_watcher_poll',
+                replace_existing=True,
+                misfire_grace_time=None
+            )
+    
+    def _on_draws_published(self, day: str, games: list):
+        """偵測到新開獎: 啟動每日流程"""
+        structured_logger.log_operation(
+            operation_type='draw_published',
+            status='success',
+            details={'date': day, 'games': games, 'polls': self.draw_watcher.polls}
         )
+        return self.run_daily_pipeline()
         
     def start(self):
         """啟動排程器"""
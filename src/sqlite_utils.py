@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite 共用工具
+統一以 WAL 模式開啟資料庫,讓 Streamlit 頁面 (讀) 與排程器 (寫) 可同時存取。
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Union
+
+
+def connect(db_path: Union[str, Path], timeout: float = 30.0) -> sqlite3.Connection:
+    """
+    開啟 SQLite 連線 (WAL 模式, autocommit, 可跨執行緒使用)
+
+    Args:
+        db_path: 資料庫路徑
+        timeout: 等待寫入鎖的秒數
+
+    Returns:
+        sqlite3.Connection: row_factory 為 sqlite3.Row
+    """
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # isolation_level=None: 由 transaction() 明確控制交易範圍
+    conn = sqlite3.connect(str(db_path), timeout=timeout, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+    return conn
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection, lock: threading.Lock = None):
+    """
+    寫入交易 (BEGIN IMMEDIATE ... COMMIT, 發生例外時 ROLLBACK)
+
+    Args:
+        conn: connect() 建立的連線
+        lock: 同一連線被多執行緒共用時的鎖 (optional)
+    """
+    if lock is not None:
+        lock.acquire()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    finally:
+        if lock is not None:
+            lock.release()
+
+
+def data_version(conn: sqlite3.Connection) -> tuple:
+    """
+    資料版本戳記 (其他連線的寫入會改變 PRAGMA data_version, 本連線的寫入會改變 total_changes)
+    可用來判斷記憶體快取是否仍然有效
+    """
+    return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
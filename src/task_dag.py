@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+任務相依圖執行器 (Task DAG)
+- 每個任務宣告上游相依: depends_on (上游必須成功) / after (只需等上游結束,不論結果)
+- 上游完成的瞬間即啟動下游,互不相依的分支 (AI 顧問 / 訓練) 在執行緒池中同時執行
+- 任務拋出 TaskSkipped 或未啟用時記為 skipped; depends_on 的上游未成功時下游直接略過 (short-circuit)
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional
+
+from src.timezone_utils import get_taiwan_isoformat
+
+
+SUCCESS = 'success'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+class TaskSkipped(Exception):
+    """任務主動略過 (例如沒有新資料),下游依 depends_on 一併略過"""
+
+
+class DagTask:
+    """單一任務節點"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        depends_on: Iterable[str] = (),
+        after: Iterable[str] = (),
+        enabled: bool = True
+    ):
+        """
+        初始化
+
+        Args:
+            name: 任務名稱
+            func: 任務函式 (回傳 False 視為失敗, 拋出 TaskSkipped 視為略過)
+            depends_on: 必須成功的上游任務
+            after: 只需等待結束的上游任務 (失敗或略過仍會執行)
+            enabled: False 時不執行,直接記為 skipped
+        """
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+        self.after = list(after)
+        self.enabled = enabled
+
+    @property
+    def upstream(self) -> List[str]:
+        return self.depends_on + [name for name in self.after if name not in self.depends_on]
+
+
+class TaskDAG:
+    """任務相依圖"""
+
+    def __init__(self, name: str = 'dag', max_workers: int = 4):
+        """
+        初始化
+
+        Args:
+            name: 流程名稱 (用於日誌與執行緒名稱)
+            max_workers: 最多同時執行的任務數
+        """
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.tasks: Dict[str, DagTask] = {}
+
+    def add(self, name: str, func: Callable, depends_on: Iterable[str] = (),
+            after: Iterable[str] = (), enabled: bool = True) -> DagTask:
+        """新增任務 (上游任務須先加入)"""
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task: {name}")
+        task = DagTask(name, func, depends_on, after, enabled)
+        missing = [up for up in task.upstream if up not in self.tasks]
+        if missing:
+            raise ValueError(f"Task {name} depends on unknown tasks: {missing}")
+        self.tasks[name] = task
+        return task
+
+    def _resolve(self, task: DagTask, results: Dict[str, Dict]) -> Optional[str]:
+        """上游皆已結束時回傳略過原因 (None = 可執行)"""
+        if not task.enabled:
+            return 'disabled'
+        for up in task.depends_on:
+            if results[up]['status'] != SUCCESS:
+                return f"upstream {up} {results[up]['status']}"
+        return None
+
+    def _run_task(self, task: DagTask) -> Dict:
+        """執行單一任務 (工作執行緒)"""
+        started_at = get_taiwan_isoformat()
+        start = time.perf_counter()
+        record = {'status': SUCCESS, 'reason': None, 'result': None, 'started_at': started_at}
+        try:
+            result = task.func()
+            record['result'] = result
+            if result is False:
+                record['status'] = FAILED
+        except TaskSkipped as e:
+            record.update(status=SKIPPED, reason=str(e) or 'skipped')
+        except Exception as e:
+            record.update(status=FAILED, reason=f"{type(e).__name__}: {e}")
+        record['duration_seconds'] = round(time.perf_counter() - start, 3)
+        return record
+
+    def run(self) -> Dict:
+        """
+        執行整個相依圖
+
+        Returns:
+            dict: {'tasks': {任務: {'status', 'reason', 'result', 'started_at', 'duration_seconds'}},
+                   'success', 'elapsed_seconds'}
+        """
+        start = time.perf_counter()
+        results: Dict[str, Dict] = {}
+        waiting = dict(self.tasks)
+        running = {}
+
+        print(f"[INFO] {self.name}: running {len(self.tasks)} tasks (max {self.max_workers} concurrent)")
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name) as pool:
+            while waiting or running:
+                # 上游皆已結束的任務: 略過或送出執行 (略過會讓更多任務就緒,重複直到沒有變化)
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name, task in list(waiting.items()):
+                        if any(up not in results for up in task.upstream):
+                            continue
+                        del waiting[name]
+                        progressed = True
+                        reason = self._resolve(task, results)
+                        if reason is None:
+                            print(f"[INFO] {self.name}: start {name}")
+                            running[pool.submit(self._run_task, task)] = name
+                        else:
+                            print(f"[INFO] {self.name}: skip {name} ({reason})")
+                            results[name] = {'status': SKIPPED, 'reason': reason, 'result': None,
+                                             'started_at': None, 'duration_seconds': 0.0}
+
+                if not running:
+                    if waiting:
+                        raise RuntimeError(f"{self.name}: unresolvable tasks {sorted(waiting)}")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name] = future.result()
+                    record = results[name]
+                    suffix = f" ({record['reason']})" if record['reason'] else ''
+                    print(f"[INFO] {self.name}: {name} {record['status']} in {record['duration_seconds']:.2f}s{suffix}")
+
+        return {
+            'tasks': {name: results[name] for name in self.tasks},
+            'success': all(r['status'] != FAILED for r in results.values()),
+            'elapsed_seconds': round(time.perf_counter() - start, 3)
+        }
+
+
+if __name__ == "__main__":
+    def step(name, seconds, skip=False):
+        def run():
+            time.sleep(seconds)
+            if skip:
+                raise TaskSkipped('nothing to do')
+            return name
+        return run
+
+    dag = TaskDAG('demo', max_workers=4)
+    dag.add('update', step('update', 0.2))
+    dag.add('advisor', step('advisor', 0.5), depends_on=['update'])
+    dag.add('verify', step('verify', 0.1), depends_on=['update'])
+    dag.add('train', step('train', 0.3), depends_on=['verify'], after=['advisor'])
+    dag.add('numerology', step('numerology', 0.1, skip=True))
+    dag.add('predict', step('predict', 0.1), depends_on=['train'], after=['numerology'])
+    dag.add('review', step('review', 0.1), depends_on=['predict', 'numerology'])
+    outcome = dag.run()
+    for task_name, record in outcome['tasks'].items():
+        print(f"  {task_name}: {record['status']} {record['duration_seconds']}s {record['reason'] or ''}")
+    print(f"Elapsed: {outcome['elapsed_seconds']}s")
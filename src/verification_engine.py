@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+批次預測驗證引擎 (Verification Engine)
+- 一次查詢取得所有遊戲的待驗證預測
+- 實際號碼由 DrawRepository 的已排序日期陣列以 searchsorted 一次對應 (每個週期每個檔案只解析一次)
+- 命中數以 one-hot 布林矩陣向量化計算集合交集,不逐列比對
+- 每個遊戲的驗證結果以單一交易 (executemany) 寫入
+"""
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.draw_repository import DrawRepository, draw_repository
+from src.history_store import dates_to_days
+from src.timezone_utils import get_taiwan_now
+
+
+def _as_array(rows: Sequence[Sequence[int]]):
+    """每列號碼數相同時轉為二維 int64 陣列,否則回傳 None"""
+    try:
+        values = np.asarray(rows, dtype=np.int64)
+    except ValueError:
+        return None
+    return values if values.ndim == 2 else None
+
+
+def _one_hot(rows: Sequence[Sequence[int]], values: Optional[np.ndarray], width: int) -> np.ndarray:
+    """號碼列表 -> (列數, width) 布林矩陣 (重複號碼視為一個, 與集合語意相同)"""
+    matrix = np.zeros((len(rows), width), dtype=bool)
+    if values is not None:
+        matrix[np.arange(len(rows))[:, None], values] = True
+        return matrix
+
+    lengths = np.fromiter((len(r) for r in rows), dtype=np.int64, count=len(rows))
+    if lengths.sum():
+        flat = np.fromiter((n for r in rows for n in r), dtype=np.int64, count=int(lengths.sum()))
+        matrix[np.repeat(np.arange(len(rows)), lengths), flat] = True
+    return matrix
+
+
+def _max_value(rows: Sequence[Sequence[int]], values: Optional[np.ndarray]) -> int:
+    if values is not None:
+        return int(values.max()) if values.size else 0
+    return max((max(r) for r in rows if len(r)), default=0)
+
+
+def match_hits(predicted: Sequence[Sequence[int]], actual: Sequence[Sequence[int]]) -> np.ndarray:
+    """
+    向量化集合交集: 每列 len(set(predicted[i]) & set(actual[i]))
+
+    Returns:
+        np.ndarray: 每列命中數 (int64)
+    """
+    if not len(predicted):
+        return np.zeros(0, dtype=np.int64)
+    predicted_values, actual_values = _as_array(predicted), _as_array(actual)
+    width = 1 + max(_max_value(predicted, predicted_values), _max_value(actual, actual_values))
+    hot = _one_hot(predicted, predicted_values, width) & _one_hot(actual, actual_values, width)
+    return hot.sum(axis=1).astype(np.int64)
+
+
+class VerificationEngine:
+    """批次預測驗證"""
+
+    def __init__(self, manager=None, repository: Optional[DrawRepository] = None):
+        """
+        初始化
+
+        Args:
+            manager: PredictionManager (預設為全域實例)
+            repository: 開獎資料倉庫 (預設為全域實例)
+        """
+        if manager is None:
+            from src.prediction_manager import prediction_manager as manager
+        self.manager = manager
+        self.repository = repository or draw_repository
+
+    def pending(self, days: int = 7, games: Optional[Iterable[str]] = None) -> Dict[str, List[Tuple[str, List[int]]]]:
+        """所有遊戲的待驗證預測 (單一查詢) {遊戲: [(預測日期, 預測號碼), ...]}"""
+        return self.manager.get_pending_rows(days=days, games=games)
+
+    def lookup_actuals(self, game: str, dates: Sequence[str]) -> Dict[str, List[int]]:
+        """
+        由本地歷史批次取得實際開獎號碼 (不含特別號/第二區)
+
+        Returns:
+            dict: {日期: 號碼列表} (查無資料的日期不在結果中)
+        """
+        draws = self.repository.get_draws(game)
+        if draws is None or len(draws) == 0 or not dates:
+            return {}
+        wanted = dates_to_days([d[:10] for d in dates])
+        positions = np.searchsorted(draws.dates, wanted)
+        clipped = np.minimum(positions, len(draws) - 1)
+        found = (positions < len(draws)) & (np.asarray(draws.dates)[clipped] == wanted)
+        numbers = np.asarray(draws.numbers)[clipped[found]].astype(np.int64).tolist()
+        return dict(zip([d[:10] for d, ok in zip(dates, found) if ok], numbers))
+
+    def verify_game(
+        self,
+        game: str,
+        rows: List[Tuple[str, List[int]]],
+        fetch_missing: Optional[Callable[[str, List[str]], Dict[str, List[int]]]] = None
+    ) -> Dict:
+        """
+        驗證單一遊戲的待驗證預測並以單一交易寫入
+
+        Args:
+            game: 遊戲名稱
+            rows: [(預測日期, 預測號碼), ...]
+            fetch_missing: 本地查無且日期已過的開獎,改由此函式批次取得 (例如月份頁索引)
+
+        Returns:
+            dict: {'status': 'no_pending'/'no_actuals'/'verified', 'verified', 'pending', 'sources', 'results'}
+        """
+        if not rows:
+            return {'status': 'no_pending', 'verified': 0}
+
+        dates = [date for date, _ in rows]
+        actuals = self.lookup_actuals(game, dates)
+        local_count = len(actuals)
+
+        today = get_taiwan_now().strftime('%Y-%m-%d')
+        missing = [d for d in dates if d not in actuals and d <= today]
+        if missing and fetch_missing is not None:
+            actuals.update(fetch_missing(game, missing))
+
+        matched = [(date, predicted, actuals[date]) for date, predicted in rows if date in actuals]
+        summary = {
+            'status': 'verified' if matched else 'no_actuals',
+            'verified': 0,
+            'pending': len(rows),
+            'sources': {'local': local_count, 'month_index': len(actuals) - local_count},
+            'results': []
+        }
+        if not matched:
+            return summary
+
+        hits = match_hits([m[1] for m in matched], [m[2] for m in matched])
+        results = [
+            {
+                'game': game,
+                'date': date,
+                'predicted': predicted,
+                'actual': actual,
+                'hits': int(h),
+                'accuracy': int(h) / len(predicted) if predicted else 0.0
+            }
+            for (date, predicted, actual), h in zip(matched, hits)
+        ]
+        written = self.manager.record_verifications(game, results)
+        summary['verified'] = written
+        summary['results'] = results if written else []
+        return summary
+
+    def verify_all(
+        self,
+        days: int = 7,
+        games: Optional[Iterable[str]] = None,
+        fetch_missing: Optional[Callable[[str, List[str]], Dict[str, List[int]]]] = None
+    ) -> Dict[str, Dict]:
+        """一次查詢所有待驗證預測,逐遊戲向量化比對並寫入"""
+        games = list(games or self.manager.games)
+        pending = self.pending(days, games)
+        return {game: self.verify_game(game, pending.get(game, []), fetch_missing) for game in games}
+
+
+_default_engine = None
+
+
+def get_verification_engine() -> VerificationEngine:
+    """行程內共用的 VerificationEngine (首次使用時才連結 PredictionManager)"""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = VerificationEngine()
+    return _default_engine
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    predicted = [sorted(rng.choice(np.arange(1, 40), 5, replace=False).tolist()) for _ in range(100000)]
+    actual = [sorted(rng.choice(np.arange(1, 40), 5, replace=False).tolist()) for _ in range(100000)]
+
+    start = time.perf_counter()
+    loop = [len(set(p) & set(a)) for p, a in zip(predicted, actual)]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vector = match_hits(predicted, actual)
+    vector_time = time.perf_counter() - start
+
+    predicted_array, actual_array = np.asarray(predicted), np.asarray(actual)
+    start = time.perf_counter()
+    array_hits = match_hits(predicted_array, actual_array)
+    array_time = time.perf_counter() - start
+
+    assert vector.tolist() == loop == array_hits.tolist()
+    print(f"100k rows: loop {loop_time * 1000:.1f} ms, vectorized {vector_time * 1000:.1f} ms "
+          f"(from arrays {array_time * 1000:.1f} ms)")
+
+    engine = get_verification_engine()
+    print({game: len(rows) for game, rows in engine.pending().items()})
@@ -1,6 +1,6 @@
 """
 智能權重優化器
-實作漸進式權重調整與歷史驗證機制,避免過度擬合
+實作漸進式權重調整與歷史驗證機制 (以快取評分重播最近 N 期),避免過度擬合
 """
 import numpy as np
 from src.logger import logger
@@ -8,16 +8,26 @@ from src.logger import logger
 class WeightOptimizer:
     """智能權重優化器"""
     
-    def __init__(self, learning_rate=0.6, observation_window=3):
+    def __init__(self, learning_rate=0.6, observation_window=3, replay_window=10,
+                 min_replay_periods=5, regression_tolerance=0.0, score_cache=None):
         """
         初始化
         
         Args:
             learning_rate: 學習率 (0-1),決定每次調整的幅度比例
             observation_window: 觀察窗口,連續幾期低命中率才調整
+            replay_window: 回測驗證時重播的期數
+            min_replay_periods: 快取至少要有幾期才進行重播驗證
+            regression_tolerance: 平均命中數退步超過此值即拒絕調整
+            score_cache: 逐期模型評分快取 (src.weight_search.ScoreCache)
         """
         self.learning_rate = learning_rate
         self.observation_window = observation_window
+        self.replay_window = replay_window
+        self.min_replay_periods = min_replay_periods
+        self.regression_tolerance = regression_tolerance
+        self.score_cache = score_cache
+        self._replay_strategy = None
         self.history = []  # 記錄歷史表現
         
         logger.info(f"智能權重優化器已初始化 (學習率: {learning_rate}, 觀察窗口: {observation_window})")
@@ -127,56 +137,73 @@ class WeightOptimizer:
         
         return actual_adjustment
     
-    def backtest_adjustment(self, proposed_weights, historical_data, group_id):
+    def backtest_adjustment(self, proposed_weights, historical_data, group_id, current_group_weights=None):
         """
         回測驗證調整是否有效
         
+        以快取的逐期模型評分 (score_cache) 重播最近 replay_window 期:
+        分別用目前權重與提議權重計算四群評分,再經真實的
+        GroupBasedStrategy.cross_group_selection 選號,比較平均命中數。
+        
         Args:
-            proposed_weights: 提議的新權重
-            historical_data: 歷史資料 (最近 10 期)
+            proposed_weights: 提議的新權重 (該群組)
+            historical_data: 該群組的歷史表現記錄
             group_id: 群組 ID
+            current_group_weights: 四群目前的權重 {'group1': {...}, ...}
         
         Returns:
             dict: {
                 'is_valid': True/False,
                 'message': '...',
-                'improvement': 0.05
+                'improvement': 0.05,      # 每期平均命中數差 (提議 - 目前)
+                'baseline_hits': 1.2,
+                'proposed_hits': 1.25,
+                'periods': 10
             }
         """
-        if len(historical_data) < 5:
-            # 資料不足,無法驗證
+        cache = self.score_cache
+        if cache is None or current_group_weights is None or len(cache) < self.min_replay_periods:
+            # 沒有快取或資料不足,無法重播
             return {
                 'is_valid': True,  # 預設允許
-                'message': '歷史資料不足,跳過驗證',
+                'message': '歷史評分快取不足,跳過驗證',
                 'improvement': 0
             }
         
         try:
-            # 簡化版回測:比較最近 5 期的平均命中率
-            recent_5 = historical_data[-5:]
-            avg_accuracy = np.mean([h.get('accuracy', 0) for h in recent_5])
+            window = cache.tail(self.replay_window)
             
-            # 🔥 進階修補 1: 移除拒絕調整邏輯,始終允許但給予不同建議
-            if avg_accuracy > 0.3:
-                return {
-                    'is_valid': True,
-                    'message': f'近期表現良好 ({avg_accuracy:.0%}),建議中幅調整',
-                    'improvement': 0.05
-                }
-            elif avg_accuracy > 0.15:
-                # 表現一般,小幅調整
-                return {
-                    'is_valid': True,  # 🔥 關鍵: 改為 True
-                    'message': f'近期表現一般 ({avg_accuracy:.0%}),建議小幅調整',
-                    'improvement': 0.02
-                }
+            candidate_weights = dict(current_group_weights)
+            candidate_weights[group_id] = proposed_weights
+            
+            # 未變動的群組只需計算一次
+            baseline_scores = {
+                gid: self._replay_group_scores(window, gid, weights)
+                for gid, weights in current_group_weights.items()
+            }
+            proposed_scores = dict(baseline_scores)
+            proposed_scores[group_id] = self._replay_group_scores(window, group_id, proposed_weights)
+            
+            baseline_hits = self._replay_hits(window, baseline_scores)
+            proposed_hits = self._replay_hits(window, proposed_scores)
+            improvement = float(proposed_hits.mean() - baseline_hits.mean())
+            
+            result = {
+                'improvement': improvement,
+                'baseline_hits': float(baseline_hits.mean()),
+                'proposed_hits': float(proposed_hits.mean()),
+                'periods': len(window)
+            }
+            
+            if improvement < -self.regression_tolerance:
+                result['is_valid'] = False
+                result['message'] = (f'重播 {len(window)} 期命中退步 '
+                                     f'({result["baseline_hits"]:.2f} → {result["proposed_hits"]:.2f}),拒絕調整')
             else:
-                # 表現不佳,探索性調整 (原本會拒絕!)
-                return {
-                    'is_valid': True,  # 🔥 關鍵: 改為 True
-                    'message': f'近期表現不佳 ({avg_accuracy:.0%}),探索性調整',
-                    'improvement': 0.01
-                }
+                result['is_valid'] = True
+                result['message'] = (f'重播 {len(window)} 期平均命中 '
+                                     f'{result["baseline_hits"]:.2f} → {result["proposed_hits"]:.2f}')
+            return result
         
         except Exception as e:
             logger.error(f"回測驗證失敗: {e}")
@@ -186,7 +213,53 @@ class WeightOptimizer:
                 'improvement': 0
             }
     
-    def optimize_group_weights(self, group_id, accuracy, group_history, current_weights):
+    def _replay_group_scores(self, window, group_id, weights):
+        """
+        向量化計算單一群組在各期的加權評分 (與 GroupBasedStrategy._calculate_weighted_scores 相同)
+        
+        模型分數依權重正規化; 該群自己的 LLM 建議以 weights['llm'] x 信心度 直接加分 (未正規化),
+        因此整組等比例縮放權重時,實際改變的是 LLM 加分的相對份量
+        
+        Returns:
+            ndarray: 期數 x 群組號碼數
+        """
+        from src.group_strategy import GroupBasedStrategy
+        
+        start, end = GroupBasedStrategy.GROUPS[group_id]
+        model_names = [m for m in window.model_names if m != 'llm']
+        idx = [window.model_names.index(m) for m in model_names]
+        w = np.array([weights.get(m, 1.0) for m in model_names], dtype=np.float32)
+        total = w.sum()
+        
+        weighted = np.einsum('pnm,m->pn', window.scores[:, start - 1:end, idx], w)
+        if total > 0:
+            weighted = weighted / total
+        group_index = window.GROUP_IDS.index(group_id)
+        return weighted + weights.get('llm', 0.5) * window.llm[:, group_index, start - 1:end]
+    
+    def _replay_hits(self, window, group_scores):
+        """以真實的群組選號與跨群篩選重播每期,回傳命中數陣列"""
+        from src.group_strategy import GroupBasedStrategy
+        
+        if self._replay_strategy is None:
+            self._replay_strategy = GroupBasedStrategy()
+        strategy = self._replay_strategy
+        
+        hits = np.zeros(len(window), dtype=np.int16)
+        for p in range(len(window)):
+            group_results = {}
+            for gid, scores in group_scores.items():
+                start = GroupBasedStrategy.GROUPS[gid][0]
+                score_dict = {start + i: float(v) for i, v in enumerate(scores[p])}
+                group_results[gid] = {
+                    'selected_numbers': strategy._select_top_numbers(score_dict, max_count=3),
+                    'scores': score_dict
+                }
+            selection = strategy.cross_group_selection(group_results)['final_selection']
+            hits[p] = int(window.actual[p, np.asarray(selection, dtype=int) - 1].sum())
+        return hits
+    
+    def optimize_group_weights(self, group_id, accuracy, group_history, current_weights, all_group_weights=None):
         """
         優化單一群組的權重
         
@@ -195,6 +268,7 @@ class WeightOptimizer:
             accuracy: 本次命中率
             group_history: 該群組的歷史表現
             current_weights: 當前權重
+            all_group_weights: 四群目前的權重 (提供時以重播驗證調整)
         
         Returns:
             dict: {
@@ -218,11 +292,17 @@ class WeightOptimizer:
         # 計算調整幅度
         adjustment = self.calculate_adjustment(accuracy)
         
-        # 回測驗證
+        # 提議的新權重
+        new_weights = {}
+        for model_name, weight in current_weights.items():
+            new_weights[model_name] = weight * (1 + adjustment)
+        
+        # 回測驗證 (重播提議權重)
         backtest_result = self.backtest_adjustment(
-            current_weights,
+            new_weights,
             group_history,
-            group_id
+            group_id,
+            all_group_weights
         )
         
         if not backtest_result['is_valid']:
@@ -234,11 +314,6 @@ class WeightOptimizer:
                 'backtest': backtest_result
             }
         
-        # 執行調整
-        new_weights = {}
-        for model_name, weight in current_weights.items():
-            new_weights[model_name] = weight * (1 + adjustment)
-        
         return {
             'action': 'adjust',
             'adjustment': adjustment,
@@ -273,3 +348,33 @@ if __name__ == "__main__":
     )
     
     logger.info(f"優化結果: {result}")
+    
+    # 重播驗證: 等比例放大權重會放大 LLM 加分,LLM 建議錯誤時應拒絕
+    import pandas as pd
+    from src.group_strategy import GroupBasedStrategy
+    from src.weight_search import ScoreCache
+    
+    rng = np.random.default_rng(0)
+    model_names = ['freq', 'svm', 'markov']
+    cache = ScoreCache.empty(model_names)
+    for period in range(10):
+        actual = sorted(rng.choice(np.arange(1, 40), size=5, replace=False).tolist())
+        scores = rng.uniform(0, 0.3, size=(39, len(model_names)))
+        scores[np.asarray(actual) - 1] = 0.9
+        advice = {}
+        for gid, (start, end) in GroupBasedStrategy.GROUPS.items():
+            wrong = [n for n in range(start, end + 1) if n not in actual][:2]
+            advice[gid] = {'numbers': wrong, 'confidence': 0.9}
+        frame = pd.DataFrame(scores, index=range(1, 40), columns=model_names)
+        cache.append(period + 1, frame, actual, llm_advice=advice)
+    
+    replay_optimizer = WeightOptimizer(score_cache=cache)
+    group_weights = GroupBasedStrategy().group_weights
+    bad_proposal = {m: w * 3 for m, w in group_weights['group1'].items()}
+    check = replay_optimizer.backtest_adjustment(bad_proposal, test_history, 'group1', group_weights)
+    logger.info(f"錯誤提議重播: {check}")
+    assert check['is_valid'] is False, check
+    
+    # 建議號碼不在該群範圍內時不加分 (與策略相同)
+    rows = ScoreCache.llm_rows({'group1': {'numbers': [3, 15], 'confidence': 0.8}})
+    assert rows[0, 2] == np.float32(0.8) and rows[:, 14].sum() == 0, rows
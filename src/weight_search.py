@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+向量化權重搜尋引擎
+以快取的逐期模型評分張量 (期數 x 39 x 模型數) 一次評估上千組候選權重,
+用單一 einsum 計算加權分數,再以 argpartition 取 Top-K 選號並統計 2+/3+ 命中率,
+回傳 Pareto 最佳權重。權重調整從「重新訓練數小時」變成「數秒」。
+"""
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.group_strategy import GroupBasedStrategy
+
+
+# StrategyEngine 的四個權重 (hot/stability/cold/random) 對應到各模型欄位的係數
+STRATEGY_ENGINE_BASIS = {
+    'hot': {'freq': 1 / 3, 'svm': 1 / 3, 'rsi': 1 / 3},
+    'stability': {'slope': 1 / 2, 'markov': 1 / 2},
+    'cold': {'pca': 1.0},
+    'random': {'knn': 1.0}
+}
+
+
+class ScoreCache:
+    """
+    逐期模型評分快取
+
+    scores: 期數 x 39 x 模型數, actual: 期數 x 39,
+    llm: 期數 x 群組數 x 39 (各群自己的 LLM 建議信心度,只落在該群號碼範圍內)
+    """
+
+    GROUP_IDS = list(GroupBasedStrategy.GROUPS)
+
+    def __init__(self, scores: np.ndarray, actual: np.ndarray, model_names: Sequence[str],
+                 periods: Optional[np.ndarray] = None, dates: Optional[np.ndarray] = None,
+                 llm: Optional[np.ndarray] = None):
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.actual = np.asarray(actual, dtype=np.uint8)
+        self.model_names = list(model_names)
+        n = len(self.scores)
+        self.periods = np.arange(n) if periods is None else np.asarray(periods)
+        self.dates = np.array([''] * n) if dates is None else np.asarray(dates)
+        self.llm = (np.zeros((n, len(self.GROUP_IDS), 39), dtype=np.float32) if llm is None
+                    else np.asarray(llm, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.scores)
+
+    def tail(self, window: Optional[int]) -> 'ScoreCache':
+        """取最近 window 期 (None = 全部)"""
+        if not window or window >= len(self):
+            return self
+        return ScoreCache(self.scores[-window:], self.actual[-window:], self.model_names,
+                          self.periods[-window:], self.dates[-window:], self.llm[-window:])
+
+    @classmethod
+    def llm_rows(cls, llm_advice: Optional[Dict]) -> np.ndarray:
+        """
+        各群 LLM 建議 -> 群組數 x 39 信心度
+
+        與 GroupBasedStrategy._calculate_weighted_scores 相同: 群組只採用自己的建議,
+        且只有落在該群號碼範圍內的號碼加分 (加分為 llm 權重 x 此值)
+        """
+        rows = np.zeros((len(cls.GROUP_IDS), 39), dtype=np.float32)
+        for g, group_id in enumerate(cls.GROUP_IDS):
+            advice = (llm_advice or {}).get(group_id)
+            if not advice or 'numbers' not in advice:
+                continue
+            start, end = GroupBasedStrategy.GROUPS[group_id]
+            confidence = advice.get('confidence', 0.5)
+            for num in advice['numbers']:
+                if isinstance(num, (int, np.integer)) and start <= num <= end:
+                    rows[g, num - 1] += confidence
+        return rows
+
+    def append(self, period: int, scores_df: pd.DataFrame, actual_numbers: Sequence[int], date: str = '',
+               llm_advice: Optional[Dict] = None):
+        """
+        加入一期評分
+
+        Args:
+            period: 期數
+            scores_df: get_all_scores() 結果 (index 1-39)
+            actual_numbers: 開獎號碼
+            date: 開獎日期
+            llm_advice: 當期各群 LLM 建議 {'group1': {'numbers', 'confidence'}, ...}
+        """
+        frame = scores_df.reindex(index=range(1, 40), columns=self.model_names).fillna(0.0)
+        actual = np.zeros((1, 39), dtype=np.uint8)
+        actual[0, np.asarray(actual_numbers, dtype=int) - 1] = 1
+        self.scores = np.concatenate([self.scores, frame.values[None].astype(np.float32)])
+        self.actual = np.concatenate([self.actual, actual])
+        self.periods = np.append(self.periods, period)
+        self.dates = np.append(self.dates, str(date))
+        self.llm = np.concatenate([self.llm, self.llm_rows(llm_advice)[None]])
+
+    def save(self, filepath):
+        """儲存為 .npz"""
+        np.savez_compressed(
+            filepath,
+            scores=self.scores,
+            actual=self.actual,
+            model_names=np.asarray(self.model_names),
+            periods=self.periods,
+            dates=self.dates.astype(str),
+            llm=self.llm
+        )
+
+    @classmethod
+    def load(cls, filepath) -> 'ScoreCache':
+        """從 .npz 載入 (舊檔沒有 llm 欄位時視為無建議)"""
+        with np.load(filepath) as data:
+            return cls(data['scores'], data['actual'], [str(m) for m in data['model_names']],
+                       data['periods'], data['dates'], data['llm'] if 'llm' in data.files else None)
+
+    @classmethod
+    def empty(cls, model_names: Sequence[str]) -> 'ScoreCache':
+        return cls(np.zeros((0, 39, len(model_names)), dtype=np.float32),
+                   np.zeros((0, 39), dtype=np.uint8), model_names)
+
+
+def _score_period(period_index: int):
+    """工作行程: 計算第 period_index 期 (只用之前資料) 的模型評分"""
+    import io
+    import contextlib
+    from src.models import FeatureEngine
+    from src.backtest_engine import _WORKER_STATE, _matrix_to_frame
+
+    draws = _WORKER_STATE['draws']
+    dates = _WORKER_STATE['dates']
+    with contextlib.redirect_stdout(io.StringIO()):
+        train_df = _matrix_to_frame(np.asarray(draws[:period_index]), np.asarray(dates[:period_index]))
+        scores = FeatureEngine(data_df=train_df).get_all_scores(use_enhanced=_WORKER_STATE['use_enhanced'])
+    return period_index, scores
+
+
+def build_score_cache(data_file: str = "data/539_history.csv", start_period: int = 30,
+                      end_period: Optional[int] = None, use_enhanced: bool = False,
+                      max_workers: Optional[int] = None) -> ScoreCache:
+    """
+    以平行回測引擎的共用開獎矩陣,計算每期的模型評分張量
+
+    Args:
+        data_file: 開獎歷史 CSV
+        start_period: 第一個期數索引
+        end_period: 結束期數索引 (不含)
+        use_enhanced: 是否計算增強模型
+        max_workers: 工作行程數
+    """
+    from src.backtest_engine import WalkForwardBacktester, _init_worker
+
+    backtester = WalkForwardBacktester(data_file=data_file, use_enhanced=use_enhanced)
+    matrix_path, dates_path, total = backtester._prepare_shared_matrix()
+    end_period = total if end_period is None else min(end_period, total)
+    periods = list(range(start_period, end_period))
+    init_args = (str(matrix_path), str(dates_path), backtester.group_weights, use_enhanced)
+
+    print(f"[INFO] Building score cache for {len(periods)} periods...")
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                             initializer=_init_worker, initargs=init_args) as pool:
+        scored = dict(pool.map(_score_period, periods, chunksize=4))
+
+    draws = np.load(matrix_path, mmap_mode='r')
+    dates = np.load(dates_path)
+    model_names = list(scored[periods[0]].columns) if periods else []
+    scores = np.stack([scored[p].reindex(columns=model_names).values for p in periods]) if periods \
+        else np.zeros((0, 39, 0))
+
+    return ScoreCache(scores, np.asarray(draws[periods]), model_names,
+                      np.asarray(periods) + 1, np.datetime_as_string(dates[periods], unit='D'))
+
+
+def random_weight_candidates(n: int, n_models: int, low: float = 0.1, high: float = 2.0,
+                             seed: Optional[int] = 0) -> np.ndarray:
+    """均勻隨機產生 n 組候選權重 (n x n_models)"""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(low, high, size=(n, n_models)).astype(np.float32)
+
+
+def grid_weight_candidates(values: Sequence[float], n_models: int) -> np.ndarray:
+    """所有模型權重取自 values 的完整網格 (len(values) ** n_models 組)"""
+    return np.array(list(itertools.product(values, repeat=n_models)), dtype=np.float32)
+
+
+def pareto_front(points: np.ndarray) -> np.ndarray:
+    """回傳 points (n x 2, 越大越好) 中未被支配的索引"""
+    order = np.lexsort((-points[:, 1], -points[:, 0]))
+    front = []
+    best_second = -np.inf
+    for idx in order:
+        if points[idx, 1] > best_second:
+            front.append(idx)
+            best_second = points[idx, 1]
+    return np.asarray(front, dtype=int)
+
+
+class WeightGridSearch:
+    """向量化權重搜尋"""
+
+    def __init__(self, cache: ScoreCache, per_group: int = 2, final_count: int = 7,
+                 mode: str = 'group', chunk_bytes: int = 256 * 1024 * 1024):
+        """
+        初始化
+
+        Args:
+            cache: 逐期評分快取
+            per_group: 每群候選數 (group 模式)
+            final_count: 最終選號數
+            mode: 'group' 重現 GroupBasedStrategy 的四群篩選 + 跨群篩選, 'global' 全域 Top-K
+            chunk_bytes: 每批候選權重的分數張量大小上限
+        """
+        self.cache = cache
+        self.per_group = per_group
+        self.final_count = final_count
+        self.mode = mode
+        self.chunk_bytes = chunk_bytes
+        self.group_slices = [slice(start - 1, end) for start, end in GroupBasedStrategy.GROUPS.values()]
+
+    def basis_matrix(self, basis: Dict[str, Dict[str, float]]) -> np.ndarray:
+        """將組合權重 (例如 STRATEGY_ENGINE_BASIS) 轉為 (組合數 x 模型數) 矩陣"""
+        matrix = np.zeros((len(basis), len(self.cache.model_names)), dtype=np.float32)
+        for i, components in enumerate(basis.values()):
+            for model_name, coef in components.items():
+                if model_name in self.cache.model_names:
+                    matrix[i, self.cache.model_names.index(model_name)] = coef
+        return matrix
+
+    def _select(self, weighted: np.ndarray) -> np.ndarray:
+        """
+        由加權分數 (K x P x 39) 選號,回傳號碼索引 (K x P x final_count)
+
+        group 模式: 每群 Top-per_group 組成候選,再取分數最高的 final_count 顆。
+        因每群候選數不超過跨群篩選的每群上限 (2),結果與 cross_group_selection 相同。
+        """
+        if self.mode == 'global':
+            return np.argpartition(-weighted, self.final_count - 1, axis=-1)[..., :self.final_count]
+
+        cand_idx = []
+        for sl in self.group_slices:
+            part = weighted[..., sl]
+            top = np.argpartition(-part, self.per_group - 1, axis=-1)[..., :self.per_group]
+            cand_idx.append(top + sl.start)
+        cand_idx = np.concatenate(cand_idx, axis=-1)
+        cand_scores = np.take_along_axis(weighted, cand_idx, axis=-1)
+
+        k = min(self.final_count, cand_idx.shape[-1])
+        best = np.argpartition(-cand_scores, k - 1, axis=-1)[..., :k]
+        return np.take_along_axis(cand_idx, best, axis=-1)
+
+    def evaluate(self, candidates: np.ndarray, window: Optional[int] = None) -> np.ndarray:
+        """
+        計算每組候選權重在每期的命中數
+
+        Args:
+            candidates: 候選權重 (K x 模型數)
+            window: 只評估最近 window 期
+
+        Returns:
+            ndarray: 命中數 (K x P)
+        """
+        cache = self.cache.tail(window)
+        candidates = np.asarray(candidates, dtype=np.float32)
+        n_periods = len(cache)
+        per_candidate = max(n_periods * 39 * 4, 1)
+        chunk = max(1, self.chunk_bytes // per_candidate)
+
+        hits = np.zeros((len(candidates), n_periods), dtype=np.int16)
+        period_idx = np.arange(n_periods)[None, :, None]
+        for start in range(0, len(candidates), chunk):
+            w = candidates[start:start + chunk]
+            # 權重正規化不影響同一期內的排序,故直接相乘
+            weighted = np.einsum('pnm,km->kpn', cache.scores, w, optimize=True)
+            picks = self._select(weighted)
+            hits[start:start + chunk] = cache.actual[period_idx, picks].sum(axis=-1)
+        return hits
+
+    def search(self, candidates: Optional[np.ndarray] = None, window: Optional[int] = 100,
+               n_random: int = 2000, basis: Optional[Dict[str, Dict[str, float]]] = None,
+               include: Optional[List[Dict[str, float]]] = None, top_k: int = 10,
+               seed: Optional[int] = 0) -> Dict:
+        """
+        搜尋權重
+
+        Args:
+            candidates: 候選權重 (K x 維度), None = 隨機產生 n_random 組
+            window: 評估最近幾期
+            n_random: 隨機候選數
+            basis: 組合權重定義 (例如 STRATEGY_ENGINE_BASIS), None = 直接使用模型權重
+            include: 額外加入評估的權重 (例如目前權重), dict 形式
+            top_k: 回傳 2+ 命中率最高的前 K 組
+            seed: 隨機種子
+
+        Returns:
+            dict: {
+                'pareto': [{'weights': {...}, 'hit2_rate': .., 'hit3_rate': .., 'avg_hits': ..}, ...],
+                'top': [...],
+                'evaluated': K,
+                'periods': P
+            }
+        """
+        names = list(basis.keys()) if basis else self.cache.model_names
+        if candidates is None:
+            candidates = random_weight_candidates(n_random, len(names), seed=seed)
+        candidates = np.asarray(candidates, dtype=np.float32)
+        if include:
+            extra = np.array([[w.get(n, 0.0) for n in names] for w in include], dtype=np.float32)
+            candidates = np.vstack([extra, candidates])
+
+        effective = candidates @ self.basis_matrix(basis) if basis else candidates
+        hits = self.evaluate(effective, window=window)
+
+        rate2 = (hits >= 2).mean(axis=1)
+        rate3 = (hits >= 3).mean(axis=1)
+        avg_hits = hits.mean(axis=1)
+
+        def describe(i):
+            return {
+                'weights': {n: round(float(v), 4) for n, v in zip(names, candidates[i])},
+                'hit2_rate': float(rate2[i]),
+                'hit3_rate': float(rate3[i]),
+                'avg_hits': float(avg_hits[i])
+            }
+
+        front = pareto_front(np.column_stack([rate2, rate3]))
+        top = np.argsort(-(rate2 + 1e-3 * avg_hits), kind='stable')[:top_k]
+
+        return {
+            'pareto': [describe(i) for i in front],
+            'top': [describe(i) for i in top],
+            'evaluated': len(candidates),
+            'periods': hits.shape[1]
+        }
+
+
+if __name__ == "__main__":
+    import time
+
+    cache_file = Path("data/cache/score_cache_539.npz")
+    if cache_file.exists():
+        cache = ScoreCache.load(cache_file)
+    else:
+        history_len = len(pd.read_csv("data/539_history.csv"))
+        cache = build_score_cache(start_period=max(30, history_len - 100))
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache.save(cache_file)
+
+    search = WeightGridSearch(cache)
+    start = time.perf_counter()
+    result = search.search(n_random=5000, window=100)
+    print(f"Evaluated {result['evaluated']} candidates x {result['periods']} periods "
+          f"in {time.perf_counter() - start:.2f}s")
+    for item in result['pareto']:
+        print(item)